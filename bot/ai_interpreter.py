@@ -4,29 +4,249 @@ Intérprete de IA usando Llama 3.3 70B via OpenRouter
 
 import json
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import aiohttp
 import asyncio
 import pytz
 from loguru import logger
 
 from config.settings import settings
-from utils.helpers import parse_simple_time_expressions
+from utils.http_client import HttpClient
+from utils.time_parser import parse_time_expression, TimeParseResult
+from bot.llm_cache import LLMCache, ANCHOR_DATE, ANCHOR_STATIC
+
+
+# Versión de cada prompt: subirla al editar un prompt invalida sus respuestas cacheadas
+PROMPT_VERSIONS = {
+    "interpret_time_expression": 1,
+    "parse_recurring_reminder": 1,
+    "parse_multiple_reminders": 1,
+    "parse_deletion_request": 1,
+    "enhance_reminder_text": 1,
+    "route_message": 2
+}
+
+# Reglas y ejemplos compartidos por enhance_reminder_text y enhance_reminder_texts
+ENHANCE_RULES = """REGLAS IMPORTANTES:
+1. Mantén la esencia del mensaje original
+2. Hazlo más específico y accionable
+3. USA TÍTULOS CORTOS Y DIRECTOS (máximo 30 caracteres)
+4. Para evaluaciones/exámenes, usa solo "Examen [número]" o "Evaluación [tipo]"
+5. Para informes, usa solo "Informe [materia]"
+6. Para presentaciones, usa solo "Presentación [tema]"
+7. NO uses "Recordatorio:" al inicio
+8. NO agregues texto descriptivo extra
+9. NO cambies fechas ni horas mencionadas
+
+Ejemplos:
+Input: "40% RA1-2-3: Informe Caso Logística Completo"
+Output: "Examen Logística"
+
+Input: "Evaluación certificación Hubspot"
+Output: "Examen Hubspot"
+
+Input: "Presentación empresa productiva"
+Output: "Presentación Empresa"
+
+Input: "recordar comprar leche"
+Output: "Comprar leche"
+
+Input: "reunión con juan"
+Output: "Reunión Juan"
+
+Input: "enviar reporte marketing"
+Output: "Reporte Marketing\""""
 
 
 class AIInterpreter:
     """Intérprete de IA para procesar lenguaje natural"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http_client: Optional[HttpClient] = None, cache: Optional[LLMCache] = None):
         self.api_key = api_key
+        self.http = http_client or HttpClient()
+        self.cache = cache or LLMCache()
         self.api_url = settings.OPENROUTER_API_URL
         self.model = settings.LLAMA_MODEL
         self.timeout = settings.AI_TIMEOUT_SECONDS
         
-    async def _make_api_call(self, messages: List[Dict[str, str]], temperature: float = None) -> Optional[str]:
-        """Hacer llamada a la API de OpenRouter"""
+    async def _cached_api_call(
+        self,
+        method: str,
+        user_input: str,
+        current_time: datetime,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        anchor: Optional[str] = None,
+        json_mode: bool = False,
+        max_tokens: Optional[int] = None
+    ) -> Tuple[Optional[str], bool]:
+        """
+        Respuesta del LLM desde la caché o, si no está, desde OpenRouter
+        
+        Returns:
+            (respuesta, True si vino de la caché)
+        """
+        cached = await self.cache.get(method, PROMPT_VERSIONS[method], user_input, current_time, anchor)
+        if cached is not None:
+            return cached, True
+        if json_mode:
+            return await self._make_api_call(messages, temperature=temperature, json_mode=True, max_tokens=max_tokens), False
+        return await self._make_api_call(messages, temperature=temperature), False
+    
+    async def _cache_answer(self, method: str, user_input: str, current_time: datetime, result: str, anchor: Optional[str] = None):
+        """Guardar una respuesta ya validada (las inválidas no se cachean)"""
+        await self.cache.set(method, PROMPT_VERSIONS[method], user_input, current_time, result, anchor)
+    
+    @staticmethod
+    def _strip_code_fence(result: str) -> str:
+        """Quitar el bloque ```json ... ``` que a veces envuelve la respuesta"""
+        result = result.strip()
+        if result.startswith('```json'):
+            result = result[7:-3].strip()
+        elif result.startswith('```'):
+            result = result[3:-3].strip()
+        return result
+    
+    async def route_message(self, user_input: str, context: Optional[List[str]] = None, current_time: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Clasificar la intención y extraer todos los recordatorios en una sola llamada
+        
+        Reemplaza la cascada parse_deletion_request → parse_recurring_reminder →
+        parse_multiple_reminders → interpret_time_expression + enhance_reminder_text;
+        esos métodos quedan como respaldo si esta llamada falla
+        
+        Args:
+            user_input: Mensaje del usuario
+            context: Contexto previo del usuario (solo orienta los títulos)
+            current_time: Hora actual (UTC)
+        
+        Returns:
+            {"intent": "create", "recurring", "pattern", "reminders": [{"text", "original", "date"}]},
+            {"intent": "delete", "deletion": {...formato legacy...}} o {"intent": "none"};
+            None si la respuesta no se pudo obtener o interpretar
+        """
+        if current_time is None:
+            current_time = datetime.utcnow()
+        chile_tz = pytz.timezone('America/Santiago')
+        chile_now = current_time.replace(tzinfo=pytz.UTC).astimezone(chile_tz)
+        weekdays_es = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+        
+        context_text = ""
+        if context:
+            context_text = "\n\nContexto previo del usuario:\n" + "\n".join(context[-3:])
+        
+        system_prompt = f"""Eres el asistente de recordatorios de OskarOS. Analiza el mensaje del usuario y responde SOLO un objeto JSON.
+
+FECHA/HORA ACTUAL: {current_time.strftime('%Y-%m-%d %H:%M:%S')} UTC
+HORA EN CHILE: {chile_now.strftime('%Y-%m-%d %H:%M')} (América/Santiago), hoy es {weekdays_es[chile_now.weekday()]}
+
+INTENCIONES:
+- "create": el usuario quiere uno o más recordatorios (incluye recurrentes y listas académicas)
+- "delete": quiere eliminar, cancelar o poner excepciones a recordatorios existentes
+- "none": no es una solicitud de recordatorio o no tiene ninguna fecha interpretable
+
+REGLAS PARA "create":
+1. Un elemento en "reminders" por cada fecha: listas con varias fechas → varios recordatorios
+2. Recurrentes: "todos los días" → próximos 7 días; "todos los lunes"/"cada semana" → próximas 4 semanas;
+   "día por medio" → cada 2 días por 14 días; "cada mes" → próximos 3 meses; "lunes a viernes" → próximos 5 días hábiles
+3. Fechas SIEMPRE futuras, en UTC con formato YYYY-MM-DDTHH:MM:SSZ (convierte desde la hora de Chile)
+4. Horas por defecto: trabajo/clases 09:00, entregas y fechas límite 23:59, llamadas/reuniones 10:00,
+   gym 07:00, médico/trámites 10:00, medicamentos 08:00, sociales 19:00; "al tiro" = +30 segundos
+5. "title": título corto y accionable (máximo 30 caracteres), sin "Recordatorio:", sin fechas ni porcentajes;
+   evaluaciones → "Examen [materia]", informes → "Informe [tema]", presentaciones → "Presentación [tema]"
+6. "original": el fragmento del mensaje que originó ese recordatorio; omítelo si es el mensaje completo
+
+REGLAS PARA "delete":
+- deletion_type: "specific" (uno), "pattern" (todos los que coinciden), "exception" (mantener recurrencia salvo ciertos días)
+- exceptions: días de la semana en español, p.ej. [{{"weekday": "viernes", "reason": "..."}}]
+
+FORMATO:
+{{
+  "intent": "create|delete|none",
+  "recurring": false,
+  "pattern": "descripción del patrón recurrente o vacío",
+  "reminders": [{{"title": "Examen Logística", "original": "40% RA1: Informe Caso Logística 5 OCTUBRE 2025", "date": "2025-10-06T02:59:00Z"}}],
+  "deletion": {{"is_deletion": true, "deletion_type": "specific", "target_pattern": "gym", "exceptions": [], "keep_recurrence": false, "action_description": "..."}}
+}}
+Usa "reminders": [] y "deletion": null cuando no apliquen.{context_text}"""
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_input}
+        ]
+        
+        try:
+            result, cached = await self._cached_api_call(
+                "route_message", user_input, current_time, messages, temperature=0.2, json_mode=True,
+                max_tokens=settings.AI_ROUTER_MAX_TOKENS
+            )
+            if not result:
+                return None
+            
+            result = self._strip_code_fence(result)
+            parsed = json.loads(result)
+            intent = parsed.get("intent")
+            
+            if intent == "delete":
+                deletion = self._to_legacy_deletion(
+                    {"is_deletion": True, **(parsed.get("deletion") or {})}, chile_now
+                )
+                route = {"intent": "delete", "deletion": deletion}
+            
+            elif intent == "create":
+                reminders = []
+                for reminder in parsed.get("reminders") or []:
+                    date_str = reminder.get("date") or ""
+                    title = (reminder.get("title") or reminder.get("text") or "").strip()
+                    if not title or not date_str.endswith('Z'):
+                        continue
+                    try:
+                        reminders.append({
+                            "text": title,
+                            "original": reminder.get("original") or user_input,
+                            "date": datetime.fromisoformat(date_str[:-1])
+                        })
+                    except ValueError:
+                        logger.warning(f"⚠️ Fecha inválida del router: {date_str}")
+                
+                route = {
+                    "intent": "create",
+                    "recurring": bool(parsed.get("recurring")),
+                    "pattern": parsed.get("pattern") or "",
+                    "reminders": reminders
+                }
+            
+            elif intent == "none":
+                route = {"intent": "none"}
+            else:
+                logger.warning(f"⚠️ Intención desconocida del router: {intent}")
+                return None
+            
+            if not cached:
+                await self._cache_answer("route_message", user_input, current_time, result)
+            
+            logger.info(f"🧭 Mensaje enrutado en una llamada: {route['intent']} ({len(route.get('reminders', []))} recordatorios)")
+            return route
+            
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ Respuesta del router no es JSON válido: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error enrutando mensaje: {e}")
+            return None
+        
+    async def _make_api_call(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        json_mode: bool = False,
+        max_tokens: Optional[int] = None
+    ) -> Optional[str]:
+        """Hacer llamada a la API de OpenRouter (json_mode pide una respuesta JSON estructurada)"""
         if temperature is None:
             temperature = settings.AI_TEMPERATURE
+        if max_tokens is None:
+            max_tokens = settings.AI_MAX_TOKENS
             
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -39,21 +259,22 @@ class AIInterpreter:
             "model": self.model,
             "messages": messages,
             "temperature": temperature,
-            "max_tokens": settings.AI_MAX_TOKENS,
+            "max_tokens": max_tokens,
             "stream": False
         }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
         
         try:
             timeout = aiohttp.ClientTimeout(total=self.timeout)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data["choices"][0]["message"]["content"].strip()
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Error API OpenRouter {response.status}: {error_text}")
-                        return None
+            async with self.http.session.post(self.api_url, headers=headers, json=payload, timeout=timeout) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data["choices"][0]["message"]["content"].strip()
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Error API OpenRouter {response.status}: {error_text}")
+                    return None
                         
         except asyncio.TimeoutError:
             logger.error("⏱️ Timeout en llamada a OpenRouter")
@@ -78,11 +299,11 @@ class AIInterpreter:
             chile_tz = pytz.timezone('America/Santiago')
             current_time = datetime.now(chile_tz).astimezone(pytz.UTC).replace(tzinfo=None)
         
-        # Intentar parser básico primero (más rápido)
-        basic_result = parse_simple_time_expressions(user_input, current_time)
-        if basic_result:
-            logger.info(f"⚡ Interpretación básica exitosa: {user_input} -> {basic_result}")
-            return basic_result
+        # Parser local primero: solo las expresiones de baja confianza llegan al LLM
+        local_result = parse_time_expression(user_input, current_time)
+        if local_result and local_result.confidence >= settings.TIME_PARSER_MIN_CONFIDENCE:
+            logger.info(f"⚡ Interpretación local ({local_result.confidence:.2f}): {user_input} -> {local_result.date}")
+            return local_result.date
         
         # Usar IA para casos complejos - SISTEMA ULTRA COMPLETO
         system_prompt = f"""Eres un experto ULTRA-INTELIGENTE en interpretar expresiones temporales en español chileno, incluyendo lenguaje coloquial, académico, profesional, y casos extremos.
@@ -257,25 +478,37 @@ Usuario: "early next month" → [día 3 del próximo mes a las 09:00]"""
         ]
         
         try:
-            result = await self._make_api_call(messages, temperature=0.3)
+            result, cached = await self._cached_api_call(
+                "interpret_time_expression", user_input, current_time, messages, temperature=0.3
+            )
             
             if not result or result.strip() == "ERROR":
                 logger.warning(f"⚠️ IA no pudo interpretar: {user_input}")
-                return None
+                return self._local_time_fallback(local_result, current_time)
             
             # Parsear respuesta ISO8601
             result = result.strip()
             if result.endswith('Z'):
                 parsed_time = datetime.fromisoformat(result[:-1])  # Remover Z
+                if not cached:
+                    await self._cache_answer("interpret_time_expression", user_input, current_time, result)
                 logger.info(f"🤖 IA interpretó: {user_input} -> {parsed_time}")
                 return parsed_time
             else:
                 logger.error(f"❌ Formato inválido de IA: {result}")
-                return None
+                return self._local_time_fallback(local_result, current_time)
                 
         except Exception as e:
             logger.error(f"❌ Error interpretando tiempo con IA: {e}")
-            return None
+            return self._local_time_fallback(local_result, current_time)
+    
+    @staticmethod
+    def _local_time_fallback(local_result: Optional[TimeParseResult], current_time: datetime) -> Optional[datetime]:
+        """Si el LLM no responde, usar la lectura local aunque tenga baja confianza (si es futura)"""
+        if local_result and local_result.date > current_time:
+            logger.info(f"⚡ Usando interpretación local de respaldo ({local_result.confidence:.2f}): {local_result.date}")
+            return local_result.date
+        return None
     
     async def parse_recurring_reminder(self, user_input: str, current_time: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """
@@ -374,7 +607,9 @@ Usuario: "día por medio revisar email"
         ]
         
         try:
-            result = await self._make_api_call(messages, temperature=0.2)
+            result, cached = await self._cached_api_call(
+                "parse_recurring_reminder", user_input, current_time, messages, temperature=0.2
+            )
             
             if not result:
                 return []
@@ -388,6 +623,8 @@ Usuario: "día por medio revisar email"
             
             # Parsear JSON
             parsed_result = json.loads(result)
+            if not cached:
+                await self._cache_answer("parse_recurring_reminder", user_input, current_time, result)
             
             if not parsed_result.get("is_recurring", False):
                 return []
@@ -417,6 +654,8 @@ Usuario: "día por medio revisar email"
         except Exception as e:
             logger.error(f"❌ Error parseando recordatorios recurrentes: {e}")
             return []
+    
+    async def parse_multiple_reminders(self, user_input: str, current_time: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """
         Interpretar múltiples recordatorios en un solo mensaje
         
@@ -485,7 +724,9 @@ Salida: [{{"text": "Presentación", "date": "2025-11-10T09:00:00Z"}}]"""
         ]
         
         try:
-            result = await self._make_api_call(messages, temperature=0.2)
+            result, cached = await self._cached_api_call(
+                "parse_multiple_reminders", user_input, current_time, messages, temperature=0.2
+            )
             
             if not result:
                 logger.warning(f"⚠️ IA no devolvió resultado para múltiples recordatorios")
@@ -500,6 +741,8 @@ Salida: [{{"text": "Presentación", "date": "2025-11-10T09:00:00Z"}}]"""
             
             # Parsear JSON
             reminders = json.loads(result)
+            if not cached:
+                await self._cache_answer("parse_multiple_reminders", user_input, current_time, result)
             
             # Validar y convertir fechas
             valid_reminders = []
@@ -605,8 +848,13 @@ EJEMPLOS:
             {"role": "user", "content": f"Analizar eliminación: '{user_input}'"}
         ]
         
+        # Las fechas de excepción se recalculan en cada llamada: la respuesta vale todo el día
+        reference_time = current_time.astimezone(pytz.UTC).replace(tzinfo=None)
+        
         try:
-            result = await self._make_api_call(messages, temperature=0.2)
+            result, cached = await self._cached_api_call(
+                "parse_deletion_request", user_input, reference_time, messages, temperature=0.2, anchor=ANCHOR_DATE
+            )
             
             if not result:
                 return {"is_deletion": False}
@@ -620,31 +868,13 @@ EJEMPLOS:
             
             try:
                 parsed_result = json.loads(result)
+                if not cached:
+                    await self._cache_answer(
+                        "parse_deletion_request", user_input, reference_time, result, anchor=ANCHOR_DATE
+                    )
                 
-                # Si es una modificación con excepciones, procesar los días de la semana
-                if parsed_result.get("is_deletion") and parsed_result.get("deletion_type") == "exception":
-                    exceptions = parsed_result.get("exceptions", [])
-                    for exception in exceptions:
-                        if "weekday" in exception:
-                            # Calcular la fecha del próximo día especificado
-                            weekday_name = exception["weekday"].lower()
-                            weekday_index = self._get_weekday_index(weekday_name)
-                            if weekday_index is not None:
-                                next_date = self._get_next_weekday_date(current_time, weekday_index)
-                                exception["date"] = next_date.isoformat() + "Z"
-                
-                # Convertir a formato legacy para compatibilidad
-                if parsed_result.get("is_deletion"):
-                    legacy_result = {
-                        "type": parsed_result.get("deletion_type", "specific"),
-                        "target": parsed_result.get("target_pattern", ""),
-                        "pattern": parsed_result.get("target_pattern", ""),
-                        "keep_recurrence": parsed_result.get("keep_recurrence", False),
-                        "exception_dates": [exc.get("date") for exc in parsed_result.get("exceptions", []) if "date" in exc],
-                        "exception_weekdays": [exc.get("weekday") for exc in parsed_result.get("exceptions", []) if "weekday" in exc],
-                        "action_description": parsed_result.get("action_description", "")
-                    }
-                    
+                legacy_result = self._to_legacy_deletion(parsed_result, current_time)
+                if legacy_result:
                     logger.info(f"🗑️ Solicitud de eliminación parseada: {legacy_result['type']} - {legacy_result['action_description']}")
                     return legacy_result
                 else:
@@ -659,6 +889,42 @@ EJEMPLOS:
             logger.error(f"❌ Error en parse_deletion_request: {e}")
             return {"is_deletion": False}
     
+    def _to_legacy_deletion(self, parsed_result: Dict[str, Any], current_time: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Convertir la respuesta JSON de eliminación al formato legacy que usa el bot
+        
+        Args:
+            parsed_result: JSON del LLM ("is_deletion", "deletion_type", "exceptions", ...)
+            current_time: Hora actual en Chile (para fechar las excepciones por día de la semana)
+        
+        Returns:
+            Diccionario legacy o None si no es una eliminación
+        """
+        if not parsed_result.get("is_deletion"):
+            return None
+        
+        # Si es una modificación con excepciones, procesar los días de la semana
+        exceptions = parsed_result.get("exceptions") or []
+        if parsed_result.get("deletion_type") == "exception":
+            for exception in exceptions:
+                if "weekday" in exception:
+                    # Calcular la fecha del próximo día especificado
+                    weekday_name = exception["weekday"].lower()
+                    weekday_index = self._get_weekday_index(weekday_name)
+                    if weekday_index is not None:
+                        next_date = self._get_next_weekday_date(current_time, weekday_index)
+                        exception["date"] = next_date.isoformat() + "Z"
+        
+        return {
+            "type": parsed_result.get("deletion_type", "specific"),
+            "target": parsed_result.get("target_pattern", ""),
+            "pattern": parsed_result.get("target_pattern", ""),
+            "keep_recurrence": parsed_result.get("keep_recurrence", False),
+            "exception_dates": [exc.get("date") for exc in exceptions if "date" in exc],
+            "exception_weekdays": [exc.get("weekday") for exc in exceptions if "weekday" in exc],
+            "action_description": parsed_result.get("action_description", "")
+        }
+    
     def _get_weekday_index(self, weekday_name: str) -> Optional[int]:
         """Obtener índice del día de la semana (0=lunes, 6=domingo)"""
         weekdays_map = {
@@ -702,46 +968,25 @@ EJEMPLOS:
 
 Tu tarea: Crear un recordatorio claro y específico basado en el input del usuario.
 
-REGLAS IMPORTANTES:
-1. Mantén la esencia del mensaje original
-2. Hazlo más específico y accionable
-3. USA TÍTULOS CORTOS Y DIRECTOS (máximo 30 caracteres)
-4. Para evaluaciones/exámenes, usa solo "Examen [número]" o "Evaluación [tipo]"
-5. Para informes, usa solo "Informe [materia]"
-6. Para presentaciones, usa solo "Presentación [tema]"
-7. NO uses "Recordatorio:" al inicio
-8. NO agregues texto descriptivo extra
-9. NO cambies fechas ni horas mencionadas
-
-Ejemplos:
-Input: "40% RA1-2-3: Informe Caso Logística Completo"
-Output: "Examen Logística"
-
-Input: "Evaluación certificación Hubspot"
-Output: "Examen Hubspot"
-
-Input: "Presentación empresa productiva"
-Output: "Presentación Empresa"
-
-Input: "recordar comprar leche"
-Output: "Comprar leche"
-
-Input: "reunión con juan"
-Output: "Reunión Juan"
-
-Input: "enviar reporte marketing"
-Output: "Reporte Marketing"{context_text}"""
+{ENHANCE_RULES}{context_text}"""
 
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": f"Mejorar recordatorio: '{user_input}'"}
         ]
         
+        # El título no depende de la hora; el contexto solo orienta el estilo y no entra en la clave
+        now = datetime.utcnow()
+        
         try:
-            result = await self._make_api_call(messages, temperature=0.4)
+            result, cached = await self._cached_api_call(
+                "enhance_reminder_text", user_input, now, messages, temperature=0.4, anchor=ANCHOR_STATIC
+            )
             
             if result and len(result.strip()) > 0:
                 enhanced = result.strip()
+                if not cached:
+                    await self._cache_answer("enhance_reminder_text", user_input, now, enhanced, anchor=ANCHOR_STATIC)
                 logger.info(f"✨ Recordatorio mejorado: '{user_input}' -> '{enhanced}'")
                 return enhanced
             else:
@@ -751,6 +996,71 @@ Output: "Reporte Marketing"{context_text}"""
             logger.error(f"❌ Error mejorando texto: {e}")
             return f"Recordatorio: {user_input}"
     
+    async def enhance_reminder_texts(self, texts: List[str], context: Optional[List[str]] = None) -> List[str]:
+        """
+        Mejorar varios textos de recordatorio en una sola llamada
+        
+        Los textos repetidos (p.ej. una serie recurrente) se mejoran una vez y las
+        respuestas se comparten con la caché de enhance_reminder_text
+        
+        Args:
+            texts: Textos originales (en orden)
+            context: Contexto previo del usuario
+        
+        Returns:
+            Textos mejorados, en el mismo orden que `texts`
+        """
+        unique = list(dict.fromkeys(texts))
+        now = datetime.utcnow()
+        enhanced: Dict[str, str] = {}
+        
+        for text in unique:
+            cached = await self.cache.get(
+                "enhance_reminder_text", PROMPT_VERSIONS["enhance_reminder_text"], text, now, ANCHOR_STATIC
+            )
+            if cached:
+                enhanced[text] = cached
+        
+        pending = [text for text in unique if text not in enhanced]
+        if len(pending) == 1:
+            enhanced[pending[0]] = await self.enhance_reminder_text(pending[0], context)
+        elif pending:
+            context_text = ""
+            if context and len(context) > 0:
+                context_text = f"\n\nContexto previo del usuario:\n" + "\n".join(context[-3:])
+            
+            system_prompt = f"""Mejora cada texto de recordatorio de la lista para que sea más claro y específico.
+
+Tu tarea: Devolver un título por cada input, en el mismo orden.
+
+{ENHANCE_RULES}
+
+Formato de respuesta: SOLO un arreglo JSON de strings con exactamente {len(pending)} elementos.{context_text}"""
+
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": "Mejorar recordatorios:\n" + json.dumps(pending, ensure_ascii=False)}
+            ]
+            
+            try:
+                result = await self._make_api_call(messages, temperature=0.4)
+                titles = json.loads(self._strip_code_fence(result)) if result else None
+                
+                if isinstance(titles, list) and len(titles) == len(pending):
+                    for text, title in zip(pending, titles):
+                        title = str(title).strip()
+                        if title:
+                            enhanced[text] = title
+                            await self._cache_answer("enhance_reminder_text", text, now, title, anchor=ANCHOR_STATIC)
+                    logger.info(f"✨ {len(pending)} recordatorios mejorados en una llamada")
+                else:
+                    logger.warning(f"⚠️ Respuesta inválida al mejorar {len(pending)} recordatorios")
+                    
+            except Exception as e:
+                logger.error(f"❌ Error mejorando textos: {e}")
+        
+        return [enhanced.get(text, f"Recordatorio: {text}") for text in texts]
+    
     async def generate_weekly_summary(self, user_name: str, reminders: List[Dict], notes: List[Dict]) -> str:
         """
         Generar resumen semanal inteligente
@@ -3,13 +3,26 @@ Integración con Apple Calendar (iCloud CalDAV)
 Permite crear eventos automáticamente en el calendario del usuario
 """
 
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 import caldav
+from caldav.elements import dav
+from caldav.lib import error as caldav_error
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from icalendar import Calendar, Event
+from typing import Optional, Dict, Any, Callable, List
+from icalendar import Calendar, Event, vRecur
 import pytz
 from loguru import logger
 
+from config.settings import settings
+
+def make_event_uid(reminder_id: str) -> str:
+    """UID del evento de calendario de un recordatorio (estable, derivado de su ID)"""
+    return f"{reminder_id}@oskaros-bot"
+
+
 class AppleCalendarIntegration:
     """Maneja la integración con Apple Calendar vía CalDAV"""
     
@@ -29,9 +42,39 @@ class AppleCalendarIntegration:
         self.principal = None
         self.calendar = None
         
+        # Espejo local (bot.calendar_mirror); cuando está al día, las búsquedas no van a iCloud
+        self.mirror = None
+        
+        # caldav es síncrono: sus llamadas corren en un pool acotado, fuera del event loop
+        self.timeout = settings.CALDAV_TIMEOUT_SECONDS
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.CALDAV_MAX_WORKERS,
+            thread_name_prefix="caldav"
+        )
+        
         # Zona horaria de Chile
         self.chile_tz = pytz.timezone('America/Santiago')
     
+    async def _run_blocking(self, func: Callable, *args, **kwargs):
+        """
+        Ejecutar una llamada bloqueante de caldav en el pool de hilos
+        
+        Raises:
+            asyncio.TimeoutError: si la llamada supera CALDAV_TIMEOUT_SECONDS
+        """
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs)),
+            timeout=self.timeout
+        )
+    
+    def _mirror_ready(self) -> bool:
+        return self.mirror is not None and self.mirror.is_ready
+    
+    def close(self):
+        """Liberar el pool de hilos (las llamadas en curso terminan por su timeout HTTP)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
     async def connect(self) -> bool:
         """
         Establecer conexión con iCloud Calendar
@@ -44,14 +87,15 @@ class AppleCalendarIntegration:
             self.client = caldav.DAVClient(
                 url=self.calendar_url,
                 username=self.email,
-                password=self.password
+                password=self.password,
+                timeout=self.timeout
             )
             
             # Obtener principal (usuario)
-            self.principal = self.client.principal()
+            self.principal = await self._run_blocking(self.client.principal)
             
             # Obtener calendarios
-            calendars = self.principal.calendars()
+            calendars = await self._run_blocking(self.principal.calendars)
             
             if not calendars:
                 logger.error("❌ No se encontraron calendarios en iCloud")
@@ -63,6 +107,9 @@ class AppleCalendarIntegration:
             
             return True
             
+        except asyncio.TimeoutError:
+            logger.error("⏱️ Timeout conectando a Apple Calendar")
+            return False
         except Exception as e:
             logger.error(f"❌ Error conectando a Apple Calendar: {e}")
             return False
@@ -71,7 +118,10 @@ class AppleCalendarIntegration:
                           title: str, 
                           start_datetime: datetime, 
                           description: str = "",
-                          duration_hours: int = 1) -> bool:
+                          duration_hours: int = 1,
+                          uid: Optional[str] = None,
+                          rrule: Optional[str] = None,
+                          exdates: Optional[List[datetime]] = None) -> Optional[Dict[str, Any]]:
         """
         Crear un evento en Apple Calendar
         
@@ -80,14 +130,17 @@ class AppleCalendarIntegration:
             start_datetime: Fecha y hora de inicio (UTC)
             description: Descripción del evento
             duration_hours: Duración en horas (default: 1)
+            uid: UID del evento (si no se indica se genera uno aleatorio)
+            rrule: Regla de recurrencia (un solo evento recurrente en vez de uno por ocurrencia)
+            exdates: Ocurrencias excluidas de la serie (UTC)
         
         Returns:
-            True si el evento se creó exitosamente
+            Referencia del evento {"uid", "href", "etag"} o None si falló
         """
         try:
             if not self.calendar:
                 logger.error("❌ No hay conexión al calendario")
-                return False
+                return None
             
             # Convertir UTC a zona horaria de Chile
             chile_start = start_datetime.replace(tzinfo=pytz.UTC).astimezone(self.chile_tz)
@@ -104,32 +157,88 @@ class AppleCalendarIntegration:
             event.add('dtstart', chile_start)
             event.add('dtend', chile_end)
             event.add('dtstamp', datetime.now(pytz.UTC))
+            if rrule:
+                self._set_recurrence(event, rrule, exdates or [])
             
-            # Generar UID único
-            import uuid
-            event.add('uid', f"{uuid.uuid4()}@oskaros-bot")
+            # UID: se guarda en el recordatorio para borrar/renombrar sin buscar
+            if not uid:
+                import uuid
+                uid = f"{uuid.uuid4()}@oskaros-bot"
+            event.add('uid', uid)
             
             cal.add_component(event)
             
             # Crear evento en el calendario
-            self.calendar.save_event(cal.to_ical().decode('utf-8'))
+            href = self._event_url(uid)
+            etag = await self._run_blocking(self._put_event, href, cal.to_ical().decode('utf-8'))
+            
+            reference = {"uid": uid, "href": href, "etag": etag}
+            if self.mirror:
+                await self.mirror.record_event(
+                    reference, title, start_datetime, start_datetime + timedelta(hours=duration_hours),
+                    rrule=rrule, exdates=(exdates or []) if rrule else None
+                )
             
             logger.info(f"📅 Evento creado en Apple Calendar: {title} - {chile_start.strftime('%Y-%m-%d %H:%M')}")
-            return True
+            return reference
             
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Timeout creando evento en Apple Calendar: {title}")
+            return None
         except Exception as e:
             logger.error(f"❌ Error creando evento en Apple Calendar: {e}")
-            return False
+            return None
+    
+    def _set_recurrence(self, event: Event, rrule: str, exdates: List[datetime]):
+        """Escribir RRULE y EXDATE (en hora de Chile, como DTSTART) en un VEVENT"""
+        for prop in ('rrule', 'exdate'):
+            if prop in event:
+                del event[prop]
+        event.add('rrule', vRecur.from_ical(rrule))
+        if exdates:
+            event.add('exdate', [
+                exdate.replace(tzinfo=pytz.UTC).astimezone(self.chile_tz) for exdate in sorted(exdates)
+            ])
+    
+    def _event_url(self, uid: str) -> str:
+        """URL del recurso .ics de un evento dentro del calendario"""
+        return str(self.calendar.url.join(quote(uid.replace("/", "%2F")) + ".ics"))
+    
+    def _put_event(self, href: str, ical_data: str, etag: Optional[str] = None) -> Optional[str]:
+        """
+        Escribir un evento (bloqueante, corre en el pool)
+        
+        Sin etag solo crea (If-None-Match: *), así un reintento tras un timeout no duplica;
+        con etag solo sobrescribe la versión conocida (If-Match)
+        
+        Returns:
+            ETag nuevo si el servidor lo informa
+        """
+        headers = {"Content-Type": 'text/calendar; charset="utf-8"'}
+        if etag:
+            headers["If-Match"] = etag
+        else:
+            headers["If-None-Match"] = "*"
+        
+        response = self.client.put(href, ical_data, headers)
+        
+        # 412 al crear: el evento ya existe (reintento de una creación que sí llegó)
+        if response.status == 412 and not etag:
+            return None
+        if response.status not in (200, 201, 204):
+            raise caldav_error.PutError(f"{response.status} {response.reason}")
+        
+        return response.headers.get("ETag")
     
-    async def create_reminder_event(self, reminder_data: Dict[str, Any]) -> bool:
+    async def create_reminder_event(self, reminder_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Crear evento en calendario basado en datos del recordatorio
         
         Args:
-            reminder_data: Datos del recordatorio con 'text', 'date', etc.
+            reminder_data: Datos del recordatorio con 'text', 'date', 'calendar_uid', etc.
         
         Returns:
-            True si el evento se creó exitosamente
+            Referencia del evento {"uid", "href", "etag"} o None si falló
         """
         try:
             title = reminder_data.get('text', 'Recordatorio')
@@ -138,7 +247,7 @@ class AppleCalendarIntegration:
             
             if not target_date:
                 logger.warning("⚠️ No hay fecha válida para crear evento")
-                return False
+                return None
             
             # Descripción del evento
             description = f"Recordatorio creado por OskarOS Bot\n\nTexto original: {original_input}"
@@ -150,12 +259,15 @@ class AppleCalendarIntegration:
                 title=title,
                 start_datetime=target_date,
                 description=description,
-                duration_hours=duration
+                duration_hours=duration,
+                uid=reminder_data.get('calendar_uid'),
+                rrule=reminder_data.get('rrule'),
+                exdates=reminder_data.get('exdates')
             )
             
         except Exception as e:
             logger.error(f"❌ Error creando evento de recordatorio: {e}")
-            return False
+            return None
     
     def _get_event_duration(self, event_text: str) -> int:
         """
@@ -195,6 +307,161 @@ class AppleCalendarIntegration:
         else:
             return 1  # 1 hora por defecto
     
+    async def delete_event_by_reference(self, uid: Optional[str] = None, href: Optional[str] = None) -> bool:
+        """
+        Eliminar un evento directamente por su recurso (sin buscar por título)
+        
+        Args:
+            uid: UID del evento
+            href: URL del recurso guardada al crearlo
+        
+        Returns:
+            True si se eliminó o ya no existía
+        """
+        try:
+            if not self.calendar:
+                logger.error("❌ No hay conexión al calendario")
+                return False
+            
+            deleted = await self._run_blocking(self._delete_event_resource, uid, href)
+            if self.mirror:
+                await self.mirror.forget_event(href=href, uid=uid)
+            if deleted:
+                logger.info(f"🗑️ Evento eliminado de Apple Calendar: {uid or href}")
+            else:
+                logger.info(f"ℹ️ Evento ya no existía en Apple Calendar: {uid or href}")
+            return True
+            
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Timeout eliminando evento de Apple Calendar: {uid or href}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error eliminando evento de Apple Calendar: {e}")
+            return False
+    
+    def _delete_event_resource(self, uid: Optional[str], href: Optional[str]) -> bool:
+        """DELETE del recurso; si la URL no existe, un REPORT por UID (bloqueante, corre en el pool)"""
+        url = href or (self._event_url(uid) if uid else None)
+        if url:
+            response = self.client.delete(url)
+            if response.status in (200, 204):
+                return True
+            if response.status != 404:
+                raise caldav_error.DeleteError(f"{response.status} {response.reason}")
+        
+        # El servidor pudo haber guardado el evento en otra URL
+        if not uid:
+            return False
+        try:
+            event = self.calendar.event_by_uid(uid)
+        except caldav_error.NotFoundError:
+            return False
+        event.delete()
+        return True
+    
+    async def update_event_by_reference(self, new_title: str, uid: Optional[str] = None, href: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cambiar el título de un evento directamente por su recurso
+        
+        Args:
+            new_title: Nuevo título
+            uid: UID del evento
+            href: URL del recurso guardada al crearlo
+        
+        Returns:
+            Referencia actualizada {"uid", "href", "etag"}, o None si no existe o falló
+        """
+        try:
+            if not self.calendar:
+                logger.error("❌ No hay conexión al calendario")
+                return None
+            
+            reference = await self._run_blocking(self._rename_event_resource, new_title, uid, href)
+            if reference and self.mirror:
+                await self.mirror.record_event(reference, new_title, None, None)
+            if reference:
+                logger.info(f"✅ Evento actualizado en Apple Calendar: '{new_title}'")
+            else:
+                logger.warning(f"⚠️ No se encontró evento para actualizar: {uid or href}")
+            return reference
+            
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Timeout actualizando evento en Apple Calendar: {uid or href}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error actualizando evento en Apple Calendar: {e}")
+            return None
+    
+    def _rename_event_resource(self, new_title: str, uid: Optional[str], href: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Cambiar el SUMMARY del evento (bloqueante, corre en el pool)"""
+        def rename(component):
+            component['summary'] = new_title
+        return self._edit_event_resource(uid, href, rename)
+    
+    def _edit_event_resource(self, uid: Optional[str], href: Optional[str], edit: Callable) -> Optional[Dict[str, Any]]:
+        """GET + PUT condicional (If-Match) del evento aplicando `edit` a cada VEVENT (bloqueante)"""
+        url = href or (self._event_url(uid) if uid else None)
+        try:
+            event = caldav.Event(client=self.client, url=url, parent=self.calendar).load()
+        except caldav_error.NotFoundError:
+            if not uid:
+                return None
+            try:
+                event = self.calendar.event_by_uid(uid)
+            except caldav_error.NotFoundError:
+                return None
+        
+        ical = event.icalendar_instance
+        for component in ical.walk('VEVENT'):
+            edit(component)
+        
+        etag = event.props.get(dav.GetEtag.tag)
+        new_etag = self._put_event(str(event.url), ical.to_ical().decode('utf-8'), etag=etag or None)
+        return {"uid": uid, "href": str(event.url), "etag": new_etag}
+    
+    async def update_event_recurrence_by_reference(
+        self,
+        rrule: str,
+        exdates: List[datetime],
+        uid: Optional[str] = None,
+        href: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reemplazar RRULE y EXDATE de un evento recurrente
+        
+        Args:
+            rrule: Regla de recurrencia nueva
+            exdates: Ocurrencias excluidas (UTC)
+            uid: UID del evento
+            href: URL del recurso guardada al crearlo
+        
+        Returns:
+            Referencia actualizada {"uid", "href", "etag"}, o None si no existe o falló
+        """
+        try:
+            if not self.calendar:
+                logger.error("❌ No hay conexión al calendario")
+                return None
+            
+            def set_recurrence(component):
+                self._set_recurrence(component, rrule, exdates)
+            
+            reference = await self._run_blocking(self._edit_event_resource, uid, href, set_recurrence)
+            if reference:
+                if self.mirror:
+                    await self.mirror.record_event(reference, None, None, None, rrule=rrule, exdates=exdates)
+                logger.info(f"🔁 Recurrencia actualizada en Apple Calendar: {rrule} ({len(exdates)} excepciones)")
+            else:
+                logger.warning(f"⚠️ No se encontró evento para actualizar recurrencia: {uid or href}")
+            return reference
+            
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Timeout actualizando recurrencia en Apple Calendar: {uid or href}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error actualizando recurrencia en Apple Calendar: {e}")
+            return None
+    
     async def delete_event_by_title_and_date(self, title: str, target_date: datetime) -> bool:
         """
         Eliminar evento específico por título y fecha
@@ -219,29 +486,21 @@ class AppleCalendarIntegration:
             start_of_day = chile_date.replace(hour=0, minute=0, second=0, microsecond=0)
             end_of_day = chile_date.replace(hour=23, minute=59, second=59, microsecond=999999)
             
-            # Obtener eventos del día
-            events = self.calendar.date_search(
-                start_of_day.astimezone(pytz.UTC),
-                end_of_day.astimezone(pytz.UTC)
-            )
+            matches = lambda event_title: title.lower() in event_title.lower() or event_title.lower() in title.lower()
             
-            deleted_count = 0
-            for event in events:
-                try:
-                    # Obtener datos del evento
-                    event_data = event.data
-                    if hasattr(event_data, 'summary') and event_data.summary:
-                        event_title = str(event_data.summary)
-                        
-                        # Comparar títulos (case insensitive y parcial)
-                        if title.lower() in event_title.lower() or event_title.lower() in title.lower():
-                            event.delete()
-                            deleted_count += 1
-                            logger.info(f"🗑️ Evento eliminado de Apple Calendar: {event_title}")
-                            
-                except Exception as e:
-                    logger.warning(f"⚠️ Error procesando evento individual: {e}")
-                    continue
+            if self._mirror_ready():
+                # Búsqueda en el espejo local; a iCloud solo van los DELETE
+                deleted_count = await self._delete_mirrored_matches(
+                    start_of_day.astimezone(pytz.UTC), end_of_day.astimezone(pytz.UTC), matches
+                )
+            else:
+                # Búsqueda y borrado en un solo viaje al pool de hilos
+                deleted_count = await self._run_blocking(
+                    self._delete_matching_events,
+                    start_of_day.astimezone(pytz.UTC),
+                    end_of_day.astimezone(pytz.UTC),
+                    matches
+                )
             
             if deleted_count > 0:
                 logger.info(f"✅ {deleted_count} eventos eliminados de Apple Calendar")
@@ -250,10 +509,74 @@ class AppleCalendarIntegration:
                 logger.warning(f"⚠️ No se encontraron eventos para eliminar: {title}")
                 return False
                 
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Timeout eliminando evento de Apple Calendar: {title}")
+            return False
         except Exception as e:
             logger.error(f"❌ Error eliminando evento de Apple Calendar: {e}")
             return False
     
+    async def _delete_mirrored_matches(
+        self,
+        start: datetime,
+        end: datetime,
+        matches: Callable[[str], bool],
+        title_pattern: Optional[str] = None
+    ) -> int:
+        """
+        Buscar en el espejo y borrar por referencia los eventos cuyo título coincide
+        
+        Returns:
+            Número de eventos eliminados
+        """
+        events = await self.mirror.find_events(
+            start.replace(tzinfo=None), end.replace(tzinfo=None), title_pattern
+        )
+        
+        deleted_count = 0
+        for event in events:
+            if not matches(event.get("summary") or ""):
+                continue
+            try:
+                await self._run_blocking(self._delete_event_resource, event.get("uid"), event["href"])
+                await self.mirror.forget_event(href=event["href"])
+                deleted_count += 1
+                logger.info(f"🗑️ Evento eliminado de Apple Calendar: {event.get('summary')}")
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Error procesando evento individual: {e}")
+        
+        return deleted_count
+    
+    def _delete_matching_events(self, start: datetime, end: datetime, matches: Callable[[str], bool]) -> int:
+        """
+        Buscar en un rango y borrar los eventos cuyo título coincide (bloqueante, corre en el pool)
+        
+        Returns:
+            Número de eventos eliminados
+        """
+        events = self.calendar.date_search(start, end)
+        
+        deleted_count = 0
+        for event in events:
+            try:
+                # Obtener datos del evento
+                event_data = event.data
+                if hasattr(event_data, 'summary') and event_data.summary:
+                    event_title = str(event_data.summary)
+                    
+                    if matches(event_title):
+                        event.delete()
+                        deleted_count += 1
+                        logger.info(f"🗑️ Evento eliminado de Apple Calendar: {event_title}")
+                        
+            except Exception as e:
+                logger.warning(f"⚠️ Error procesando evento individual: {e}")
+                continue
+        
+        return deleted_count
+    
     async def delete_events_by_title_pattern(self, title_pattern: str, date_range_days: int = 365) -> int:
         """
         Eliminar múltiples eventos que coincidan con un patrón de título
@@ -274,29 +597,25 @@ class AppleCalendarIntegration:
             start_date = datetime.now(pytz.UTC)
             end_date = start_date + timedelta(days=date_range_days)
             
-            # Obtener eventos en el rango
-            events = self.calendar.date_search(start_date, end_date)
+            matches = lambda event_title: title_pattern.lower() in event_title.lower()
             
-            deleted_count = 0
-            for event in events:
-                try:
-                    event_data = event.data
-                    if hasattr(event_data, 'summary') and event_data.summary:
-                        event_title = str(event_data.summary)
-                        
-                        # Comparar con patrón
-                        if title_pattern.lower() in event_title.lower():
-                            event.delete()
-                            deleted_count += 1
-                            logger.info(f"🗑️ Evento eliminado: {event_title}")
-                            
-                except Exception as e:
-                    logger.warning(f"⚠️ Error eliminando evento: {e}")
-                    continue
+            if self._mirror_ready():
+                deleted_count = await self._delete_mirrored_matches(start_date, end_date, matches, title_pattern)
+            else:
+                # Obtener y borrar eventos del rango en el pool de hilos
+                deleted_count = await self._run_blocking(
+                    self._delete_matching_events,
+                    start_date,
+                    end_date,
+                    matches
+                )
             
             logger.info(f"✅ {deleted_count} eventos eliminados de Apple Calendar")
             return deleted_count
                 
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Timeout eliminando eventos por patrón: {title_pattern}")
+            return 0
         except Exception as e:
             logger.error(f"❌ Error eliminando eventos por patrón: {e}")
             return 0
@@ -324,10 +643,13 @@ class AppleCalendarIntegration:
                 "server": self.calendar_url
             }
             
-            # Intentar obtener algunos eventos recientes para verificar acceso
+            # Conteo desde el espejo local; sin espejo, listar eventos para verificar acceso
             try:
-                events = self.calendar.events()
-                calendar_info["events_count"] = len(list(events))
+                if self._mirror_ready():
+                    calendar_info["events_count"] = await self.mirror.count_events()
+                else:
+                    events = await self._run_blocking(self.calendar.events)
+                    calendar_info["events_count"] = len(list(events))
             except:
                 calendar_info["events_count"] = "No disponible"
             
@@ -360,33 +682,67 @@ class AppleCalendarIntegration:
             search_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
             search_end = search_start + timedelta(days=1)
             
-            events = self.calendar.date_search(search_start, search_end)
-            
-            for event in events:
-                try:
-                    event_data = event.data
-                    if hasattr(event_data, 'summary') and event_data.summary:
-                        event_title = str(event_data.summary)
-                        
-                        # Verificar si coincide el título
-                        if old_title.lower() in event_title.lower():
-                            # Actualizar el título
-                            event_data.summary = new_title
-                            event.save()
-                            
-                            logger.info(f"✅ Evento actualizado en Apple Calendar: '{old_title}' → '{new_title}'")
-                            return True
-                            
-                except Exception as e:
-                    logger.warning(f"⚠️ Error procesando evento individual: {e}")
-                    continue
+            if self._mirror_ready():
+                updated = await self._rename_mirrored_match(search_start, search_end, old_title, new_title)
+            else:
+                updated = await self._run_blocking(
+                    self._rename_first_matching_event,
+                    search_start,
+                    search_end,
+                    old_title,
+                    new_title
+                )
+            
+            if updated:
+                logger.info(f"✅ Evento actualizado en Apple Calendar: '{old_title}' → '{new_title}'")
+                return True
             
             logger.warning(f"⚠️ No se encontró evento para actualizar: {old_title}")
             return False
                 
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Timeout actualizando evento en Apple Calendar: {old_title}")
+            return False
         except Exception as e:
             logger.error(f"❌ Error actualizando evento en Apple Calendar: {e}")
             return False
+    
+    async def _rename_mirrored_match(self, start: datetime, end: datetime, old_title: str, new_title: str) -> bool:
+        """Renombrar por referencia el primer evento del espejo que coincide"""
+        events: List[Dict[str, Any]] = await self.mirror.find_events(start, end, old_title)
+        
+        for event in events:
+            reference = await self._run_blocking(
+                self._rename_event_resource, new_title, event.get("uid"), event["href"]
+            )
+            if reference:
+                await self.mirror.record_event(reference, new_title, None, None)
+                return True
+        
+        return False
+    
+    def _rename_first_matching_event(self, start: datetime, end: datetime, old_title: str, new_title: str) -> bool:
+        """Renombrar el primer evento del rango que coincide (bloqueante, corre en el pool)"""
+        events = self.calendar.date_search(start, end)
+        
+        for event in events:
+            try:
+                event_data = event.data
+                if hasattr(event_data, 'summary') and event_data.summary:
+                    event_title = str(event_data.summary)
+                    
+                    # Verificar si coincide el título
+                    if old_title.lower() in event_title.lower():
+                        # Actualizar el título
+                        event_data.summary = new_title
+                        event.save()
+                        return True
+                        
+            except Exception as e:
+                logger.warning(f"⚠️ Error procesando evento individual: {e}")
+                continue
+        
+        return False
 
 
 # Instancia global (se inicializará en main.py)
@@ -419,6 +775,7 @@ async def initialize_apple_calendar(email: str, password: str) -> bool:
             return True
         else:
             logger.error("❌ No se pudo conectar a Apple Calendar")
+            apple_calendar.close()
             apple_calendar = None
             return False
             
@@ -467,7 +824,7 @@ async def delete_calendar_events_by_pattern(title_pattern: str) -> int:
     return await apple_calendar.delete_events_by_title_pattern(title_pattern)
 
 
-async def create_calendar_event(reminder_data: Dict[str, Any]) -> bool:
+async def create_calendar_event(reminder_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
     Crear evento en Apple Calendar (función de conveniencia)
     
@@ -475,7 +832,57 @@ async def create_calendar_event(reminder_data: Dict[str, Any]) -> bool:
         reminder_data: Datos del recordatorio
     
     Returns:
-        True si el evento se creó exitosamente
+        Referencia del evento {"uid", "href", "etag"} o None si falló
+    """
+    global apple_calendar
+    
+    if not apple_calendar:
+        logger.warning("⚠️ Apple Calendar no inicializado")
+        return None
+    
+    return await apple_calendar.create_reminder_event(reminder_data)
+
+
+def close_apple_calendar():
+    """Liberar recursos de la integración (al apagar el bot)"""
+    global apple_calendar
+    
+    if apple_calendar:
+        apple_calendar.close()
+        apple_calendar = None
+
+
+async def update_calendar_event_title(old_title: str, new_title: str, date: datetime) -> bool:
+    """
+    Renombrar evento de Apple Calendar (función de conveniencia)
+    
+    Args:
+        old_title: Título actual del evento
+        new_title: Nuevo título
+        date: Fecha del evento
+    
+    Returns:
+        True si se actualizó exitosamente
+    """
+    global apple_calendar
+    
+    if not apple_calendar:
+        logger.warning("⚠️ Apple Calendar no inicializado")
+        return False
+    
+    return await apple_calendar.update_event_title(old_title, new_title, date)
+
+
+async def delete_calendar_event_by_reference(uid: Optional[str], href: Optional[str] = None) -> bool:
+    """
+    Eliminar evento de Apple Calendar por UID/href (función de conveniencia)
+    
+    Args:
+        uid: UID del evento
+        href: URL del recurso
+    
+    Returns:
+        True si se eliminó o ya no existía
     """
     global apple_calendar
     
@@ -483,4 +890,52 @@ async def create_calendar_event(reminder_data: Dict[str, Any]) -> bool:
         logger.warning("⚠️ Apple Calendar no inicializado")
         return False
     
-    return await apple_calendar.create_reminder_event(reminder_data)
\ No newline at end of file
+    return await apple_calendar.delete_event_by_reference(uid, href)
+
+
+async def rename_calendar_event_by_reference(new_title: str, uid: Optional[str], href: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Renombrar evento de Apple Calendar por UID/href (función de conveniencia)
+    
+    Args:
+        new_title: Nuevo título
+        uid: UID del evento
+        href: URL del recurso
+    
+    Returns:
+        Referencia actualizada o None
+    """
+    global apple_calendar
+    
+    if not apple_calendar:
+        logger.warning("⚠️ Apple Calendar no inicializado")
+        return None
+    
+    return await apple_calendar.update_event_by_reference(new_title, uid, href)
+
+
+async def update_calendar_event_recurrence(
+    rrule: str,
+    exdates: List[datetime],
+    uid: Optional[str],
+    href: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Actualizar la recurrencia de un evento de Apple Calendar por UID/href (función de conveniencia)
+    
+    Args:
+        rrule: Regla de recurrencia
+        exdates: Ocurrencias excluidas (UTC)
+        uid: UID del evento
+        href: URL del recurso
+    
+    Returns:
+        Referencia actualizada o None
+    """
+    global apple_calendar
+    
+    if not apple_calendar:
+        logger.warning("⚠️ Apple Calendar no inicializado")
+        return None
+    
+    return await apple_calendar.update_event_recurrence_by_reference(rrule, exdates, uid, href)
@@ -0,0 +1,452 @@
+"""
+Espejo local de Apple Calendar en MongoDB
+Se mantiene al día con sync-collection (sync-token, RFC 6578) o, si el servidor
+no lo soporta, comparando ctag/etag; solo se descargan los eventos que cambiaron.
+Los eventos recurrentes guardan su RRULE/EXDATE y se expanden al consultar un rango
+"""
+
+import asyncio
+from datetime import datetime, date
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+from icalendar import Calendar
+from lxml import etree
+from caldav.lib import error as caldav_error
+import pytz
+from loguru import logger
+
+from database.connection import DatabaseManager
+from config.settings import settings
+from utils.recurrence import parse_rule, format_rule, occurrences_between, to_local
+import bot.calendar_integration as calendar_integration
+from bot.calendar_integration import AppleCalendarIntegration
+
+
+DAV_NS = "DAV:"
+CALDAV_NS = "urn:ietf:params:xml:ns:caldav"
+CALSERVER_NS = "http://calendarserver.org/ns/"
+NAMESPACES = {"d": DAV_NS, "c": CALDAV_NS, "cs": CALSERVER_NS}
+
+SYNC_COLLECTION = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:sync-collection xmlns:d="DAV:">'
+    '<d:sync-token>{token}</d:sync-token>'
+    '<d:sync-level>1</d:sync-level>'
+    '<d:prop><d:getetag/></d:prop>'
+    '</d:sync-collection>'
+)
+PROPFIND_CTAG = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:" xmlns:cs="http://calendarserver.org/ns/">'
+    '<d:prop><cs:getctag/><d:sync-token/></d:prop>'
+    '</d:propfind>'
+)
+PROPFIND_ETAGS = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop><d:getetag/></d:prop></d:propfind>'
+)
+CALENDAR_MULTIGET = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<c:calendar-multiget xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav">'
+    '<d:prop><d:getetag/><c:calendar-data/></d:prop>'
+    '{hrefs}'
+    '</c:calendar-multiget>'
+)
+
+
+class SyncTokenInvalid(Exception):
+    """El servidor ya no reconoce el sync-token guardado"""
+
+
+class CalendarMirror:
+    """Copia local de los eventos del calendario, sincronizada de forma incremental"""
+
+    def __init__(self, db_manager: DatabaseManager, integration: AppleCalendarIntegration, sync_minutes: int = None):
+        """
+        Args:
+            db_manager: Gestor de base de datos
+            integration: Integración conectada (cliente y calendario CalDAV)
+            sync_minutes: Intervalo entre sincronizaciones incrementales
+        """
+        self.db = db_manager
+        self.integration = integration
+        self.sync_interval = (sync_minutes or settings.CALENDAR_SYNC_MINUTES) * 60
+        self.multiget_batch = 50
+
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.is_running = False
+        self.is_ready = False
+
+        # Métricas de la última sincronización
+        self.last_sync: Optional[datetime] = None
+        self.last_mode: Optional[str] = None
+        self.last_downloaded = 0
+        self.last_deleted = 0
+
+    @property
+    def calendar_url(self) -> str:
+        return str(self.integration.calendar.url)
+
+    def _absolute(self, href: str) -> str:
+        """Normalizar un href del servidor a URL absoluta (misma forma que create_event)"""
+        return str(self.integration.calendar.url.join(href))
+
+    # --- CICLO DE VIDA ---
+
+    async def start(self):
+        """Iniciar la sincronización periódica (la primera corre de inmediato, en segundo plano)"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🪞 Espejo de calendario iniciado (sincroniza cada {self.sync_interval // 60} min)")
+
+    async def stop(self):
+        """Detener la sincronización periódica"""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("🪞 Espejo de calendario detenido")
+
+    async def _run(self):
+        while self.is_running:
+            await self.sync()
+            await asyncio.sleep(self.sync_interval)
+
+    # --- SINCRONIZACIÓN ---
+
+    async def sync(self) -> bool:
+        """
+        Traer los cambios del servidor desde la última sincronización
+
+        Returns:
+            True si el espejo quedó al día
+        """
+        async with self._lock:
+            try:
+                state = await self.db.get_calendar_sync_state(self.calendar_url) or {}
+                known = await self.db.get_mirrored_etags(self.calendar_url)
+
+                try:
+                    changed, deleted, new_state = await self.integration._run_blocking(
+                        self._sync_collection, state.get("sync_token"), known
+                    )
+                    mode = "sync-token" if state.get("sync_token") else "sync-token (completo)"
+                except SyncTokenInvalid:
+                    changed, deleted, new_state = await self.integration._run_blocking(
+                        self._sync_collection, None, known
+                    )
+                    mode = "sync-token (completo)"
+                except Exception as e:
+                    logger.debug(f"🪞 sync-collection no disponible ({e}), usando ctag/etag")
+                    changed, deleted, new_state = await self.integration._run_blocking(
+                        self._sync_by_etags, state.get("ctag"), known
+                    )
+                    mode = "ctag/etag"
+
+                # Solo descargar lo que cambió respecto a la copia local (incluye escrituras propias)
+                changed = [href for href, etag in changed if not etag or known.get(href) != etag]
+
+                # calendar-multiget por lotes, cada uno con su propio timeout
+                events = []
+                for i in range(0, len(changed), self.multiget_batch):
+                    batch = await self.integration._run_blocking(
+                        self._download, changed[i:i + self.multiget_batch]
+                    )
+                    await self.db.upsert_mirrored_events(self.calendar_url, batch)
+                    events.extend(batch)
+                if deleted:
+                    await self.db.delete_mirrored_events(self.calendar_url, deleted)
+
+                if new_state:
+                    new_state["synced_at"] = datetime.utcnow()
+                    await self.db.save_calendar_sync_state(self.calendar_url, new_state)
+
+                self.is_ready = True
+                self.last_sync = datetime.utcnow()
+                self.last_mode = mode
+                self.last_downloaded = len(events)
+                self.last_deleted = len(deleted)
+                if events or deleted:
+                    logger.info(f"🪞 Espejo sincronizado ({mode}): {len(events)} descargados, {len(deleted)} eliminados")
+                return True
+
+            except asyncio.TimeoutError:
+                logger.error("⏱️ Timeout sincronizando espejo de calendario")
+                return False
+            except Exception as e:
+                logger.error(f"❌ Error sincronizando espejo de calendario: {e}")
+                return False
+
+    @staticmethod
+    def _multistatus(response) -> etree._Element:
+        """Árbol XML de una respuesta 207 (iCloud no siempre envía Content-Type)"""
+        if response.tree is not None:
+            return response.tree
+        raw = response._raw if isinstance(response._raw, bytes) else str(response._raw).encode()
+        return etree.fromstring(raw)
+
+    def _sync_collection(self, sync_token: Optional[str], known: Dict[str, str]) -> Tuple[List[Tuple[str, Optional[str]]], List[str], Dict[str, Any]]:
+        """
+        REPORT sync-collection (bloqueante, corre en el pool)
+
+        Sin token se recibe el calendario completo (solo hrefs y etags)
+
+        Returns:
+            (cambiados [(href, etag)], eliminados [href], estado nuevo)
+        """
+        body = SYNC_COLLECTION.format(token=escape(sync_token or ""))
+        try:
+            response = self.integration.client.report(self.calendar_url, body, depth=1)
+        except caldav_error.AuthorizationError:
+            # caldav convierte el 403 (valid-sync-token) en excepción
+            if sync_token:
+                raise SyncTokenInvalid()
+            raise
+
+        if response.status in (403, 409) and sync_token:
+            raise SyncTokenInvalid()
+        if response.status != 207:
+            raise RuntimeError(f"sync-collection no soportado ({response.status})")
+
+        tree = self._multistatus(response)
+        changed, deleted = [], []
+        for item in tree.findall("d:response", NAMESPACES):
+            href = item.findtext("d:href", namespaces=NAMESPACES)
+            if not href or self._absolute(href) == self.calendar_url:
+                continue
+            status = item.findtext("d:status", default="", namespaces=NAMESPACES)
+            if " 404 " in status:
+                deleted.append(self._absolute(href))
+                continue
+            etag = item.findtext("d:propstat/d:prop/d:getetag", namespaces=NAMESPACES)
+            changed.append((self._absolute(href), etag))
+
+        new_token = tree.findtext("d:sync-token", namespaces=NAMESPACES)
+
+        # Sincronización completa: lo que no vino ya no existe
+        if not sync_token:
+            present = {href for href, _ in changed}
+            deleted = [href for href in known if href not in present]
+
+        return changed, deleted, {"sync_token": new_token}
+
+    def _sync_by_etags(self, ctag: Optional[str], known: Dict[str, str]) -> Tuple[List[Tuple[str, Optional[str]]], List[str], Optional[Dict[str, Any]]]:
+        """
+        Respaldo: comparar ctag del calendario y etags de cada recurso (bloqueante, corre en el pool)
+
+        Returns:
+            (cambiados [(href, etag)], eliminados [href], estado nuevo o None si nada cambió)
+        """
+        response = self.integration.client.propfind(self.calendar_url, PROPFIND_CTAG, depth=0)
+        tree = self._multistatus(response)
+        new_ctag = tree.findtext(".//cs:getctag", namespaces=NAMESPACES)
+
+        if new_ctag and new_ctag == ctag:
+            return [], [], None
+
+        response = self.integration.client.propfind(self.calendar_url, PROPFIND_ETAGS, depth=1)
+        tree = self._multistatus(response)
+        remote = {}
+        for item in tree.findall("d:response", NAMESPACES):
+            href = item.findtext("d:href", namespaces=NAMESPACES)
+            if not href or self._absolute(href) == self.calendar_url:
+                continue
+            remote[self._absolute(href)] = item.findtext("d:propstat/d:prop/d:getetag", namespaces=NAMESPACES)
+
+        changed = [(href, etag) for href, etag in remote.items() if known.get(href) != etag]
+        deleted = [href for href in known if href not in remote]
+        return changed, deleted, {"ctag": new_ctag}
+
+    def _download(self, hrefs: List[str]) -> List[Dict[str, Any]]:
+        """calendar-multiget de un lote de recursos cambiados (bloqueante, corre en el pool)"""
+        body = CALENDAR_MULTIGET.format(
+            hrefs="".join(f"<d:href>{escape(urlsplit(href).path)}</d:href>" for href in hrefs)
+        )
+        response = self.integration.client.report(self.calendar_url, body, depth=1)
+        tree = self._multistatus(response)
+
+        events = []
+        for item in tree.findall("d:response", NAMESPACES):
+            href = item.findtext("d:href", namespaces=NAMESPACES)
+            data = item.findtext("d:propstat/d:prop/c:calendar-data", namespaces=NAMESPACES)
+            if not href or not data:
+                continue
+            event = self._parse_event(data)
+            if event:
+                event.update({
+                    "href": self._absolute(href),
+                    "etag": item.findtext("d:propstat/d:prop/d:getetag", namespaces=NAMESPACES)
+                })
+                events.append(event)
+        return events
+
+    @staticmethod
+    def _to_utc(value) -> Optional[datetime]:
+        """Fecha iCalendar → datetime UTC naive (formato de la BD)"""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            if value.tzinfo:
+                return value.astimezone(pytz.UTC).replace(tzinfo=None)
+            return value
+        if isinstance(value, date):
+            return datetime(value.year, value.month, value.day)
+        return None
+
+    @staticmethod
+    def _local_rule(rule: str) -> str:
+        """RRULE con UNTIL en UTC (…Z) → UNTIL en hora de Chile, como se expanden las series"""
+        parts = parse_rule(rule)
+        until = parts.get("UNTIL", "")
+        if until.endswith("Z"):
+            parts["UNTIL"] = to_local(datetime.strptime(until, "%Y%m%dT%H%M%SZ")).strftime("%Y%m%dT%H%M%S")
+        return format_rule(parts)
+
+    def _exdates(self, component) -> List[datetime]:
+        """EXDATE de un VEVENT (una o varias propiedades, cada una con una o más fechas) en UTC"""
+        exdate = component.get("exdate")
+        if exdate is None:
+            return []
+        properties = exdate if isinstance(exdate, list) else [exdate]
+        return sorted(self._to_utc(value.dt) for prop in properties for value in prop.dts)
+
+    def _parse_event(self, ical_data: str) -> Optional[Dict[str, Any]]:
+        try:
+            calendar = Calendar.from_ical(ical_data)
+            components = calendar.walk("VEVENT")
+            if not components:
+                return None
+            # El evento maestro de una serie; las excepciones (RECURRENCE-ID) comparten el recurso
+            component = next((c for c in components if c.get("recurrence-id") is None), components[0])
+            start = component.get("dtstart")
+            end = component.get("dtend")
+            rule = component.get("rrule")
+            return {
+                "uid": str(component.get("uid", "")),
+                "summary": str(component.get("summary", "")),
+                "dtstart": self._to_utc(start.dt if start else None),
+                "dtend": self._to_utc(end.dt if end else None),
+                "rrule": self._local_rule(rule.to_ical().decode()) if rule else None,
+                "exdates": self._exdates(component) if rule else []
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ Evento de calendario ilegible en el espejo: {e}")
+        return None
+
+    # --- CONSULTAS LOCALES ---
+
+    async def find_events(self, start: datetime, end: datetime, title_pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Eventos del espejo con alguna ocurrencia en un rango (UTC naive), opcionalmente filtrados por título
+
+        Las series se expanden con su RRULE/EXDATE (como hacía el servidor en date_search);
+        cada evento trae "occurrence" con su primera ocurrencia dentro del rango
+        """
+        candidates = await self.db.find_mirrored_events(self.calendar_url, start, end, title_pattern)
+
+        events = []
+        for event in candidates:
+            occurrence = event.get("dtstart")
+            if event.get("rrule"):
+                occurrence = self._first_occurrence(event, start, end)
+                if occurrence is None:
+                    continue
+            events.append({**event, "occurrence": occurrence})
+        return sorted(events, key=lambda event: event["occurrence"])
+
+    @staticmethod
+    def _first_occurrence(event: Dict[str, Any], start: datetime, end: datetime) -> Optional[datetime]:
+        """Primera ocurrencia de una serie del espejo en [start, end]"""
+        try:
+            occurrences = occurrences_between(
+                event["rrule"], event["dtstart"], start, end, event.get("exdates") or [], limit=1
+            )
+            return occurrences[0] if occurrences else None
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo expandir la serie del espejo {event.get('uid')}: {e}")
+            return None
+
+    async def count_events(self) -> int:
+        """Número de eventos en el espejo"""
+        return await self.db.count_mirrored_events(self.calendar_url)
+
+    # --- ESCRITURAS PROPIAS (write-through) ---
+
+    async def record_event(
+        self,
+        reference: Dict[str, Any],
+        title: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        rrule: Optional[str] = None,
+        exdates: Optional[List[datetime]] = None
+    ):
+        """Reflejar un evento que el bot acaba de crear, renombrar o cuya recurrencia cambió"""
+        if not reference or not reference.get("href"):
+            return
+        try:
+            event = {
+                "href": reference["href"],
+                "uid": reference.get("uid"),
+                "etag": reference.get("etag"),
+                "summary": title,
+                "dtstart": self._to_utc(start),
+                "dtend": self._to_utc(end),
+                "rrule": self._local_rule(rrule) if rrule else None,
+                "exdates": sorted(self._to_utc(exdate) for exdate in exdates) if exdates is not None else None
+            }
+            # Un renombrado no conoce las fechas ni la regla: se conservan las del espejo
+            event = {key: value for key, value in event.items() if value is not None}
+            await self.db.upsert_mirrored_events(self.calendar_url, [event])
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo reflejar el evento en el espejo: {e}")
+
+    async def forget_event(self, href: Optional[str] = None, uid: Optional[str] = None):
+        """Quitar del espejo un evento que el bot acaba de borrar"""
+        try:
+            if href:
+                await self.db.delete_mirrored_events(self.calendar_url, [href])
+            elif uid:
+                await self.db.delete_mirrored_events_by_uid(self.calendar_url, uid)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo quitar el evento del espejo: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Estado del espejo"""
+        return {
+            "ready": self.is_ready,
+            "last_sync": self.last_sync.isoformat() if self.last_sync else None,
+            "mode": self.last_mode,
+            "downloaded": self.last_downloaded,
+            "deleted": self.last_deleted
+        }
+
+
+# Instancia global (se inicializa en main.py si Apple Calendar está disponible)
+calendar_mirror: Optional[CalendarMirror] = None
+
+
+def initialize_calendar_mirror(db_manager: DatabaseManager, integration: AppleCalendarIntegration = None) -> CalendarMirror:
+    """
+    Crear la instancia global del espejo y conectarla a la integración
+
+    Args:
+        db_manager: Gestor de base de datos
+        integration: Integración ya conectada (default: la instancia global de Apple Calendar)
+
+    Returns:
+        Espejo creado
+    """
+    global calendar_mirror
+    integration = integration or calendar_integration.apple_calendar
+    calendar_mirror = CalendarMirror(db_manager, integration)
+    integration.mirror = calendar_mirror
+    return calendar_mirror
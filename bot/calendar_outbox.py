@@ -0,0 +1,471 @@
+"""
+Cola de sincronización con Apple Calendar (write-behind)
+Las escrituras de recordatorios solo encolan la operación en MongoDB;
+un worker en segundo plano la envía a iCloud con lotes, reintentos y coalescencia
+"""
+
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+from loguru import logger
+
+from database.connection import DatabaseManager
+from config.settings import settings
+from bot.calendar_integration import (
+    create_calendar_event,
+    delete_calendar_event,
+    delete_calendar_event_by_reference,
+    update_calendar_event_title,
+    rename_calendar_event_by_reference,
+    update_calendar_event_recurrence
+)
+
+
+class CalendarOutbox:
+    """Outbox persistente de operaciones de calendario"""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        batch_size: int = None,
+        max_attempts: int = None,
+        retry_seconds: float = None,
+        poll_seconds: float = None
+    ):
+        """
+        Args:
+            db_manager: Gestor de base de datos
+            batch_size: Operaciones tomadas por ciclo del worker
+            max_attempts: Intentos antes de marcar una operación como fallida
+            retry_seconds: Espera base del backoff exponencial
+            poll_seconds: Revisión periódica de reintentos vencidos
+        """
+        self.db = db_manager
+        self.batch_size = batch_size or settings.CALENDAR_OUTBOX_BATCH_SIZE
+        self.max_attempts = max_attempts or settings.CALENDAR_OUTBOX_MAX_ATTEMPTS
+        self.retry_seconds = retry_seconds or settings.CALENDAR_OUTBOX_RETRY_SECONDS
+        self.poll_seconds = poll_seconds or settings.CALENDAR_OUTBOX_POLL_SECONDS
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        # Métricas
+        self.processed = 0
+        self.failed = 0
+        self.coalesced = 0
+
+    def _wake(self):
+        if self._wakeup:
+            self._wakeup.set()
+
+    # --- ENCOLADO ---
+
+    @staticmethod
+    def _create_payload(reminder_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Payload de una creación (las series llevan su regla y excepciones)"""
+        payload = {
+            "text": reminder_data.get("text"),
+            "date": reminder_data.get("date"),
+            "original_input": reminder_data.get("original_input", ""),
+            "user_id": reminder_data.get("user_id"),
+            "calendar_uid": reminder_data.get("calendar_uid")
+        }
+        if reminder_data.get("rrule"):
+            payload["rrule"] = reminder_data["rrule"]
+            payload["exdates"] = reminder_data.get("exdates") or []
+        return payload
+
+    async def enqueue_create(self, reminder_id: str, reminder_data: Dict[str, Any]) -> bool:
+        """Encolar la creación del evento de un recordatorio"""
+        queued = await self.db.enqueue_calendar_operation({
+            "reminder_id": reminder_id,
+            "operation": "create",
+            "payload": self._create_payload(reminder_data)
+        })
+        self._wake()
+        return queued
+
+    async def enqueue_create_many(self, items: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Encolar la creación de varios eventos en una sola escritura"""
+        queued = await self.db.enqueue_calendar_operations([
+            {
+                "reminder_id": reminder_id,
+                "operation": "create",
+                "payload": self._create_payload(reminder_data)
+            }
+            for reminder_id, reminder_data in items
+        ])
+        if queued:
+            self._wake()
+        return queued
+
+    async def enqueue_delete(
+        self,
+        reminder_id: str,
+        title: str,
+        date: datetime,
+        uid: Optional[str] = None,
+        href: Optional[str] = None
+    ) -> bool:
+        """
+        Encolar el borrado del evento de un recordatorio
+
+        Si la creación aún no se envió a iCloud, ambas se cancelan entre sí.
+        Con uid/href se borra el recurso directo; título y fecha quedan como respaldo
+        para recordatorios creados antes de guardar el UID
+        """
+        if await self.db.cancel_pending_calendar_operations(reminder_id, ["create"]):
+            await self.db.cancel_pending_calendar_operations(reminder_id, ["rename", "recurrence"])
+            self.coalesced += 1
+            logger.debug(f"📭 Creación y borrado de calendario cancelados entre sí: {reminder_id}")
+            return True
+
+        # Renombrar algo que se va a borrar es trabajo perdido
+        self.coalesced += await self.db.cancel_pending_calendar_operations(reminder_id, ["rename", "recurrence"])
+
+        queued = await self.db.enqueue_calendar_operation({
+            "reminder_id": reminder_id,
+            "operation": "delete",
+            "payload": {"title": title, "date": date, "uid": uid, "href": href}
+        })
+        self._wake()
+        return queued
+
+    async def enqueue_rename(
+        self,
+        reminder_id: str,
+        old_title: str,
+        new_title: str,
+        date: datetime,
+        uid: Optional[str] = None,
+        href: Optional[str] = None
+    ) -> bool:
+        """Encolar el cambio de título del evento de un recordatorio"""
+        # Creación pendiente: se crea directamente con el título nuevo
+        if await self.db.update_pending_calendar_operation(reminder_id, "create", {"payload.text": new_title}):
+            self.coalesced += 1
+            return True
+
+        # Renombrado pendiente: se conserva el título original y se reemplaza el destino
+        if await self.db.update_pending_calendar_operation(reminder_id, "rename", {"payload.new_title": new_title}):
+            self.coalesced += 1
+            return True
+
+        queued = await self.db.enqueue_calendar_operation({
+            "reminder_id": reminder_id,
+            "operation": "rename",
+            "payload": {"old_title": old_title, "new_title": new_title, "date": date, "uid": uid, "href": href}
+        })
+        self._wake()
+        return queued
+
+    async def enqueue_recurrence(
+        self,
+        reminder_id: str,
+        rrule: str,
+        exdates: List[datetime],
+        uid: Optional[str] = None,
+        href: Optional[str] = None
+    ) -> bool:
+        """Encolar el cambio de regla/excepciones del evento de una serie"""
+        changes = {"rrule": rrule, "exdates": exdates}
+
+        # Creación pendiente: el evento nace con la regla nueva
+        if await self.db.update_pending_calendar_operation(
+            reminder_id, "create", {f"payload.{key}": value for key, value in changes.items()}
+        ):
+            self.coalesced += 1
+            return True
+
+        # Cambio pendiente: solo importa el último estado de la serie
+        if await self.db.update_pending_calendar_operation(
+            reminder_id, "recurrence", {f"payload.{key}": value for key, value in changes.items()}
+        ):
+            self.coalesced += 1
+            return True
+
+        queued = await self.db.enqueue_calendar_operation({
+            "reminder_id": reminder_id,
+            "operation": "recurrence",
+            "payload": {**changes, "uid": uid, "href": href}
+        })
+        self._wake()
+        return queued
+
+    # --- WORKER ---
+
+    async def start(self):
+        """Iniciar el worker (retoma operaciones que quedaron a medias)"""
+        if self.is_running:
+            return
+
+        released = await self.db.release_stale_calendar_operations()
+        if released:
+            logger.info(f"📬 {released} operaciones de calendario retomadas tras reinicio")
+
+        self._wakeup = asyncio.Event()
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📬 Cola de calendario iniciada (lotes de {self.batch_size})")
+
+    async def stop(self):
+        """Detener el worker (lo pendiente queda en MongoDB)"""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("📬 Cola de calendario detenida")
+
+    async def _run(self):
+        """Vaciar la cola por lotes; dormir hasta nuevo encolado o reintento"""
+        while self.is_running:
+            try:
+                processed = await self.process_batch()
+            except Exception as e:
+                logger.error(f"❌ Error en cola de calendario: {e}")
+                processed = 0
+
+            if processed:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_batch(self) -> int:
+        """
+        Tomar un lote de operaciones y enviarlo a iCloud
+
+        Recordatorios distintos se procesan en paralelo (acotado por el pool de caldav);
+        las operaciones de un mismo recordatorio, en orden
+
+        Returns:
+            Número de operaciones tomadas
+        """
+        operations = await self.db.claim_calendar_operations(self.batch_size)
+        if not operations:
+            return 0
+
+        groups: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        for operation in operations:
+            key = operation.get("reminder_id") or str(operation["_id"])
+            groups.setdefault(key, []).append(operation)
+
+        async def run_group(group: List[Dict[str, Any]]):
+            for operation in group:
+                await self._execute(operation)
+
+        await asyncio.gather(*(run_group(group) for group in groups.values()))
+        return len(operations)
+
+    async def _execute(self, operation: Dict[str, Any]):
+        """Ejecutar una operación y completarla o reprogramarla"""
+        kind = operation["operation"]
+        payload = operation.get("payload", {})
+
+        try:
+            if kind == "create":
+                reference = await create_calendar_event(payload)
+                if reference:
+                    await self.db.set_reminder_calendar_event(operation["reminder_id"], reference)
+                success = bool(reference)
+            elif kind == "delete":
+                if payload.get("uid") or payload.get("href"):
+                    success = await delete_calendar_event_by_reference(payload.get("uid"), payload.get("href"))
+                else:
+                    # Respaldo por título: no encontrar el evento no es un error
+                    await delete_calendar_event(payload.get("title", ""), payload.get("date"))
+                    success = True
+            elif kind == "rename":
+                if payload.get("uid") or payload.get("href"):
+                    reference = await rename_calendar_event_by_reference(
+                        payload["new_title"], payload.get("uid"), payload.get("href")
+                    )
+                    if reference:
+                        await self.db.set_reminder_calendar_event(operation["reminder_id"], reference)
+                    # None: timeout, error de red o conflicto (412); se reintenta con backoff
+                    success = bool(reference)
+                else:
+                    # Respaldo por título: no encontrar el evento no es un error
+                    await update_calendar_event_title(payload["old_title"], payload["new_title"], payload["date"])
+                    success = True
+            elif kind == "recurrence":
+                reference = await update_calendar_event_recurrence(
+                    payload["rrule"], payload.get("exdates", []), payload.get("uid"), payload.get("href")
+                )
+                if reference:
+                    await self.db.set_reminder_calendar_event(operation["reminder_id"], reference)
+                success = bool(reference)
+            else:
+                logger.error(f"❌ Operación de calendario desconocida: {kind}")
+                success = True
+
+            error = None if success else "Apple Calendar rechazó la operación"
+
+        except Exception as e:
+            success = False
+            error = str(e)
+
+        if success:
+            self.processed += 1
+            await self.db.complete_calendar_operation(operation["_id"])
+            return
+
+        attempts = operation.get("attempts", 0) + 1
+        if attempts >= self.max_attempts:
+            self.failed += 1
+            await self.db.retry_calendar_operation(operation["_id"], error, None)
+            logger.error(f"❌ Operación de calendario '{kind}' descartada tras {attempts} intentos: {error}")
+            return
+
+        delay = self.retry_seconds * (2 ** (attempts - 1))
+        await self.db.retry_calendar_operation(
+            operation["_id"], error, datetime.utcnow() + timedelta(seconds=delay)
+        )
+        logger.warning(f"⚠️ Operación de calendario '{kind}' reintentará en {delay:.0f}s")
+
+    async def get_status(self) -> Dict[str, Any]:
+        """Estado de la cola"""
+        return {
+            "running": self.is_running,
+            "queue": await self.db.count_calendar_operations(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "coalesced": self.coalesced
+        }
+
+
+# Instancia global (se inicializa en main.py si Apple Calendar está disponible)
+calendar_outbox: Optional[CalendarOutbox] = None
+
+
+def initialize_calendar_outbox(db_manager: DatabaseManager) -> CalendarOutbox:
+    """
+    Crear la instancia global de la cola de calendario
+
+    Args:
+        db_manager: Gestor de base de datos
+
+    Returns:
+        Cola creada
+    """
+    global calendar_outbox
+    calendar_outbox = CalendarOutbox(db_manager)
+    return calendar_outbox
+
+
+async def queue_calendar_create(reminder_id: str, reminder_data: Dict[str, Any]) -> bool:
+    """
+    Encolar creación de evento (función de conveniencia)
+
+    Args:
+        reminder_id: ID del recordatorio
+        reminder_data: Datos del recordatorio ('text', 'date', 'original_input', 'user_id')
+
+    Returns:
+        True si se encoló
+    """
+    if not calendar_outbox:
+        return False
+    return await calendar_outbox.enqueue_create(reminder_id, reminder_data)
+
+
+async def queue_calendar_create_many(items: List[Tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Encolar creación de varios eventos (función de conveniencia)
+
+    Args:
+        items: Pares (ID del recordatorio, datos del recordatorio)
+
+    Returns:
+        Número de operaciones encoladas
+    """
+    if not calendar_outbox:
+        return 0
+    return await calendar_outbox.enqueue_create_many(items)
+
+
+async def queue_calendar_delete(
+    reminder_id: str,
+    title: str,
+    date: datetime,
+    uid: Optional[str] = None,
+    href: Optional[str] = None
+) -> bool:
+    """
+    Encolar borrado de evento (función de conveniencia)
+
+    Args:
+        reminder_id: ID del recordatorio
+        title: Título del evento
+        date: Fecha del evento
+        uid: UID del evento (si se conoce)
+        href: URL del recurso (si se conoce)
+
+    Returns:
+        True si se encoló (o se canceló con una creación pendiente)
+    """
+    if not calendar_outbox:
+        return False
+    return await calendar_outbox.enqueue_delete(reminder_id, title, date, uid=uid, href=href)
+
+
+async def queue_calendar_rename(
+    reminder_id: str,
+    old_title: str,
+    new_title: str,
+    date: datetime,
+    uid: Optional[str] = None,
+    href: Optional[str] = None
+) -> bool:
+    """
+    Encolar cambio de título de evento (función de conveniencia)
+
+    Args:
+        reminder_id: ID del recordatorio
+        old_title: Título actual
+        new_title: Título nuevo
+        date: Fecha del evento
+        uid: UID del evento (si se conoce)
+        href: URL del recurso (si se conoce)
+
+    Returns:
+        True si se encoló
+    """
+    if not calendar_outbox:
+        return False
+    return await calendar_outbox.enqueue_rename(reminder_id, old_title, new_title, date, uid=uid, href=href)
+
+
+
+async def queue_calendar_recurrence(
+    reminder_id: str,
+    rrule: str,
+    exdates: List[datetime],
+    uid: Optional[str] = None,
+    href: Optional[str] = None
+) -> bool:
+    """
+    Encolar cambio de recurrencia de evento (función de conveniencia)
+
+    Args:
+        reminder_id: ID del recordatorio
+        rrule: Regla de recurrencia nueva
+        exdates: Ocurrencias excluidas (UTC)
+        uid: UID del evento (si se conoce)
+        href: URL del recurso (si se conoce)
+
+    Returns:
+        True si se encoló
+    """
+    if not calendar_outbox:
+        return False
+    return await calendar_outbox.enqueue_recurrence(reminder_id, rrule, exdates, uid=uid, href=href)
@@ -0,0 +1,262 @@
+"""
+Pipeline de entrega de mensajes a Telegram
+Pool de workers con límites de tasa global y por chat, reintentos diferidos
+(retry_after ante 429, backoff exponencial ante errores transitorios)
+y métricas de latencia por mensaje
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Awaitable
+from loguru import logger
+
+from config.settings import settings
+
+
+# Corrutina de envío: recibe (chat_id, texto) y devuelve {"ok": bool, "retry_after": Optional[float]}
+SendFunc = Callable[[int, str], Awaitable[Dict[str, Any]]]
+
+
+class TokenBucket:
+    """Token bucket asíncrono para limitar la tasa de envío"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Tokens repuestos por segundo
+            capacity: Ráfaga máxima permitida
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Esperar hasta obtener un token"""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Bloquear el bucket (respuesta 429 con retry_after)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    @property
+    def idle(self) -> bool:
+        """True si el bucket está lleno y sin bloqueo (se puede descartar)"""
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class DeliveryPipeline:
+    """Entrega concurrente y limitada de mensajes"""
+
+    def __init__(
+        self,
+        send_func: SendFunc,
+        workers: int = None,
+        global_rate: float = None,
+        per_chat_rate: float = None,
+        max_retries: int = None,
+        retry_base: float = None
+    ):
+        """
+        Args:
+            send_func: Corrutina que hace la llamada real a la API
+            workers: Número de envíos concurrentes
+            global_rate: Mensajes por segundo en total
+            per_chat_rate: Mensajes por segundo a un mismo chat
+            max_retries: Reintentos ante 429 o errores de red
+            retry_base: Espera del primer reintento ante errores de red (se duplica en cada intento)
+        """
+        self.send_func = send_func
+        self.workers = workers or settings.DELIVERY_WORKERS
+        self.per_chat_rate = per_chat_rate or settings.TELEGRAM_PER_CHAT_RATE
+        self.max_retries = max_retries if max_retries is not None else settings.DELIVERY_MAX_RETRIES
+        self.retry_base = retry_base if retry_base is not None else settings.DELIVERY_RETRY_BASE_SECONDS
+
+        # Capacidad 1: envíos espaciados de forma uniforme (sin ráfagas que Telegram penaliza)
+        global_rate = global_rate or settings.TELEGRAM_GLOBAL_RATE
+        self.global_bucket = TokenBucket(global_rate, capacity=1)
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        # Reintentos esperando su turno fuera de la cola (sin ocupar un worker)
+        self._delayed: Dict[int, Any] = {}
+
+        # Métricas
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.latencies = deque(maxlen=1000)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Evitar crecimiento indefinido con muchos chats
+            if len(self.chat_buckets) > 10000:
+                self.chat_buckets = {k: b for k, b in self.chat_buckets.items() if not b.idle}
+            bucket = TokenBucket(self.per_chat_rate, capacity=1)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def start(self):
+        """Iniciar workers"""
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"📮 Pipeline de entrega iniciado: {self.workers} workers, {self.global_bucket.rate:g} msg/s")
+
+    async def stop(self):
+        """Detener workers (los mensajes en cola se descartan como fallidos)"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+        jobs = []
+        for handle, job in self._delayed.values():
+            handle.cancel()
+            jobs.append(job)
+        self._delayed.clear()
+        if self.queue:
+            while not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+        for job in jobs:
+            if not job["future"].done():
+                job["future"].set_result(False)
+        logger.info("📮 Pipeline de entrega detenido")
+
+    async def submit(self, chat_id: int, text: str) -> bool:
+        """
+        Encolar un mensaje y esperar su entrega
+
+        Args:
+            chat_id: ID del chat de Telegram
+            text: Mensaje a enviar
+
+        Returns:
+            True si se entregó exitosamente
+        """
+        if not self._tasks:
+            await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put({
+            "chat_id": chat_id,
+            "text": text,
+            "attempts": 0,
+            "enqueued_at": time.monotonic(),
+            "future": future
+        })
+        return await future
+
+    async def _worker(self, worker_id: int):
+        """Consumir la cola respetando los límites de tasa"""
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._deliver(job)
+            except Exception as e:
+                logger.error(f"❌ Error en worker de entrega {worker_id}: {e}")
+                if not job["future"].done():
+                    job["future"].set_result(False)
+            finally:
+                self.queue.task_done()
+
+    def _schedule(self, job: Dict[str, Any], delay: float):
+        """Volver a encolar un mensaje tras `delay` segundos sin bloquear un worker"""
+        key = id(job)
+
+        def requeue():
+            self._delayed.pop(key, None)
+            self.queue.put_nowait(job)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._delayed[key] = (handle, job)
+
+    async def _deliver(self, job: Dict[str, Any]):
+        chat_id = job["chat_id"]
+        chat_bucket = self._chat_bucket(chat_id)
+
+        # Chat pausado por un 429: reprogramar para el fin de la pausa en vez de dormir en el worker
+        paused_for = chat_bucket.blocked_until - time.monotonic()
+        if paused_for > 0:
+            self._schedule(job, paused_for)
+            return
+
+        # El token del chat se toma al final para que el espaciado se mida desde el envío real
+        await self.global_bucket.acquire()
+        await chat_bucket.acquire()
+
+        result = await self.send_func(chat_id, job["text"])
+
+        if result.get("ok"):
+            self.sent += 1
+            self.latencies.append(time.monotonic() - job["enqueued_at"])
+            job["future"].set_result(True)
+            return
+
+        retry_after = result.get("retry_after")
+        if retry_after is not None:
+            self.rate_limited += 1
+            chat_bucket.pause(retry_after)
+            # Una espera mayor al espaciado por chat indica el límite global: pausar a todos los workers
+            if retry_after > 1 / self.per_chat_rate:
+                self.global_bucket.pause(retry_after)
+            logger.warning(f"🐢 Telegram 429 para chat {chat_id}: reintento en {retry_after}s")
+
+        if job["attempts"] < self.max_retries and (retry_after is not None or result.get("retryable")):
+            job["attempts"] += 1
+            self.retried += 1
+            delay = retry_after if retry_after is not None else self.retry_base * 2 ** (job["attempts"] - 1)
+            self._schedule(job, delay)
+            return
+
+        self.failed += 1
+        job["future"].set_result(False)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métricas de entrega (latencia desde encolado hasta entrega)"""
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rate_limited": self.rate_limited,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "delayed": len(self._delayed),
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": round(latencies[-1], 4) if latencies else None
+        }
@@ -0,0 +1,88 @@
+"""
+Histogramas de hábitos por usuario
+Contadores por hora del día (24) y día de la semana (7), actualizados al crear recordatorios
+y guardados como un solo documento pequeño por usuario
+"""
+
+from array import array
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from utils.recurrence import to_local
+
+HOURS_IN_DAY = 24
+DAYS_IN_WEEK = 7
+WEEKDAY_NAMES = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+# Mínimos para considerar un hábito: historial total y recordatorios en la misma hora / día
+MIN_HISTORY = 3
+MIN_PATTERN_COUNT = 2
+
+
+class HabitHistogram:
+    """Contadores de hora local y día de la semana (arrays de enteros)"""
+
+    __slots__ = ("hours", "weekdays")
+
+    def __init__(self, hours: Optional[Iterable[int]] = None, weekdays: Optional[Iterable[int]] = None):
+        self.hours = array("l", hours or [0] * HOURS_IN_DAY)
+        self.weekdays = array("l", weekdays or [0] * DAYS_IN_WEEK)
+
+    @classmethod
+    def from_document(cls, document: Optional[Dict[str, Any]]) -> "HabitHistogram":
+        """Histograma desde el documento de MongoDB (vacío si no existe)"""
+        if not document:
+            return cls()
+        return cls(document.get("hours"), document.get("weekdays"))
+
+    @classmethod
+    def from_dates(cls, dates: Iterable[datetime]) -> "HabitHistogram":
+        """Histograma de fechas UTC (se cuentan en hora local)"""
+        histogram = cls()
+        for date in dates:
+            histogram.add(date)
+        return histogram
+
+    def add(self, date: datetime, count: int = 1):
+        """Contar una fecha UTC naive en su hora y día locales"""
+        local = to_local(date)
+        self.hours[local.hour] += count
+        self.weekdays[local.weekday()] += count
+
+    @property
+    def total(self) -> int:
+        return sum(self.weekdays)
+
+    def increments(self) -> Dict[str, int]:
+        """Campos $inc de los contadores distintos de cero ("hours.9": 2, ...)"""
+        changes = {f"hours.{hour}": count for hour, count in enumerate(self.hours) if count}
+        changes.update({f"weekdays.{day}": count for day, count in enumerate(self.weekdays) if count})
+        return changes
+
+    def to_document(self) -> Dict[str, Any]:
+        return {"hours": list(self.hours), "weekdays": list(self.weekdays)}
+
+    def _peak(self, counters: array) -> Optional[Tuple[int, int]]:
+        count = max(counters)
+        if self.total < MIN_HISTORY or count < MIN_PATTERN_COUNT:
+            return None
+        return counters.index(count), count
+
+    def peak_hour(self) -> Optional[Tuple[int, int]]:
+        """(hora, recordatorios) más frecuente, o None si no hay hábito"""
+        return self._peak(self.hours)
+
+    def peak_weekday(self) -> Optional[Tuple[int, int]]:
+        """(día 0=lunes, recordatorios) más frecuente, o None si no hay hábito"""
+        return self._peak(self.weekdays)
+
+    def describe(self) -> List[str]:
+        """Hábitos detectados en texto"""
+        patterns = []
+        peak_hour = self.peak_hour()
+        if peak_hour:
+            patterns.append(f"Prefiere recordatorios a las {peak_hour[0]:02d}:00")
+        peak_weekday = self.peak_weekday()
+        if peak_weekday:
+            patterns.append(f"Frecuentemente programa para {WEEKDAY_NAMES[peak_weekday[0]]}")
+        return patterns
@@ -0,0 +1,447 @@
+"""
+Detector de intención de recordatorios y eliminaciones
+Las listas de palabras clave y patrones se compilan una vez (al importar), una
+expresión regular por rasgo, en vez de reconstruirlas y recorrerlas en cada mensaje
+"""
+
+import re
+from typing import Dict, Iterable, List
+from loguru import logger
+
+
+# --- VOCABULARIO ---
+
+# Palabras clave para recordatorios en español
+REMINDER_KEYWORDS = [
+    # Comandos directos
+    "recuérdame", "recordar", "avísame", "avisar", "alerta", "alarma",
+    "notifícame", "notificar", "alertar", "programar", "agendar",
+
+    # Expresiones temporales básicas
+    "en ", "dentro de", "después de", "antes de", "desde", "hasta",
+    "mañana", "hoy", "ayer", "pasado mañana", "anteayer",
+    "próxim", "siguiente", "que viene", "entrante", "venidero",
+    "esta semana", "la próxima", "el otro", "la otra",
+
+    # Expresiones de tiempo chilenas/coloquiales
+    "al tiro", "al rato", "lueguito", "ratito", "un cachito",
+    "altiro", "altoque", "yapo", "cachái", "bacán",
+    "en la once", "en la mañanita", "tempranito",
+
+    # Días específicos (español e inglés)
+    "lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "mon", "tue", "wed", "thu", "fri", "sat", "sun",
+
+    # Meses (español e inglés)
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+    "jan", "feb", "mar", "apr", "may", "jun",
+    "jul", "aug", "sep", "oct", "nov", "dec",
+
+    # Palabras académicas y profesionales
+    "evaluación", "examen", "prueba", "control", "test", "quiz", "certamen",
+    "entrega", "tarea", "trabajo", "informe", "proyecto", "ensayo", "reporte",
+    "presentación", "exposición", "defensa", "seminario", "conferencia",
+    "reunión", "junta", "meeting", "call", "videoconferencia",
+    "fecha", "deadline", "vencimiento", "plazo", "límite", "cutoff",
+    "due date", "submission", "delivery", "handout",
+
+    # Expresiones de tiempo específicas
+    "a las", "al mediodía", "a medianoche", "al amanecer", "al atardecer",
+    "en la mañana", "en la tarde", "en la noche", "en la madrugada",
+    "por la mañana", "por la tarde", "por la noche", "por la madrugada",
+    "de mañana", "de tarde", "de noche", "de madrugada",
+    "am", "pm", "hrs", "horas", "minutos", "segundos", "mins", "segs",
+    "h", "min", "sec", "o'clock",
+
+    # Eventos y ocasiones
+    "cumpleaños", "cumple", "aniversario", "graduación", "boda", "matrimonio",
+    "fiesta", "celebración", "evento", "cita", "appointment", "date",
+    "viaje", "vacaciones", "feriado", "holiday", "trip", "travel",
+
+    # Actividades cotidianas
+    "hacer", "ir", "venir", "llegar", "salir", "partir", "volver", "regresar",
+    "llamar", "telefonear", "contactar", "escribir", "enviar", "mandar",
+    "comprar", "pagar", "cobrar", "depositar", "transferir",
+    "estudiar", "leer", "practicar", "ejercitar", "entrenar", "gym",
+    "comer", "almorzar", "cenar", "desayunar", "tomar", "beber",
+    "limpiar", "ordenar", "arreglar", "reparar", "revisar", "chequear",
+    "trabajar", "terminar", "finalizar", "completar", "enviar",
+
+    # Actividades médicas y personales
+    "médico", "doctor", "dentista", "cita médica", "consulta", "control",
+    "medicamento", "pastilla", "medicina", "tratamiento", "terapia",
+    "ejercicio", "deporte", "correr", "caminar", "nadar", "yoga",
+    "dieta", "régimen", "peso", "dormir", "despertar", "levantarse",
+
+    # Expresiones de urgencia/importancia
+    "urgente", "importante", "crítico", "vital", "esencial", "necesario",
+    "imperdible", "fundamental", "clave", "priority", "asap", "ya",
+    "emergency", "emergencia", "crisis", "problema",
+
+    # Frecuencia y repetición
+    "diario", "semanal", "mensual", "anual", "cada", "todos los",
+    "siempre", "nunca", "a veces", "ocasional", "regular",
+    "daily", "weekly", "monthly", "yearly", "every",
+
+    # Expresiones vagas que podrían ser recordatorios
+    "no olvides", "no te olvides", "acuérdate", "recuerda",
+    "don't forget", "remember", "remind", "note", "memo",
+    "tengo que", "debo", "necesito", "hay que", "toca",
+    "i need to", "i have to", "i must", "should"
+]
+
+
+# Patrones de fecha numérica
+DATE_PATTERNS = [
+    r'\b\d{1,2}/\d{1,2}/\d{4}\b',          # DD/MM/YYYY
+    r'\b\d{1,2}/\d{1,2}/\d{2}\b',          # DD/MM/YY
+    r'\b\d{1,2}-\d{1,2}-\d{4}\b',          # DD-MM-YYYY
+    r'\b\d{1,2}\.\d{1,2}\.\d{4}\b',        # DD.MM.YYYY
+    r'\b\d{4}/\d{1,2}/\d{1,2}\b',          # YYYY/MM/DD
+    r'\b\d{4}-\d{1,2}-\d{1,2}\b',          # YYYY-MM-DD (ISO)
+    r'\b\d{1,2}:\d{2}\b',                  # HH:MM
+    r'\b\d{1,2}h\d{2}\b',                  # 14h30
+    r'\b\d{1,2}:\d{2}(am|pm)\b',           # 2:30pm
+    r'\b\d{1,2}\s?(am|pm)\b',              # 3pm, 8 am
+    r'\b\d{1,2}hs?\b',                     # 15hs, 8h
+    r'\b\d{1,2}:\d{2}:\d{2}\b',            # HH:MM:SS
+]
+
+
+# Patrones académicos específicos
+ACADEMIC_PATTERNS = [
+    r'fecha de entrega',
+    r'fecha limite',
+    r'fecha tope',
+    r'entregar el',
+    r'entrega el',
+    r'para el',
+    r'hasta el',
+    r'deadline',
+    r'due date',
+    r'vence el',
+    r'vencimiento',
+    r'antes del',
+    r'submission',
+    r'hand\s?in',
+    r'turn\s?in',
+    r'\b\d+%\s+\w+',                      # 25% RA1-2-3
+    r'ra\d+-\d+-\d+',                     # RA1-2-3
+    r'evaluaci[óo]n\s+\w+',               # evaluación escrita
+    r'examen\s+\w+',                      # examen final
+    r'prueba\s+\w+',                      # prueba parcial
+    r'control\s+\w+',                     # control de lectura
+    r'certamen\s+\w+',                    # certamen 1
+    r'tarea\s+\d+',                       # tarea 3
+    r'tp\s+\d+',                          # TP 2 (trabajo práctico)
+    r'lab\s+\d+',                         # lab 4 (laboratorio)
+    r'quiz\s+\d+',                        # quiz 1
+]
+
+
+# Patrones de tiempo relativo
+TIME_RELATIVE_PATTERNS = [
+    # Tiempo específico
+    r'en\s+\d+\s+(segundo|minuto|hora|día|semana|mes|año)s?',
+    r'dentro\s+de\s+\d+',
+    r'después\s+de\s+\d+',
+    r'hace\s+\d+',
+    r'en\s+\d+h\d+',                      # en 2h30
+    r'en\s+\d+:\d+',                      # en 1:30
+
+    # Expresiones relativas
+    r'el\s+(próximo|siguiente|otro)',
+    r'la\s+(próxima|siguiente|otra)',
+    r'este\s+(lunes|martes|miércoles|jueves|viernes|sábado|domingo)',
+    r'esta\s+(semana|tarde|mañana|noche)',
+    r'next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)',
+    r'this\s+(week|afternoon|morning|evening)',
+
+    # Expresiones chilenas
+    r'el\s+otro\s+(lunes|martes|miércoles|jueves|viernes)',
+    r'la\s+otra\s+semana',
+    r'pasado\s+mañana',
+    r'antes\s+de\s+ayer',
+    r'al\s+rato',
+    r'al\s+tiro',
+    r'lueguito',
+
+    # Expresiones vagas pero útiles
+    r'pronto',
+    r'más\s+tarde',
+    r'después',
+    r'luego',
+    r'soon',
+    r'later',
+    r'eventually',
+
+    # Rangos de tiempo
+    r'entre\s+las?\s+\d+',
+    r'desde\s+las?\s+\d+',
+    r'hasta\s+las?\s+\d+',
+    r'de\s+\d+\s+a\s+\d+',
+    r'from\s+\d+\s+to\s+\d+',
+
+    # PATRONES RECURRENTES (NUEVOS)
+    r'cada\s+\d+\s+(minutos?|horas?|días?|semanas?|meses?)',
+    r'todos?\s+los?\s+(días?|lunes|martes|miércoles|jueves|viernes|sábados?|domingos?)',
+    r'todas?\s+las?\s+(mañanas?|tardes?|noches?|semanas?)',
+    r'every\s+\d+\s+(minutes?|hours?|days?|weeks?|months?)',
+    r'every\s+(day|monday|tuesday|wednesday|thursday|friday|saturday|sunday)',
+    r'daily|weekly|monthly|yearly',
+    r'diario|semanal|mensual|anual',
+    r'día\s+por\s+medio',
+    r'día\s+sí\s+día\s+no',
+    r'inter\s?diario',
+    r'cada\s+dos\s+días',
+    r'cada\s+tercer\s+día',
+    r'cada\s+otra\s+semana',
+    r'cada\s+dos\s+semanas',
+    r'fin\s+de\s+semana',
+    r'días?\s+laborables?',
+    r'días?\s+hábiles?',
+    r'entre\s+semana',
+    r'lunes\s+a\s+viernes',
+    r'monday\s+to\s+friday',
+    r'weekdays?',
+    r'weekends?',
+]
+
+
+# Patrones de contexto de actividad
+ACTIVITY_PATTERNS = [
+    # Trabajo/estudio
+    r'(trabajo|office|oficina|estudio|universidad|colegio)',
+    r'(meeting|reunión|junta|conferencia|videoconferencia)',
+    r'(proyecto|informe|reporte|presentación|tarea)',
+
+    # Personal/salud
+    r'(médico|doctor|dentista|cita|consulta|control)',
+    r'(medicamento|pastilla|medicina|tratamiento)',
+    r'(ejercicio|gym|deporte|correr|caminar)',
+
+    # Finanzas
+    r'(pagar|cobrar|banco|cuenta|tarjeta|transferencia)',
+    r'(factura|boleta|recibo|impuesto|dividendo)',
+
+    # Social/familia
+    r'(cumpleaños|cumple|aniversario|fiesta|celebración)',
+    r'(llamar|contactar|escribir|visitar|ver)',
+    r'(mamá|papá|familia|amigo|novia|polola)',
+
+    # Casa/compras
+    r'(comprar|super|supermercado|tienda|mall)',
+    r'(limpiar|ordenar|arreglar|reparar|mantener)',
+    r'(cocinar|comer|almorzar|cenar|desayunar)',
+]
+
+
+# Verbos de acción (fechas numéricas con contexto)
+ACTION_WORDS = [
+    "hacer", "ir", "venir", "llamar", "revisar", "estudiar", "pagar", 
+    "comprar", "trabajar", "terminar", "enviar", "completar", "ejercitar"
+]
+
+
+# Expresiones imperativas o de planificación
+IMPERATIVE_PHRASES = [
+    "tengo que", "debo", "necesito", "hay que", "toca", "me toca",
+    "i need to", "i have to", "i must", "should", "gonna", "going to",
+    "voy a", "vamos a", "plan to", "planear", "planifico"
+]
+
+
+# Preguntas sobre tiempo
+TIME_QUESTION_PHRASES = [
+    "cuándo", "when", "qué hora", "what time", "a qué hora", "at what time"
+]
+
+
+# Patrones recurrentes específicos
+RECURRING_PHRASES = [
+    "todos los días", "every day", "daily", "diario", "diariamente",
+    "cada día", "cada mañana", "cada tarde", "cada noche",
+    "todos los lunes", "todos los martes", "todos los miércoles", 
+    "todos los jueves", "todos los viernes", "todos los sábados", "todos los domingos",
+    "every monday", "every tuesday", "every wednesday", "every thursday", 
+    "every friday", "every saturday", "every sunday",
+    "día por medio", "día sí día no", "cada dos días", "cada tercer día",
+    "cada semana", "weekly", "semanal", "semanalmente",
+    "cada mes", "monthly", "mensual", "mensualmente",
+    "fin de semana", "weekends", "entre semana", "días laborables",
+    "lunes a viernes", "monday to friday", "weekdays",
+    "cada otra semana", "cada dos semanas", "bi-weekly"
+]
+
+
+# Frecuencia numérica (cada X tiempo)
+NUMERIC_FREQUENCY_PATTERNS = [
+    r'cada\s+\d+\s+(minutos?|horas?|días?|semanas?|meses?)',
+    r'every\s+\d+\s+(minutes?|hours?|days?|weeks?|months?)',
+    r'cada\s+\d+h',  # cada 8h
+    r'cada\s+\d+hrs?',  # cada 12hrs
+]
+
+
+# Solicitudes de eliminación dentro de un recordatorio
+DELETION_REQUEST_PHRASES = [
+    "elimina", "eliminar", "borra", "borrar", "cancela", "cancelar",
+    "quita", "quitar", "delete", "remove", "cancel",
+    "no quiero", "ya no", "excepto", "menos", "except", "but not",
+    "salvo", "a excepción de", "excluding", "sin incluir"
+]
+
+
+# Comandos explícitos de eliminación
+DELETION_KEYWORDS = [
+    'eliminar', 'elimina', 'borra', 'borrar', 'cancelar', 'cancela',
+    'quitar', 'quita', 'remover', 'remueve', 'delete', 'remove',
+    'deshacer', 'anular', 'deshaz'
+]
+
+
+# Modificación de recurrencias con excepciones
+EXCEPTION_PHRASES = [
+    'excepto', 'menos', 'except', 'salvo', 'pero no', 'all except',
+    'todos excepto', 'todas excepto', 'todo excepto', 'toda excepta'
+]
+
+
+# Rasgo → lista de patrones; las listas de frases se buscan como subcadenas literales
+LITERAL_FEATURES = {
+    "keywords": REMINDER_KEYWORDS,
+    "action": ACTION_WORDS,
+    "imperative": IMPERATIVE_PHRASES,
+    "question": TIME_QUESTION_PHRASES,
+    "recurring": RECURRING_PHRASES,
+    "deletion": DELETION_REQUEST_PHRASES,
+    "deletion_command": DELETION_KEYWORDS + EXCEPTION_PHRASES,
+}
+
+PATTERN_FEATURES = {
+    "date": DATE_PATTERNS,
+    "academic": ACADEMIC_PATTERNS,
+    "relative": TIME_RELATIVE_PATTERNS,
+    "activity": ACTIVITY_PATTERNS,
+    "frequency": NUMERIC_FREQUENCY_PATTERNS,
+    "numeric_date": [r'\b\d{1,2}/\d{1,2}/\d{2,4}\b'],
+}
+
+NUMBERED_ITEM = re.compile(r'\d+\.')
+
+
+def _alternation(patterns: Iterable[str]) -> str:
+    """Unir patrones en una alternancia; los más largos primero (igual resultado, menos retroceso)"""
+    unique = sorted(set(patterns), key=len, reverse=True)
+    return "|".join(f"(?:{pattern})" for pattern in unique)
+
+
+class IntentMatcher:
+    """Clasificador de mensajes compilado una sola vez"""
+
+    def __init__(self, literal_features: Dict[str, List[str]] = None, pattern_features: Dict[str, List[str]] = None):
+        """
+        Args:
+            literal_features: Rasgo → frases buscadas como subcadenas
+            pattern_features: Rasgo → expresiones regulares
+        """
+        features = {
+            name: [re.escape(phrase) for phrase in phrases]
+            for name, phrases in (LITERAL_FEATURES if literal_features is None else literal_features).items()
+        }
+        features.update(PATTERN_FEATURES if pattern_features is None else pattern_features)
+
+        # Una alternancia compilada por rasgo: cada búsqueda recorre el texto en C y los rasgos
+        # que se solapan (ej. "todos los días" es palabra clave y patrón recurrente) se detectan todos.
+        # Sin IGNORECASE: el texto ya va en minúsculas y los patrones también (así re usa sus prefijos literales)
+        self._patterns = {name: re.compile(_alternation(patterns)) for name, patterns in features.items()}
+
+    def features(self, text: str) -> Dict[str, bool]:
+        """
+        Rasgos del texto (el texto se pasa a minúsculas una sola vez)
+
+        Returns:
+            Dict rasgo → presente
+        """
+        text_lower = text.lower()
+        return {name: pattern.search(text_lower) is not None for name, pattern in self._patterns.items()}
+
+    def is_reminder_request(self, text: str) -> bool:
+        """Detectar si un texto es una solicitud de recordatorio"""
+        found = self.features(text)
+
+        # Estructura del mensaje (conteos en C, sin listas)
+        has_context = len(text.split()) >= 2 and len(text) > 5
+        has_list_format = (
+            text.count('\n') > 1 or  # Múltiples líneas
+            text.count('-') > 1 or   # Lista con guiones
+            text.count('•') > 0 or   # Lista con bullets
+            text.count('*') > 1 or   # Lista con asteriscos
+            len(NUMBERED_ITEM.findall(text)) > 1  # Lista numerada
+        )
+        has_time_question = found["question"] and len(text.split()) > 2
+
+        # Es recordatorio si cumple cualquiera de estos criterios:
+        is_reminder = (
+            found["keywords"] or
+            (found["date"] and found["action"]) or
+            found["academic"] or
+            (found["relative"] and has_context) or
+            (found["numeric_date"] and len(text) > 15) or
+            (found["activity"] and (found["date"] or found["relative"])) or
+            (found["imperative"] and (found["date"] or found["relative"] or len(text) > 20)) or
+            (has_list_format and (found["date"] or found["academic"])) or
+            (has_time_question and found["activity"]) or
+            found["recurring"] or
+            (found["frequency"] and found["activity"]) or
+            found["deletion"]
+        )
+
+        if is_reminder:
+            logger.info(f"📝 Detectado como recordatorio: "
+                        f"keywords={found['keywords']}, date={found['date']}, "
+                        f"academic={found['academic']}, relative={found['relative']}, "
+                        f"activity={found['activity']}, imperative={found['imperative']}, "
+                        f"list={has_list_format}, question={has_time_question}, "
+                        f"recurring={found['recurring']}, frequency={found['frequency']}, "
+                        f"deletion={found['deletion']}")
+
+        return is_reminder
+
+    def has_deletion_pattern(self, text: str) -> bool:
+        """Detectar eliminaciones explícitas o excepciones que modifican recurrencias"""
+        return self._patterns["deletion_command"].search(text.lower()) is not None
+
+
+# Instancia global (se compila al importar el módulo)
+intent_matcher = IntentMatcher()
+
+
+def is_reminder_request(text: str) -> bool:
+    """
+    Clasificar un mensaje como recordatorio (función de conveniencia)
+
+    Args:
+        text: Texto del usuario
+
+    Returns:
+        True si parece una solicitud de recordatorio
+    """
+    return intent_matcher.is_reminder_request(text)
+
+
+def has_deletion_pattern(text: str) -> bool:
+    """
+    Detectar una solicitud de eliminación o excepción (función de conveniencia)
+
+    Args:
+        text: Texto del usuario
+
+    Returns:
+        True si contiene patrones de eliminación
+    """
+    return intent_matcher.has_deletion_pattern(text)
@@ -0,0 +1,265 @@
+"""
+Caché de respuestas del LLM (memoria LRU con TTL + colección opcional en MongoDB)
+La clave combina método, versión del prompt, input normalizado y un bucket de tiempo;
+las fechas relativas se re-anclan a la hora actual al servir un hit
+"""
+
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+import pytz
+from loguru import logger
+
+from config.settings import settings
+
+
+CHILE_TZ = pytz.timezone('America/Santiago')
+
+# Anclas de las expresiones temporales
+ANCHOR_OFFSET = "offset"      # "en 3 horas": se desplaza exacto con la hora actual
+ANCHOR_DAILY = "daily"        # "mañana a las 8": misma hora del día, se desplaza por días
+ANCHOR_WEEKLY = "weekly"      # "el viernes": mismo día de la semana, se desplaza por semanas
+ANCHOR_DATE = "date"          # "5 octubre 2025", "cada mes": válido solo el mismo día
+ANCHOR_STATIC = "static"      # No depende de la hora (p.ej. mejorar texto)
+
+ISO_UTC = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z")
+
+MONTHS = "enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre"
+ABSOLUTE_DATE = re.compile(
+    rf"\b\d{{1,2}}[/.-]\d{{1,2}}([/.-]\d{{2,4}})?\b|\b\d{{4}}-\d{{2}}-\d{{2}}\b|\b\d{{1,2}}\s+(de\s+)?({MONTHS})\b|\b({MONTHS})\s+\d{{1,2}}\b"
+)
+CALENDAR_PERIOD = re.compile(r"\b(mes|meses|mensual\w*|año|años|anual\w*|trimestre|semestre|fin de mes)\b")
+WEEKDAY = re.compile(r"\b(lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bados?|domingos?|fin de semana|entre semana|semana)\b")
+OFFSET = re.compile(
+    r"\b(en|dentro de)\s+(\d+|un|una|media|medio)\s+(segundos?|minutos?|horas?|d[ií]as?|semanas?|rato|ratito)\b"
+    r"|\b(al tiro|altiro|al rato|m[aá]s tarde|ahora|ya)\b"
+)
+CLOCK_OR_DAY = re.compile(
+    r"\b(hoy|mañana|pasado|tarde|noche|madrugada|mediod[ií]a|medianoche|diario|todos los d[ií]as|cada d[ií]a|a las?|\d{1,2}:\d{2}|\d{1,2}\s*(am|pm|hrs?|h))\b"
+)
+
+
+class LLMCache:
+    """Caché de dos niveles para respuestas del LLM"""
+
+    def __init__(self, db_manager=None, max_entries: int = None, ttl_seconds: int = None):
+        """
+        Args:
+            db_manager: Gestor de base de datos (opcional, segundo nivel compartido)
+            max_entries: Máximo de entradas en memoria
+            ttl_seconds: Vida de una entrada
+        """
+        self.db = db_manager
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or settings.LLM_CACHE_TTL_SECONDS
+
+        # clave -> (expira en monotonic, entrada)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+        # Métricas
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.reanchored = 0
+
+    # --- CLAVES ---
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Minúsculas, espacios colapsados y sin puntuación en los extremos (se conservan tildes)"""
+        text = unicodedata.normalize("NFC", text or "").lower()
+        text = re.sub(r"\s+", " ", text).strip()
+        return text.strip(" .,;:!¡?¿'\"")
+
+    @classmethod
+    def classify(cls, user_input: str) -> str:
+        """Tipo de ancla temporal de una expresión"""
+        text = cls.normalize(user_input)
+        if ABSOLUTE_DATE.search(text) or CALENDAR_PERIOD.search(text):
+            return ANCHOR_DATE
+        # "en 2 semanas" o "más tarde" son desplazamientos exactos aunque nombren semana o tarde
+        rest = OFFSET.sub(" ", text)
+        if rest != text and not WEEKDAY.search(rest) and not CLOCK_OR_DAY.search(rest):
+            return ANCHOR_OFFSET
+        if WEEKDAY.search(text):
+            return ANCHOR_WEEKLY
+        return ANCHOR_DAILY
+
+    @staticmethod
+    def _bucket(anchor: str, current_time: datetime) -> str:
+        """Bucket de tiempo: las respuestas solo se reutilizan dentro del mismo bucket"""
+        local = current_time.replace(tzinfo=pytz.UTC).astimezone(CHILE_TZ)
+        if anchor == ANCHOR_DAILY:
+            return f"h{local.hour}"
+        if anchor == ANCHOR_WEEKLY:
+            return f"w{local.weekday()}h{local.hour}"
+        if anchor == ANCHOR_DATE:
+            return local.strftime("%Y-%m-%d")
+        return anchor
+
+    def make_key(self, method: str, version: int, user_input: str, anchor: str, current_time: datetime) -> str:
+        raw = "|".join([method, str(version), anchor, self._bucket(anchor, current_time), self.normalize(user_input)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    # --- RE-ANCLAJE ---
+
+    @staticmethod
+    def _shift_days(value: datetime, days: int) -> datetime:
+        """Desplazar días en hora local de Chile (respeta cambios de horario)"""
+        local = value.replace(tzinfo=pytz.UTC).astimezone(CHILE_TZ)
+        shifted = CHILE_TZ.localize(local.replace(tzinfo=None) + timedelta(days=days))
+        return shifted.astimezone(pytz.UTC).replace(tzinfo=None)
+
+    def _reanchor(self, entry: Dict[str, Any], current_time: datetime) -> Optional[str]:
+        """
+        Ajustar las fechas ISO8601 de la respuesta a la hora actual
+
+        Returns:
+            Respuesta re-anclada, o None si alguna fecha quedaría en el pasado
+        """
+        value = entry["value"]
+        reference = entry["reference_time"]
+        anchor = entry["anchor"]
+
+        if anchor == ANCHOR_OFFSET:
+            delta = current_time - reference
+            shift = lambda dt: dt + delta
+        elif anchor in (ANCHOR_DAILY, ANCHOR_WEEKLY):
+            days = (
+                current_time.replace(tzinfo=pytz.UTC).astimezone(CHILE_TZ).date()
+                - reference.replace(tzinfo=pytz.UTC).astimezone(CHILE_TZ).date()
+            ).days
+            shift = (lambda dt: self._shift_days(dt, days)) if days else None
+        else:
+            shift = None
+
+        if not ISO_UTC.search(value):
+            return value
+
+        in_past = False
+
+        def replace(match):
+            nonlocal in_past
+            parsed = datetime.fromisoformat(match.group(0)[:-1])
+            # Solo importa lo que la respuesta proyectaba hacia el futuro
+            was_future = parsed >= reference
+            if shift:
+                parsed = shift(parsed)
+            if was_future and parsed < current_time:
+                in_past = True
+            return parsed.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        result = ISO_UTC.sub(replace, value)
+        if in_past:
+            return None
+        if shift:
+            self.reanchored += 1
+        return result
+
+    # --- LECTURA / ESCRITURA ---
+
+    async def get(
+        self,
+        method: str,
+        version: int,
+        user_input: str,
+        current_time: datetime,
+        anchor: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Buscar una respuesta en caché
+
+        Args:
+            method: Método del intérprete
+            version: Versión del prompt del método
+            user_input: Texto del usuario
+            current_time: Hora actual (UTC naive)
+            anchor: Ancla temporal (por defecto se deduce del texto)
+
+        Returns:
+            Respuesta del LLM re-anclada o None
+        """
+        anchor = anchor or self.classify(user_input)
+        key = self.make_key(method, version, user_input, anchor, current_time)
+
+        entry = None
+        cached = self._entries.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            entry = cached[1]
+        elif cached:
+            del self._entries[key]
+
+        from_db = False
+        if entry is None and self.db is not None:
+            entry = await self.db.get_llm_cache_entry(key)
+            from_db = entry is not None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value = self._reanchor(entry, current_time)
+        if value is None:
+            self.stale += 1
+            self.misses += 1
+            return None
+
+        if from_db:
+            self.db_hits += 1
+            self._remember(key, entry)
+        else:
+            self.hits += 1
+        logger.debug(f"🧠 Caché LLM hit ({method}): {user_input[:40]}")
+        return value
+
+    async def set(
+        self,
+        method: str,
+        version: int,
+        user_input: str,
+        current_time: datetime,
+        value: str,
+        anchor: Optional[str] = None
+    ):
+        """Guardar una respuesta del LLM con su hora de referencia"""
+        if not value:
+            return
+
+        anchor = anchor or self.classify(user_input)
+        key = self.make_key(method, version, user_input, anchor, current_time)
+        entry = {"value": value, "reference_time": current_time, "anchor": anchor, "method": method}
+
+        self._remember(key, entry)
+        if self.db is not None:
+            await self.db.save_llm_cache_entry(
+                key, entry, datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+            )
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vaciar el nivel en memoria"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de la caché"""
+        lookups = self.hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "reanchored": self.reanchored,
+            "hit_rate": round((self.hits + self.db_hits) / lookups, 3) if lookups else 0.0
+        }
@@ -2,19 +2,159 @@
 Índice de memoria para contexto y hábitos del usuario
 """
 
+import asyncio
+import math
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Set
+from bson import ObjectId
 from loguru import logger
 
 from database.connection import DatabaseManager
-from database.models import AIMemory, MemoryType
+from database.models import AIMemory, MemoryType, CONTEXT_SUMMARY_SOURCE
+from config.settings import settings
+from utils.text_search import tokenize
+from bot.habit_histogram import HabitHistogram
+
+
+def score_memory(memory: AIMemory, query_terms: Set[str], now: datetime) -> float:
+    """
+    Relevancia de una memoria para el mensaje actual (0.0-1.0)
+    
+    Combina recencia (vida media), confianza, frecuencia de uso (saturada)
+    y términos en común con el mensaje, con los pesos de MEMORY_SCORE_WEIGHTS.
+    Cada término en común aporta la mitad de lo que falta: los mensajes traen
+    palabras de comando ("recordar", "mañana") que no deben diluir una coincidencia
+    """
+    weights = settings.MEMORY_SCORE_WEIGHTS
+    age_days = max((now - memory.created_at).total_seconds(), 0.0) / 86400
+    recency = 0.5 ** (age_days / settings.MEMORY_RECENCY_HALF_LIFE_DAYS)
+    frequency = min(
+        math.log1p(memory.access_count) / math.log1p(settings.MEMORY_FREQUENCY_SATURATION), 1.0
+    )
+    overlap = 0.0
+    if query_terms:
+        overlap = 1.0 - 0.5 ** len(query_terms & set(tokenize(memory.text)))
+    
+    return (
+        weights["recency"] * recency
+        + weights["confidence"] * min(max(memory.confidence, 0.0), 1.0)
+        + weights["frequency"] * frequency
+        + weights["overlap"] * overlap
+    )
+
+
+class ContextCache:
+    """
+    Memorias recientes por (usuario, tipo), más nuevas primero
+    
+    Se llena en la primera lectura y se actualiza al guardar (write-through);
+    LRU acotado entre todos los usuarios
+    """
+    
+    def __init__(self, max_entries: int = None, items_per_type: int = None):
+        self.max_entries = max_entries or settings.MEMORY_CACHE_MAX_ENTRIES
+        self.items_per_type = items_per_type or settings.MEMORY_CACHE_ITEMS_PER_TYPE
+        self._entries: "OrderedDict[Tuple[int, str], List[AIMemory]]" = OrderedDict()
+        
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id: int, memory_type: MemoryType) -> Optional[List[AIMemory]]:
+        key = (user_id, memory_type)
+        memories = self._entries.get(key)
+        if memories is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return memories
+    
+    def put(self, user_id: int, memory_type: MemoryType, memories: List[AIMemory]):
+        key = (user_id, memory_type)
+        self._entries[key] = memories[:self.items_per_type]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def add(self, memory: AIMemory):
+        """Insertar una memoria nueva solo si su (usuario, tipo) ya está en caché"""
+        memories = self._entries.get((memory.user_id, memory.memory_type))
+        if memories is not None:
+            memories.insert(0, memory)
+            del memories[self.items_per_type:]
+    
+    def invalidate_user(self, user_id: int):
+        """Olvidar todas las entradas del usuario (p. ej. tras compactar)"""
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+# Etiquetas del resumen de contexto compactado (por origen)
+CONTEXT_SOURCE_LABELS = {
+    "general_message": "mensajes",
+    "reminder_creation": "recordatorios creados",
+    "recurring_reminder": "series recurrentes",
+    "note_creation": "notas",
+    "bot_interaction": "interacciones con el bot"
+}
 
 
 class MemoryIndex:
     """Gestor de memoria contextual del usuario"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        cache: Optional[ContextCache] = None,
+        flush_seconds: float = None,
+        flush_batch_size: int = None
+    ):
+        """
+        Args:
+            db_manager: Gestor de base de datos
+            cache: Caché de contexto (una nueva por defecto)
+            flush_seconds: Intervalo de escritura del contexto en lote
+            flush_batch_size: Tamaño de búfer que fuerza una escritura
+        """
         self.db = db_manager
+        self.cache = cache or ContextCache()
+        self.flush_seconds = flush_seconds or settings.MEMORY_FLUSH_SECONDS
+        self.flush_batch_size = flush_batch_size or settings.MEMORY_FLUSH_BATCH_SIZE
+        
+        # Contexto aún no escrito (visible en lecturas vía caché y merge)
+        self._pending: List[AIMemory] = []
+        # Accesos aún no escritos ({_id: n}); se suman con un $inc en lote
+        self._access: Dict[ObjectId, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._next_compaction = 0.0
+        self.is_running = False
+        
+        # Métricas
+        self.flushed = 0
+        self.dropped = 0
+        self.compacted = 0
+    
+    @staticmethod
+    def _expires_at(memory_type: MemoryType, created_at: datetime) -> Optional[datetime]:
+        """Fecha de expiración según la retención del tipo (None = se conserva)"""
+        days = settings.MEMORY_RETENTION_DAYS.get(memory_type.value)
+        return created_at + timedelta(days=days) if days else None
     
     async def add_preference(self, user_id: int, preference_text: str, source: str = "user_input") -> bool:
         """
@@ -29,19 +169,22 @@ class MemoryIndex:
             True si se guardó exitosamente
         """
         try:
+            now = datetime.utcnow()
             memory_data = {
                 "user_id": user_id,
                 "text": preference_text,
                 "memory_type": MemoryType.PREFERENCE,
                 "confidence": 0.8,
                 "source": source,
-                "created_at": datetime.utcnow(),
-                "access_count": 0
+                "created_at": now,
+                "access_count": 0,
+                "expires_at": self._expires_at(MemoryType.PREFERENCE, now)
             }
             
-            success = await self.db.add_ai_memory(memory_data)
+            memory = await self.db.add_ai_memory(memory_data)
             
-            if success:
+            if memory:
+                self.cache.add(memory)
                 logger.info(f"💾 Preferencia guardada para usuario {user_id}: '{preference_text[:50]}...'")
                 return True
             else:
@@ -65,19 +208,22 @@ class MemoryIndex:
             True si se guardó exitosamente
         """
         try:
+            now = datetime.utcnow()
             memory_data = {
                 "user_id": user_id,
                 "text": pattern_text,
                 "memory_type": MemoryType.HABIT,
                 "confidence": min(max(confidence, 0.0), 1.0),  # Clamp entre 0 y 1
                 "source": "pattern_detection",
-                "created_at": datetime.utcnow(),
-                "access_count": 0
+                "created_at": now,
+                "access_count": 0,
+                "expires_at": self._expires_at(MemoryType.HABIT, now)
             }
             
-            success = await self.db.add_ai_memory(memory_data)
+            memory = await self.db.add_ai_memory(memory_data)
             
-            if success:
+            if memory:
+                self.cache.add(memory)
                 logger.info(f"🔄 Hábito detectado para usuario {user_id}: '{pattern_text[:50]}...'")
                 return True
             else:
@@ -90,7 +236,7 @@ class MemoryIndex:
     
     async def add_context(self, user_id: int, context_text: str, source: str = "conversation") -> bool:
         """
-        Agregar contexto conversacional
+        Agregar contexto conversacional (queda en el búfer; se escribe en lote)
         
         Args:
             user_id: ID del usuario
@@ -98,33 +244,41 @@ class MemoryIndex:
             source: Origen del contexto
         
         Returns:
-            True si se guardó exitosamente
+            True si se aceptó
         """
         try:
+            now = datetime.utcnow()
             memory_data = {
                 "user_id": user_id,
                 "text": context_text,
                 "memory_type": MemoryType.CONTEXT,
                 "confidence": 0.6,
                 "source": source,
-                "created_at": datetime.utcnow(),
-                "access_count": 0
+                "created_at": now,
+                "access_count": 0,
+                "expires_at": self._expires_at(MemoryType.CONTEXT, now)
             }
             
-            success = await self.db.add_ai_memory(memory_data)
+            memory = AIMemory(**memory_data)
+            self._pending.append(memory)
+            self.cache.add(memory)
+            logger.debug(f"💬 Contexto en búfer para usuario {user_id}")
+            
+            if len(self._pending) >= self.flush_batch_size:
+                await self.flush()
+            return True
             
-            if success:
-                logger.debug(f"💬 Contexto guardado para usuario {user_id}")
-                return True
-            else:
-                logger.error("❌ Error guardando contexto")
-                return False
-                
         except Exception as e:
             logger.error(f"❌ Error agregando contexto: {e}")
             return False
     
-    async def get_user_context(self, user_id: int, memory_types: List[MemoryType] = None, limit: int = 10) -> List[str]:
+    async def get_user_context(
+        self,
+        user_id: int,
+        memory_types: List[MemoryType] = None,
+        limit: int = 10,
+        query: Optional[str] = None
+    ) -> List[str]:
         """
         Obtener contexto relevante del usuario
         
@@ -132,17 +286,17 @@ class MemoryIndex:
             user_id: ID del usuario
             memory_types: Tipos de memoria a incluir (default: todos)
             limit: Número máximo de elementos
+            query: Mensaje actual; si se indica, las memorias se ordenan por relevancia
         
         Returns:
             Lista de strings con información contextual
         """
         try:
-            # Obtener memorias de la base de datos
-            memories = await self.db.get_user_context(user_id, limit)
-            
-            # Filtrar por tipo si se especifica
-            if memory_types:
-                memories = [m for m in memories if m.memory_type in memory_types]
+            memories = await self._recent_memories(user_id, memory_types or list(MemoryType), limit)
+            if query:
+                memories = self.rank_memories(memories, query)
+            memories = memories[:limit]
+            self._record_access(memories)
             
             # Convertir a lista de strings
             context_list = []
@@ -156,9 +310,6 @@ class MemoryIndex:
                 
                 context_item = f"{memory_type_emoji} {memory.text}"
                 context_list.append(context_item)
-                
-                # Actualizar contador de accesos (implementar en el futuro)
-                # await self._increment_access_count(memory.id)
             
             logger.debug(f"🧠 Obtenido contexto para usuario {user_id}: {len(context_list)} elementos")
             return context_list
@@ -167,6 +318,213 @@ class MemoryIndex:
             logger.error(f"❌ Error obteniendo contexto: {e}")
             return []
     
+    def _with_pending(self, user_id: int, memory_types: List[MemoryType], memories: List[AIMemory]) -> List[AIMemory]:
+        """Agregar el contexto del búfer que MongoDB aún no tiene"""
+        loaded = {memory.id for memory in memories}
+        pending = [
+            memory for memory in self._pending
+            if memory.user_id == user_id and memory.memory_type in memory_types and memory.id not in loaded
+        ]
+        if not pending:
+            return memories
+        return sorted(memories + pending, key=lambda memory: memory.created_at, reverse=True)
+    
+    async def _recent_memories(self, user_id: int, memory_types: List[MemoryType], limit: int) -> List[AIMemory]:
+        """
+        Candidatas de los tipos pedidos, más nuevas primero
+        
+        Las ventanas por tipo vienen de la caché (las que faltan, en paralelo desde el
+        índice user_id + memory_type + created_at); un límite mayor que la ventana va directo a MongoDB
+        """
+        if limit > self.cache.items_per_type:
+            memories = await self.db.get_user_context(user_id, limit, memory_types)
+            return self._with_pending(user_id, memory_types, memories)
+        
+        by_type = {memory_type: self.cache.get(user_id, memory_type) for memory_type in memory_types}
+        missing = [memory_type for memory_type, memories in by_type.items() if memories is None]
+        if missing:
+            loaded = await asyncio.gather(*(
+                self.db.get_user_context(user_id, self.cache.items_per_type, [memory_type])
+                for memory_type in missing
+            ))
+            for memory_type, memories in zip(missing, loaded):
+                memories = self._with_pending(user_id, [memory_type], memories)
+                self.cache.put(user_id, memory_type, memories)
+                by_type[memory_type] = memories
+        
+        memories = [memory for memories in by_type.values() for memory in memories]
+        memories.sort(key=lambda memory: memory.created_at, reverse=True)
+        return memories
+    
+    @staticmethod
+    def rank_memories(memories: List[AIMemory], query: str, now: Optional[datetime] = None) -> List[AIMemory]:
+        """Ordenar memorias por relevancia para el mensaje (empates: la más reciente)"""
+        now = now or datetime.utcnow()
+        query_terms = set(tokenize(query))
+        return sorted(
+            memories,
+            key=lambda memory: (score_memory(memory, query_terms, now), memory.created_at),
+            reverse=True
+        )
+    
+    def _record_access(self, memories: List[AIMemory]):
+        """Contar el uso de las memorias devueltas (en memoria; se escribe en el próximo flush)"""
+        now = datetime.utcnow()
+        pending = {memory.id for memory in self._pending}
+        for memory in memories:
+            memory.access_count += 1
+            memory.last_accessed = now
+            # Lo que sigue en el búfer se insertará ya con el contador actualizado
+            if memory.id not in pending:
+                self._access[memory.id] = self._access.get(memory.id, 0) + 1
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de contexto y de las escrituras en lote"""
+        return {
+            **self.cache.get_stats(),
+            "pending_writes": len(self._pending),
+            "pending_access": len(self._access),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "compacted": self.compacted
+        }
+    
+    # --- ESCRITURA EN LOTE Y COMPACTACIÓN ---
+    
+    async def flush(self) -> int:
+        """
+        Escribir el contexto del búfer con un insert_many y los accesos acumulados
+        
+        Si MongoDB falla el lote queda para el siguiente intento (con tope MEMORY_BUFFER_MAX)
+        
+        Returns:
+            Memorias escritas
+        """
+        async with self._flush_lock:
+            saved = 0
+            batch = self._pending[:]
+            if batch:
+                saved = await self.db.add_ai_memories_bulk(batch)
+                if saved:
+                    # Lo agregado mientras se escribía queda al final del búfer
+                    del self._pending[:len(batch)]
+                    self.flushed += saved
+                    logger.debug(f"💬 {saved} memorias de contexto escritas")
+                elif len(self._pending) > settings.MEMORY_BUFFER_MAX:
+                    overflow = len(self._pending) - settings.MEMORY_BUFFER_MAX
+                    del self._pending[:overflow]
+                    self.dropped += overflow
+                    logger.warning(f"⚠️ Búfer de contexto lleno: {overflow} memorias descartadas")
+            
+            # Después de insertar: los $inc encuentran las memorias recién escritas
+            await self._flush_access()
+            return saved
+    
+    async def _flush_access(self):
+        """Escribir los accesos acumulados con un solo bulk_write de $inc"""
+        if not self._access:
+            return
+        access, self._access = self._access, {}
+        await self.db.increment_memory_access(access, datetime.utcnow())
+        logger.debug(f"🧠 Accesos guardados para {len(access)} memorias")
+    
+    @staticmethod
+    def _summary_text(counts: Dict[str, int], until: datetime, last_text: str) -> str:
+        total = sum(counts.values())
+        parts = ", ".join(
+            f"{count} {CONTEXT_SOURCE_LABELS.get(source, source)}"
+            for source, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        )
+        return f"Historial hasta {until.strftime('%d/%m/%Y')}: {total} interacciones ({parts}). Última: {last_text}"
+    
+    async def compact_user_context(self, user_id: int, before: datetime, keep_latest: int = None) -> int:
+        """
+        Resumir el contexto anterior a `before` (y el que exceda `keep_latest`) en una memoria por usuario
+        
+        Returns:
+            Entradas de contexto compactadas
+        """
+        try:
+            keep_latest = keep_latest or settings.MEMORY_MAX_CONTEXT_PER_USER
+            folded = await self.db.get_context_to_compact(user_id, before, keep_latest)
+            if not folded:
+                return 0
+            
+            previous = await self.db.get_context_summary(user_id) or {}
+            counts = dict(previous.get("counts") or {})
+            for source, group in folded["by_source"].items():
+                counts[source] = counts.get(source, 0) + group["count"]
+            
+            newest = folded["newest"]
+            last_text = max(folded["by_source"].values(), key=lambda group: group["newest"])["last_text"]
+            summary = {
+                "text": self._summary_text(counts, newest, last_text),
+                "memory_type": MemoryType.CONTEXT,
+                "source": CONTEXT_SUMMARY_SOURCE,
+                "confidence": 0.5,
+                "counts": counts,
+                "created_at": newest,
+                "access_count": previous.get("access_count", 0),
+                "expires_at": None
+            }
+            
+            removed = await self.db.fold_context(user_id, folded["cutoff"], summary)
+            self.cache.invalidate_user(user_id)
+            self.compacted += removed
+            logger.info(f"🧹 Contexto compactado para usuario {user_id}: {removed} entradas → 1 resumen")
+            return removed
+            
+        except Exception as e:
+            logger.error(f"❌ Error compactando contexto: {e}")
+            return 0
+    
+    async def compact_all_context(self) -> int:
+        """Compactar el contexto de todos los usuarios que lo necesitan"""
+        await self.flush()
+        before = datetime.utcnow() - timedelta(days=settings.MEMORY_COMPACT_AFTER_DAYS)
+        keep_latest = settings.MEMORY_MAX_CONTEXT_PER_USER
+        
+        total = 0
+        for user_id in await self.db.get_users_to_compact(before, keep_latest):
+            total += await self.compact_user_context(user_id, before, keep_latest)
+        
+        if total:
+            logger.info(f"🧹 Compactación de contexto: {total} entradas resumidas")
+        return total
+    
+    async def start(self):
+        """Iniciar la escritura en lote y la compactación periódica"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._next_compaction = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🧠 Memoria contextual iniciada (lotes cada {self.flush_seconds:.0f}s)")
+    
+    async def stop(self):
+        """Detener tareas en segundo plano y escribir lo pendiente"""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info("🧠 Memoria contextual detenida")
+    
+    async def _run(self):
+        while self.is_running:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+                if time.monotonic() >= self._next_compaction:
+                    self._next_compaction = time.monotonic() + settings.MEMORY_COMPACTION_HOURS * 3600
+                    await self.compact_all_context()
+            except Exception as e:
+                logger.error(f"❌ Error en tareas de memoria contextual: {e}")
+    
     async def get_preferences(self, user_id: int) -> List[str]:
         """
         Obtener solo las preferencias del usuario
@@ -191,62 +549,32 @@ class MemoryIndex:
         """
         return await self.get_user_context(user_id, [MemoryType.HABIT], limit=5)
     
-    async def analyze_reminder_patterns(self, user_id: int, recent_reminders: List[Dict]) -> Optional[str]:
+    async def get_habit_histogram(self, user_id: int) -> HabitHistogram:
+        """Histograma de horas y días de los recordatorios del usuario (un documento)"""
+        return HabitHistogram.from_document(await self.db.get_habit_histogram(user_id))
+    
+    async def analyze_reminder_patterns(self, user_id: int) -> Optional[str]:
         """
-        Analizar patrones en los recordatorios del usuario
+        Describir los patrones de horario del usuario
+        
+        Lee el histograma que se actualiza al crear cada recordatorio; no recorre
+        recordatorios ni guarda una memoria nueva por análisis
         
         Args:
             user_id: ID del usuario
-            recent_reminders: Lista de recordatorios recientes
         
         Returns:
             Descripción del patrón detectado o None
         """
         try:
-            if len(recent_reminders) < 3:
+            histogram = await self.get_habit_histogram(user_id)
+            patterns_detected = histogram.describe()
+            if not patterns_detected:
                 return None
             
-            # Análisis básico de patrones temporales
-            hour_counts = {}
-            day_counts = {}
-            
-            for reminder in recent_reminders:
-                if 'date' in reminder:
-                    date = reminder['date']
-                    if isinstance(date, datetime):
-                        hour = date.hour
-                        day = date.weekday()  # 0=Monday, 6=Sunday
-                        
-                        hour_counts[hour] = hour_counts.get(hour, 0) + 1
-                        day_counts[day] = day_counts.get(day, 0) + 1
-            
-            patterns_detected = []
-            
-            # Patrón de horario preferido
-            if hour_counts:
-                most_common_hour = max(hour_counts.items(), key=lambda x: x[1])
-                if most_common_hour[1] >= 2:  # Al menos 2 recordatorios en esa hora
-                    patterns_detected.append(f"Prefiere recordatorios a las {most_common_hour[0]:02d}:00")
-            
-            # Patrón de día de la semana
-            if day_counts:
-                most_common_day = max(day_counts.items(), key=lambda x: x[1])
-                if most_common_day[1] >= 2:
-                    day_names = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
-                    day_name = day_names[most_common_day[0]]
-                    patterns_detected.append(f"Frecuentemente programa para {day_name}")
-            
-            # Combinar patrones
-            if patterns_detected:
-                pattern_text = "; ".join(patterns_detected)
-                
-                # Guardar patrón detectado
-                await self.add_habit_pattern(user_id, pattern_text, confidence=0.7)
-                
-                logger.info(f"📊 Patrón detectado para usuario {user_id}: {pattern_text}")
-                return pattern_text
-            
-            return None
+            pattern_text = "; ".join(patterns_detected)
+            logger.debug(f"📊 Patrón para usuario {user_id}: {pattern_text}")
+            return pattern_text
             
         except Exception as e:
             logger.error(f"❌ Error analizando patrones: {e}")
@@ -254,7 +582,7 @@ class MemoryIndex:
     
     async def suggest_improvements(self, user_id: int) -> List[str]:
         """
-        Sugerir mejoras basadas en la memoria del usuario
+        Sugerir mejoras basadas en los hábitos del usuario
         
         Args:
             user_id: ID del usuario
@@ -265,16 +593,12 @@ class MemoryIndex:
         try:
             suggestions = []
             
-            # Obtener contexto del usuario
-            preferences = await self.get_preferences(user_id)
-            habits = await self.get_habits(user_id)
-            
-            # Sugerencias basadas en hábitos
-            for habit in habits:
-                if "prefiere recordatorios a las" in habit.lower():
-                    suggestions.append("💡 Considera usar pre-recordatorios para tareas importantes")
-                elif "frecuentemente programa" in habit.lower():
-                    suggestions.append("📅 Podrías beneficiarte de recordatorios semanales recurrentes")
+            # Sugerencias basadas en el histograma de hábitos
+            histogram = await self.get_habit_histogram(user_id)
+            if histogram.peak_hour():
+                suggestions.append("💡 Considera usar pre-recordatorios para tareas importantes")
+            if histogram.peak_weekday():
+                suggestions.append("📅 Podrías beneficiarte de recordatorios semanales recurrentes")
             
             # Sugerencias generales si no hay suficiente contexto
             if not suggestions:
@@ -293,24 +617,21 @@ class MemoryIndex:
     
     async def cleanup_old_context(self, user_id: int, days_old: int = 30) -> int:
         """
-        Limpiar contexto antiguo (implementación futura)
+        Compactar el contexto antiguo del usuario en su memoria resumen
         
         Args:
             user_id: ID del usuario
-            days_old: Días de antigüedad para limpiar
+            days_old: Días de antigüedad para compactar
         
         Returns:
-            Número de elementos limpiados
+            Número de elementos compactados
         """
         try:
-            # TODO: Implementar cleanup en DatabaseManager
-            # Por ahora solo logging
+            await self.flush()
             cutoff_date = datetime.utcnow() - timedelta(days=days_old)
             logger.info(f"🧹 Cleanup de contexto anterior a {cutoff_date} para usuario {user_id}")
-            
-            # Retornar 0 como placeholder
-            return 0
+            return await self.compact_user_context(user_id, cutoff_date)
             
         except Exception as e:
             logger.error(f"❌ Error en cleanup de contexto: {e}")
-            return 0
\ No newline at end of file
+            return 0
@@ -2,22 +2,25 @@
 Gestor de notas con clasificación automática por IA
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from loguru import logger
 
 from database.connection import DatabaseManager
 from database.models import Note, NoteType
 from bot.ai_interpreter import AIInterpreter
+from bot.note_search import NoteSearchIndex
+from config.settings import settings
 from utils.helpers import extract_keywords_from_text
 
 
 class NoteManager:
     """Gestor de notas con clasificación inteligente"""
     
-    def __init__(self, db_manager: DatabaseManager, ai_interpreter: AIInterpreter):
+    def __init__(self, db_manager: DatabaseManager, ai_interpreter: AIInterpreter, search_index: Optional[NoteSearchIndex] = None):
         self.db = db_manager
         self.ai = ai_interpreter
+        self.search_index = search_index or NoteSearchIndex(db_manager)
     
     async def create_note(self, user_id: int, note_text: str, auto_classify: bool = True) -> bool:
         """
@@ -56,9 +59,13 @@ class NoteManager:
             }
             
             # Guardar en base de datos
-            success = await self.db.add_note(note_data)
+            note = await self.db.add_note(note_data)
             
-            if success:
+            if note:
+                self.search_index.add_note(
+                    user_id, str(note.id), note.text, note.tags,
+                    note.priority, note.note_type.value, note.created_at
+                )
                 logger.info(f"✅ Nota creada para usuario {user_id}: '{note_text[:50]}...'")
                 if classification:
                     logger.info(f"🏷️ Clasificación: {classification}")
@@ -73,65 +80,56 @@ class NoteManager:
     
     async def search_notes(self, user_id: int, query: str, use_ai_search: bool = True, limit: int = 10) -> List[Note]:
         """
-        Buscar notas por palabra clave o semánticamente
+        Buscar notas con el índice local (BM25 + similitud de trigramas)
+        
+        Se rankean todas las notas del usuario en memoria; el LLM solo reordena
+        los mejores candidatos si NOTE_SEARCH_LLM_RERANK está activo.
         
         Args:
             user_id: ID del usuario
             query: Término de búsqueda
-            use_ai_search: Si usar búsqueda semántica con IA
+            use_ai_search: Permitir el reordenamiento con IA
             limit: Número máximo de resultados
         
         Returns:
-            Lista de notas encontradas
+            Lista de notas encontradas, de la más a la menos relevante
         """
         try:
-            # Búsqueda básica por palabra clave
-            basic_results = await self.db.get_notes_by_keyword(user_id, query, limit)
+            rerank = use_ai_search and settings.NOTE_SEARCH_LLM_RERANK
+            top_k = max(limit, settings.NOTE_SEARCH_RERANK_TOP_K) if rerank else limit
             
-            # Si no hay resultados básicos o se solicita IA, usar búsqueda semántica
-            if (not basic_results or use_ai_search) and len(basic_results) < limit:
-                try:
-                    # Obtener más notas para análisis semántico
-                    all_notes = await self.db.get_notes_by_keyword(user_id, "", limit=100)
-                    
-                    if all_notes:
-                        # Convertir a dict para IA
-                        notes_for_ai = [note.dict() for note in all_notes]
-                        
-                        # Búsqueda semántica
-                        semantic_results = await self.ai.search_notes_semantically(query, notes_for_ai)
-                        
-                        # Convertir de vuelta a objetos Note
-                        semantic_notes = []
-                        for note_dict in semantic_results:
-                            try:
-                                semantic_notes.append(Note(**note_dict))
-                            except Exception as e:
-                                logger.warning(f"⚠️ Error convirtiendo nota: {e}")
-                        
-                        # Combinar resultados (básicos + semánticos) sin duplicados
-                        combined_results = basic_results.copy()
-                        basic_ids = {str(note.id) for note in basic_results}
-                        
-                        for semantic_note in semantic_notes:
-                            if str(semantic_note.id) not in basic_ids:
-                                combined_results.append(semantic_note)
-                                if len(combined_results) >= limit:
-                                    break
-                        
-                        logger.info(f"🔍 Búsqueda combinada: {len(basic_results)} básicos + {len(semantic_notes)} semánticos")
-                        return combined_results[:limit]
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ Error en búsqueda semántica: {e}")
+            ranked = await self.search_index.search(user_id, query, limit=top_k)
+            note_ids = [note_id for note_id, _ in ranked]
             
-            logger.info(f"🔍 Búsqueda básica: {len(basic_results)} resultados para '{query}'")
-            return basic_results
+            if rerank and len(note_ids) > 1:
+                note_ids = await self._rerank_with_ai(user_id, query, note_ids)
+            
+            notes = await self.db.get_notes_by_ids(user_id, note_ids[:limit])
+            logger.info(f"🔍 Búsqueda local: {len(notes)} resultados para '{query}'")
+            return notes
             
         except Exception as e:
             logger.error(f"❌ Error buscando notas: {e}")
             return []
     
+    async def _rerank_with_ai(self, user_id: int, query: str, note_ids: List[str]) -> List[str]:
+        """Reordenar los candidatos con el LLM (solo el top-k viaja en el prompt)"""
+        try:
+            candidates = await self.db.get_notes_by_ids(user_id, note_ids)
+            reranked = await self.ai.search_notes_semantically(
+                query, [{"id": str(note.id), "text": note.text} for note in candidates]
+            )
+            if not reranked:
+                return note_ids
+            
+            # Los que el LLM no eligió quedan después, en el orden local
+            chosen = [note["id"] for note in reranked]
+            return chosen + [note_id for note_id in note_ids if note_id not in chosen]
+            
+        except Exception as e:
+            logger.warning(f"⚠️ Error reordenando notas con IA: {e}")
+            return note_ids
+    
     async def get_recent_notes(self, user_id: int, limit: int = 10) -> List[Note]:
         """
         Obtener notas recientes del usuario
@@ -167,14 +165,13 @@ class NoteManager:
             Lista de notas con esa etiqueta
         """
         try:
-            # Usar búsqueda por palabra clave que también busca en tags
-            notes = await self.db.get_notes_by_keyword(user_id, tag, limit)
-            
-            # Filtrar solo las que realmente tienen la etiqueta
-            tagged_notes = [
-                note for note in notes 
-                if tag.lower() in [t.lower() for t in note.tags]
-            ]
+            # Índice en memoria si ya está cargado; si no, consulta indexada en MongoDB
+            # (no vale la pena construir el índice completo para una etiqueta)
+            if self.search_index.is_loaded(user_id):
+                note_ids = await self.search_index.notes_by_tag(user_id, tag, limit)
+                tagged_notes = await self.db.get_notes_by_ids(user_id, note_ids)
+            else:
+                tagged_notes = await self.db.get_notes_by_tag(user_id, tag, limit)
             
             logger.info(f"🏷️ {len(tagged_notes)} notas encontradas con etiqueta '{tag}'")
             return tagged_notes
@@ -196,16 +193,14 @@ class NoteManager:
             Lista de notas con esa prioridad
         """
         try:
-            # Obtener notas recientes y filtrar por prioridad
-            all_notes = await self.get_recent_notes(user_id, limit=100)
-            
-            priority_notes = [
-                note for note in all_notes 
-                if note.priority and note.priority.lower() == priority.lower()
-            ]
+            if self.search_index.is_loaded(user_id):
+                note_ids = await self.search_index.notes_by_priority(user_id, priority, limit)
+                priority_notes = await self.db.get_notes_by_ids(user_id, note_ids)
+            else:
+                priority_notes = await self.db.get_notes_by_priority(user_id, priority, limit)
             
             logger.info(f"⭐ {len(priority_notes)} notas de prioridad '{priority}'")
-            return priority_notes[:limit]
+            return priority_notes
             
         except Exception as e:
             logger.error(f"❌ Error obteniendo notas por prioridad: {e}")
@@ -222,52 +217,21 @@ class NoteManager:
             Dict con estadísticas de la semana
         """
         try:
-            # Obtener notas recientes (últimas 50)
-            recent_notes = await self.get_recent_notes(user_id, limit=50)
-            
-            # Filtrar por última semana
-            one_week_ago = datetime.utcnow().timestamp() - (7 * 24 * 60 * 60)
-            weekly_notes = [
-                note for note in recent_notes 
-                if note.created_at.timestamp() >= one_week_ago
-            ]
-            
-            # Calcular estadísticas
-            total = len(weekly_notes)
-            
-            # Contar por tipo
-            types_count = {}
-            for note in weekly_notes:
-                note_type = note.note_type.value if note.note_type else "general"
-                types_count[note_type] = types_count.get(note_type, 0) + 1
-            
-            # Contar por prioridad
-            priority_count = {}
-            for note in weekly_notes:
-                priority = note.priority or "medium"
-                priority_count[priority] = priority_count.get(priority, 0) + 1
-            
-            # Tags más comunes
-            all_tags = []
-            for note in weekly_notes:
-                all_tags.extend(note.tags)
-            
-            tag_count = {}
-            for tag in all_tags:
-                tag_count[tag] = tag_count.get(tag, 0) + 1
-            
-            # Top 5 tags
-            top_tags = sorted(tag_count.items(), key=lambda x: x[1], reverse=True)[:5]
+            # Conteos, etiquetas top y últimas notas en una agregación sobre la semana (en MongoDB)
+            one_week_ago = datetime.utcnow() - timedelta(days=7)
+            stats = await self.db.get_weekly_note_stats(
+                user_id, one_week_ago, recent_limit=settings.SUMMARY_RECENT_ITEMS
+            )
             
             summary = {
-                "total": total,
-                "types": types_count,
-                "priorities": priority_count,
-                "top_tags": top_tags,
-                "notes": [note.dict() for note in weekly_notes]
+                "total": stats["total"],
+                "types": stats["types"],
+                "priorities": stats["priorities"],
+                "top_tags": stats["top_tags"],
+                "notes": stats["recent"]
             }
             
-            logger.info(f"📊 Resumen semanal de notas para usuario {user_id}: {total} notas")
+            logger.info(f"📊 Resumen semanal de notas para usuario {user_id}: {summary['total']} notas")
             return summary
             
         except Exception as e:
@@ -291,17 +255,33 @@ class NoteManager:
             Lista de etiquetas únicas
         """
         try:
-            notes = await self.get_recent_notes(user_id, limit=200)
-            
-            all_tags = set()
-            for note in notes:
-                all_tags.update(note.tags)
-            
-            unique_tags = sorted(list(all_tags))
+            unique_tags = await self.search_index.all_tags(user_id)
             
             logger.info(f"🏷️ {len(unique_tags)} etiquetas únicas para usuario {user_id}")
             return unique_tags
             
         except Exception as e:
             logger.error(f"❌ Error obteniendo etiquetas: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    async def delete_note(self, user_id: int, note_id: str) -> bool:
+        """
+        Eliminar una nota
+        
+        Args:
+            user_id: ID del usuario
+            note_id: ID de la nota
+        
+        Returns:
+            True si se eliminó
+        """
+        try:
+            deleted = await self.db.delete_note(note_id, user_id)
+            if deleted:
+                self.search_index.remove_note(user_id, note_id)
+                logger.info(f"🗑️ Nota {note_id} eliminada para usuario {user_id}")
+            return deleted
+            
+        except Exception as e:
+            logger.error(f"❌ Error eliminando nota: {e}")
+            return False
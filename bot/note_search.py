@@ -0,0 +1,471 @@
+"""
+Índice local de notas por usuario
+Búsqueda (BM25 + vectores hasheados de trigramas) y consultas por etiqueta,
+prioridad, tipo y día de creación. Cada índice se construye desde MongoDB en el
+primer acceso del usuario (una sola vez aunque lleguen consultas concurrentes),
+se actualiza al crear y borrar notas y se descarta por LRU cuando el total
+supera el presupuesto de memoria
+"""
+
+import asyncio
+import math
+import time
+import zlib
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from config.settings import settings
+from utils.text_search import tokenize
+
+# Parámetros estándar de BM25 (Okapi)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Estimación de memoria (CPython): entrada de dict con sus números, y nota con sus metadatos
+ENTRY_BYTES = 100
+NOTE_BYTES = 600
+
+
+def embed(tokens: List[str], dim: int) -> Dict[int, float]:
+    """
+    Vector local de un texto: trigramas de caracteres hasheados a `dim` posiciones, norma 1
+
+    Sin modelo ni dependencias: acerca variantes que BM25 no une ("presupuestario"
+    y "presupuesto", palabras incompletas o con errores de tipeo).
+    """
+    counts: Counter = Counter()
+    for token in tokens:
+        marked = f"#{token}#"
+        for i in range(len(marked) - 2):
+            counts[zlib.crc32(marked[i:i + 3].encode()) % dim] += 1
+
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    return {bucket: value / norm for bucket, value in counts.items()} if norm else {}
+
+
+class NoteIndexUnavailable(Exception):
+    """No se pudieron cargar las notas del usuario (el índice no se guarda)"""
+
+
+class UserNoteIndex:
+    """Índice invertido y de metadatos de las notas de un usuario"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        # Posiciones estables: una nota borrada deja None en su lugar
+        self.note_ids: List[Optional[str]] = []
+        self.positions: Dict[str, int] = {}
+        self.lengths: List[int] = []
+        self.total_length = 0
+        self.live = 0
+        self.memory_bytes = 0
+        # término → {posición de la nota: frecuencia}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        # bucket del vector → {posición de la nota: peso}
+        self.vectors: Dict[int, Dict[int, float]] = {}
+        # Metadatos por posición (etiquetas, prioridad, tipo, creación, términos y buckets)
+        self.meta: List[Optional[Dict[str, Any]]] = []
+        # Consultas directas: clave → posiciones en orden de creación
+        self.by_tag: Dict[str, List[int]] = {}
+        self.by_priority: Dict[str, List[int]] = {}
+        self.by_type: Dict[str, List[int]] = {}
+        self.by_day: Dict[date, List[int]] = {}
+        # Etiqueta normalizada → cómo la escribió el usuario la primera vez
+        self.tag_names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return self.live
+
+    def add(
+        self,
+        note_id: str,
+        text: str,
+        tags: Optional[List[str]] = None,
+        priority: Optional[str] = None,
+        note_type: Optional[str] = None,
+        created_at: Optional[datetime] = None
+    ):
+        """Agregar una nota (se indexan texto + etiquetas)"""
+        if note_id in self.positions:
+            return
+
+        position = len(self.note_ids)
+        tags = tags or []
+        tokens = tokenize(f"{text} {' '.join(tags)}")
+        frequencies = Counter(tokens)
+        vector = embed(tokens, self.dim)
+        created_at = created_at or datetime.utcnow()
+
+        self.note_ids.append(note_id)
+        self.positions[note_id] = position
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        self.live += 1
+
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[position] = frequency
+        for bucket, weight in vector.items():
+            self.vectors.setdefault(bucket, {})[position] = weight
+
+        tag_keys = []
+        for tag in tags:
+            key = tag.lower()
+            if key not in tag_keys:
+                tag_keys.append(key)
+                self.tag_names.setdefault(key, tag)
+                self.by_tag.setdefault(key, []).append(position)
+        priority = (priority or "medium").lower()
+        note_type = note_type or "general"
+        self.by_priority.setdefault(priority, []).append(position)
+        self.by_type.setdefault(note_type, []).append(position)
+        self.by_day.setdefault(created_at.date(), []).append(position)
+
+        size = NOTE_BYTES + len(text) + ENTRY_BYTES * (len(frequencies) + len(vector) + len(tag_keys) + 3)
+        self.meta.append({
+            "tags": tag_keys,
+            "priority": priority,
+            "note_type": note_type,
+            "created_at": created_at,
+            "terms": list(frequencies),
+            "buckets": list(vector),
+            "bytes": size,
+        })
+        self.memory_bytes += size
+
+    def remove(self, note_id: str) -> bool:
+        """Quitar una nota de todas las estructuras"""
+        position = self.positions.pop(note_id, None)
+        if position is None:
+            return False
+
+        meta = self.meta[position]
+        for term in meta["terms"]:
+            self._discard(self.postings, term, position)
+        for bucket in meta["buckets"]:
+            self._discard(self.vectors, bucket, position)
+        for tag in meta["tags"]:
+            self._discard(self.by_tag, tag, position)
+            if tag not in self.by_tag:
+                self.tag_names.pop(tag, None)
+        self._discard(self.by_priority, meta["priority"], position)
+        self._discard(self.by_type, meta["note_type"], position)
+        self._discard(self.by_day, meta["created_at"].date(), position)
+
+        self.total_length -= self.lengths[position]
+        self.live -= 1
+        self.memory_bytes -= meta["bytes"]
+        self.note_ids[position] = None
+        self.meta[position] = None
+        return True
+
+    @staticmethod
+    def _discard(mapping: Dict, key, position: int):
+        """Sacar una posición de una lista/dict de posiciones (y la clave si queda vacía)"""
+        entries = mapping.get(key)
+        if entries is None:
+            return
+        if isinstance(entries, dict):
+            entries.pop(position, None)
+        elif position in entries:
+            entries.remove(position)
+        if not entries:
+            del mapping[key]
+
+    def newest_first(self, positions: List[int], limit: Optional[int] = None) -> List[str]:
+        """IDs de las posiciones, de la nota más reciente a la más antigua"""
+        ordered = sorted(positions, key=lambda position: self.meta[position]["created_at"], reverse=True)
+        return [self.note_ids[position] for position in ordered[:limit]]
+
+    def created_between(self, start: datetime, end: Optional[datetime] = None) -> List[int]:
+        """Posiciones creadas en [start, end) usando los buckets por día"""
+        end = end or datetime.utcnow() + timedelta(seconds=1)
+        positions = []
+        day = start.date()
+        while day <= end.date():
+            for position in self.by_day.get(day, []):
+                if start <= self.meta[position]["created_at"] < end:
+                    positions.append(position)
+            day += timedelta(days=1)
+        return positions
+
+    def bm25(self, terms: List[str]) -> Dict[int, float]:
+        """Puntaje BM25 de las notas que contienen algún término"""
+        scores: Dict[int, float] = {}
+        total = self.live
+        average_length = self.total_length / total if total else 0
+
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings.items():
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[position] / (average_length or 1)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * length_norm
+                )
+        return scores
+
+    def cosine(self, vector: Dict[int, float]) -> Dict[int, float]:
+        """Similitud coseno con las notas que comparten algún trigrama"""
+        scores: Dict[int, float] = {}
+        for bucket, query_weight in vector.items():
+            for position, weight in self.vectors.get(bucket, {}).items():
+                scores[position] = scores.get(position, 0.0) + query_weight * weight
+        return scores
+
+
+class NoteSearchIndex:
+    """Índices de notas por usuario, con LRU bajo un presupuesto de memoria"""
+
+    def __init__(
+        self,
+        db_manager=None,
+        dim: int = None,
+        semantic_weight: float = None,
+        min_similarity: float = None,
+        memory_budget_bytes: int = None
+    ):
+        """
+        Args:
+            db_manager: Gestor de base de datos (carga inicial de cada usuario)
+            dim: Tamaño de los vectores hasheados
+            semantic_weight: Peso del coseno frente a BM25 (0-1)
+            min_similarity: Coseno mínimo para notas sin términos en común
+            memory_budget_bytes: Memoria estimada máxima de todos los índices
+        """
+        self.db = db_manager
+        self.dim = dim or settings.NOTE_SEARCH_EMBEDDING_DIM
+        self.semantic_weight = settings.NOTE_SEARCH_SEMANTIC_WEIGHT if semantic_weight is None else semantic_weight
+        self.min_similarity = settings.NOTE_SEARCH_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.memory_budget_bytes = memory_budget_bytes or settings.NOTE_INDEX_MEMORY_BUDGET_MB * 1024 * 1024
+
+        # user_id → índice, del menos al más recientemente usado
+        self._users: "OrderedDict[int, UserNoteIndex]" = OrderedDict()
+        # Construcciones en curso: user_id → (future compartido, cambios de notas llegados mientras tanto)
+        self._building: Dict[int, Tuple[asyncio.Future, List[Tuple]]] = {}
+
+        # Métricas
+        self.searches = 0
+        self.builds = 0
+        self.evictions = 0
+        self.search_seconds = 0.0
+
+    async def _get_user_index(self, user_id: int) -> UserNoteIndex:
+        """
+        Índice del usuario (se construye con todas sus notas la primera vez)
+
+        Las consultas concurrentes esperan la misma construcción
+
+        Raises:
+            NoteIndexUnavailable: si MongoDB no entregó las notas (se reintenta en el próximo acceso)
+        """
+        index = self._users.get(user_id)
+        if index is not None:
+            self._users.move_to_end(user_id)
+            return index
+
+        building = self._building.get(user_id)
+        if building is not None:
+            return await asyncio.shield(building[0])
+
+        future = asyncio.get_running_loop().create_future()
+        changes: List[Tuple] = []
+        self._building[user_id] = (future, changes)
+        try:
+            index = await self._build(user_id, changes)
+            future.set_result(index)
+            return index
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marcada como vista aunque nadie más la espere
+            raise
+        finally:
+            del self._building[user_id]
+
+    async def _build(self, user_id: int, changes: List[Tuple]) -> UserNoteIndex:
+        """Cargar las notas del usuario y aplicar las creadas o borradas durante la carga"""
+        index = UserNoteIndex(self.dim)
+        if self.db:
+            notes = await self.db.get_notes_for_index(user_id)
+            if notes is None:
+                raise NoteIndexUnavailable(f"notas del usuario {user_id} no disponibles")
+            for note in notes:
+                index.add(
+                    str(note["_id"]), note.get("text", ""), note.get("tags"),
+                    note.get("priority"), note.get("note_type"), note.get("created_at")
+                )
+
+        # add es idempotente por ID y remove no falla si la nota no está: el orden original basta
+        for change in changes:
+            if change[0] == "add":
+                index.add(*change[1:])
+            elif change[0] == "remove":
+                index.remove(change[1])
+        if ("discard",) in changes:
+            # remove_user durante la carga: responder con lo cargado pero no conservarlo
+            return index
+
+        self._users[user_id] = index
+        self.builds += 1
+        logger.info(f"🗂️ Índice de notas construido para usuario {user_id}: {len(index)} notas")
+        self._evict(keep=user_id)
+        return index
+
+    def _evict(self, keep: int):
+        """Descartar los índices menos usados hasta volver al presupuesto (nunca el de `keep`)"""
+        while self.memory_bytes > self.memory_budget_bytes and len(self._users) > 1:
+            user_id = next(iter(self._users))
+            if user_id == keep:
+                self._users.move_to_end(user_id)
+                continue
+            del self._users[user_id]
+            self.evictions += 1
+            logger.debug(f"🧹 Índice de notas descartado (LRU): usuario {user_id}")
+
+    @property
+    def memory_bytes(self) -> int:
+        """Memoria estimada de todos los índices"""
+        return sum(index.memory_bytes for index in self._users.values())
+
+    def add_note(
+        self,
+        user_id: int,
+        note_id: str,
+        text: str,
+        tags: Optional[List[str]] = None,
+        priority: Optional[str] = None,
+        note_type: Optional[str] = None,
+        created_at: Optional[datetime] = None
+    ):
+        """
+        Agregar una nota recién creada
+
+        Si el índice del usuario no está en memoria no se hace nada: se construirá
+        desde MongoDB (con esta nota) en su próximo acceso. Si se está construyendo,
+        la nota se aplica al terminar la carga.
+        """
+        if user_id in self._building:
+            self._building[user_id][1].append(("add", note_id, text, tags, priority, note_type, created_at))
+            return
+        index = self._users.get(user_id)
+        if index is not None:
+            index.add(note_id, text, tags, priority, note_type, created_at)
+            self._evict(keep=user_id)
+
+    def remove_note(self, user_id: int, note_id: str):
+        """Quitar una nota borrada (si el índice del usuario está en memoria o construyéndose)"""
+        if user_id in self._building:
+            self._building[user_id][1].append(("remove", note_id))
+            return
+        index = self._users.get(user_id)
+        if index is not None:
+            index.remove(note_id)
+
+    def is_loaded(self, user_id: int) -> bool:
+        """Si el índice del usuario ya está en memoria"""
+        return user_id in self._users
+
+    def remove_user(self, user_id: int):
+        """Descartar el índice de un usuario (p.ej. al borrar todas sus notas)"""
+        if user_id in self._building:
+            self._building[user_id][1].append(("discard",))
+        self._users.pop(user_id, None)
+
+    # --- CONSULTAS POR METADATOS ---
+
+    async def notes_by_tag(self, user_id: int, tag: str, limit: Optional[int] = None) -> List[str]:
+        """IDs de notas con la etiqueta (sin distinguir mayúsculas), más recientes primero"""
+        index = await self._get_user_index(user_id)
+        return index.newest_first(index.by_tag.get(tag.lower(), []), limit)
+
+    async def notes_by_priority(self, user_id: int, priority: str, limit: Optional[int] = None) -> List[str]:
+        """IDs de notas con la prioridad, más recientes primero"""
+        index = await self._get_user_index(user_id)
+        return index.newest_first(index.by_priority.get(priority.lower(), []), limit)
+
+    async def notes_by_type(self, user_id: int, note_type: str, limit: Optional[int] = None) -> List[str]:
+        """IDs de notas del tipo, más recientes primero"""
+        index = await self._get_user_index(user_id)
+        return index.newest_first(index.by_type.get(note_type, []), limit)
+
+    async def all_tags(self, user_id: int) -> List[str]:
+        """Etiquetas únicas del usuario, ordenadas"""
+        index = await self._get_user_index(user_id)
+        return sorted(index.tag_names.values())
+
+    async def created_since(self, user_id: int, since: datetime) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Notas creadas desde `since`
+
+        Returns:
+            (IDs más recientes primero, metadatos de cada una en el mismo orden)
+        """
+        index = await self._get_user_index(user_id)
+        positions = sorted(
+            index.created_between(since),
+            key=lambda position: index.meta[position]["created_at"],
+            reverse=True
+        )
+        return [index.note_ids[p] for p in positions], [index.meta[p] for p in positions]
+
+    async def search(self, user_id: int, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Rankear todas las notas del usuario
+
+        Args:
+            user_id: ID del usuario
+            query: Consulta libre
+            limit: Máximo de resultados
+
+        Returns:
+            Lista (id de nota, puntaje 0-1), de mayor a menor
+        """
+        try:
+            index = await self._get_user_index(user_id)
+            started = time.perf_counter()
+
+            terms = tokenize(query)
+            if not terms or not len(index):
+                return []
+
+            lexical = index.bm25(terms)
+            semantic = index.cosine(embed(terms, self.dim))
+            best_lexical = max(lexical.values(), default=0.0) or 1.0
+
+            scored = []
+            for position in set(lexical) | set(semantic):
+                similarity = semantic.get(position, 0.0)
+                if position not in lexical and similarity < self.min_similarity:
+                    continue
+                score = (1 - self.semantic_weight) * lexical.get(position, 0.0) / best_lexical + self.semantic_weight * similarity
+                scored.append((score, position))
+
+            # Empates: la nota más reciente primero
+            scored.sort(reverse=True)
+            results = [(index.note_ids[position], round(score, 4)) for score, position in scored[:limit]]
+
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - started
+            return results
+
+        except Exception as e:
+            logger.error(f"❌ Error en búsqueda local de notas: {e}")
+            return []
+
+    def get_stats(self) -> Dict[str, float]:
+        """Estadísticas del índice"""
+        return {
+            "users": len(self._users),
+            "notes": sum(len(index) for index in self._users.values()),
+            "memory_mb": round(self.memory_bytes / (1024 * 1024), 2),
+            "builds": self.builds,
+            "evictions": self.evictions,
+            "searches": self.searches,
+            "avg_search_ms": (self.search_seconds / self.searches * 1000) if self.searches else 0.0
+        }
@@ -0,0 +1,307 @@
+"""
+Despachador de recordatorios basado en eventos
+Mantiene en memoria los próximos disparos (principal + pre-recordatorios)
+y los ejecuta en su hora exacta, sin consultar la base de datos en reposo
+"""
+
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable
+from loguru import logger
+
+from database.connection import DatabaseManager
+from database.models import Reminder
+from config.settings import settings
+
+
+DueCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ReminderDispatcher:
+    """Cola de prioridad (heap) con los disparos de las próximas horas"""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        on_due: DueCallback,
+        horizon_hours: int = None,
+        grace_seconds: int = None
+    ):
+        """
+        Args:
+            db_manager: Gestor de base de datos
+            on_due: Corrutina que recibe el reminder_info a enviar
+            horizon_hours: Horas hacia adelante que se mantienen en memoria
+            grace_seconds: Tolerancia para disparos levemente atrasados
+        """
+        self.db = db_manager
+        self.on_due = on_due
+        self.horizon = timedelta(hours=horizon_hours or settings.DISPATCHER_HORIZON_HOURS)
+        self.grace = timedelta(seconds=grace_seconds or settings.REMINDER_TOLERANCE_SECONDS)
+
+        # Heap de (hora_disparo, secuencia, clave); las entradas borradas se descartan al salir
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._by_reminder: Dict[str, Set[str]] = {}
+        self._in_flight: Set[str] = set()
+        self._fired: Dict[str, datetime] = {}
+        self._seq = 0
+
+        self._window_end: Optional[datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+    @staticmethod
+    def _make_key(reminder_id: str, notification_type: str, fire_at: datetime) -> str:
+        """Clave única de un disparo"""
+        return f"{reminder_id}:{notification_type}:{fire_at.isoformat()}"
+
+    def _expand(self, reminder: Reminder, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Obtener los disparos pendientes de un recordatorio dentro de una ventana
+
+        Returns:
+            Lista de reminder_info (mismo formato que get_due_reminders)
+        """
+        notifications = []
+
+        for pre_time in reminder.pre_reminders:
+            if start <= pre_time <= end and not reminder.pre_reminder_notified.get(pre_time.isoformat(), False):
+                notifications.append({
+                    "reminder": reminder,
+                    "type": "pre_reminder",
+                    "notification_time": pre_time,
+                    "days_before": (reminder.date - pre_time).days
+                })
+
+        if not reminder.notified and start <= reminder.date <= end:
+            notifications.append({
+                "reminder": reminder,
+                "type": "main",
+                "notification_time": reminder.date
+            })
+
+        return notifications
+
+    def _push(self, info: Dict[str, Any]) -> bool:
+        """Agregar un disparo al heap si no está programado ni enviado"""
+        reminder_id = str(info["reminder"].id)
+        key = self._make_key(reminder_id, info["type"], info["notification_time"])
+
+        if key in self._entries or key in self._in_flight or key in self._fired:
+            return False
+
+        self._seq += 1
+        heapq.heappush(self._heap, (info["notification_time"], self._seq, key))
+        self._entries[key] = info
+        self._by_reminder.setdefault(reminder_id, set()).add(key)
+        return True
+
+    def _discard(self, key: str) -> Optional[Dict[str, Any]]:
+        """Quitar una entrada (el tuple del heap queda obsoleto y se ignora)"""
+        info = self._entries.pop(key, None)
+        if info:
+            reminder_id = str(info["reminder"].id)
+            keys = self._by_reminder.get(reminder_id)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_reminder[reminder_id]
+        return info
+
+    def _wake(self):
+        """Despertar el loop para recalcular el próximo disparo"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def refresh(self):
+        """Cargar desde la BD los disparos de la ventana [ahora - gracia, ahora + horizonte]"""
+        try:
+            now = datetime.utcnow()
+            start = now - self.grace
+            end = now + self.horizon
+
+            reminders = await self.db.get_reminders_in_window(start, end)
+
+            added = 0
+            for reminder in reminders:
+                for info in self._expand(reminder, start, end):
+                    if self._push(info):
+                        added += 1
+
+            self._window_end = end
+
+            # Olvidar disparos ya enviados que quedaron fuera de la ventana
+            self._fired = {key: t for key, t in self._fired.items() if t >= start}
+
+            self._wake()
+            logger.info(f"🗓️ Despachador actualizado: {added} nuevos, {len(self._entries)} programados hasta {end.strftime('%H:%M')} UTC")
+
+        except Exception as e:
+            logger.error(f"❌ Error actualizando despachador: {e}")
+
+    def schedule_reminder(self, reminder: Reminder) -> int:
+        """
+        Programar los disparos de un recordatorio recién creado
+
+        Returns:
+            Número de disparos agregados a la ventana actual
+        """
+        if not self.is_running or not self._window_end:
+            return 0
+
+        now = datetime.utcnow()
+        added = 0
+        for info in self._expand(reminder, now - self.grace, self._window_end):
+            if self._push(info):
+                added += 1
+
+        if added:
+            self._wake()
+            logger.debug(f"🗓️ {added} disparos programados para recordatorio {reminder.id}")
+        return added
+
+    def unschedule_reminder(self, reminder_id: str) -> int:
+        """
+        Cancelar los disparos pendientes de un recordatorio
+
+        Returns:
+            Número de disparos cancelados
+        """
+        keys = list(self._by_reminder.get(str(reminder_id), ()))
+        for key in keys:
+            self._discard(key)
+
+        if keys:
+            self._wake()
+            logger.debug(f"🗓️ {len(keys)} disparos cancelados para recordatorio {reminder_id}")
+        return len(keys)
+
+    async def start(self):
+        """Cargar la ventana inicial e iniciar el loop de disparo"""
+        if self.is_running:
+            return
+
+        self._wakeup = asyncio.Event()
+        self.is_running = True
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🗓️ Despachador de recordatorios iniciado (horizonte {self.horizon})")
+
+    async def stop(self):
+        """Detener el loop de disparo"""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("🗓️ Despachador de recordatorios detenido")
+
+    async def _run(self):
+        """Dormir hasta el próximo disparo (o hasta que cambie el heap) y ejecutarlo"""
+        while self.is_running:
+            # Descartar cabezas obsoletas
+            while self._heap and self._heap[0][2] not in self._entries:
+                heapq.heappop(self._heap)
+
+            timeout = None
+            if self._heap:
+                timeout = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+
+            if timeout is None or timeout > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            fire_at, _, key = heapq.heappop(self._heap)
+            info = self._discard(key)
+            if not info:
+                continue
+
+            self._in_flight.add(key)
+            asyncio.create_task(self._fire(key, fire_at, info))
+
+    async def _fire(self, key: str, fire_at: datetime, info: Dict[str, Any]):
+        """Entregar un disparo al callback"""
+        try:
+            delay = (datetime.utcnow() - fire_at).total_seconds()
+            logger.debug(f"⏰ Disparo {key} (retraso {delay:.3f}s)")
+            await self.on_due(info)
+        except Exception as e:
+            logger.error(f"❌ Error despachando recordatorio: {e}")
+        finally:
+            self._in_flight.discard(key)
+            self._fired[key] = fire_at
+
+    def get_status(self) -> Dict[str, Any]:
+        """Estado del despachador"""
+        next_fire = min(
+            (info["notification_time"] for info in self._entries.values()),
+            default=None
+        )
+
+        return {
+            "running": self.is_running,
+            "scheduled": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "window_end": self._window_end.isoformat() if self._window_end else None,
+            "next_fire": next_fire.isoformat() if next_fire else None
+        }
+
+
+# Instancia global (se inicializa desde SchedulerService)
+reminder_dispatcher: Optional[ReminderDispatcher] = None
+
+
+def initialize_reminder_dispatcher(db_manager: DatabaseManager, on_due: DueCallback) -> ReminderDispatcher:
+    """
+    Crear la instancia global del despachador
+
+    Args:
+        db_manager: Gestor de base de datos
+        on_due: Corrutina que envía cada recordatorio vencido
+
+    Returns:
+        Despachador creado
+    """
+    global reminder_dispatcher
+    reminder_dispatcher = ReminderDispatcher(db_manager, on_due)
+    return reminder_dispatcher
+
+
+def schedule_reminder_notifications(reminder: Reminder) -> int:
+    """
+    Programar disparos de un recordatorio nuevo (función de conveniencia)
+
+    Args:
+        reminder: Recordatorio guardado en BD
+
+    Returns:
+        Número de disparos programados
+    """
+    if not reminder_dispatcher:
+        return 0
+    return reminder_dispatcher.schedule_reminder(reminder)
+
+
+def unschedule_reminder_notifications(reminder_id: str) -> int:
+    """
+    Cancelar disparos de un recordatorio eliminado (función de conveniencia)
+
+    Args:
+        reminder_id: ID del recordatorio
+
+    Returns:
+        Número de disparos cancelados
+    """
+    if not reminder_dispatcher:
+        return 0
+    return reminder_dispatcher.unschedule_reminder(reminder_id)
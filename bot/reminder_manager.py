@@ -2,15 +2,27 @@
 Gestor de recordatorios con lógica de pre-alertas
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
+from itertools import islice
 from typing import List, Optional, Dict, Any
+from bson import ObjectId
 from loguru import logger
 
 from database.connection import DatabaseManager
 from database.models import Reminder, ReminderStatus
 from config.settings import settings
 from utils.helpers import clean_reminder_text
-from bot.calendar_integration import create_calendar_event, delete_calendar_event, delete_calendar_events_by_pattern
+from utils.recurrence import (
+    infer_rrule, parse_rule, series_pre_reminders, exclude_weekdays,
+    iter_occurrences, iteration_start, occurrences_between, to_local, to_utc
+)
+from bot.calendar_integration import make_event_uid
+from bot.habit_histogram import HabitHistogram
+from bot.calendar_outbox import (
+    queue_calendar_create, queue_calendar_create_many, queue_calendar_delete,
+    queue_calendar_rename, queue_calendar_recurrence
+)
+from bot.reminder_dispatcher import schedule_reminder_notifications, unschedule_reminder_notifications
 
 
 class ReminderManager:
@@ -46,6 +58,56 @@ class ReminderManager:
         logger.info(f"📅 Pre-recordatorios calculados: {len(pre_reminders)} alertas")
         return pre_reminders
     
+    def _calculate_pre_reminders_bulk(self, target_dates: List[datetime]) -> List[List[datetime]]:
+        """
+        Calcular pre-recordatorios de un lote con una sola hora de referencia
+        
+        Los desfases se ordenan una vez (de mayor a menor), así cada lista
+        sale ya ordenada cronológicamente sin ordenar por recordatorio.
+        """
+        current_time = datetime.utcnow()
+        offsets = [timedelta(days=days) for days in sorted(self.pre_reminder_days, reverse=True)]
+        
+        return [
+            [pre_date for pre_date in (target_date - offset for offset in offsets) if pre_date > current_time]
+            for target_date in target_dates
+        ]
+    
+    def _build_reminder_data(
+        self,
+        user_id: int,
+        original_input: str,
+        reminder_text: str,
+        target_date: datetime,
+        pre_reminders: List[datetime],
+        rrule: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Documento de un recordatorio nuevo (el UID del evento se deriva del ID)"""
+        reminder_id = ObjectId()
+        reminder_data = {
+            "_id": reminder_id,
+            "calendar_uid": make_event_uid(str(reminder_id)),
+            "user_id": user_id,
+            "text": clean_reminder_text(reminder_text),
+            "original_input": original_input,
+            "date": target_date,
+            "pre_reminders": pre_reminders,
+            "status": ReminderStatus.PENDING,
+            "notified": False,
+            "pre_reminder_notified": {}  # Inicializar como dict vacío
+        }
+        
+        # Serie: la regla genera las ocurrencias; `date` es solo la próxima
+        if rrule:
+            reminder_data.update({
+                "recurring": True,
+                "frequency": parse_rule(rrule)["FREQ"].lower(),
+                "rrule": rrule,
+                "series_start": target_date,
+                "exdates": []
+            })
+        return reminder_data
+    
     async def create_reminder(
         self, 
         user_id: int, 
@@ -75,45 +137,38 @@ class ReminderManager:
             # Calcular pre-recordatorios
             pre_reminders = self._calculate_pre_reminders(target_date)
             
-            # Limpiar texto del recordatorio
-            clean_text = clean_reminder_text(reminder_text)
-            
-            # Crear datos del recordatorio
-            reminder_data = {
-                "user_id": user_id,
-                "text": clean_text,
-                "original_input": original_input,
-                "date": target_date,
-                "pre_reminders": pre_reminders,
-                "status": ReminderStatus.PENDING,
-                "notified": False,
-                "pre_reminder_notified": {}  # Inicializar como dict vacío
-            }
+            # Crear datos del recordatorio con el texto limpio
+            reminder_data = self._build_reminder_data(
+                user_id, original_input, reminder_text, target_date, pre_reminders
+            )
+            clean_text = reminder_data["text"]
             
             # Guardar en base de datos
-            success = await self.db.add_reminder(reminder_data)
+            reminder = await self.db.add_reminder(reminder_data)
             
-            if success:
+            if reminder:
                 logger.info(f"✅ Recordatorio creado para usuario {user_id}: '{clean_text}' en {target_date}")
                 logger.info(f"⏰ {len(pre_reminders)} pre-recordatorios programados")
                 
-                # Crear evento en Apple Calendar
+                # Programar disparos en el despachador (si caen en la ventana actual)
+                schedule_reminder_notifications(reminder)
+                await self._record_habits(user_id, [target_date])
+                
+                # Encolar evento para Apple Calendar (la respuesta no espera a iCloud)
                 try:
                     calendar_data = {
                         "text": clean_text,
                         "date": target_date,
                         "original_input": original_input,
-                        "user_id": user_id
+                        "user_id": user_id,
+                        "calendar_uid": reminder.calendar_uid
                     }
                     
-                    calendar_success = await create_calendar_event(calendar_data)
-                    if calendar_success:
-                        logger.info(f"📅 Evento creado en Apple Calendar: {clean_text}")
-                    else:
-                        logger.warning(f"⚠️ No se pudo crear evento en Apple Calendar")
+                    if await queue_calendar_create(str(reminder.id), calendar_data):
+                        logger.info(f"📅 Evento encolado para Apple Calendar: {clean_text}")
                         
                 except Exception as e:
-                    logger.warning(f"⚠️ Error integrando con Apple Calendar: {e}")
+                    logger.warning(f"⚠️ Error encolando evento de Apple Calendar: {e}")
                     # No fallar la creación del recordatorio si falla el calendario
                 
                 return True
@@ -125,6 +180,162 @@ class ReminderManager:
             logger.error(f"❌ Error creando recordatorio: {e}")
             return False
     
+    async def create_reminders_bulk(self, user_id: int, items: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Crear varios recordatorios con un solo insert_many (programas académicos, fechas sueltas)
+        
+        Args:
+            user_id: ID del usuario de Telegram
+            items: Recordatorios con 'original_input', 'text' y 'date' (UTC)
+        
+        Returns:
+            Lista alineada con `items`: True si ese recordatorio se creó
+        """
+        results = [False] * len(items)
+        if not items:
+            return results
+        
+        try:
+            current_time = datetime.utcnow()
+            accepted = []
+            for index, item in enumerate(items):
+                if item["date"] <= current_time:
+                    logger.warning(f"⚠️ Fecha en el pasado rechazada: {item['date']} (actual: {current_time})")
+                else:
+                    accepted.append(index)
+            
+            if not accepted:
+                return results
+            
+            pre_reminders = self._calculate_pre_reminders_bulk([items[i]["date"] for i in accepted])
+            documents = [
+                self._build_reminder_data(
+                    user_id, items[index]["original_input"], items[index]["text"], items[index]["date"], pre
+                )
+                for index, pre in zip(accepted, pre_reminders)
+            ]
+            
+            saved = await self._save_reminder_documents(user_id, documents)
+            for index, reminder in zip(accepted, saved):
+                results[index] = reminder is not None
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Error creando recordatorios en lote: {e}")
+            return results
+    
+    async def create_recurring_reminders(self, user_id: int, items: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Crear una serie recurrente guardando su regla en vez de una fila por fecha
+        
+        Las fechas que lista el LLM se agrupan por texto; si un grupo forma una serie
+        regular se guarda como un solo recordatorio con RRULE (sin fin si lo listado cubre
+        una semana, con COUNT si no). Los grupos irregulares se guardan fecha por fecha como antes.
+        
+        Args:
+            user_id: ID del usuario de Telegram
+            items: Recordatorios con 'original_input', 'text' y 'date' (UTC)
+        
+        Returns:
+            Lista alineada con `items`: True si esa fecha quedó cubierta
+        """
+        results = [False] * len(items)
+        if not items:
+            return results
+        
+        try:
+            current_time = datetime.utcnow()
+            groups: Dict[str, List[int]] = {}
+            for index, item in enumerate(items):
+                if item["date"] <= current_time:
+                    logger.warning(f"⚠️ Fecha en el pasado rechazada: {item['date']} (actual: {current_time})")
+                else:
+                    groups.setdefault(clean_reminder_text(item["text"]), []).append(index)
+            
+            documents, owners, singles = [], [], []
+            for indices in groups.values():
+                dates = sorted(items[i]["date"] for i in indices)
+                rule = infer_rrule(dates)
+                if not rule:
+                    singles.extend(indices)
+                    continue
+                
+                item = items[indices[0]]
+                pre_reminders = series_pre_reminders(
+                    rule, dates[0], dates[0], self.pre_reminder_days, now=current_time
+                )
+                documents.append(self._build_reminder_data(
+                    user_id, item["original_input"], item["text"], dates[0], pre_reminders, rrule=rule
+                ))
+                owners.append(indices)
+                logger.info(f"🔁 Serie guardada como regla {rule} ({len(indices)} fechas listadas)")
+            
+            pre_reminders = self._calculate_pre_reminders_bulk([items[i]["date"] for i in singles])
+            for index, pre in zip(singles, pre_reminders):
+                item = items[index]
+                documents.append(self._build_reminder_data(
+                    user_id, item["original_input"], item["text"], item["date"], pre
+                ))
+                owners.append([index])
+            
+            if not documents:
+                return results
+            
+            saved = await self._save_reminder_documents(user_id, documents)
+            for indices, reminder in zip(owners, saved):
+                for index in indices:
+                    results[index] = reminder is not None
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Error creando serie recurrente: {e}")
+            return results
+    
+    async def _save_reminder_documents(self, user_id: int, documents: List[Dict[str, Any]]) -> List[Optional[Reminder]]:
+        """Guardar documentos ya armados con un insert_many, programarlos y encolar sus eventos"""
+        saved = await self.db.add_reminders_bulk(documents)
+        
+        calendar_items = []
+        for reminder in saved:
+            if not reminder:
+                continue
+            schedule_reminder_notifications(reminder)
+            calendar_items.append((str(reminder.id), {
+                "text": reminder.text,
+                "date": reminder.date,
+                "original_input": reminder.original_input,
+                "user_id": user_id,
+                "calendar_uid": reminder.calendar_uid,
+                "rrule": reminder.rrule,
+                "exdates": reminder.exdates
+            }))
+        
+        logger.info(f"✅ {len(calendar_items)}/{len(documents)} recordatorios creados en lote para usuario {user_id}")
+        await self._record_habits(user_id, [reminder.date for reminder in saved if reminder])
+        
+        # Encolar eventos para Apple Calendar (no falla la creación si falla el calendario)
+        if calendar_items:
+            try:
+                queued = await queue_calendar_create_many(calendar_items)
+                if queued:
+                    logger.info(f"📅 {queued} eventos encolados para Apple Calendar")
+            except Exception as e:
+                logger.warning(f"⚠️ Error encolando eventos de Apple Calendar: {e}")
+        
+        return saved
+    
+    async def _record_habits(self, user_id: int, dates: List[datetime]):
+        """Sumar los recordatorios nuevos al histograma de hábitos del usuario (un solo $inc)"""
+        if not dates:
+            return
+        try:
+            delta = HabitHistogram.from_dates(dates)
+            await self.db.increment_habit_histogram(user_id, delta.increments(), delta.to_document())
+        except Exception as e:
+            logger.warning(f"⚠️ Error actualizando hábitos del usuario {user_id}: {e}")
+    
     async def delete_reminder(self, user_id: int, reminder_id: str) -> bool:
         """
         Eliminar recordatorio específico con sincronización en Apple Calendar
@@ -150,19 +361,22 @@ class ReminderManager:
             if success:
                 logger.info(f"✅ Recordatorio eliminado de BD: {reminder.get('text', 'N/A')}")
                 
-                # Eliminar de Apple Calendar
+                # Cancelar disparos pendientes
+                unschedule_reminder_notifications(reminder_id)
+                
+                # Encolar borrado en Apple Calendar
                 try:
-                    calendar_success = await delete_calendar_event(
+                    if await queue_calendar_delete(
+                        str(reminder_id),
                         reminder.get('text', ''),
-                        reminder.get('date')
-                    )
-                    if calendar_success:
-                        logger.info(f"📅 Evento eliminado de Apple Calendar")
-                    else:
-                        logger.warning(f"⚠️ No se pudo eliminar evento de Apple Calendar")
+                        reminder.get('date'),
+                        uid=reminder.get('calendar_uid'),
+                        href=reminder.get('calendar_href')
+                    ):
+                        logger.info(f"📅 Borrado encolado para Apple Calendar")
                         
                 except Exception as e:
-                    logger.warning(f"⚠️ Error eliminando de Apple Calendar: {e}")
+                    logger.warning(f"⚠️ Error encolando borrado de Apple Calendar: {e}")
                 
                 return True
             else:
@@ -197,13 +411,7 @@ class ReminderManager:
                 except Exception as e:
                     logger.warning(f"⚠️ Error eliminando recordatorio individual: {e}")
             
-            # También eliminar eventos de Apple Calendar por patrón
-            try:
-                calendar_deleted = await delete_calendar_events_by_pattern(text_pattern)
-                logger.info(f"📅 {calendar_deleted} eventos eliminados de Apple Calendar")
-            except Exception as e:
-                logger.warning(f"⚠️ Error eliminando eventos de calendario: {e}")
-            
+            # Cada borrado encola el de su evento por UID: no se barren eventos ajenos por título
             logger.info(f"🗑️ {deleted_count} recordatorios eliminados por patrón: {text_pattern}")
             return deleted_count
             
@@ -215,6 +423,9 @@ class ReminderManager:
         """
         Modificar recordatorio recurrente eliminando excepciones específicas
         
+        En una serie con regla las excepciones se guardan como EXDATE (fechas) o como
+        filtro BYDAY (días de la semana); los recordatorios sueltos se borran como antes.
+        
         Args:
             text: Texto del recordatorio a modificar
             user_id: ID del usuario
@@ -232,42 +443,39 @@ class ReminderManager:
                 logger.warning(f"⚠️ No se encontraron recordatorios para modificar: {text}")
                 return False
             
-            deleted_count = 0
+            # Fechas y días de la semana en hora de Chile (como los dice el usuario)
+            exception_days = []
+            for date_str in exception_dates or []:
+                try:
+                    exception_days.append(datetime.fromisoformat(date_str.replace('Z', '')).date())
+                except ValueError as e:
+                    logger.warning(f"⚠️ Error procesando fecha de excepción {date_str}: {e}")
             
-            # Procesar excepciones por fechas específicas
-            if exception_dates:
-                for date_str in exception_dates:
-                    try:
-                        exception_date = datetime.fromisoformat(date_str.replace('Z', ''))
-                        
-                        # Buscar recordatorios en esa fecha específica
-                        for reminder in reminders:
-                            if reminder.date.date() == exception_date.date():
-                                success = await self.delete_reminder(text, user_id, reminder.date)
-                                if success:
-                                    deleted_count += 1
-                    except Exception as e:
-                        logger.warning(f"⚠️ Error procesando fecha de excepción {date_str}: {e}")
-            
-            # Procesar excepciones por días de la semana
-            if exception_weekdays:
-                weekday_map = {
-                    'lunes': 0, 'martes': 1, 'miércoles': 2, 'miercoles': 2,
-                    'jueves': 3, 'viernes': 4, 'sábado': 5, 'sabado': 5, 'domingo': 6
-                }
+            weekday_map = {
+                'lunes': 0, 'martes': 1, 'miércoles': 2, 'miercoles': 2,
+                'jueves': 3, 'viernes': 4, 'sábado': 5, 'sabado': 5, 'domingo': 6
+            }
+            weekdays = sorted({
+                weekday_map[name.lower()] for name in exception_weekdays or [] if name.lower() in weekday_map
+            })
+            
+            modified_count = 0
+            for reminder_data in reminders:
+                reminder = Reminder(**reminder_data)
+                
+                if reminder.rrule:
+                    if await self._apply_series_exceptions(reminder, exception_days, weekdays):
+                        modified_count += 1
+                    continue
                 
-                for weekday_name in exception_weekdays:
-                    target_weekday = weekday_map.get(weekday_name.lower())
-                    if target_weekday is not None:
-                        # Buscar recordatorios que caigan en ese día de la semana
-                        for reminder in reminders:
-                            if reminder.date.weekday() == target_weekday:
-                                success = await self.delete_reminder(text, user_id, reminder.date)
-                                if success:
-                                    deleted_count += 1
-            
-            if deleted_count > 0:
-                logger.info(f"✅ Modificado recordatorio con {deleted_count} excepciones: {text}")
+                # Recordatorio suelto (series guardadas fecha por fecha): se borra esa ocurrencia
+                local_date = to_local(reminder.date)
+                if local_date.date() in exception_days or local_date.weekday() in weekdays:
+                    if await self.delete_reminder(user_id, str(reminder.id)):
+                        modified_count += 1
+            
+            if modified_count > 0:
+                logger.info(f"✅ Modificado recordatorio con {modified_count} excepciones: {text}")
                 return True
             else:
                 logger.warning(f"⚠️ No se encontraron recordatorios para eliminar como excepción")
@@ -277,6 +485,67 @@ class ReminderManager:
             logger.error(f"❌ Error modificando recordatorio con excepciones: {e}")
             return False
     
+    async def _apply_series_exceptions(self, reminder: Reminder, exception_days: List, weekdays: List[int]) -> bool:
+        """
+        Aplicar excepciones a una serie editando su regla (sin borrar documentos)
+        
+        Returns:
+            True si la serie cambió (o se eliminó por quedar vacía)
+        """
+        current_time = datetime.utcnow()
+        series_start = reminder.series_start or reminder.date
+        rule = reminder.rrule
+        exdates = set(reminder.exdates)
+        
+        if weekdays:
+            try:
+                rule = exclude_weekdays(rule, series_start, weekdays)
+            except ValueError:
+                # Series mensuales/anuales: BYDAY cambiaría su sentido, se excluye cada ocurrencia del próximo año
+                upcoming = occurrences_between(
+                    rule, series_start, current_time, current_time + timedelta(days=366), reminder.exdates
+                )
+                exdates.update(o for o in upcoming if to_local(o).weekday() in weekdays)
+            
+            if rule is None:
+                logger.info(f"🗑️ La serie '{reminder.text}' no conserva ningún día: se elimina")
+                return await self.delete_reminder(reminder.user_id, str(reminder.id))
+        
+        for day in exception_days:
+            day_start = to_utc(datetime.combine(day, time.min))
+            day_end = to_utc(datetime.combine(day + timedelta(days=1), time.min)) - timedelta(microseconds=1)
+            exdates.update(occurrences_between(rule, series_start, day_start, day_end))
+        
+        if rule == reminder.rrule and exdates == set(reminder.exdates):
+            return False
+        
+        reminder.rrule = rule
+        reminder.exdates = sorted(exdates)
+        
+        # Si la ocurrencia materializada quedó excluida, pasar a la siguiente
+        if reminder.next_occurrence(reminder.date - timedelta(microseconds=1)) != reminder.date:
+            if not reminder.advance_occurrence(reminder.date, self.pre_reminder_days, now=current_time):
+                logger.info(f"🗑️ La serie '{reminder.text}' no tiene más ocurrencias: se elimina")
+                return await self.delete_reminder(reminder.user_id, str(reminder.id))
+        
+        if not await self.db.update_reminder_recurrence(reminder):
+            return False
+        
+        # Reprogramar disparos con la ocurrencia vigente
+        unschedule_reminder_notifications(str(reminder.id))
+        schedule_reminder_notifications(reminder)
+        
+        try:
+            await queue_calendar_recurrence(
+                str(reminder.id), rule, reminder.exdates,
+                uid=reminder.calendar_uid, href=reminder.calendar_href
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Error encolando recurrencia de Apple Calendar: {e}")
+        
+        logger.info(f"🔁 Serie '{reminder.text}' actualizada: {rule} ({len(reminder.exdates)} excepciones)")
+        return True
+    
     async def get_user_reminders(self, user_id: int, limit: int = 10) -> List[Reminder]:
         """
         Método alias para get_pending_reminders_for_user para compatibilidad
@@ -295,22 +564,14 @@ class ReminderManager:
             Lista de recordatorios pendientes ordenados por fecha (solo futuros)
         """
         try:
-            reminders = await self.db.get_user_reminders(
+            # "Solo futuros" va en la consulta: los vencidos no consumen el límite
+            future_reminders = await self.db.get_user_reminders(
                 user_id=user_id,
                 status=ReminderStatus.PENDING,
-                limit=limit * 2  # Obtener más para filtrar
+                limit=limit,
+                after=datetime.utcnow()
             )
             
-            # Filtrar solo recordatorios futuros
-            current_time = datetime.utcnow()
-            future_reminders = [
-                reminder for reminder in reminders 
-                if reminder.date > current_time
-            ]
-            
-            # Limitar al número solicitado
-            future_reminders = future_reminders[:limit]
-            
             logger.info(f"📋 Obtenidos {len(future_reminders)} recordatorios futuros para usuario {user_id}")
             return future_reminders
             
@@ -318,6 +579,36 @@ class ReminderManager:
             logger.error(f"❌ Error obteniendo recordatorios pendientes: {e}")
             return []
     
+    async def get_upcoming_occurrences(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Próximas ocurrencias de un usuario (las series se expanden a demanda)
+        
+        Cada documento aporta al menos una ocurrencia a partir de su `date`, así que
+        los `limit` documentos más próximos bastan para las `limit` ocurrencias más próximas.
+        
+        Returns:
+            Lista de {"reminder", "date"} ordenada por fecha
+        """
+        try:
+            reminders = await self.get_pending_reminders_for_user(user_id, limit)
+            
+            occurrences = []
+            for reminder in reminders:
+                occurrences.append({"reminder": reminder, "date": reminder.date})
+                if reminder.rrule:
+                    start = iteration_start(reminder.rrule, reminder.series_start or reminder.date, reminder.date)
+                    following = iter_occurrences(reminder.rrule, start, reminder.exdates, after=reminder.date)
+                    occurrences.extend(
+                        {"reminder": reminder, "date": date} for date in islice(following, limit - 1)
+                    )
+            
+            occurrences.sort(key=lambda entry: entry["date"])
+            return occurrences[:limit]
+            
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo próximas ocurrencias: {e}")
+            return []
+    
     async def cleanup_past_reminders(self, user_id: Optional[int] = None) -> int:
         """
         Limpiar recordatorios pasados automáticamente
@@ -331,20 +622,16 @@ class ReminderManager:
         try:
             current_time = datetime.utcnow()
             
-            # Obtener recordatorios pasados
+            # Obtener recordatorios pendientes ya vencidos (filtro en la consulta)
             if user_id:
-                all_reminders = await self.db.get_user_reminders(user_id, limit=100)
+                past_reminders = await self.db.get_user_reminders(
+                    user_id, status=ReminderStatus.PENDING, limit=100, until=current_time
+                )
             else:
                 # TODO: Implementar get_all_reminders en la base de datos
                 logger.info("⚠️ Limpieza global no implementada aún")
                 return 0
             
-            # Filtrar recordatorios pasados
-            past_reminders = [
-                reminder for reminder in all_reminders 
-                if reminder.date <= current_time and reminder.status == ReminderStatus.PENDING
-            ]
-            
             # Marcar como completados (no eliminar, para historial)
             cleaned_count = 0
             for reminder in past_reminders:
@@ -381,34 +668,23 @@ class ReminderManager:
             current_time = datetime.utcnow()
             pending_reminders = await self.db.get_pending_reminders(current_time, tolerance_seconds)
             
+            # La consulta ya filtra por next_fire_at: cada recordatorio trae su disparo listo
             due_reminders = []
             
             for reminder in pending_reminders:
-                # Verificar recordatorio principal
-                if not reminder.notified:
-                    time_diff = abs((reminder.date - current_time).total_seconds())
-                    if time_diff <= tolerance_seconds:
-                        due_reminders.append({
-                            "reminder": reminder,
-                            "type": "main",
-                            "notification_time": reminder.date
-                        })
-                
-                # Verificar pre-recordatorios
-                for pre_time in reminder.pre_reminders:
-                    time_diff = abs((pre_time - current_time).total_seconds())
-                    if time_diff <= tolerance_seconds:
-                        pre_key = pre_time.isoformat()
-                        if not reminder.pre_reminder_notified.get(pre_key, False):
-                            # Calcular días antes
-                            days_before = (reminder.date - pre_time).days
-                            
-                            due_reminders.append({
-                                "reminder": reminder,
-                                "type": "pre_reminder",
-                                "notification_time": pre_time,
-                                "days_before": days_before
-                            })
+                if reminder.next_fire_kind == "pre_reminder":
+                    due_reminders.append({
+                        "reminder": reminder,
+                        "type": "pre_reminder",
+                        "notification_time": reminder.next_fire_at,
+                        "days_before": (reminder.date - reminder.next_fire_at).days
+                    })
+                elif reminder.next_fire_kind == "main":
+                    due_reminders.append({
+                        "reminder": reminder,
+                        "type": "main",
+                        "notification_time": reminder.date
+                    })
             
             logger.info(f"⏰ {len(due_reminders)} recordatorios listos para enviar")
             return due_reminders
@@ -435,15 +711,19 @@ class ReminderManager:
             True si se marcó exitosamente
         """
         try:
-            success = await self.db.mark_as_notified(
+            reminder = await self.db.mark_as_notified(
                 reminder_id=reminder_id,
                 is_pre_reminder=is_pre_reminder,
                 pre_reminder_time=pre_reminder_time
             )
             
-            if success:
+            if reminder:
                 notification_type = "pre-recordatorio" if is_pre_reminder else "recordatorio principal"
                 logger.info(f"✅ {notification_type} marcado como notificado: {reminder_id}")
+                
+                # Serie: la próxima ocurrencia entra al despachador si cae en su ventana
+                if not is_pre_reminder and reminder.rrule and not reminder.notified:
+                    schedule_reminder_notifications(reminder)
                 return True
             else:
                 logger.error(f"❌ Error marcando recordatorio como notificado: {reminder_id}")
@@ -490,34 +770,20 @@ class ReminderManager:
             Dict con estadísticas de la semana
         """
         try:
-            # Obtener recordatorios de la última semana
-            # Nota: Esto requeriría filtros de fecha en get_user_reminders
-            # Por simplicidad, obtenemos todos los recordatorios recientes
-            
-            all_reminders = await self.db.get_user_reminders(user_id, limit=50)
-            
-            # Filtrar por última semana
+            # Conteos y últimos recordatorios en una agregación sobre la semana (en MongoDB)
             one_week_ago = datetime.utcnow() - timedelta(days=7)
-            weekly_reminders = [
-                r for r in all_reminders 
-                if r.created_at >= one_week_ago
-            ]
-            
-            # Calcular estadísticas
-            total = len(weekly_reminders)
-            completed = len([r for r in weekly_reminders if r.status == ReminderStatus.COMPLETED])
-            pending = len([r for r in weekly_reminders if r.status == ReminderStatus.PENDING])
-            missed = len([r for r in weekly_reminders if r.status == ReminderStatus.MISSED])
+            stats = await self.db.get_weekly_reminder_stats(user_id, one_week_ago, settings.SUMMARY_RECENT_ITEMS)
+            by_status = stats["by_status"]
             
             summary = {
-                "total": total,
-                "completed": completed,
-                "pending": pending,
-                "missed": missed,
-                "reminders": [r.dict() for r in weekly_reminders]
+                "total": stats["total"],
+                "completed": by_status.get(ReminderStatus.COMPLETED.value, 0),
+                "pending": by_status.get(ReminderStatus.PENDING.value, 0),
+                "missed": by_status.get(ReminderStatus.MISSED.value, 0),
+                "reminders": stats["recent"]
             }
             
-            logger.info(f"📊 Resumen semanal para usuario {user_id}: {total} recordatorios")
+            logger.info(f"📊 Resumen semanal para usuario {user_id}: {summary['total']} recordatorios")
             return summary
             
         except Exception as e:
@@ -552,23 +818,24 @@ class ReminderManager:
             
             # Modificar el primer recordatorio encontrado
             reminder = reminders[0]
-            old_reminder_text = reminder.text
+            old_reminder_text = reminder['text']
             
             # Actualizar el recordatorio
-            success = await self.db.update_reminder_text(reminder.id, new_text)
+            success = await self.db.update_reminder_text(reminder['_id'], new_text)
             
             if success:
-                # Si hay integración con calendario, actualizar evento
-                if self.calendar_integration:
-                    try:
-                        # Buscar y actualizar evento en calendario
-                        await self.calendar_integration.update_event_title(
-                            old_title=old_reminder_text,
-                            new_title=new_text,
-                            date=reminder.date
-                        )
-                    except Exception as e:
-                        logger.warning(f"⚠️ Error actualizando evento en calendario: {e}")
+                # Encolar cambio de título en Apple Calendar
+                try:
+                    await queue_calendar_rename(
+                        str(reminder['_id']),
+                        old_reminder_text,
+                        new_text,
+                        reminder['date'],
+                        uid=reminder.get('calendar_uid'),
+                        href=reminder.get('calendar_href')
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ Error encolando actualización de calendario: {e}")
                 
                 logger.info(f"✅ Recordatorio modificado: '{old_text}' → '{new_text}'")
                 return True
@@ -585,11 +852,8 @@ class ReminderManager:
         Buscar recordatorios por texto
         """
         try:
-            # Usar el método existente de búsqueda
-            reminders = await self.db.search_reminders_by_text(user_id, query)
-            
-            # Limitar resultados
-            return reminders[:limit] if reminders else []
+            # Índice de texto, ordenado por relevancia
+            return await self.db.search_reminders_by_text(user_id, query, limit=limit)
             
         except Exception as e:
             logger.error(f"❌ Error buscando recordatorios: {e}")
@@ -4,7 +4,7 @@ Servicio de scheduler para envío automático de recordatorios
 
 import asyncio
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict, Any
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import aiohttp
@@ -12,17 +12,24 @@ from loguru import logger
 
 from database.connection import DatabaseManager
 from bot.reminder_manager import ReminderManager
+from bot.reminder_dispatcher import initialize_reminder_dispatcher
+from bot.delivery_pipeline import DeliveryPipeline
 from config.settings import settings
+from utils.http_client import HttpClient
 from utils.helpers import create_reminder_message, format_datetime_for_user
 
 
 class SchedulerService:
     """Servicio de programación de tareas automáticas"""
     
-    def __init__(self, db_manager: DatabaseManager, telegram_bot_token: str):
+    def __init__(self, db_manager: DatabaseManager, telegram_bot_token: str, http_client: Optional[HttpClient] = None):
         self.db = db_manager
         self.telegram_token = telegram_bot_token
-        self.telegram_api_url = f"https://api.telegram.org/bot{telegram_bot_token}"
+        self.telegram_api_url = f"{settings.TELEGRAM_API_URL}/bot{telegram_bot_token}"
+        
+        # Cliente HTTP compartido (conexiones reutilizadas entre envíos)
+        self.http = http_client or HttpClient()
+        self._owns_http = http_client is None
         
         # Inicializar scheduler
         self.scheduler = AsyncIOScheduler()
@@ -30,18 +37,30 @@ class SchedulerService:
         # Inicializar reminder manager
         self.reminder_manager = ReminderManager(db_manager)
         
+        # Entrega concurrente con límites de tasa de Telegram
+        self.delivery = DeliveryPipeline(self._post_telegram_message)
+        
+        # Despachador por eventos (reemplaza el sondeo periódico)
+        self.dispatcher = initialize_reminder_dispatcher(db_manager, self._send_reminder_notification)
+        
         # Estado del servicio
         self.is_running = False
     
-    def start(self):
-        """Iniciar el scheduler"""
+    async def start(self):
+        """Iniciar el scheduler y el despachador de recordatorios"""
         try:
-            # Agregar tarea de verificación de recordatorios
+            # Iniciar workers de entrega
+            await self.delivery.start()
+            
+            # Cargar ventana inicial y comenzar a despachar
+            await self.dispatcher.start()
+            
+            # Recargar la ventana del despachador periódicamente
             self.scheduler.add_job(
-                func=self._check_reminders,
-                trigger=IntervalTrigger(seconds=settings.SCHEDULER_INTERVAL_SECONDS),
-                id='reminder_checker',
-                name='Verificador de Recordatorios',
+                func=self.dispatcher.refresh,
+                trigger=IntervalTrigger(minutes=settings.DISPATCHER_REFRESH_MINUTES),
+                id='dispatcher_refresh',
+                name='Recarga del Despachador',
                 replace_existing=True,
                 max_instances=1
             )
@@ -60,47 +79,28 @@ class SchedulerService:
             self.scheduler.start()
             self.is_running = True
             
-            logger.info(f"⏰ Scheduler iniciado - Verificando cada {settings.SCHEDULER_INTERVAL_SECONDS}s")
+            logger.info(f"⏰ Scheduler iniciado - Ventana de {settings.DISPATCHER_HORIZON_HOURS}h, recarga cada {settings.DISPATCHER_REFRESH_MINUTES} min")
             
         except Exception as e:
             logger.error(f"❌ Error iniciando scheduler: {e}")
             self.is_running = False
     
-    def stop(self):
+    async def stop(self):
         """Detener el scheduler"""
         try:
+            await self.dispatcher.stop()
+            await self.delivery.stop()
             if self.scheduler.running:
                 self.scheduler.shutdown(wait=True)
+            # El cliente compartido lo cierra main.py
+            if self._owns_http:
+                await self.http.close()
             self.is_running = False
             logger.info("🛑 Scheduler detenido")
             
         except Exception as e:
             logger.error(f"❌ Error deteniendo scheduler: {e}")
     
-    async def _check_reminders(self):
-        """Verificar y enviar recordatorios vencidos"""
-        try:
-            logger.debug("🔍 Verificando recordatorios pendientes...")
-            
-            # Obtener recordatorios que deben enviarse
-            due_reminders = await self.reminder_manager.get_due_reminders()
-            
-            if not due_reminders:
-                logger.debug("✅ No hay recordatorios pendientes")
-                return
-            
-            logger.info(f"📬 Procesando {len(due_reminders)} recordatorios")
-            
-            # Procesar cada recordatorio
-            for reminder_info in due_reminders:
-                await self._send_reminder_notification(reminder_info)
-                
-                # Pequeña pausa entre envíos
-                await asyncio.sleep(0.5)
-            
-        except Exception as e:
-            logger.error(f"❌ Error verificando recordatorios: {e}")
-    
     async def _send_reminder_notification(self, reminder_info: dict):
         """
         Enviar notificación de recordatorio por Telegram
@@ -131,8 +131,8 @@ class SchedulerService:
                 logger.error(f"❌ Tipo de recordatorio desconocido: {notification_type}")
                 return
             
-            # Enviar mensaje por Telegram
-            success = await self._send_telegram_message(user_id, message)
+            # Enviar mensaje por el pipeline de entrega (espera turno según límites)
+            success = await self.delivery.submit(user_id, message)
             
             if success:
                 # Marcar como notificado
@@ -166,6 +166,20 @@ class SchedulerService:
         Returns:
             True si se envió exitosamente
         """
+        result = await self._post_telegram_message(user_id, message)
+        return result["ok"]
+    
+    async def _post_telegram_message(self, user_id: int, message: str) -> Dict[str, Any]:
+        """
+        Llamada a sendMessage de la API de Telegram
+        
+        Args:
+            user_id: ID del usuario de Telegram
+            message: Mensaje a enviar
+        
+        Returns:
+            Dict con "ok", y "retry_after" (429) o "retryable" (error transitorio)
+        """
         try:
             url = f"{self.telegram_api_url}/sendMessage"
             
@@ -177,22 +191,26 @@ class SchedulerService:
             }
             
             timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        logger.debug(f"📤 Mensaje enviado a {user_id}")
-                        return True
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Error API Telegram {response.status}: {error_text}")
-                        return False
+            async with self.http.session.post(url, json=payload, timeout=timeout) as response:
+                if response.status == 200:
+                    logger.debug(f"📤 Mensaje enviado a {user_id}")
+                    return {"ok": True}
+                
+                if response.status == 429:
+                    data = await response.json(content_type=None)
+                    retry_after = data.get("parameters", {}).get("retry_after", 1)
+                    return {"ok": False, "retry_after": float(retry_after)}
+                
+                error_text = await response.text()
+                logger.error(f"❌ Error API Telegram {response.status}: {error_text}")
+                return {"ok": False, "retryable": response.status >= 500}
                         
         except asyncio.TimeoutError:
             logger.error(f"⏱️ Timeout enviando mensaje a {user_id}")
-            return False
+            return {"ok": False, "retryable": True}
         except Exception as e:
             logger.error(f"❌ Error enviando mensaje Telegram: {e}")
-            return False
+            return {"ok": False, "retryable": True}
     
     async def _daily_maintenance(self):
         """Tareas de mantenimiento diario"""
@@ -224,7 +242,7 @@ class SchedulerService:
         Returns:
             True si se envió exitosamente
         """
-        return await self._send_telegram_message(user_id, message)
+        return await self.delivery.submit(user_id, message)
     
     def get_status(self) -> dict:
         """
@@ -247,7 +265,9 @@ class SchedulerService:
                 "running": self.is_running,
                 "scheduler_active": self.scheduler.running if hasattr(self.scheduler, 'running') else False,
                 "jobs": jobs,
-                "interval_seconds": settings.SCHEDULER_INTERVAL_SECONDS
+                "dispatcher": self.dispatcher.get_status(),
+                "delivery": self.delivery.get_metrics(),
+                "http": self.http.get_stats()
             }
             
         except Exception as e:
@@ -3,34 +3,38 @@ Interfaz principal del bot de Telegram con aiogram
 """
 
 import asyncio
-import re
 from datetime import datetime
 from typing import Optional
-from aiogram import Bot, Dispatcher, types
+from aiogram import Bot, Dispatcher
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, BotCommand
 from aiogram.exceptions import TelegramAPIError
 from loguru import logger
 
 from database.connection import DatabaseManager
+from database.models import User
 from bot.ai_interpreter import AIInterpreter
+from bot.llm_cache import LLMCache
 from bot.reminder_manager import ReminderManager
 from bot.note_manager import NoteManager
 from bot.memory_index import MemoryIndex
+from bot.user_registry import UserRegistry, UserMiddleware
+from bot.intent_matcher import is_reminder_request, has_deletion_pattern
 from config.settings import settings
+from utils.http_client import HttpClient
 from utils.helpers import (
     format_reminders_list, 
     sanitize_input, 
-    validate_telegram_user_id,
     truncate_text,
     format_datetime_for_user
 )
+from utils.recurrence import describe_rrule
 
 
 class TelegramBot:
     """Bot principal de Telegram"""
     
-    def __init__(self, token: str, db_manager: DatabaseManager, openrouter_api_key: str):
+    def __init__(self, token: str, db_manager: DatabaseManager, openrouter_api_key: str, http_client: Optional[HttpClient] = None):
         self.token = token
         self.db = db_manager
         
@@ -39,10 +43,24 @@ class TelegramBot:
         self.dp = Dispatcher()
         
         # Inicializar componentes
-        self.ai_interpreter = AIInterpreter(openrouter_api_key)
+        self.ai_interpreter = AIInterpreter(
+            openrouter_api_key,
+            http_client=http_client,
+            cache=LLMCache(db_manager)
+        )
         self.reminder_manager = ReminderManager(db_manager)
         self.note_manager = NoteManager(db_manager, self.ai_interpreter)
         self.memory_index = MemoryIndex(db_manager)
+        self.user_registry = UserRegistry(db_manager)
+        
+        # Usuario cargado una vez por mensaje (caché + actividad en lote)
+        self.dp.message.middleware(UserMiddleware(self.user_registry))
+        self.dp.startup.register(self.user_registry.start)
+        self.dp.shutdown.register(self.user_registry.stop)
+        
+        # Contexto de IA en lote + compactación periódica
+        self.dp.startup.register(self.memory_index.start)
+        self.dp.shutdown.register(self.memory_index.stop)
         
         # Registrar handlers
         self._register_handlers()
@@ -89,7 +107,7 @@ class TelegramBot:
             BotCommand(command="recordar", description="⏰ Crear recordatorio"),
             BotCommand(command="nota", description="📝 Guardar nota"),
             BotCommand(command="listar", description="📋 Ver recordatorios"),
-            BotCommand(command="buscar", description="🔍 Buscar notas"),
+            BotCommand(command="buscar", description="🔍 Buscar notas y recordatorios"),
             BotCommand(command="resumen", description="📊 Resumen semanal"),
             BotCommand(command="calendar", description="🍎 Estado Apple Calendar"),
             BotCommand(command="status", description="⚙️ Estado del sistema"),
@@ -99,43 +117,11 @@ class TelegramBot:
         await self.bot.set_my_commands(commands)
         logger.info("📋 Comandos del bot configurados")
     
-    async def _register_user(self, user: types.User) -> bool:
-        """Registrar o actualizar usuario en base de datos"""
-        try:
-            if not validate_telegram_user_id(user.id):
-                logger.error(f"❌ ID de usuario inválido: {user.id}")
-                return False
-            
-            user_data = {
-                "user_id": user.id,
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "language": user.language_code or "es",
-                "timezone": settings.DEFAULT_TIMEZONE,
-                "last_activity": datetime.utcnow(),
-                "is_active": True
-            }
-            
-            success = await self.db.add_user(user_data)
-            
-            if success:
-                logger.info(f"👤 Usuario registrado/actualizado: {user.id} (@{user.username})")
-                return True
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"❌ Error registrando usuario: {e}")
-            return False
-    
     # --- COMANDOS ---
     
     async def _cmd_start(self, message: Message):
         """Comando /start - Bienvenida"""
         try:
-            await self._register_user(message.from_user)
-            
             welcome_text = """🧠 **¡Bienvenido a OskarOS Assistant Bot!**
 
 Soy tu segundo cerebro personal con IA. Puedo ayudarte con:
@@ -155,7 +141,7 @@ Soy tu segundo cerebro personal con IA. Puedo ayudarte con:
 /recordar - Crear recordatorio
 /nota - Guardar nota  
 /listar - Ver recordatorios pendientes
-/buscar - Buscar en tus notas
+/buscar - Buscar en tus notas y recordatorios
 /resumen - Resumen semanal
 /status - Estado del sistema
 
@@ -182,8 +168,6 @@ Simplemente escribe algo como:
     async def _cmd_recordar(self, message: Message):
         """Comando /recordar - Crear recordatorio"""
         try:
-            await self._register_user(message.from_user)
-            
             # Extraer texto del comando
             command_text = message.text
             if not command_text or len(command_text.split()) < 2:
@@ -210,8 +194,6 @@ Simplemente escribe algo como:
     async def _cmd_nota(self, message: Message):
         """Comando /nota - Guardar nota"""
         try:
-            await self._register_user(message.from_user)
-            
             # Extraer texto del comando
             command_text = message.text
             if not command_text or len(command_text.split()) < 2:
@@ -263,18 +245,16 @@ Simplemente escribe algo como:
     async def _cmd_listar(self, message: Message):
         """Comando /listar - Mostrar recordatorios pendientes"""
         try:
-            await self._register_user(message.from_user)
-            
             # Limpiar recordatorios pasados automáticamente
             cleaned_count = await self.reminder_manager.cleanup_past_reminders(message.from_user.id)
             
-            # Obtener recordatorios pendientes (solo futuros)
-            reminders = await self.reminder_manager.get_pending_reminders_for_user(
+            # Próximas ocurrencias (solo futuras; las series se expanden a demanda)
+            occurrences = await self.reminder_manager.get_upcoming_occurrences(
                 message.from_user.id,
                 limit=10
             )
             
-            if not reminders:
+            if not occurrences:
                 cleanup_msg = f"\n\n🧹 Se limpiaron {cleaned_count} recordatorios pasados." if cleaned_count > 0 else ""
                 await message.answer(
                     f"📭 **No tienes recordatorios pendientes**\n\n"
@@ -287,12 +267,16 @@ Simplemente escribe algo como:
             # Formatear lista
             message_text = "📋 **Tus próximos recordatorios:**\n\n"
             
-            for i, reminder in enumerate(reminders, 1):
-                date_str = format_datetime_for_user(reminder.date)
+            for i, occurrence in enumerate(occurrences, 1):
+                reminder = occurrence["reminder"]
+                date_str = format_datetime_for_user(occurrence["date"])
                 text = reminder.text[:60] + "..." if len(reminder.text) > 60 else reminder.text
                 
                 message_text += f"{i}. 📅 {date_str}\n"
-                message_text += f"   📝 {text}\n\n"
+                message_text += f"   📝 {text}\n"
+                if reminder.rrule:
+                    message_text += f"   🔁 {describe_rrule(reminder.rrule)}\n"
+                message_text += "\n"
             
             # Truncar si es muy largo
             message_text = truncate_text(message_text)
@@ -306,8 +290,6 @@ Simplemente escribe algo como:
     async def _cmd_buscar(self, message: Message):
         """Comando /buscar - Buscar notas"""
         try:
-            await self._register_user(message.from_user)
-            
             # Extraer término de búsqueda
             command_text = message.text
             if not command_text or len(command_text.split()) < 2:
@@ -338,10 +320,13 @@ Simplemente escribe algo como:
                 limit=8
             )
             
-            if not notes:
+            # Recordatorios pendientes (índice de texto, por relevancia)
+            reminders = await self.reminder_manager.search_reminders(message.from_user.id, search_query, limit=5)
+            
+            if not notes and not reminders:
                 await message.answer(
                     f"🔍 **Sin resultados para '{search_query}'**\n\n"
-                    "No encontré notas que coincidan.\n\n"
+                    "No encontré notas ni recordatorios que coincidan.\n\n"
                     "Intenta con otros términos o usa `/nota` para crear nuevas notas.",
                     parse_mode="Markdown"
                 )
@@ -363,6 +348,11 @@ Simplemente escribe algo como:
                 
                 message_text += "\n\n"
             
+            if reminders:
+                message_text += "⏰ **Recordatorios:**\n"
+                for reminder in reminders:
+                    message_text += f"• {reminder['text']} — {format_datetime_for_user(reminder['date'])}\n"
+            
             # Truncar si es muy largo
             message_text = truncate_text(message_text)
             
@@ -375,8 +365,6 @@ Simplemente escribe algo como:
     async def _cmd_resumen(self, message: Message):
         """Comando /resumen - Generar resumen semanal"""
         try:
-            await self._register_user(message.from_user)
-            
             # Mostrar mensaje de procesamiento
             processing_msg = await message.answer("📊 Generando tu resumen semanal con IA...")
             
@@ -416,8 +404,6 @@ Simplemente escribe algo como:
     async def _cmd_calendar(self, message: Message):
         """Comando /calendar - Estado de Apple Calendar"""
         try:
-            await self._register_user(message.from_user)
-            
             # Importar aquí para evitar ciclos
             from bot.calendar_integration import apple_calendar
             
@@ -481,11 +467,9 @@ Simplemente escribe algo como:
             logger.error(f"❌ Error en comando calendar: {e}")
             await message.answer("❌ Error verificando estado del calendario.")
 
-    async def _cmd_status(self, message: Message):
+    async def _cmd_status(self, message: Message, db_user: Optional[User] = None):
         """Comando /status - Estado del sistema"""
         try:
-            await self._register_user(message.from_user)
-            
             # Información básica
             uptime = datetime.utcnow()
             
@@ -497,12 +481,13 @@ Simplemente escribe algo como:
 ⏰ **Scheduler:** Activo
 
 📊 **Información:**
-• Verificación: cada {settings.SCHEDULER_INTERVAL_SECONDS}s
+• Despacho: por evento (ventana de {settings.DISPATCHER_HORIZON_HOURS}h)
 • Zona horaria: {settings.DEFAULT_TIMEZONE}
 • Versión: 1.0.0
 
 ⚡ **Tu actividad:**
 • Usuario ID: `{message.from_user.id}`
+• Registrado: {db_user.created_at.strftime('%d/%m/%Y') if db_user else 'N/A'}
 • Última consulta: {uptime.strftime('%H:%M:%S UTC')}
 
 🔗 **APIs:**
@@ -593,8 +578,6 @@ Soy tu asistente personal con IA para recordatorios y notas.
     async def _cmd_eliminar(self, message: Message):
         """Comando /eliminar - Eliminar recordatorios"""
         try:
-            await self._register_user(message.from_user)
-            
             # Extraer texto del comando
             command_text = message.text
             if not command_text or len(command_text.split()) < 2:
@@ -628,8 +611,6 @@ Soy tu asistente personal con IA para recordatorios y notas.
     async def _handle_text_message(self, message: Message):
         """Manejar mensajes de texto general"""
         try:
-            await self._register_user(message.from_user)
-            
             text = sanitize_input(message.text)
             
             # Detectar si es una solicitud de recordatorio
@@ -658,371 +639,174 @@ Soy tu asistente personal con IA para recordatorios y notas.
             await message.answer("❌ Error procesando mensaje. Usa `/help` para ver comandos disponibles.")
     
     def _is_reminder_request(self, text: str) -> bool:
-        """Detectar si un texto es una solicitud de recordatorio - VERSIÓN ULTRA COMPLETA"""
-        
-        # Palabras clave para recordatorios en español
-        reminder_keywords = [
-            # Comandos directos
-            "recuérdame", "recordar", "avísame", "avisar", "alerta", "alarma",
-            "notifícame", "notificar", "alertar", "programar", "agendar",
-            
-            # Expresiones temporales básicas
-            "en ", "dentro de", "después de", "antes de", "desde", "hasta",
-            "mañana", "hoy", "ayer", "pasado mañana", "anteayer",
-            "próxim", "siguiente", "que viene", "entrante", "venidero",
-            "esta semana", "la próxima", "el otro", "la otra",
-            
-            # Expresiones de tiempo chilenas/coloquiales
-            "al tiro", "al rato", "lueguito", "ratito", "un cachito",
-            "altiro", "altoque", "yapo", "cachái", "bacán",
-            "en la once", "en la mañanita", "tempranito",
-            
-            # Días específicos (español e inglés)
-            "lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo",
-            "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
-            "mon", "tue", "wed", "thu", "fri", "sat", "sun",
-            
-            # Meses (español e inglés)
-            "enero", "febrero", "marzo", "abril", "mayo", "junio",
-            "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
-            "january", "february", "march", "april", "may", "june",
-            "july", "august", "september", "october", "november", "december",
-            "jan", "feb", "mar", "apr", "may", "jun",
-            "jul", "aug", "sep", "oct", "nov", "dec",
-            
-            # Palabras académicas y profesionales
-            "evaluación", "examen", "prueba", "control", "test", "quiz", "certamen",
-            "entrega", "tarea", "trabajo", "informe", "proyecto", "ensayo", "reporte",
-            "presentación", "exposición", "defensa", "seminario", "conferencia",
-            "reunión", "junta", "meeting", "call", "videoconferencia",
-            "fecha", "deadline", "vencimiento", "plazo", "límite", "cutoff",
-            "due date", "submission", "delivery", "handout",
-            
-            # Expresiones de tiempo específicas
-            "a las", "al mediodía", "a medianoche", "al amanecer", "al atardecer",
-            "en la mañana", "en la tarde", "en la noche", "en la madrugada",
-            "por la mañana", "por la tarde", "por la noche", "por la madrugada",
-            "de mañana", "de tarde", "de noche", "de madrugada",
-            "am", "pm", "hrs", "horas", "minutos", "segundos", "mins", "segs",
-            "h", "min", "sec", "o'clock",
-            
-            # Eventos y ocasiones
-            "cumpleaños", "cumple", "aniversario", "graduación", "boda", "matrimonio",
-            "fiesta", "celebración", "evento", "cita", "appointment", "date",
-            "viaje", "vacaciones", "feriado", "holiday", "trip", "travel",
-            
-            # Actividades cotidianas
-            "hacer", "ir", "venir", "llegar", "salir", "partir", "volver", "regresar",
-            "llamar", "telefonear", "contactar", "escribir", "enviar", "mandar",
-            "comprar", "pagar", "cobrar", "depositar", "transferir",
-            "estudiar", "leer", "practicar", "ejercitar", "entrenar", "gym",
-            "comer", "almorzar", "cenar", "desayunar", "tomar", "beber",
-            "limpiar", "ordenar", "arreglar", "reparar", "revisar", "chequear",
-            "trabajar", "terminar", "finalizar", "completar", "enviar",
-            
-            # Actividades médicas y personales
-            "médico", "doctor", "dentista", "cita médica", "consulta", "control",
-            "medicamento", "pastilla", "medicina", "tratamiento", "terapia",
-            "ejercicio", "deporte", "correr", "caminar", "nadar", "yoga",
-            "dieta", "régimen", "peso", "dormir", "despertar", "levantarse",
-            
-            # Expresiones de urgencia/importancia
-            "urgente", "importante", "crítico", "vital", "esencial", "necesario",
-            "imperdible", "fundamental", "clave", "priority", "asap", "ya",
-            "emergency", "emergencia", "crisis", "problema",
-            
-            # Frecuencia y repetición
-            "diario", "semanal", "mensual", "anual", "cada", "todos los",
-            "siempre", "nunca", "a veces", "ocasional", "regular",
-            "daily", "weekly", "monthly", "yearly", "every",
-            
-            # Expresiones vagas que podrían ser recordatorios
-            "no olvides", "no te olvides", "acuérdate", "recuerda",
-            "don't forget", "remember", "remind", "note", "memo",
-            "tengo que", "debo", "necesito", "hay que", "toca",
-            "i need to", "i have to", "i must", "should"
-        ]
-        
-        # Patrones de fecha numérica (más completos)
-        date_patterns = [
-            r'\b\d{1,2}/\d{1,2}/\d{4}\b',          # DD/MM/YYYY
-            r'\b\d{1,2}/\d{1,2}/\d{2}\b',          # DD/MM/YY
-            r'\b\d{1,2}-\d{1,2}-\d{4}\b',          # DD-MM-YYYY
-            r'\b\d{1,2}\.\d{1,2}\.\d{4}\b',        # DD.MM.YYYY
-            r'\b\d{4}/\d{1,2}/\d{1,2}\b',          # YYYY/MM/DD
-            r'\b\d{4}-\d{1,2}-\d{1,2}\b',          # YYYY-MM-DD (ISO)
-            r'\b\d{1,2}:\d{2}\b',                  # HH:MM
-            r'\b\d{1,2}h\d{2}\b',                  # 14h30
-            r'\b\d{1,2}:\d{2}(am|pm)\b',           # 2:30pm
-            r'\b\d{1,2}\s?(am|pm)\b',              # 3pm, 8 am
-            r'\b\d{1,2}hs?\b',                     # 15hs, 8h
-            r'\b\d{1,2}:\d{2}:\d{2}\b',            # HH:MM:SS
-        ]
-        
-        # Patrones académicos específicos (expandidos)
-        academic_patterns = [
-            r'fecha de entrega',
-            r'fecha limite',
-            r'fecha tope',
-            r'entregar el',
-            r'entrega el',
-            r'para el',
-            r'hasta el',
-            r'deadline',
-            r'due date',
-            r'vence el',
-            r'vencimiento',
-            r'antes del',
-            r'submission',
-            r'hand\s?in',
-            r'turn\s?in',
-            r'\b\d+%\s+\w+',                      # 25% RA1-2-3
-            r'ra\d+-\d+-\d+',                     # RA1-2-3
-            r'evaluaci[óo]n\s+\w+',               # evaluación escrita
-            r'examen\s+\w+',                      # examen final
-            r'prueba\s+\w+',                      # prueba parcial
-            r'control\s+\w+',                     # control de lectura
-            r'certamen\s+\w+',                    # certamen 1
-            r'tarea\s+\d+',                       # tarea 3
-            r'tp\s+\d+',                          # TP 2 (trabajo práctico)
-            r'lab\s+\d+',                         # lab 4 (laboratorio)
-            r'quiz\s+\d+',                        # quiz 1
-        ]
-        
-        # Patrones de tiempo relativo (muy expandidos)
-        time_relative_patterns = [
-            # Tiempo específico
-            r'en\s+\d+\s+(segundo|minuto|hora|día|semana|mes|año)s?',
-            r'dentro\s+de\s+\d+',
-            r'después\s+de\s+\d+',
-            r'hace\s+\d+',
-            r'en\s+\d+h\d+',                      # en 2h30
-            r'en\s+\d+:\d+',                      # en 1:30
-            
-            # Expresiones relativas
-            r'el\s+(próximo|siguiente|otro)',
-            r'la\s+(próxima|siguiente|otra)',
-            r'este\s+(lunes|martes|miércoles|jueves|viernes|sábado|domingo)',
-            r'esta\s+(semana|tarde|mañana|noche)',
-            r'next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)',
-            r'this\s+(week|afternoon|morning|evening)',
-            
-            # Expresiones chilenas
-            r'el\s+otro\s+(lunes|martes|miércoles|jueves|viernes)',
-            r'la\s+otra\s+semana',
-            r'pasado\s+mañana',
-            r'antes\s+de\s+ayer',
-            r'al\s+rato',
-            r'al\s+tiro',
-            r'lueguito',
-            
-            # Expresiones vagas pero útiles
-            r'pronto',
-            r'más\s+tarde',
-            r'después',
-            r'luego',
-            r'soon',
-            r'later',
-            r'eventually',
-            
-            # Rangos de tiempo
-            r'entre\s+las?\s+\d+',
-            r'desde\s+las?\s+\d+',
-            r'hasta\s+las?\s+\d+',
-            r'de\s+\d+\s+a\s+\d+',
-            r'from\s+\d+\s+to\s+\d+',
-            
-            # PATRONES RECURRENTES (NUEVOS)
-            r'cada\s+\d+\s+(minutos?|horas?|días?|semanas?|meses?)',
-            r'todos?\s+los?\s+(días?|lunes|martes|miércoles|jueves|viernes|sábados?|domingos?)',
-            r'todas?\s+las?\s+(mañanas?|tardes?|noches?|semanas?)',
-            r'every\s+\d+\s+(minutes?|hours?|days?|weeks?|months?)',
-            r'every\s+(day|monday|tuesday|wednesday|thursday|friday|saturday|sunday)',
-            r'daily|weekly|monthly|yearly',
-            r'diario|semanal|mensual|anual',
-            r'día\s+por\s+medio',
-            r'día\s+sí\s+día\s+no',
-            r'inter\s?diario',
-            r'cada\s+dos\s+días',
-            r'cada\s+tercer\s+día',
-            r'cada\s+otra\s+semana',
-            r'cada\s+dos\s+semanas',
-            r'fin\s+de\s+semana',
-            r'días?\s+laborables?',
-            r'días?\s+hábiles?',
-            r'entre\s+semana',
-            r'lunes\s+a\s+viernes',
-            r'monday\s+to\s+friday',
-            r'weekdays?',
-            r'weekends?',
-        ]
-        
-        # Patrones de contexto de actividad (nuevo)
-        activity_patterns = [
-            # Trabajo/estudio
-            r'(trabajo|office|oficina|estudio|universidad|colegio)',
-            r'(meeting|reunión|junta|conferencia|videoconferencia)',
-            r'(proyecto|informe|reporte|presentación|tarea)',
-            
-            # Personal/salud
-            r'(médico|doctor|dentista|cita|consulta|control)',
-            r'(medicamento|pastilla|medicina|tratamiento)',
-            r'(ejercicio|gym|deporte|correr|caminar)',
-            
-            # Finanzas
-            r'(pagar|cobrar|banco|cuenta|tarjeta|transferencia)',
-            r'(factura|boleta|recibo|impuesto|dividendo)',
-            
-            # Social/familia
-            r'(cumpleaños|cumple|aniversario|fiesta|celebración)',
-            r'(llamar|contactar|escribir|visitar|ver)',
-            r'(mamá|papá|familia|amigo|novia|polola)',
-            
-            # Casa/compras
-            r'(comprar|super|supermercado|tienda|mall)',
-            r'(limpiar|ordenar|arreglar|reparar|mantener)',
-            r'(cocinar|comer|almorzar|cenar|desayunar)',
-        ]
-        
-        text_lower = text.lower()
-        
-        # 1. Verificar palabras clave de recordatorio
-        has_reminder_keywords = any(keyword in text_lower for keyword in reminder_keywords)
-        
-        # 2. Verificar patrones de fecha numérica
-        has_date_pattern = any(re.search(pattern, text_lower) for pattern in date_patterns)
-        
-        # 3. Verificar patrones académicos
-        has_academic_pattern = any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in academic_patterns)
-        
-        # 4. Verificar patrones de tiempo relativo
-        has_time_relative = any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in time_relative_patterns)
-        
-        # 5. Verificar contexto de actividad
-        has_activity_context = any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in activity_patterns)
-        
-        # 6. Verificar si tiene estructura de recordatorio (longitud mínima y contexto)
-        has_context = len(text.split()) >= 2 and len(text) > 5
-        
-        # 7. Detectar fechas numéricas con contexto de acción
-        has_numeric_date = re.search(r'\b\d{1,2}/\d{1,2}/\d{2,4}\b', text)
-        has_action_context = any(word in text_lower for word in [
-            "hacer", "ir", "venir", "llamar", "revisar", "estudiar", "pagar", 
-            "comprar", "trabajar", "terminar", "enviar", "completar", "ejercitar"
-        ])
-        
-        # 8. Detectar expresiones imperativas o de planificación
-        has_imperative = any(phrase in text_lower for phrase in [
-            "tengo que", "debo", "necesito", "hay que", "toca", "me toca",
-            "i need to", "i have to", "i must", "should", "gonna", "going to",
-            "voy a", "vamos a", "plan to", "planear", "planifico"
-        ])
-        
-        # 9. Detectar formato de lista o múltiples tareas
-        has_list_format = (
-            text.count('\n') > 1 or  # Múltiples líneas
-            text.count('-') > 1 or   # Lista con guiones
-            text.count('•') > 0 or   # Lista con bullets
-            text.count('*') > 1 or   # Lista con asteriscos
-            len(re.findall(r'\d+\.', text)) > 1  # Lista numerada
-        )
-        
-        # 10. Detectar preguntas sobre tiempo (potenciales recordatorios)
-        has_time_question = any(phrase in text_lower for phrase in [
-            "cuándo", "when", "qué hora", "what time", "a qué hora", "at what time"
-        ]) and len(text.split()) > 2
-        
-        # 11. NUEVO: Detectar patrones recurrentes específicos
-        has_recurring_pattern = any(phrase in text_lower for phrase in [
-            "todos los días", "every day", "daily", "diario", "diariamente",
-            "cada día", "cada mañana", "cada tarde", "cada noche",
-            "todos los lunes", "todos los martes", "todos los miércoles", 
-            "todos los jueves", "todos los viernes", "todos los sábados", "todos los domingos",
-            "every monday", "every tuesday", "every wednesday", "every thursday", 
-            "every friday", "every saturday", "every sunday",
-            "día por medio", "día sí día no", "cada dos días", "cada tercer día",
-            "cada semana", "weekly", "semanal", "semanalmente",
-            "cada mes", "monthly", "mensual", "mensualmente",
-            "fin de semana", "weekends", "entre semana", "días laborables",
-            "lunes a viernes", "monday to friday", "weekdays",
-            "cada otra semana", "cada dos semanas", "bi-weekly"
-        ])
-        
-        # 12. Detectar frecuencia numérica (cada X tiempo)
-        has_numeric_frequency = any(re.search(pattern, text_lower) for pattern in [
-            r'cada\s+\d+\s+(minutos?|horas?|días?|semanas?|meses?)',
-            r'every\s+\d+\s+(minutes?|hours?|days?|weeks?|months?)',
-            r'cada\s+\d+h',  # cada 8h
-            r'cada\s+\d+hrs?',  # cada 12hrs
-        ])
-        
-        # 13. NUEVO: Detectar solicitudes de eliminación
-        has_deletion_request = any(phrase in text_lower for phrase in [
-            "elimina", "eliminar", "borra", "borrar", "cancela", "cancelar",
-            "quita", "quitar", "delete", "remove", "cancel",
-            "no quiero", "ya no", "excepto", "menos", "except", "but not",
-            "salvo", "a excepción de", "excluding", "sin incluir"
-        ])
-        
-        # Es recordatorio si cumple cualquiera de estos criterios:
-        is_reminder = (
-            has_reminder_keywords or
-            (has_date_pattern and has_action_context) or
-            has_academic_pattern or
-            (has_time_relative and has_context) or
-            (has_numeric_date and len(text) > 15) or
-            (has_activity_context and (has_date_pattern or has_time_relative)) or
-            (has_imperative and (has_date_pattern or has_time_relative or len(text) > 20)) or
-            (has_list_format and (has_date_pattern or has_academic_pattern)) or
-            (has_time_question and has_activity_context) or
-            has_recurring_pattern or  # NUEVO: Patrones recurrentes
-            (has_numeric_frequency and has_activity_context) or  # NUEVO: Frecuencia numérica con contexto
-            has_deletion_request  # NUEVO: Solicitudes de eliminación
-        )
-        
-        # Log para debugging (más detallado)
-        if is_reminder:
-            logger.info(f"📝 Detectado como recordatorio: "
-                       f"keywords={has_reminder_keywords}, date={has_date_pattern}, "
-                       f"academic={has_academic_pattern}, relative={has_time_relative}, "
-                       f"activity={has_activity_context}, imperative={has_imperative}, "
-                       f"list={has_list_format}, question={has_time_question}, "
-                       f"recurring={has_recurring_pattern}, frequency={has_numeric_frequency}, "
-                       f"deletion={has_deletion_request}")
-        
-        return is_reminder
+        """Detectar si un texto es una solicitud de recordatorio (vocabulario precompilado en intent_matcher)"""
+        return is_reminder_request(text)
     
     def _has_deletion_pattern(self, text: str) -> bool:
         """Detectar si el texto contiene patrones de eliminación"""
-        text_lower = text.lower()
-        
-        # Patrones explícitos de eliminación
-        deletion_keywords = [
-            'eliminar', 'elimina', 'borra', 'borrar', 'cancelar', 'cancela',
-            'quitar', 'quita', 'remover', 'remueve', 'delete', 'remove',
-            'deshacer', 'anular', 'deshaz'
-        ]
-        
-        # Patrones de modificación con excepciones
-        exception_patterns = [
-            'excepto', 'menos', 'except', 'salvo', 'pero no', 'all except',
-            'todos excepto', 'todas excepto', 'todo excepto', 'toda excepta'
-        ]
-        
-        # Verificar palabras clave de eliminación
-        has_deletion_keyword = any(keyword in text_lower for keyword in deletion_keywords)
-        
-        # Verificar patrones de excepción (para modificar recurrencias)
-        has_exception_pattern = any(pattern in text_lower for pattern in exception_patterns)
-        
-        return has_deletion_keyword or has_exception_pattern
+        return has_deletion_pattern(text)
     
     async def _process_reminder_request(self, message: Message, reminder_input: str):
-        """Procesar solicitud de recordatorio - Sistema inteligente con recurrencia"""
+        """Procesar solicitud de recordatorio - una llamada al router; la cascada de prompts queda de respaldo"""
         try:
             # Mostrar mensaje de procesamiento
             processing_msg = await message.answer("🤖 Interpretando con IA...")
+            user_id = message.from_user.id
+            
+            # Intención + recordatorios + títulos en una sola llamada al LLM
+            context = await self.memory_index.get_user_context(user_id, limit=3, query=reminder_input)
+            route = await self.ai_interpreter.route_message(reminder_input, context)
+            
+            if route is None:
+                logger.info("🔄 Router sin respuesta válida, usando prompts especializados...")
+                await self._process_reminder_cascade(message, processing_msg, reminder_input)
+            elif route["intent"] == "delete":
+                logger.info(f"🗑️ Procesando solicitud de eliminación: {reminder_input}")
+                await self._apply_deletion(processing_msg, user_id, route["deletion"])
+            elif route["intent"] == "create" and route["reminders"]:
+                await self._create_routed_reminders(processing_msg, user_id, reminder_input, route)
+            else:
+                await self._reply_time_not_understood(processing_msg)
+                
+        except Exception as e:
+            logger.error(f"❌ Error procesando recordatorio: {e}")
+            await message.answer("❌ Error procesando recordatorio. Intenta de nuevo.")
+    
+    async def _reply_time_not_understood(self, processing_msg: Message):
+        await processing_msg.edit_text(
+            "❌ **No pude interpretar el tiempo**\n\n"
+            "Ejemplos válidos:\n"
+            "• 'recuérdame en 30 minutos'\n" 
+            "• 'mañana a las 9'\n"
+            "• 'el 25 de octubre a las 15:00'\n"
+            "• 'Evaluación escrita 12/09/2025'\n\n"
+            "Intenta ser más específico con la fecha y hora.",
+            parse_mode="Markdown"
+        )
+    
+    async def _create_routed_reminders(self, processing_msg: Message, user_id: int, reminder_input: str, route: dict):
+        """Crear los recordatorios extraídos por el router (los títulos ya vienen mejorados)"""
+        reminders = route["reminders"]
+        
+        # Toda la serie en un solo viaje a la BD (las recurrentes se guardan como regla)
+        items = [{"original_input": r['original'], "text": r['text'], "date": r['date']} for r in reminders]
+        if route["recurring"]:
+            results = await self.reminder_manager.create_recurring_reminders(user_id, items)
+        else:
+            results = await self.reminder_manager.create_reminders_bulk(user_id, items)
+        created = [reminder_data for reminder_data, success in zip(reminders, results) if success]
+        failed_count = len(reminders) - len(created)
+        
+        if not created:
+            if len(reminders) == 1 and reminders[0]['date'] <= datetime.utcnow():
+                await processing_msg.edit_text(
+                    "❌ **La fecha ya pasó**\n\n"
+                    f"📅 La fecha {format_datetime_for_user(reminders[0]['date'])} ya pasó.\n\n"
+                    "Por favor, elige una fecha en el futuro.",
+                    parse_mode="Markdown"
+                )
+            else:
+                await processing_msg.edit_text("❌ Error creando recordatorio. Intenta de nuevo.")
+            return
+        
+        if route["recurring"]:
+            result_text = f"🔄 **{len(created)} recordatorios recurrentes creados**\n\n"
+            for i, reminder_data in enumerate(created[:3], 1):
+                date_str = format_datetime_for_user(reminder_data['date'])
+                result_text += f"{i}. {reminder_data['text']}\n   📅 {date_str}\n"
+            if len(created) > 3:
+                result_text += f"   ... y {len(created) - 3} más\n"
+            result_text += "\n🔔 Todos incluyen pre-recordatorios automáticos"
+            memory_text = f"Creó {len(created)} recordatorios recurrentes: {reminder_input[:50]}"
+            memory_type = "recurring_reminder"
+        elif len(created) == 1:
+            reminder_data = created[0]
+            date_str = format_datetime_for_user(reminder_data['date'])
+            result_text = f"✅ **Recordatorio creado**\n\n📝 {reminder_data['text']}\n📅 {date_str}\n\n⏰ Incluye pre-recordatorios automáticos"
+            memory_text = f"Creó recordatorio: {reminder_data['text'][:50]}"
+            memory_type = "reminder_creation"
+        else:
+            result_text = f"✅ **{len(created)} recordatorios creados**\n\n"
+            for i, reminder_data in enumerate(created, 1):
+                date_str = format_datetime_for_user(reminder_data['date'])
+                result_text += f"{i}. {reminder_data['text']}\n   📅 {date_str}\n\n"
+            result_text += "⏰ Todos incluyen pre-recordatorios automáticos"
+            memory_text = f"Creó {len(created)} recordatorios: {reminder_input[:50]}"
+            memory_type = "reminder_creation"
+        
+        if failed_count > 0:
+            result_text += f"\n\n⚠️ {failed_count} recordatorios no se pudieron crear (fechas pasadas o errores)"
+        
+        await processing_msg.edit_text(result_text, parse_mode="Markdown")
+        await self.memory_index.add_context(user_id, memory_text, memory_type)
+    
+    async def _apply_deletion(self, processing_msg: Message, user_id: int, deletion_data: dict):
+        """Aplicar una solicitud de eliminación ya interpretada (router o parse_deletion_request)"""
+        if deletion_data["type"] == "specific":
+            # Eliminar recordatorio específico: resolver el texto (y la fecha si viene) a un ID
+            target_date = deletion_data.get("date")
+            if isinstance(target_date, str):
+                target_date = datetime.fromisoformat(target_date.replace('Z', ''))
+            if target_date:
+                matches = await self.db.get_reminders_by_date_and_pattern(user_id, target_date, deletion_data["target"])
+            else:
+                matches = await self.db.search_reminders_by_text(user_id, deletion_data["target"], limit=1)
+            
+            success = bool(matches) and await self.reminder_manager.delete_reminder(
+                user_id, str(matches[0]["_id"])
+            )
+            
+            if success:
+                await processing_msg.edit_text("✅ Recordatorio eliminado exitosamente")
+            else:
+                await processing_msg.edit_text("❌ No se encontró el recordatorio especificado")
+            
+        elif deletion_data["type"] == "pattern":
+            # Eliminar múltiples recordatorios por patrón
+            count = await self.reminder_manager.delete_reminders_by_pattern(
+                user_id=user_id,
+                text_pattern=deletion_data["pattern"]
+            )
+            
+            if count > 0:
+                await processing_msg.edit_text(f"✅ Se eliminaron {count} recordatorio(s)")
+            else:
+                await processing_msg.edit_text("❌ No se encontraron recordatorios que coincidan")
+            
+        elif deletion_data["type"] == "exception":
+            # Modificar recordatorio recurrente con excepciones
+            success = await self.reminder_manager.delete_reminder_exceptions(
+                text=deletion_data["target"],
+                user_id=user_id,
+                exception_dates=deletion_data.get("exception_dates"),
+                exception_weekdays=deletion_data.get("exception_weekdays")
+            )
+            
+            if success:
+                weekdays_str = ", ".join(deletion_data.get("exception_weekdays", []))
+                if weekdays_str:
+                    await processing_msg.edit_text(f"✅ Recordatorio modificado - no se ejecutará los {weekdays_str}")
+                else:
+                    await processing_msg.edit_text("✅ Recordatorio modificado con excepciones")
+            else:
+                await processing_msg.edit_text("❌ No se pudo modificar el recordatorio")
+            
+        elif deletion_data["type"] == "modification":
+            # Modificar recordatorio existente
+            success = await self.reminder_manager.modify_reminder(
+                old_text=deletion_data["old_target"],
+                new_text=deletion_data["new_target"],
+                user_id=user_id
+            )
             
+            if success:
+                await processing_msg.edit_text("✅ Recordatorio modificado exitosamente")
+            else:
+                await processing_msg.edit_text("❌ No se pudo modificar el recordatorio")
+    
+    async def _process_reminder_cascade(self, message: Message, processing_msg: Message, reminder_input: str):
+        """Cascada de prompts especializados (respaldo cuando el router no responde)"""
+        try:
             # PRIMERO: Verificar si es una solicitud de eliminación
             if self._has_deletion_pattern(reminder_input):
                 try:
@@ -1030,63 +814,7 @@ Soy tu asistente personal con IA para recordatorios y notas.
                     
                     # Parsear la solicitud de eliminación con AI
                     deletion_data = await self.ai_interpreter.parse_deletion_request(reminder_input)
-                    
-                    if deletion_data["type"] == "specific":
-                        # Eliminar recordatorio específico
-                        success = await self.reminder_manager.delete_reminder(
-                            text=deletion_data["target"],
-                            user_id=message.from_user.id,
-                            date=deletion_data.get("date")
-                        )
-                        
-                        if success:
-                            await processing_msg.edit_text("✅ Recordatorio eliminado exitosamente")
-                        else:
-                            await processing_msg.edit_text("❌ No se encontró el recordatorio especificado")
-                    
-                    elif deletion_data["type"] == "pattern":
-                        # Eliminar múltiples recordatorios por patrón
-                        count = await self.reminder_manager.delete_reminders_by_pattern(
-                            pattern=deletion_data["pattern"],
-                            user_id=message.from_user.id
-                        )
-                        
-                        if count > 0:
-                            await processing_msg.edit_text(f"✅ Se eliminaron {count} recordatorio(s)")
-                        else:
-                            await processing_msg.edit_text("❌ No se encontraron recordatorios que coincidan")
-                    
-                    elif deletion_data["type"] == "exception":
-                        # Modificar recordatorio recurrente con excepciones
-                        success = await self.reminder_manager.delete_reminder_exceptions(
-                            text=deletion_data["target"],
-                            user_id=message.from_user.id,
-                            exception_dates=deletion_data.get("exception_dates"),
-                            exception_weekdays=deletion_data.get("exception_weekdays")
-                        )
-                        
-                        if success:
-                            weekdays_str = ", ".join(deletion_data.get("exception_weekdays", []))
-                            if weekdays_str:
-                                await processing_msg.edit_text(f"✅ Recordatorio modificado - no se ejecutará los {weekdays_str}")
-                            else:
-                                await processing_msg.edit_text("✅ Recordatorio modificado con excepciones")
-                        else:
-                            await processing_msg.edit_text("❌ No se pudo modificar el recordatorio")
-                    
-                    elif deletion_data["type"] == "modification":
-                        # Modificar recordatorio existente
-                        success = await self.reminder_manager.modify_reminder(
-                            old_text=deletion_data["old_target"],
-                            new_text=deletion_data["new_target"],
-                            user_id=message.from_user.id
-                        )
-                        
-                        if success:
-                            await processing_msg.edit_text("✅ Recordatorio modificado exitosamente")
-                        else:
-                            await processing_msg.edit_text("❌ No se pudo modificar el recordatorio")
-                    
+                    await self._apply_deletion(processing_msg, message.from_user.id, deletion_data)
                     return
                     
                 except Exception as e:
@@ -1099,31 +827,19 @@ Soy tu asistente personal con IA para recordatorios y notas.
             
             if recurring_reminders:
                 # Procesar recordatorios recurrentes
-                created_count = 0
-                failed_count = 0
+                # Contexto una vez por mensaje y todos los títulos en una sola llamada
+                context = await self.memory_index.get_user_context(message.from_user.id, limit=3, query=reminder_input)
+                enhanced_texts = await self.ai_interpreter.enhance_reminder_texts(
+                    [reminder_data['text'] for reminder_data in recurring_reminders], context
+                )
                 
-                for reminder_data in recurring_reminders:
-                    try:
-                        # Mejorar texto del recordatorio individual
-                        context = await self.memory_index.get_user_context(message.from_user.id, limit=3)
-                        enhanced_text = await self.ai_interpreter.enhance_reminder_text(reminder_data['text'], context)
-                        
-                        # Crear recordatorio
-                        success = await self.reminder_manager.create_reminder(
-                            user_id=message.from_user.id,
-                            original_input=reminder_data['text'],
-                            reminder_text=enhanced_text,
-                            target_date=reminder_data['date']
-                        )
-                        
-                        if success:
-                            created_count += 1
-                        else:
-                            failed_count += 1
-                            
-                    except Exception as e:
-                        logger.warning(f"⚠️ Error creando recordatorio recurrente: {e}")
-                        failed_count += 1
+                # Guardar la serie como regla de recurrencia (una sola escritura)
+                results = await self.reminder_manager.create_recurring_reminders(message.from_user.id, [
+                    {"original_input": reminder_data['text'], "text": enhanced_text, "date": reminder_data['date']}
+                    for reminder_data, enhanced_text in zip(recurring_reminders, enhanced_texts)
+                ])
+                created_count = sum(results)
+                failed_count = len(results) - created_count
                 
                 # Respuesta para recordatorios recurrentes
                 if created_count > 0:
@@ -1160,53 +876,43 @@ Soy tu asistente personal con IA para recordatorios y notas.
             
             if reminders:
                 # Crear recordatorios usando el método múltiple
-                created_count = 0
-                failed_count = 0
+                # Contexto una vez por mensaje y todos los títulos en una sola llamada
+                context = await self.memory_index.get_user_context(message.from_user.id, limit=3, query=reminder_input)
+                enhanced_texts = await self.ai_interpreter.enhance_reminder_texts(
+                    [reminder_data['text'] for reminder_data in reminders], context
+                )
+                
+                # Crear todos los recordatorios en un solo insert_many
+                results = await self.reminder_manager.create_reminders_bulk(message.from_user.id, [
+                    {"original_input": reminder_data['text'], "text": enhanced_text, "date": reminder_data['date']}
+                    for reminder_data, enhanced_text in zip(reminders, enhanced_texts)
+                ])
+                created_reminders = [
+                    reminder_data for reminder_data, success in zip(reminders, results) if success
+                ]
+                created_count = len(created_reminders)
+                failed_count = len(results) - created_count
                 
-                for reminder_data in reminders:
-                    try:
-                        # Mejorar texto del recordatorio individual
-                        context = await self.memory_index.get_user_context(message.from_user.id, limit=3)
-                        enhanced_text = await self.ai_interpreter.enhance_reminder_text(reminder_data['text'], context)
-                        
-                        # Crear recordatorio
-                        success = await self.reminder_manager.create_reminder(
-                            user_id=message.from_user.id,
-                            original_input=reminder_data['text'],
-                            reminder_text=enhanced_text,
-                            target_date=reminder_data['date']
+                for reminder_data, enhanced_text, success in zip(reminders, enhanced_texts, results):
+                    if success:
+                        # Agregar a memoria
+                        await self.memory_index.add_context(
+                            message.from_user.id,
+                            f"Creó recordatorio: {enhanced_text[:50]}",
+                            "reminder_creation"
                         )
-                        
-                        if success:
-                            created_count += 1
-                            # Agregar a memoria
-                            await self.memory_index.add_context(
-                                message.from_user.id,
-                                f"Creó recordatorio: {enhanced_text[:50]}",
-                                "reminder_creation"
-                            )
-                        else:
-                            # Verificar si fue rechazado por fecha pasada
-                            from datetime import datetime
-                            if reminder_data['date'] <= datetime.utcnow():
-                                logger.warning(f"⚠️ Recordatorio rechazado por fecha pasada: {reminder_data['text']}")
-                            failed_count += 1
-                            
-                    except Exception as e:
-                        logger.warning(f"⚠️ Error creando recordatorio individual: {e}")
-                        failed_count += 1
                 
                 # Respuesta final
                 if created_count > 0:
                     if created_count == 1:
                         # Un solo recordatorio
-                        reminder_data = reminders[0]
+                        reminder_data = created_reminders[0]
                         date_str = format_datetime_for_user(reminder_data['date'])
                         result_text = f"✅ **Recordatorio creado**\n\n📝 {reminder_data['text']}\n📅 {date_str}\n\n⏰ Incluye pre-recordatorios automáticos"
                     else:
                         # Múltiples recordatorios
                         result_text = f"✅ **{created_count} recordatorios creados**\n\n"
-                        for i, reminder_data in enumerate(reminders[:created_count], 1):
+                        for i, reminder_data in enumerate(created_reminders, 1):
                             date_str = format_datetime_for_user(reminder_data['date'])
                             result_text += f"{i}. {reminder_data['text']}\n   📅 {date_str}\n\n"
                         result_text += "⏰ Todos incluyen pre-recordatorios automáticos"
@@ -1225,20 +931,11 @@ Soy tu asistente personal con IA para recordatorios y notas.
             target_date = await self.ai_interpreter.interpret_time_expression(reminder_input)
             
             if not target_date:
-                await processing_msg.edit_text(
-                    "❌ **No pude interpretar el tiempo**\n\n"
-                    "Ejemplos válidos:\n"
-                    "• 'recuérdame en 30 minutos'\n" 
-                    "• 'mañana a las 9'\n"
-                    "• 'el 25 de octubre a las 15:00'\n"
-                    "• 'Evaluación escrita 12/09/2025'\n\n"
-                    "Intenta ser más específico con la fecha y hora.",
-                    parse_mode="Markdown"
-                )
+                await self._reply_time_not_understood(processing_msg)
                 return
             
             # Mejorar texto del recordatorio
-            context = await self.memory_index.get_user_context(message.from_user.id, limit=3)
+            context = await self.memory_index.get_user_context(message.from_user.id, limit=3, query=reminder_input)
             enhanced_text = await self.ai_interpreter.enhance_reminder_text(reminder_input, context)
             
             # Crear recordatorio único
@@ -0,0 +1,202 @@
+"""
+Registro de usuarios de Telegram con caché en memoria
+Un middleware carga el usuario una vez por update y lo comparte con los handlers;
+last_activity se acumula y se escribe en lote
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable
+from aiogram import BaseMiddleware, types
+from aiogram.types import TelegramObject
+from loguru import logger
+
+from database.connection import DatabaseManager
+from database.models import User
+from config.settings import settings
+from utils.helpers import validate_telegram_user_id
+
+
+class UserRegistry:
+    """Caché TTL de usuarios conocidos y cola de last_activity"""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        ttl_seconds: float = None,
+        max_entries: int = None,
+        flush_seconds: float = None
+    ):
+        """
+        Args:
+            db_manager: Gestor de base de datos
+            ttl_seconds: Vida de un usuario en caché antes de releerlo
+            max_entries: Usuarios en caché (LRU)
+            flush_seconds: Intervalo de escritura de last_activity
+        """
+        self.db = db_manager
+        self.ttl_seconds = ttl_seconds or settings.USER_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.USER_CACHE_MAX_ENTRIES
+        self.flush_seconds = flush_seconds or settings.USER_ACTIVITY_FLUSH_SECONDS
+
+        self._users: "OrderedDict[int, Tuple[User, float]]" = OrderedDict()
+        self._activity: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.flushed = 0
+
+    @staticmethod
+    def _profile(tg_user: types.User) -> Dict[str, Any]:
+        return {
+            "username": tg_user.username,
+            "first_name": tg_user.first_name,
+            "last_name": tg_user.last_name,
+            "language": tg_user.language_code or "es"
+        }
+
+    def _cached(self, user_id: int) -> Optional[User]:
+        entry = self._users.get(user_id)
+        if not entry:
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._users[user_id]
+            return None
+        self._users.move_to_end(user_id)
+        return user
+
+    def _remember(self, user: User):
+        self._users[user.user_id] = (user, time.monotonic() + self.ttl_seconds)
+        self._users.move_to_end(user.user_id)
+        while len(self._users) > self.max_entries:
+            self._users.popitem(last=False)
+
+    def touch(self, user_id: int, when: Optional[datetime] = None):
+        """Anotar actividad del usuario (se escribe en el próximo flush)"""
+        self._activity[user_id] = when or datetime.utcnow()
+
+    async def get_user(self, tg_user: types.User) -> Optional[User]:
+        """
+        Usuario de la base de datos para un remitente de Telegram
+
+        En caché no hay escrituras: solo se anota la actividad. Se escribe el perfil
+        si el usuario es nuevo o cambió su nombre/username/idioma
+
+        Returns:
+            Usuario o None si el ID no es válido o falló MongoDB
+        """
+        try:
+            if not validate_telegram_user_id(tg_user.id):
+                logger.error(f"❌ ID de usuario inválido: {tg_user.id}")
+                return None
+
+            now = datetime.utcnow()
+            profile = self._profile(tg_user)
+
+            user = self._cached(tg_user.id)
+            if user and all(getattr(user, key) == value for key, value in profile.items()):
+                self.hits += 1
+                self.touch(tg_user.id, now)
+                return user
+
+            self.misses += 1
+            if not user:
+                user = await self.db.get_user(tg_user.id)
+
+            if not user or any(getattr(user, key) != value for key, value in profile.items()):
+                user_data = {
+                    "user_id": tg_user.id,
+                    **profile,
+                    "timezone": user.timezone if user else settings.DEFAULT_TIMEZONE,
+                    "last_activity": now,
+                    "is_active": True
+                }
+                if not await self.db.add_user(user_data):
+                    return None
+                user = await self.db.get_user(tg_user.id)
+                if not user:
+                    return None
+                logger.info(f"👤 Usuario registrado/actualizado: {tg_user.id} (@{tg_user.username})")
+            else:
+                self.touch(tg_user.id, now)
+
+            self._remember(user)
+            return user
+
+        except Exception as e:
+            logger.error(f"❌ Error registrando usuario: {e}")
+            return None
+
+    async def flush(self) -> int:
+        """Escribir la actividad acumulada en un solo bulk_write"""
+        if not self._activity:
+            return 0
+
+        activity, self._activity = self._activity, {}
+        updated = await self.db.update_users_activity(activity)
+        self.flushed += len(activity)
+        logger.debug(f"👤 Actividad guardada: {len(activity)} usuarios ({updated} actualizados)")
+        return updated
+
+    async def start(self):
+        """Iniciar el flush periódico de last_activity"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"👤 Registro de usuarios iniciado (actividad cada {self.flush_seconds:.0f}s)")
+
+    async def stop(self):
+        """Detener el flush periódico y escribir lo pendiente"""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info("👤 Registro de usuarios detenido")
+
+    async def _run(self):
+        while self.is_running:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Error guardando actividad de usuarios: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché"""
+        return {
+            "cached_users": len(self._users),
+            "pending_activity": len(self._activity),
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushed": self.flushed
+        }
+
+
+class UserMiddleware(BaseMiddleware):
+    """Carga el usuario una vez por update y lo expone a los handlers como `db_user`"""
+
+    def __init__(self, registry: UserRegistry):
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+        if tg_user and not tg_user.is_bot:
+            data["db_user"] = await self.registry.get_user(tg_user)
+        return await handler(event, data)
@@ -16,6 +16,7 @@ class Settings:
     def __init__(self):
         # Telegram Bot
         self.TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
+        self.TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
         
         # OpenRouter API (Llama 3.3 FREE)
         self.OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
@@ -30,18 +31,74 @@ class Settings:
         self.ICLOUD_EMAIL: str = os.getenv("ICLOUD_EMAIL", "")
         self.ICLOUD_PASSWORD: str = os.getenv("ICLOUD_PASSWORD", "")
         self.ICLOUD_CALENDAR_URL: str = "https://caldav.icloud.com"
+        self.CALDAV_MAX_WORKERS: int = 4  # Hilos para llamadas bloqueantes de caldav
+        self.CALDAV_TIMEOUT_SECONDS: int = 20
+        self.CALENDAR_OUTBOX_BATCH_SIZE: int = 20  # Operaciones por ciclo del worker
+        self.CALENDAR_OUTBOX_MAX_ATTEMPTS: int = 5
+        self.CALENDAR_OUTBOX_RETRY_SECONDS: float = 30.0  # Base del backoff exponencial
+        self.CALENDAR_OUTBOX_POLL_SECONDS: float = 15.0
+        self.CALENDAR_SYNC_MINUTES: int = 5  # Sincronización incremental del espejo local
         
         # Scheduler
         self.SCHEDULER_INTERVAL_SECONDS: int = 60  # Revisar cada 60 segundos
         self.REMINDER_TOLERANCE_SECONDS: int = 30  # ±30 segundos de tolerancia
+        self.DISPATCHER_HORIZON_HOURS: int = 6  # Disparos cargados en memoria
+        self.DISPATCHER_REFRESH_MINUTES: int = 60  # Recarga de la ventana desde la BD
+        
+        # Entrega de mensajes (límites de Telegram: ~30 msg/s global, ~1 msg/s por chat)
+        self.DELIVERY_WORKERS: int = 16
+        self.TELEGRAM_GLOBAL_RATE: float = 30.0
+        self.TELEGRAM_PER_CHAT_RATE: float = 1.0
+        self.DELIVERY_MAX_RETRIES: int = 3
+        self.DELIVERY_RETRY_BASE_SECONDS: float = 0.5  # Backoff exponencial ante 5xx / timeouts
+        
+        # Cliente HTTP compartido (pool keep-alive)
+        self.HTTP_POOL_LIMIT: int = 100
+        self.HTTP_POOL_LIMIT_PER_HOST: int = 32
+        self.HTTP_DNS_CACHE_SECONDS: int = 300
+        self.HTTP_KEEPALIVE_SECONDS: float = 30.0
+        
+        # Usuarios conocidos (middleware de Telegram)
+        self.USER_CACHE_TTL_SECONDS: int = 3600  # Tras expirar se relee el usuario de MongoDB
+        self.USER_CACHE_MAX_ENTRIES: int = 10000
+        self.USER_ACTIVITY_FLUSH_SECONDS: float = 60.0  # last_activity se escribe en lote
         
         # Pre-recordatorios automáticos
         self.PRE_REMINDER_DAYS: list = [7, 2, 1]  # 7 días, 2 días, 1 día antes
         
+        # Resumen semanal (/resumen)
+        self.SUMMARY_RECENT_ITEMS: int = 10  # Recordatorios/notas que llegan al prompt del resumen
+        
         # Configuración de IA
         self.AI_TEMPERATURE: float = 0.4
         self.AI_MAX_TOKENS: int = 500
+        self.AI_ROUTER_MAX_TOKENS: int = 1500  # El router devuelve todos los recordatorios (~50 tokens cada uno)
         self.AI_TIMEOUT_SECONDS: int = 10
+        self.LLM_CACHE_MAX_ENTRIES: int = 2000  # Respuestas en memoria (LRU)
+        self.LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # Una semana: permite re-anclar "todos los lunes"
+        self.TIME_PARSER_MIN_CONFIDENCE: float = 0.8  # Bajo este umbral la expresión se consulta al LLM
+        
+        # Búsqueda local de notas (BM25 + vectores de trigramas)
+        self.NOTE_SEARCH_EMBEDDING_DIM: int = 512  # Posiciones del vector hasheado
+        self.NOTE_SEARCH_SEMANTIC_WEIGHT: float = 0.3  # Peso del coseno frente a BM25
+        self.NOTE_SEARCH_MIN_SIMILARITY: float = 0.35  # Coseno mínimo sin palabras en común
+        self.NOTE_SEARCH_LLM_RERANK: bool = False  # Reordenar el top-k con el LLM (opcional)
+        self.NOTE_SEARCH_RERANK_TOP_K: int = 10
+        self.NOTE_INDEX_MEMORY_BUDGET_MB: int = 64  # Índices por usuario en memoria (LRU)
+        
+        # Memoria contextual de IA (caché por usuario y tipo)
+        self.MEMORY_CACHE_MAX_ENTRIES: int = 5000  # Pares (usuario, tipo) en memoria (LRU)
+        self.MEMORY_CACHE_ITEMS_PER_TYPE: int = 20  # Memorias más recientes guardadas por par
+        self.MEMORY_FLUSH_SECONDS: float = 2.0  # Contexto conversacional escrito en lote (insert_many)
+        self.MEMORY_FLUSH_BATCH_SIZE: int = 100  # Escribir antes si el búfer llega a este tamaño
+        self.MEMORY_BUFFER_MAX: int = 5000  # Tope del búfer si MongoDB no responde
+        self.MEMORY_RETENTION_DAYS: dict = {"context": 30, "pattern": 180}  # Tipos sin entrada no expiran
+        self.MEMORY_COMPACTION_HOURS: int = 24  # Compactación periódica del contexto
+        self.MEMORY_COMPACT_AFTER_DAYS: int = 7  # Contexto más antiguo se resume en una memoria por usuario
+        self.MEMORY_MAX_CONTEXT_PER_USER: int = 200  # Contexto reciente conservado por usuario
+        self.MEMORY_SCORE_WEIGHTS: dict = {"recency": 0.3, "confidence": 0.15, "frequency": 0.15, "overlap": 0.4}
+        self.MEMORY_RECENCY_HALF_LIFE_DAYS: float = 7.0  # La recencia vale la mitad cada 7 días
+        self.MEMORY_FREQUENCY_SATURATION: int = 20  # Accesos con los que la frecuencia vale 1
         
         # Timezone
         self.DEFAULT_TIMEZONE: str = os.getenv("DEFAULT_TIMEZONE", "UTC")
@@ -3,14 +3,18 @@ Gestor de conexión a MongoDB Atlas
 """
 
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
+import re
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, OperationFailure, ServerSelectionTimeoutError
 from bson import ObjectId
 from loguru import logger
 
-from database.models import User, Reminder, Note, AIMemory, ReminderStatus
+from database.models import User, Reminder, Note, AIMemory, ReminderStatus, MemoryType, CONTEXT_SUMMARY_SOURCE
+from config.settings import settings
+from utils.text_search import TEXT_SEARCH_LANGUAGE, search_terms, matches_all_terms
 
 
 class DatabaseManager:
@@ -27,6 +31,11 @@ class DatabaseManager:
         self.reminders: Optional[AsyncIOMotorCollection] = None
         self.notes: Optional[AsyncIOMotorCollection] = None
         self.ai_memory: Optional[AsyncIOMotorCollection] = None
+        self.calendar_outbox: Optional[AsyncIOMotorCollection] = None
+        self.calendar_events: Optional[AsyncIOMotorCollection] = None
+        self.calendar_sync_state: Optional[AsyncIOMotorCollection] = None
+        self.llm_cache: Optional[AsyncIOMotorCollection] = None
+        self.habit_histograms: Optional[AsyncIOMotorCollection] = None
     
     async def connect(self) -> bool:
         """Conectar a MongoDB Atlas"""
@@ -49,10 +58,18 @@ class DatabaseManager:
             self.reminders = self.db.reminders
             self.notes = self.db.notes
             self.ai_memory = self.db.ai_memory
+            self.calendar_outbox = self.db.calendar_outbox
+            self.calendar_events = self.db.calendar_events
+            self.calendar_sync_state = self.db.calendar_sync_state
+            self.llm_cache = self.db.llm_cache
+            self.habit_histograms = self.db.habit_histograms
             
             # Crear índices
             await self._create_indexes()
             
+            # Completar next_fire_at en documentos anteriores
+            await self.migrate_next_fire_times()
+            
             logger.info(f"✅ Conectado a MongoDB: {self.database_name}")
             return True
             
@@ -79,16 +96,45 @@ class DatabaseManager:
             await self.reminders.create_index("user_id")
             await self.reminders.create_index("date")
             await self.reminders.create_index("status")
-            await self.reminders.create_index([("user_id", 1), ("status", 1)])
+            await self.reminders.create_index([("user_id", 1), ("status", 1), ("date", 1)])
+            await self.reminders.create_index([("status", 1), ("next_fire_at", 1)])
+            await self.reminders.create_index([("user_id", 1), ("created_at", -1)])
+            # Búsqueda de texto por usuario: prefijo de igualdad (user_id, status) + stemming en español
+            await self.reminders.create_index(
+                [("user_id", 1), ("status", 1), ("text", "text"), ("original_input", "text")],
+                name="reminders_text_search",
+                default_language=TEXT_SEARCH_LANGUAGE,
+                weights={"text": 3, "original_input": 1}
+            )
             
             # Índices para notas
             await self.notes.create_index("user_id")
             await self.notes.create_index("created_at")
             await self.notes.create_index([("user_id", 1), ("created_at", -1)])
+            await self.notes.create_index([("user_id", 1), ("priority", 1), ("created_at", -1)])
+            await self.notes.create_index([("user_id", 1), ("tags", 1), ("created_at", -1)])
             
             # Índices para memoria de IA
-            await self.ai_memory.create_index("user_id")
-            await self.ai_memory.create_index("memory_type")
+            await self.ai_memory.create_index([("user_id", 1), ("memory_type", 1), ("created_at", -1)])
+            await self.ai_memory.create_index("expires_at", expireAfterSeconds=0)  # Retención por tipo
+            
+            # Índices para la cola de sincronización con calendario
+            await self.calendar_outbox.create_index([("status", 1), ("next_attempt_at", 1), ("created_at", 1)])
+            await self.calendar_outbox.create_index([("reminder_id", 1), ("status", 1)])
+            
+            # Índices para el espejo local del calendario
+            await self.calendar_events.create_index([("calendar_url", 1), ("href", 1)], unique=True)
+            await self.calendar_events.create_index([("calendar_url", 1), ("dtstart", 1)])
+            await self.calendar_events.create_index([("calendar_url", 1), ("uid", 1)])
+            await self.calendar_events.create_index([("calendar_url", 1), ("rrule", 1), ("dtstart", 1)])
+            await self.calendar_sync_state.create_index("calendar_url", unique=True)
+            
+            # Caché de respuestas del LLM (MongoDB borra las vencidas)
+            await self.llm_cache.create_index("key", unique=True)
+            await self.llm_cache.create_index("expires_at", expireAfterSeconds=0)
+            
+            # Histogramas de hábitos (un documento por usuario)
+            await self.habit_histograms.create_index("user_id", unique=True)
             
             logger.info("📋 Índices de MongoDB creados")
             
@@ -98,14 +144,15 @@ class DatabaseManager:
     # --- MÉTODOS PARA USUARIOS ---
     
     async def add_user(self, user_data: Dict[str, Any]) -> bool:
-        """Registrar nuevo usuario"""
+        """Registrar nuevo usuario o actualizar su perfil (created_at solo al insertar)"""
         try:
             user = User(**user_data)
+            fields = user.dict(exclude={"id", "created_at"})
             
             # Usar upsert para evitar duplicados
             result = await self.users.update_one(
                 {"user_id": user.user_id},
-                {"$set": user.dict()},
+                {"$set": fields, "$setOnInsert": {"created_at": user.created_at}},
                 upsert=True
             )
             
@@ -129,72 +176,222 @@ class DatabaseManager:
             logger.error(f"❌ Error obteniendo usuario: {e}")
             return None
     
+    async def update_users_activity(self, activity: Dict[int, datetime]) -> int:
+        """
+        Guardar last_activity de varios usuarios en un solo bulk_write
+        
+        Args:
+            activity: {user_id: última actividad}
+        
+        Returns:
+            Usuarios actualizados
+        """
+        if not activity:
+            return 0
+        try:
+            operations = [
+                UpdateOne({"user_id": user_id}, {"$max": {"last_activity": last_activity}})
+                for user_id, last_activity in activity.items()
+            ]
+            result = await self.users.bulk_write(operations, ordered=False)
+            return result.modified_count
+        except Exception as e:
+            logger.error(f"❌ Error guardando actividad de usuarios: {e}")
+            return 0
+    
     # --- MÉTODOS PARA RECORDATORIOS ---
     
-    async def add_reminder(self, reminder_data: Dict[str, Any]) -> bool:
-        """Crear recordatorio"""
+    async def add_reminder(self, reminder_data: Dict[str, Any]) -> Optional[Reminder]:
+        """Crear recordatorio (devuelve el recordatorio guardado o None)"""
         try:
             reminder = Reminder(**reminder_data)
-            result = await self.reminders.insert_one(reminder.dict())
+            reminder.next_fire_at, reminder.next_fire_kind = reminder.compute_next_fire()
+            result = await self.reminders.insert_one(reminder.dict(by_alias=True))
             
             if result.inserted_id:
                 logger.info(f"⏰ Recordatorio creado para usuario {reminder.user_id}")
-                return True
-            return False
+                return reminder
+            return None
             
         except Exception as e:
             logger.error(f"❌ Error creando recordatorio: {e}")
-            return False
+            return None
+    
+    async def add_reminders_bulk(self, reminders_data: List[Dict[str, Any]]) -> List[Optional[Reminder]]:
+        """
+        Crear varios recordatorios en un solo viaje (insert_many no ordenado)
+        
+        Returns:
+            Lista alineada con la entrada: el recordatorio guardado o None si falló
+        """
+        results: List[Optional[Reminder]] = [None] * len(reminders_data)
+        valid = []
+        
+        for index, reminder_data in enumerate(reminders_data):
+            try:
+                reminder = Reminder(**reminder_data)
+                reminder.next_fire_at, reminder.next_fire_kind = reminder.compute_next_fire()
+                valid.append((index, reminder))
+            except Exception as e:
+                logger.warning(f"⚠️ Recordatorio inválido en lote (#{index}): {e}")
+        
+        if not valid:
+            return results
+        
+        failed = set()
+        try:
+            await self.reminders.insert_many(
+                [reminder.dict(by_alias=True) for _, reminder in valid], ordered=False
+            )
+        except BulkWriteError as e:
+            # Con ordered=False el resto del lote se inserta igual
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            logger.warning(f"⚠️ {len(failed)} recordatorios del lote no se guardaron")
+        except Exception as e:
+            logger.error(f"❌ Error creando recordatorios en lote: {e}")
+            return results
+        
+        for position, (index, reminder) in enumerate(valid):
+            if position not in failed:
+                results[index] = reminder
+        
+        saved = len(valid) - len(failed)
+        if saved:
+            logger.info(f"⏰ {saved} recordatorios creados en lote")
+        return results
     
     async def get_pending_reminders(self, current_time: datetime, tolerance_seconds: int = 30) -> List[Reminder]:
-        """Obtener recordatorios pendientes"""
+        """Obtener recordatorios cuyo próximo disparo cae dentro de la tolerancia"""
         try:
-            # Buscar recordatorios principales
-            main_query = {
+            query = {
                 "status": ReminderStatus.PENDING,
-                "notified": False,
-                "date": {
-                    "$gte": datetime.fromtimestamp(current_time.timestamp() - tolerance_seconds),
-                    "$lte": datetime.fromtimestamp(current_time.timestamp() + tolerance_seconds)
+                "next_fire_at": {
+                    "$gte": current_time - timedelta(seconds=tolerance_seconds),
+                    "$lte": current_time + timedelta(seconds=tolerance_seconds)
                 }
             }
             
-            # Buscar pre-recordatorios
-            pre_query = {
+            pending_reminders = []
+            cursor = self.reminders.find(query)
+            async for reminder_data in cursor:
+                pending_reminders.append(Reminder(**reminder_data))
+            
+            return pending_reminders
+            
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo recordatorios pendientes: {e}")
+            return []
+    
+    async def get_reminders_in_window(self, start: datetime, end: datetime) -> List[Reminder]:
+        """Obtener recordatorios pendientes con algún disparo (principal o previo) en la ventana"""
+        try:
+            # Pre-recordatorios perdidos (bot caído) dejarían next_fire_at atascado antes de la ventana
+            await self.advance_stale_fire_times(start)
+            
+            # El próximo disparo es el más temprano: si hay alguno en la ventana, next_fire_at también lo está
+            query = {
                 "status": ReminderStatus.PENDING,
-                "pre_reminders": {
-                    "$elemMatch": {
-                        "$gte": datetime.fromtimestamp(current_time.timestamp() - tolerance_seconds),
-                        "$lte": datetime.fromtimestamp(current_time.timestamp() + tolerance_seconds)
-                    }
-                }
+                "next_fire_at": {"$gte": start, "$lte": end}
             }
             
-            pending_reminders = []
+            reminders = []
+            cursor = self.reminders.find(query)
+            async for reminder_data in cursor:
+                reminders.append(Reminder(**reminder_data))
+            
+            return reminders
+            
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo recordatorios de la ventana: {e}")
+            return []
+    
+    async def advance_stale_fire_times(self, before: datetime) -> int:
+        """
+        Recalcular next_fire_at de recordatorios cuyo disparo quedó en el pasado
+        
+        Args:
+            before: Los disparos anteriores a esta hora se consideran perdidos
+        
+        Returns:
+            Número de recordatorios actualizados
+        """
+        try:
+            # Pre-recordatorios perdidos, y series cuyo aviso principal se perdió (pasan a la próxima ocurrencia)
+            query = {
+                "status": ReminderStatus.PENDING,
+                "next_fire_at": {"$lt": before},
+                "$or": [
+                    {"next_fire_kind": "pre_reminder"},
+                    {"next_fire_kind": "main", "rrule": {"$type": "string"}}
+                ]
+            }
             
-            # Obtener recordatorios principales
-            cursor = self.reminders.find(main_query)
+            operations = []
+            cursor = self.reminders.find(query)
             async for reminder_data in cursor:
-                pending_reminders.append(Reminder(**reminder_data))
+                reminder = Reminder(**reminder_data)
+                changes = {}
+                if reminder.rrule and reminder.date < before:
+                    if reminder.advance_occurrence(before, settings.PRE_REMINDER_DAYS, now=before):
+                        changes = self._occurrence_changes(reminder)
+                    else:
+                        changes = {"notified": True}
+                        reminder.notified = True
+                next_fire_at, next_fire_kind = reminder.compute_next_fire(not_before=before)
+                operations.append(UpdateOne(
+                    {"_id": reminder.id},
+                    {"$set": {**changes, "next_fire_at": next_fire_at, "next_fire_kind": next_fire_kind}}
+                ))
+            
+            if operations:
+                await self.reminders.bulk_write(operations, ordered=False)
+                logger.info(f"⏭️ {len(operations)} recordatorios con disparos vencidos reprogramados")
+            
+            return len(operations)
+            
+        except Exception as e:
+            logger.error(f"❌ Error reprogramando disparos vencidos: {e}")
+            return 0
+    
+    async def migrate_next_fire_times(self, batch_size: int = 500) -> int:
+        """
+        Migración: calcular next_fire_at/next_fire_kind en recordatorios que no los tienen
+        
+        Returns:
+            Número de recordatorios migrados
+        """
+        try:
+            query = {"next_fire_kind": {"$exists": False}}
+            now = datetime.utcnow()
             
-            # Obtener pre-recordatorios
-            cursor = self.reminders.find(pre_query)
+            migrated = 0
+            operations = []
+            cursor = self.reminders.find(query)
             async for reminder_data in cursor:
                 reminder = Reminder(**reminder_data)
-                # Verificar cuáles pre-recordatorios están pendientes
-                for pre_time in reminder.pre_reminders:
-                    time_diff = abs((pre_time - current_time).total_seconds())
-                    if time_diff <= tolerance_seconds:
-                        pre_key = pre_time.isoformat()
-                        if not reminder.pre_reminder_notified.get(pre_key, False):
-                            pending_reminders.append(reminder)
-                            break
+                next_fire_at, next_fire_kind = reminder.compute_next_fire(not_before=now)
+                operations.append(UpdateOne(
+                    {"_id": reminder.id},
+                    {"$set": {"next_fire_at": next_fire_at, "next_fire_kind": next_fire_kind}}
+                ))
+                
+                if len(operations) >= batch_size:
+                    await self.reminders.bulk_write(operations, ordered=False)
+                    migrated += len(operations)
+                    operations = []
             
-            return pending_reminders
+            if operations:
+                await self.reminders.bulk_write(operations, ordered=False)
+                migrated += len(operations)
+            
+            if migrated:
+                logger.info(f"🔧 Migración next_fire_at: {migrated} recordatorios actualizados")
+            
+            return migrated
             
         except Exception as e:
-            logger.error(f"❌ Error obteniendo recordatorios pendientes: {e}")
-            return []
+            logger.error(f"❌ Error migrando next_fire_at: {e}")
+            return 0
     
     async def get_reminder_by_id(self, reminder_id: str, user_id: int) -> Optional[Dict[str, Any]]:
         """Obtener recordatorio por ID"""
@@ -222,32 +419,65 @@ class DatabaseManager:
             logger.error(f"❌ Error eliminando recordatorio: {e}")
             return False
     
-    async def search_reminders_by_text(self, user_id: int, text_pattern: str) -> List[Dict[str, Any]]:
-        """Buscar recordatorios por patrón de texto"""
-        try:
-            query = {
-                "user_id": user_id,
-                "status": ReminderStatus.PENDING,
-                "$or": [
-                    {"text": {"$regex": text_pattern, "$options": "i"}},
-                    {"original_input": {"$regex": text_pattern, "$options": "i"}}
-                ]
-            }
-            
-            reminders = []
-            cursor = self.reminders.find(query)
+    async def _find_reminders_by_text(self, query: Dict[str, Any], text_pattern: str) -> List[Dict[str, Any]]:
+        """
+        Recordatorios que coinciden con un texto, del más al menos relevante
+
+        Usa el índice de texto (stemming en español, sin tildes) y exige todos los términos.
+        Si no hay resultados (palabra incompleta, solo palabras vacías) recurre a una
+        búsqueda literal escapada, acotada por el índice (user_id, status).
+        """
+        if not text_pattern or not text_pattern.strip():
+            return []
+        
+        reminders = []
+        terms = search_terms(text_pattern)
+        if terms:
+            try:
+                # Solo palabras: comillas y guiones del usuario no se leen como frase/negación
+                cursor = self.reminders.find(
+                    {**query, "$text": {"$search": " ".join(terms), "$language": TEXT_SEARCH_LANGUAGE}},
+                    {"score": {"$meta": "textScore"}}
+                ).sort([("score", {"$meta": "textScore"})])
+                async for reminder in cursor:
+                    reminder.pop("score", None)
+                    if matches_all_terms(f"{reminder.get('text', '')} {reminder.get('original_input', '')}", terms):
+                        reminders.append(reminder)
+            except OperationFailure as e:
+                logger.warning(f"⚠️ Búsqueda de texto no disponible, usando búsqueda literal: {e}")
+        
+        if not reminders:
+            literal = {"$regex": re.escape(text_pattern.strip()), "$options": "i"}
+            cursor = self.reminders.find({**query, "$or": [{"text": literal}, {"original_input": literal}]})
             async for reminder in cursor:
                 reminders.append(reminder)
-            
-            return reminders
+        
+        return reminders
+    
+    async def search_reminders_by_text(self, user_id: int, text_pattern: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Buscar recordatorios pendientes por texto
+        
+        Args:
+            user_id: ID del usuario
+            text_pattern: Texto libre (no se interpreta como regex)
+            limit: Máximo de resultados (None = todos)
+        
+        Returns:
+            Documentos ordenados por relevancia
+        """
+        try:
+            query = {"user_id": user_id, "status": ReminderStatus.PENDING}
+            reminders = await self._find_reminders_by_text(query, text_pattern)
+            return reminders[:limit] if limit else reminders
         except Exception as e:
             logger.error(f"❌ Error buscando recordatorios por texto: {e}")
             return []
     
     async def get_reminders_by_date_and_pattern(self, user_id: int, target_date: datetime, text_pattern: str) -> List[Dict[str, Any]]:
-        """Obtener recordatorios en fecha específica que coincidan con patrón"""
+        """Obtener recordatorios en fecha específica que coincidan con el texto"""
         try:
-            # Buscar en un rango de ±12 horas para la fecha objetivo
+            # Buscar en el día completo de la fecha objetivo
             start_date = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
             end_date = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
             
@@ -257,25 +487,23 @@ class DatabaseManager:
                 "date": {
                     "$gte": start_date,
                     "$lte": end_date
-                },
-                "$or": [
-                    {"text": {"$regex": text_pattern, "$options": "i"}},
-                    {"original_input": {"$regex": text_pattern, "$options": "i"}}
-                ]
+                }
             }
-            
-            reminders = []
-            cursor = self.reminders.find(query)
-            async for reminder in cursor:
-                reminders.append(reminder)
-            
-            return reminders
+            return await self._find_reminders_by_text(query, text_pattern)
         except Exception as e:
             logger.error(f"❌ Error obteniendo recordatorios por fecha y patrón: {e}")
             return []
     
-    async def mark_as_notified(self, reminder_id: str, is_pre_reminder: bool = False, pre_reminder_time: Optional[datetime] = None) -> bool:
-        """Marcar recordatorio como notificado"""
+    async def mark_as_notified(self, reminder_id: str, is_pre_reminder: bool = False, pre_reminder_time: Optional[datetime] = None) -> Optional[Reminder]:
+        """
+        Marcar recordatorio como notificado y avanzar su próximo disparo
+        
+        En una serie (rrule) el aviso principal no la cierra: se materializa la
+        próxima ocurrencia con sus pre-recordatorios.
+        
+        Returns:
+            Recordatorio actualizado, o None si no existe o falló
+        """
         try:
             if is_pre_reminder and pre_reminder_time:
                 # Marcar pre-recordatorio específico
@@ -286,23 +514,104 @@ class DatabaseManager:
                 # Marcar recordatorio principal
                 update_data = {"notified": True}
             
-            result = await self.reminders.update_one(
+            reminder_data = await self.reminders.find_one_and_update(
                 {"_id": ObjectId(reminder_id)},
-                {"$set": update_data}
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER
             )
             
-            return result.modified_count > 0
+            if not reminder_data:
+                return None
+            
+            reminder = Reminder(**reminder_data)
+            changes = {}
+            if not is_pre_reminder and reminder.rrule:
+                if reminder.advance_occurrence(reminder.date, settings.PRE_REMINDER_DAYS):
+                    changes = self._occurrence_changes(reminder)
+                else:
+                    logger.info(f"🔁 Serie terminada: {reminder_id}")
+            
+            reminder.next_fire_at, reminder.next_fire_kind = reminder.compute_next_fire(not_before=pre_reminder_time)
+            await self.reminders.update_one(
+                {"_id": reminder.id},
+                {"$set": {**changes, "next_fire_at": reminder.next_fire_at, "next_fire_kind": reminder.next_fire_kind}}
+            )
+            
+            return reminder
             
         except Exception as e:
             logger.error(f"❌ Error marcando como notificado: {e}")
+            return None
+    
+    @staticmethod
+    def _occurrence_changes(reminder: Reminder) -> Dict[str, Any]:
+        """Campos que cambian al materializar otra ocurrencia de una serie"""
+        return {
+            "date": reminder.date,
+            "pre_reminders": reminder.pre_reminders,
+            "pre_reminder_notified": reminder.pre_reminder_notified,
+            "notified": reminder.notified
+        }
+    
+    async def update_reminder_recurrence(self, reminder: Reminder) -> bool:
+        """
+        Guardar la regla, EXDATEs y ocurrencia materializada de una serie editada
+        
+        Args:
+            reminder: Recordatorio con rrule/exdates ya modificados y avanzado a su próxima ocurrencia
+        
+        Returns:
+            bool: True si se actualizó
+        """
+        try:
+            reminder.next_fire_at, reminder.next_fire_kind = reminder.compute_next_fire()
+            result = await self.reminders.update_one(
+                {"_id": reminder.id},
+                {"$set": {
+                    **self._occurrence_changes(reminder),
+                    "rrule": reminder.rrule,
+                    "exdates": reminder.exdates,
+                    "next_fire_at": reminder.next_fire_at,
+                    "next_fire_kind": reminder.next_fire_kind,
+                    "updated_at": datetime.utcnow()
+                }}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            logger.error(f"❌ Error actualizando recurrencia del recordatorio: {e}")
             return False
     
-    async def get_user_reminders(self, user_id: int, status: Optional[ReminderStatus] = None, limit: int = 10) -> List[Reminder]:
-        """Obtener recordatorios de usuario"""
+    async def get_user_reminders(
+        self,
+        user_id: int,
+        status: Optional[ReminderStatus] = None,
+        limit: int = 10,
+        after: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Reminder]:
+        """
+        Obtener recordatorios de usuario ordenados por fecha
+        
+        Args:
+            user_id: ID del usuario
+            status: Filtrar por estado
+            limit: Máximo de recordatorios
+            after: Solo con fecha posterior (exclusivo)
+            until: Solo con fecha hasta (inclusivo)
+        """
         try:
             query = {"user_id": user_id}
             if status:
                 query["status"] = status
+            # El rango va en la consulta: lo resuelve el índice (user_id, status, date)
+            date_range = {}
+            if after:
+                date_range["$gt"] = after
+            if until:
+                date_range["$lte"] = until
+            if date_range:
+                query["date"] = date_range
             
             cursor = self.reminders.find(query).sort("date", 1).limit(limit)
             reminders = []
@@ -316,22 +625,110 @@ class DatabaseManager:
             logger.error(f"❌ Error obteniendo recordatorios de usuario: {e}")
             return []
     
+    async def get_weekly_reminder_stats(self, user_id: int, since: datetime, recent_limit: int = 10) -> Dict[str, Any]:
+        """
+        Conteos por estado y últimos recordatorios creados desde `since` (una agregación)
+        
+        Returns:
+            {"total", "by_status": {estado: n}, "recent": [docs, del más antiguo al más nuevo]}
+        """
+        try:
+            pipeline = [
+                # Rango sobre el índice (user_id, created_at): el costo no crece con el historial
+                {"$match": {"user_id": user_id, "created_at": {"$gte": since}}},
+                {"$facet": {
+                    "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                    "recent": [
+                        {"$sort": {"created_at": -1}},
+                        {"$limit": recent_limit},
+                        {"$project": {"_id": 0, "text": 1, "date": 1, "status": 1, "created_at": 1}}
+                    ]
+                }}
+            ]
+            result = {"by_status": [], "recent": []}
+            async for row in self.reminders.aggregate(pipeline):
+                result = row
+            
+            by_status = {row["_id"]: row["count"] for row in result["by_status"]}
+            return {
+                "total": sum(by_status.values()),
+                "by_status": by_status,
+                "recent": list(reversed(result["recent"]))
+            }
+        except Exception as e:
+            logger.error(f"❌ Error agregando resumen semanal de recordatorios: {e}")
+            return {"total": 0, "by_status": {}, "recent": []}
+    
     # --- MÉTODOS PARA NOTAS ---
     
-    async def add_note(self, note_data: Dict[str, Any]) -> bool:
-        """Guardar nota"""
+    async def add_note(self, note_data: Dict[str, Any]) -> Optional[Note]:
+        """Guardar nota (retorna la nota con su _id, o None si falló)"""
         try:
-            note = Note(**note_data)
-            result = await self.notes.insert_one(note.dict())
+            document = Note(**note_data).dict()
+            result = await self.notes.insert_one(document)
             
             if result.inserted_id:
-                logger.info(f"📝 Nota creada para usuario {note.user_id}")
-                return True
-            return False
+                logger.info(f"📝 Nota creada para usuario {document['user_id']}")
+                return Note(**{**document, "_id": result.inserted_id})
+            return None
             
         except Exception as e:
             logger.error(f"❌ Error creando nota: {e}")
-            return False
+            return None
+    
+    async def get_notes_by_priority(self, user_id: int, priority: str, limit: int = 10) -> List[Note]:
+        """Notas con la prioridad, más recientes primero (índice (user_id, priority, created_at))"""
+        try:
+            priority = priority.lower()
+            # Las notas sin prioridad cuentan como "medium"
+            values = [priority, None] if priority == "medium" else [priority]
+            cursor = self.notes.find({
+                "user_id": user_id,
+                "priority": {"$in": values}
+            }).sort("created_at", -1).limit(limit)
+            return [Note(**note_data) async for note_data in cursor]
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo notas por prioridad: {e}")
+            return []
+    
+    async def get_notes_by_tag(self, user_id: int, tag: str, limit: int = 10) -> List[Note]:
+        """Notas con la etiqueta, más recientes primero (índice (user_id, tags, created_at))"""
+        try:
+            cursor = self.notes.find({
+                "user_id": user_id,
+                "tags": {"$in": list({tag, tag.lower()})}
+            }).sort("created_at", -1).limit(limit)
+            return [Note(**note_data) async for note_data in cursor]
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo notas por etiqueta: {e}")
+            return []
+    
+    async def get_notes_for_index(self, user_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Texto y metadatos de todas las notas del usuario, de la más antigua a la más reciente (None si falló)"""
+        try:
+            cursor = self.notes.find(
+                {"user_id": user_id},
+                {"_id": 1, "text": 1, "tags": 1, "priority": 1, "note_type": 1, "created_at": 1}
+            ).sort("created_at", 1)
+            return [note async for note in cursor]
+        except Exception as e:
+            logger.error(f"❌ Error cargando notas para el índice: {e}")
+            return None
+    
+    async def get_notes_by_ids(self, user_id: int, note_ids: List[str]) -> List[Note]:
+        """Notas del usuario por ID, en el orden pedido"""
+        try:
+            cursor = self.notes.find({
+                "user_id": user_id,
+                "_id": {"$in": [ObjectId(note_id) for note_id in note_ids]}
+            })
+            found = {}
+            async for note_data in cursor:
+                found[str(note_data["_id"])] = Note(**note_data)
+            return [found[note_id] for note_id in note_ids if note_id in found]
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo notas por ID: {e}")
+            return []
     
     async def get_notes_by_keyword(self, user_id: int, keyword: str, limit: int = 10) -> List[Note]:
         """Buscar notas por palabra clave"""
@@ -356,27 +753,78 @@ class DatabaseManager:
             logger.error(f"❌ Error buscando notas: {e}")
             return []
     
+    async def get_weekly_note_stats(self, user_id: int, since: datetime, top_tags: int = 5, recent_limit: int = 10) -> Dict[str, Any]:
+        """
+        Conteos por tipo/prioridad, etiquetas top y últimas notas creadas desde `since` (una agregación)
+        
+        Returns:
+            {"total", "types", "priorities", "top_tags": [(tag, n)], "recent": [docs, de la más antigua a la más nueva]}
+        """
+        try:
+            pipeline = [
+                {"$match": {"user_id": user_id, "created_at": {"$gte": since}}},
+                {"$facet": {
+                    "total": [{"$count": "count"}],
+                    "types": [{"$group": {"_id": {"$ifNull": ["$note_type", "general"]}, "count": {"$sum": 1}}}],
+                    "priorities": [{"$group": {"_id": {"$ifNull": ["$priority", "medium"]}, "count": {"$sum": 1}}}],
+                    "top_tags": [
+                        {"$unwind": "$tags"},
+                        {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1, "_id": 1}},
+                        {"$limit": top_tags}
+                    ],
+                    "recent": [
+                        {"$sort": {"created_at": -1}},
+                        {"$limit": recent_limit},
+                        {"$project": {"_id": 0, "text": 1, "tags": 1, "created_at": 1}}
+                    ]
+                }}
+            ]
+            result = {"total": [], "types": [], "priorities": [], "top_tags": [], "recent": []}
+            async for row in self.notes.aggregate(pipeline):
+                result = row
+            
+            return {
+                "total": result["total"][0]["count"] if result["total"] else 0,
+                "types": {row["_id"]: row["count"] for row in result["types"]},
+                "priorities": {row["_id"]: row["count"] for row in result["priorities"]},
+                "top_tags": [(row["_id"], row["count"]) for row in result["top_tags"]],
+                "recent": list(reversed(result["recent"]))
+            }
+        except Exception as e:
+            logger.error(f"❌ Error agregando resumen semanal de notas: {e}")
+            return {"total": 0, "types": {}, "priorities": {}, "top_tags": [], "recent": []}
+    
     # --- MÉTODOS PARA MEMORIA DE IA ---
     
-    async def add_ai_memory(self, memory_data: Dict[str, Any]) -> bool:
-        """Guardar memoria de IA"""
+    async def add_ai_memory(self, memory_data: Dict[str, Any]) -> Optional[AIMemory]:
+        """Guardar memoria de IA (devuelve la memoria guardada)"""
         try:
-            memory = AIMemory(**memory_data)
-            result = await self.ai_memory.insert_one(memory.dict())
+            document = AIMemory(**memory_data).dict()
+            result = await self.ai_memory.insert_one(document)
             
             if result.inserted_id:
-                logger.info(f"🧠 Memoria IA guardada para usuario {memory.user_id}")
-                return True
-            return False
+                logger.info(f"🧠 Memoria IA guardada para usuario {document['user_id']}")
+                return AIMemory(**{**document, "_id": result.inserted_id})
+            return None
             
         except Exception as e:
             logger.error(f"❌ Error guardando memoria IA: {e}")
-            return False
+            return None
     
-    async def get_user_context(self, user_id: int, limit: int = 5) -> List[AIMemory]:
-        """Obtener contexto reciente del usuario"""
+    async def get_user_context(
+        self,
+        user_id: int,
+        limit: int = 5,
+        memory_types: Optional[List[str]] = None
+    ) -> List[AIMemory]:
+        """Obtener contexto reciente del usuario (más nuevo primero, opcionalmente por tipo)"""
         try:
-            cursor = self.ai_memory.find({"user_id": user_id}).sort("last_accessed", -1).limit(limit)
+            query: Dict[str, Any] = {"user_id": user_id}
+            if memory_types:
+                query["memory_type"] = {"$in": list(memory_types)}
+            
+            cursor = self.ai_memory.find(query).sort("created_at", -1).limit(limit)
             memories = []
             
             async for memory_data in cursor:
@@ -388,6 +836,148 @@ class DatabaseManager:
             logger.error(f"❌ Error obteniendo contexto de usuario: {e}")
             return []
     
+    async def add_ai_memories_bulk(self, memories: List[AIMemory]) -> int:
+        """
+        Guardar varias memorias con un solo insert_many (el _id viene de la memoria)
+        
+        Returns:
+            Memorias guardadas (las ya existentes de un reintento cuentan como guardadas)
+        """
+        if not memories:
+            return 0
+        documents = [{**memory.dict(), "_id": memory.id} for memory in memories]
+        try:
+            await self.ai_memory.insert_many(documents, ordered=False)
+            return len(documents)
+        except BulkWriteError as e:
+            failed = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+            if failed:
+                logger.error(f"❌ {len(failed)} memorias IA no se guardaron: {failed[0].get('errmsg')}")
+            return len(documents) - len(failed)
+        except Exception as e:
+            logger.error(f"❌ Error guardando memorias IA: {e}")
+            return 0
+    
+    async def increment_memory_access(self, access: Dict[ObjectId, int], accessed_at: datetime) -> int:
+        """
+        Sumar accesos de varias memorias en un solo bulk_write
+        
+        Args:
+            access: {_id de la memoria: accesos acumulados}
+            accessed_at: Último acceso
+        
+        Returns:
+            Memorias actualizadas
+        """
+        if not access:
+            return 0
+        try:
+            operations = [
+                UpdateOne(
+                    {"_id": memory_id},
+                    {"$inc": {"access_count": count}, "$max": {"last_accessed": accessed_at}}
+                )
+                for memory_id, count in access.items()
+            ]
+            result = await self.ai_memory.bulk_write(operations, ordered=False)
+            return result.modified_count
+        except Exception as e:
+            logger.error(f"❌ Error guardando accesos a memorias IA: {e}")
+            return 0
+    
+    def _compactable_context(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        query: Dict[str, Any] = {"memory_type": MemoryType.CONTEXT, "source": {"$ne": CONTEXT_SUMMARY_SOURCE}}
+        if user_id is not None:
+            query["user_id"] = user_id
+        return query
+    
+    async def get_users_to_compact(self, before: datetime, keep_latest: int) -> List[int]:
+        """Usuarios con contexto anterior a `before` o con más de `keep_latest` entradas"""
+        try:
+            pipeline = [
+                {"$match": self._compactable_context()},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}, "oldest": {"$min": "$created_at"}}},
+                {"$match": {"$or": [{"oldest": {"$lt": before}}, {"count": {"$gt": keep_latest}}]}},
+                {"$project": {"_id": 1}}
+            ]
+            return [row["_id"] async for row in self.ai_memory.aggregate(pipeline)]
+        except Exception as e:
+            logger.error(f"❌ Error buscando contexto para compactar: {e}")
+            return []
+    
+    async def get_context_to_compact(self, user_id: int, before: datetime, keep_latest: int) -> Optional[Dict[str, Any]]:
+        """
+        Contexto que se compactará: anterior a `before` o fuera de las `keep_latest` entradas más recientes
+        
+        Returns:
+            {"cutoff", "total", "newest", "by_source": {origen: {"count", "last_text", "newest"}}} o None si no hay
+        """
+        try:
+            query = self._compactable_context(user_id)
+            cutoff = before
+            overflow = await self.ai_memory.find(query, {"created_at": 1}).sort("created_at", -1).skip(keep_latest).limit(1).to_list(1)
+            if overflow:
+                cutoff = max(cutoff, overflow[0]["created_at"] + timedelta(microseconds=1))
+            
+            pipeline = [
+                {"$match": {**query, "created_at": {"$lt": cutoff}}},
+                {"$sort": {"created_at": -1}},
+                {"$group": {
+                    "_id": "$source",
+                    "count": {"$sum": 1},
+                    "last_text": {"$first": "$text"},
+                    "newest": {"$first": "$created_at"}
+                }}
+            ]
+            groups = [row async for row in self.ai_memory.aggregate(pipeline)]
+            if not groups:
+                return None
+            
+            return {
+                "cutoff": cutoff,
+                "total": sum(group["count"] for group in groups),
+                "newest": max(group["newest"] for group in groups),
+                "by_source": {
+                    group["_id"]: {"count": group["count"], "last_text": group["last_text"], "newest": group["newest"]}
+                    for group in groups
+                }
+            }
+        except Exception as e:
+            logger.error(f"❌ Error leyendo contexto para compactar: {e}")
+            return None
+    
+    async def get_context_summary(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Memoria resumen del contexto compactado"""
+        try:
+            return await self.ai_memory.find_one({
+                "user_id": user_id, "memory_type": MemoryType.CONTEXT, "source": CONTEXT_SUMMARY_SOURCE
+            })
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo resumen de contexto: {e}")
+            return None
+    
+    async def fold_context(self, user_id: int, cutoff: datetime, summary: Dict[str, Any]) -> int:
+        """
+        Guardar el resumen del usuario y borrar el contexto anterior a `cutoff`
+        
+        Args:
+            summary: Campos de la memoria resumen (text, counts, created_at...)
+        
+        Returns:
+            Entradas de contexto borradas
+        """
+        try:
+            await self.ai_memory.update_one(
+                {"user_id": user_id, "memory_type": MemoryType.CONTEXT, "source": CONTEXT_SUMMARY_SOURCE},
+                {"$set": summary},
+                upsert=True
+            )
+            result = await self.ai_memory.delete_many({**self._compactable_context(user_id), "created_at": {"$lt": cutoff}})
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"❌ Error compactando contexto: {e}")
+            return 0
+    
     async def delete_all_user_reminders(self, user_id: int) -> int:
         """Eliminar todos los recordatorios de un usuario"""
         try:
@@ -403,6 +993,18 @@ class DatabaseManager:
             logger.error(f"❌ Error eliminando recordatorios: {e}")
             return 0
     
+    async def delete_note(self, note_id: str, user_id: int) -> bool:
+        """Eliminar una nota del usuario"""
+        try:
+            result = await self.notes.delete_one({
+                "_id": ObjectId(note_id),
+                "user_id": user_id
+            })
+            return result.deleted_count > 0
+        except Exception as e:
+            logger.error(f"❌ Error eliminando nota: {e}")
+            return False
+    
     async def delete_all_user_notes(self, user_id: int) -> int:
         """Eliminar todas las notas de un usuario"""
         try:
@@ -418,6 +1020,36 @@ class DatabaseManager:
             logger.error(f"❌ Error eliminando notas: {e}")
             return 0
     
+    async def set_reminder_calendar_event(self, reminder_id: str, reference: Dict[str, Any]) -> bool:
+        """
+        Guardar la referencia del evento de calendario de un recordatorio
+        
+        Args:
+            reminder_id: ID del recordatorio
+            reference: Dict con "uid", "href" y "etag" (los valores None se omiten)
+        
+        Returns:
+            bool: True si se actualizó
+        """
+        try:
+            changes = {
+                f"calendar_{key}": value
+                for key, value in reference.items()
+                if key in ("uid", "href", "etag") and value
+            }
+            if not changes:
+                return False
+            
+            result = await self.reminders.update_one(
+                {"_id": ObjectId(reminder_id)},
+                {"$set": changes}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            logger.error(f"❌ Error guardando evento de calendario del recordatorio: {e}")
+            return False
+    
     async def update_reminder_text(self, reminder_id: str, new_text: str) -> bool:
         """
         Actualizar el texto de un recordatorio
@@ -449,4 +1081,368 @@ class DatabaseManager:
                 
         except Exception as e:
             logger.error(f"❌ Error actualizando texto de recordatorio: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    # --- MÉTODOS PARA COLA DE CALENDARIO ---
+    
+    async def enqueue_calendar_operation(self, operation: Dict[str, Any]) -> bool:
+        """Encolar una operación de calendario (create, delete, rename, recurrence, delete_pattern)"""
+        try:
+            now = datetime.utcnow()
+            operation.setdefault("status", "pending")
+            operation.setdefault("attempts", 0)
+            operation.setdefault("created_at", now)
+            operation.setdefault("next_attempt_at", now)
+            
+            result = await self.calendar_outbox.insert_one(operation)
+            return bool(result.inserted_id)
+            
+        except Exception as e:
+            logger.error(f"❌ Error encolando operación de calendario: {e}")
+            return False
+    
+    async def enqueue_calendar_operations(self, operations: List[Dict[str, Any]]) -> int:
+        """Encolar varias operaciones de calendario en un solo insert_many"""
+        if not operations:
+            return 0
+        try:
+            now = datetime.utcnow()
+            for operation in operations:
+                operation.setdefault("status", "pending")
+                operation.setdefault("attempts", 0)
+                operation.setdefault("created_at", now)
+                operation.setdefault("next_attempt_at", now)
+            
+            result = await self.calendar_outbox.insert_many(operations, ordered=False)
+            return len(result.inserted_ids)
+            
+        except BulkWriteError as e:
+            return e.details.get("nInserted", 0)
+        except Exception as e:
+            logger.error(f"❌ Error encolando operaciones de calendario: {e}")
+            return 0
+    
+    async def cancel_pending_calendar_operations(self, reminder_id: str, operations: List[str]) -> int:
+        """Descartar operaciones pendientes (aún no tomadas por el worker) de un recordatorio"""
+        try:
+            result = await self.calendar_outbox.delete_many({
+                "reminder_id": reminder_id,
+                "status": "pending",
+                "operation": {"$in": operations}
+            })
+            return result.deleted_count
+            
+        except Exception as e:
+            logger.error(f"❌ Error cancelando operaciones de calendario: {e}")
+            return 0
+    
+    async def update_pending_calendar_operation(self, reminder_id: str, operation: str, changes: Dict[str, Any]) -> bool:
+        """Modificar en sitio una operación pendiente de un recordatorio (coalescencia)"""
+        try:
+            result = await self.calendar_outbox.update_one(
+                {"reminder_id": reminder_id, "status": "pending", "operation": operation},
+                {"$set": changes}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            logger.error(f"❌ Error actualizando operación de calendario: {e}")
+            return False
+    
+    async def claim_calendar_operations(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Tomar hasta `limit` operaciones listas, en orden de llegada
+        
+        Un borrado/renombrado/cambio de regla espera a que termine la creación anterior
+        del mismo recordatorio (pendiente de reintento o en curso); si no, un reintento
+        posterior de la creación dejaría un evento huérfano
+        """
+        try:
+            now = datetime.utcnow()
+            claimed = []
+            blocked = []
+            
+            while len(claimed) < limit:
+                query = {"status": "pending", "next_attempt_at": {"$lte": now}}
+                if blocked:
+                    query["_id"] = {"$nin": blocked}
+                operation = await self.calendar_outbox.find_one_and_update(
+                    query,
+                    {"$set": {"status": "processing", "claimed_at": now}},
+                    sort=[("created_at", 1)],
+                    return_document=ReturnDocument.AFTER
+                )
+                if not operation:
+                    break
+                
+                if operation["operation"] != "create" and operation.get("reminder_id") and await self.calendar_outbox.find_one({
+                    "reminder_id": operation["reminder_id"],
+                    "operation": "create",
+                    "status": {"$in": ["pending", "processing"]},
+                    "created_at": {"$lt": operation["created_at"]}
+                }, {"_id": 1}):
+                    await self.calendar_outbox.update_one(
+                        {"_id": operation["_id"]},
+                        {"$set": {"status": "pending"}, "$unset": {"claimed_at": ""}}
+                    )
+                    blocked.append(operation["_id"])
+                    continue
+                claimed.append(operation)
+            
+            return claimed
+            
+        except Exception as e:
+            logger.error(f"❌ Error tomando operaciones de calendario: {e}")
+            return []
+    
+    async def complete_calendar_operation(self, operation_id: ObjectId) -> bool:
+        """Quitar de la cola una operación terminada"""
+        try:
+            result = await self.calendar_outbox.delete_one({"_id": operation_id})
+            return result.deleted_count > 0
+            
+        except Exception as e:
+            logger.error(f"❌ Error completando operación de calendario: {e}")
+            return False
+    
+    async def retry_calendar_operation(self, operation_id: ObjectId, error: str, next_attempt_at: Optional[datetime]) -> bool:
+        """Devolver una operación fallida a la cola (o marcarla failed si next_attempt_at es None)"""
+        try:
+            changes = {"last_error": error}
+            if next_attempt_at:
+                changes.update({"status": "pending", "next_attempt_at": next_attempt_at})
+            else:
+                changes["status"] = "failed"
+            
+            result = await self.calendar_outbox.update_one(
+                {"_id": operation_id},
+                {"$set": changes, "$inc": {"attempts": 1}}
+            )
+            return result.modified_count > 0
+            
+        except Exception as e:
+            logger.error(f"❌ Error reprogramando operación de calendario: {e}")
+            return False
+    
+    async def release_stale_calendar_operations(self) -> int:
+        """Devolver a pendiente las operaciones que quedaron tomadas tras un reinicio"""
+        try:
+            result = await self.calendar_outbox.update_many(
+                {"status": "processing"},
+                {"$set": {"status": "pending"}}
+            )
+            return result.modified_count
+            
+        except Exception as e:
+            logger.error(f"❌ Error liberando operaciones de calendario: {e}")
+            return 0
+    
+    async def count_calendar_operations(self) -> Dict[str, int]:
+        """Contar operaciones de la cola por estado"""
+        try:
+            counts = {}
+            async for row in self.calendar_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+                counts[row["_id"]] = row["count"]
+            return counts
+            
+        except Exception as e:
+            logger.error(f"❌ Error contando operaciones de calendario: {e}")
+            return {}
+    
+    # --- MÉTODOS PARA ESPEJO DE CALENDARIO ---
+    
+    async def get_calendar_sync_state(self, calendar_url: str) -> Optional[Dict[str, Any]]:
+        """Obtener el sync-token/ctag de la última sincronización del calendario"""
+        try:
+            return await self.calendar_sync_state.find_one({"calendar_url": calendar_url})
+            
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo estado de sincronización: {e}")
+            return None
+    
+    async def save_calendar_sync_state(self, calendar_url: str, state: Dict[str, Any]) -> bool:
+        """Guardar el sync-token/ctag de la sincronización (campos None se omiten)"""
+        try:
+            changes = {key: value for key, value in state.items() if value is not None}
+            await self.calendar_sync_state.update_one(
+                {"calendar_url": calendar_url},
+                {"$set": changes},
+                upsert=True
+            )
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Error guardando estado de sincronización: {e}")
+            return False
+    
+    async def get_mirrored_etags(self, calendar_url: str) -> Dict[str, Optional[str]]:
+        """Mapa href → etag de los eventos del espejo"""
+        try:
+            cursor = self.calendar_events.find(
+                {"calendar_url": calendar_url},
+                {"_id": 0, "href": 1, "etag": 1}
+            )
+            return {doc["href"]: doc.get("etag") async for doc in cursor}
+            
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo etags del espejo: {e}")
+            return {}
+    
+    async def upsert_mirrored_events(self, calendar_url: str, events: List[Dict[str, Any]]) -> int:
+        """Insertar o actualizar eventos del espejo (un solo bulk_write, clave href)"""
+        try:
+            if not events:
+                return 0
+            
+            now = datetime.utcnow()
+            operations = [
+                UpdateOne(
+                    {"calendar_url": calendar_url, "href": event["href"]},
+                    {"$set": {**event, "calendar_url": calendar_url, "synced_at": now}},
+                    upsert=True
+                )
+                for event in events
+            ]
+            result = await self.calendar_events.bulk_write(operations, ordered=False)
+            return result.upserted_count + result.modified_count
+            
+        except Exception as e:
+            logger.error(f"❌ Error actualizando espejo de calendario: {e}")
+            return 0
+    
+    async def delete_mirrored_events(self, calendar_url: str, hrefs: List[str]) -> int:
+        """Quitar eventos del espejo por href"""
+        try:
+            if not hrefs:
+                return 0
+            result = await self.calendar_events.delete_many({
+                "calendar_url": calendar_url,
+                "href": {"$in": list(hrefs)}
+            })
+            return result.deleted_count
+            
+        except Exception as e:
+            logger.error(f"❌ Error eliminando eventos del espejo: {e}")
+            return 0
+    
+    async def delete_mirrored_events_by_uid(self, calendar_url: str, uid: str) -> int:
+        """Quitar eventos del espejo por UID"""
+        try:
+            result = await self.calendar_events.delete_many({"calendar_url": calendar_url, "uid": uid})
+            return result.deleted_count
+            
+        except Exception as e:
+            logger.error(f"❌ Error eliminando eventos del espejo: {e}")
+            return 0
+    
+    async def find_mirrored_events(
+        self,
+        calendar_url: str,
+        start: datetime,
+        end: datetime,
+        title_pattern: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Eventos del espejo que empiezan en [start, end], más las series (con RRULE) iniciadas antes de `end`,
+        opcionalmente con el texto en el título; la expansión de las series la hace el espejo
+        """
+        try:
+            query = {
+                "calendar_url": calendar_url,
+                "$or": [
+                    {"dtstart": {"$gte": start, "$lte": end}},
+                    {"rrule": {"$type": "string"}, "dtstart": {"$lte": end}}
+                ]
+            }
+            if title_pattern:
+                query["summary"] = {"$regex": re.escape(title_pattern), "$options": "i"}
+            
+            cursor = self.calendar_events.find(query).sort("dtstart", 1)
+            return await cursor.to_list(length=None)
+            
+        except Exception as e:
+            logger.error(f"❌ Error buscando eventos en el espejo: {e}")
+            return []
+    
+    async def count_mirrored_events(self, calendar_url: str) -> int:
+        """Número de eventos en el espejo"""
+        try:
+            return await self.calendar_events.count_documents({"calendar_url": calendar_url})
+            
+        except Exception as e:
+            logger.error(f"❌ Error contando eventos del espejo: {e}")
+            return 0
+    
+    # --- MÉTODOS PARA CACHÉ DEL LLM ---
+    
+    async def get_llm_cache_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtener una respuesta cacheada del LLM (None si no existe o venció)"""
+        try:
+            return await self.llm_cache.find_one(
+                {"key": key, "expires_at": {"$gt": datetime.utcnow()}},
+                {"_id": 0, "value": 1, "reference_time": 1, "anchor": 1}
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Error leyendo caché del LLM: {e}")
+            return None
+    
+    async def save_llm_cache_entry(self, key: str, entry: Dict[str, Any], expires_at: datetime) -> bool:
+        """Guardar una respuesta del LLM (el índice TTL la elimina al vencer)"""
+        try:
+            await self.llm_cache.update_one(
+                {"key": key},
+                {"$set": {**entry, "key": key, "expires_at": expires_at}},
+                upsert=True
+            )
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Error guardando caché del LLM: {e}")
+            return False
+    
+    # --- MÉTODOS PARA HISTOGRAMAS DE HÁBITOS ---
+    
+    async def get_habit_histogram(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Contadores de hora y día de la semana del usuario"""
+        try:
+            return await self.habit_histograms.find_one(
+                {"user_id": user_id}, {"_id": 0, "hours": 1, "weekdays": 1, "updated_at": 1}
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Error leyendo histograma de hábitos: {e}")
+            return None
+    
+    async def increment_habit_histogram(self, user_id: int, increments: Dict[str, int], initial: Dict[str, Any]) -> bool:
+        """
+        Sumar contadores al histograma del usuario ($inc sobre posiciones del array)
+        
+        Args:
+            increments: {"hours.9": 1, "weekdays.0": 1, ...}
+            initial: Documento completo a insertar si el usuario aún no tiene histograma
+        """
+        if not increments:
+            return True
+        try:
+            now = datetime.utcnow()
+            result = await self.habit_histograms.update_one(
+                {"user_id": user_id},
+                {"$inc": increments, "$set": {"updated_at": now}}
+            )
+            if result.matched_count:
+                return True
+            
+            # Primer recordatorio: un $inc con upsert crearía objetos en vez de arrays
+            try:
+                await self.habit_histograms.insert_one({"user_id": user_id, **initial, "updated_at": now})
+            except DuplicateKeyError:
+                await self.habit_histograms.update_one(
+                    {"user_id": user_id},
+                    {"$inc": increments, "$set": {"updated_at": now}}
+                )
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Error actualizando histograma de hábitos: {e}")
+            return False
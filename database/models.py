@@ -3,11 +3,13 @@ Modelos de datos para MongoDB
 """
 
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Annotated
+from typing import List, Optional, Dict, Any, Annotated, Tuple
 from enum import Enum
 from pydantic import BaseModel, Field, BeforeValidator
 from bson import ObjectId
 
+from utils.recurrence import iteration_start, next_occurrence, series_pre_reminders
+
 
 def validate_object_id(v: Any) -> ObjectId:
     """Validador para ObjectId"""
@@ -46,6 +48,10 @@ class MemoryType(str, Enum):
     PATTERN = "pattern"
 
 
+# Origen de la memoria que resume el contexto compactado de un usuario
+CONTEXT_SUMMARY_SOURCE = "context_summary"
+
+
 class User(BaseModel):
     """Modelo de usuario"""
     id: PyObjectId = Field(default_factory=ObjectId, alias="_id")
@@ -75,17 +81,80 @@ class Reminder(BaseModel):
     date: datetime = Field(..., description="Fecha y hora del recordatorio")
     recurring: bool = Field(default=False, description="Si es un recordatorio recurrente")
     frequency: Optional[str] = Field(None, description="Frecuencia de recurrencia (daily, weekly, monthly)")
+    rrule: Optional[str] = Field(None, description="Regla de recurrencia RFC 5545 (ej: FREQ=WEEKLY;BYDAY=MO)")
+    series_start: Optional[datetime] = Field(None, description="Primera ocurrencia de la serie (DTSTART)")
+    exdates: List[datetime] = Field(default_factory=list, description="Ocurrencias excluidas de la serie")
     pre_reminders: List[datetime] = Field(default_factory=list, description="Recordatorios previos")
     status: ReminderStatus = Field(default=ReminderStatus.PENDING)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     notified: bool = Field(default=False, description="Si ya se notificó")
     pre_reminder_notified: Dict[str, bool] = Field(default_factory=dict, description="Notificaciones previas enviadas")
+    next_fire_at: Optional[datetime] = Field(None, description="Próximo disparo pendiente (principal o previo)")
+    next_fire_kind: Optional[str] = Field(None, description="Tipo del próximo disparo (main, pre_reminder)")
+    calendar_uid: Optional[str] = Field(None, description="UID del evento en Apple Calendar")
+    calendar_href: Optional[str] = Field(None, description="URL del recurso del evento en CalDAV")
+    calendar_etag: Optional[str] = Field(None, description="ETag de la última versión escrita del evento")
     
     model_config = {
         "populate_by_name": True,
         "arbitrary_types_allowed": True,
         "json_encoders": {ObjectId: str}
     }
+    
+    def compute_next_fire(self, not_before: Optional[datetime] = None) -> Tuple[Optional[datetime], Optional[str]]:
+        """
+        Calcular el próximo disparo pendiente
+        
+        Args:
+            not_before: Ignorar pre-recordatorios anteriores a esta hora (ya vencidos)
+        
+        Returns:
+            Tupla (hora, tipo) o (None, None) si no queda nada por enviar
+        """
+        if self.status != ReminderStatus.PENDING or self.notified:
+            return None, None
+        
+        for pre_time in sorted(self.pre_reminders):
+            if not_before and pre_time < not_before:
+                continue
+            if not self.pre_reminder_notified.get(pre_time.isoformat(), False):
+                return pre_time, "pre_reminder"
+        
+        return self.date, "main"
+    
+    def next_occurrence(self, after: datetime) -> Optional[datetime]:
+        """Próxima ocurrencia de la serie posterior a `after` (None si no es serie o terminó)"""
+        if not self.rrule:
+            return None
+        series_start = self.series_start or self.date
+        # La ocurrencia materializada es válida como inicio si no se busca antes de ella
+        known = self.date if after >= self.date else None
+        return next_occurrence(self.rrule, iteration_start(self.rrule, series_start, known), after, self.exdates)
+    
+    def advance_occurrence(self, after: datetime, pre_reminder_days: List[int], now: Optional[datetime] = None) -> bool:
+        """
+        Mover la serie a su próxima ocurrencia (solo se materializa una a la vez)
+        
+        Args:
+            after: Las ocurrencias hasta esta hora ya pasaron
+            pre_reminder_days: Días de anticipación de los pre-recordatorios
+            now: Hora actual (los pre-recordatorios anteriores se omiten)
+        
+        Returns:
+            True si quedó una ocurrencia pendiente; False si la serie terminó
+        """
+        upcoming = self.next_occurrence(after)
+        if not upcoming:
+            return False
+        
+        start = iteration_start(self.rrule, self.series_start or self.date, self.date)
+        self.date = upcoming
+        self.pre_reminders = series_pre_reminders(
+            self.rrule, start, upcoming, pre_reminder_days, self.exdates, now
+        )
+        self.pre_reminder_notified = {}
+        self.notified = False
+        return True
 
 
 class Note(BaseModel):
@@ -135,6 +204,7 @@ class AIMemory(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_accessed: Optional[datetime] = Field(None)
     access_count: int = Field(default=0)
+    expires_at: Optional[datetime] = Field(None, description="Borrado automático (índice TTL)")
     
     model_config = {
         "populate_by_name": True,
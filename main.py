@@ -12,10 +12,13 @@ from loguru import logger
 from config.settings import Settings
 from bot.telegram_interface import TelegramBot
 from bot.scheduler_service import SchedulerService
-from bot.calendar_integration import initialize_apple_calendar
+from bot.calendar_integration import initialize_apple_calendar, close_apple_calendar
+from bot.calendar_outbox import initialize_calendar_outbox
+from bot.calendar_mirror import initialize_calendar_mirror
 from database.connection import DatabaseManager
 from utils.logger import setup_logger
 from utils.health_server import HealthServer
+from utils.http_client import HttpClient
 
 
 async def main():
@@ -42,6 +45,14 @@ async def main():
         )
         if calendar_success:
             logger.info("🍎 Apple Calendar integrado correctamente")
+            
+            # Sincronización con iCloud en segundo plano
+            calendar_outbox = initialize_calendar_outbox(db_manager)
+            await calendar_outbox.start()
+            
+            # Espejo local del calendario (sync-token / ctag)
+            calendar_mirror = initialize_calendar_mirror(db_manager)
+            await calendar_mirror.start()
         else:
             logger.warning("⚠️ Apple Calendar no disponible (continuando sin integración)")
         
@@ -50,12 +61,24 @@ async def main():
         health_server = HealthServer(health_port)
         await health_server.start()
         
+        # Cliente HTTP compartido (Telegram + OpenRouter)
+        http_client = HttpClient()
+        await http_client.start()
+        
         # Inicializar servicios
-        scheduler_service = SchedulerService(db_manager, settings.TELEGRAM_BOT_TOKEN)
-        telegram_bot = TelegramBot(settings.TELEGRAM_BOT_TOKEN, db_manager, settings.OPENROUTER_API_KEY)
+        scheduler_service = SchedulerService(db_manager, settings.TELEGRAM_BOT_TOKEN, http_client=http_client)
+        telegram_bot = TelegramBot(
+            settings.TELEGRAM_BOT_TOKEN,
+            db_manager,
+            settings.OPENROUTER_API_KEY,
+            http_client=http_client
+        )
+        health_server.register_stats("memory_cache", telegram_bot.memory_index.get_cache_stats)
+        health_server.register_stats("user_cache", telegram_bot.user_registry.get_stats)
+        health_server.register_stats("llm_cache", telegram_bot.ai_interpreter.cache.get_stats)
         
         # Iniciar scheduler en segundo plano
-        scheduler_service.start()
+        await scheduler_service.start()
         logger.info("⏰ Scheduler iniciado")
         
         # Iniciar bot de Telegram
@@ -70,9 +93,16 @@ async def main():
     finally:
         # Cleanup
         if 'scheduler_service' in locals():
-            scheduler_service.stop()
+            await scheduler_service.stop()
+        if 'calendar_outbox' in locals():
+            await calendar_outbox.stop()
+        if 'calendar_mirror' in locals():
+            await calendar_mirror.stop()
         if 'health_server' in locals():
             await health_server.stop()
+        if 'http_client' in locals():
+            await http_client.close()
+        close_apple_calendar()
         if 'db_manager' in locals():
             await db_manager.close()
         logger.info("✅ Bot detenido correctamente")
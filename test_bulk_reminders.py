@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test de la creación de recordatorios en lote (un solo insert_many por serie)
+"""
+
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bot.calendar_outbox as outbox_module
+from bot.calendar_outbox import CalendarOutbox
+from bot.reminder_manager import ReminderManager
+from database.connection import DatabaseManager
+
+ROUND_TRIP = 0.02
+
+
+class InsertResult:
+    def __init__(self, ids):
+        self.inserted_id = ids[0] if ids else None
+        self.inserted_ids = ids
+
+
+class FakeCollection:
+    """Colección de Motor simulada con latencia fija por viaje"""
+
+    def __init__(self, reject_text=None):
+        self.docs = {}
+        self.round_trips = 0
+        self.reject_text = reject_text
+
+    async def insert_one(self, document):
+        result = await self.insert_many([document])
+        return InsertResult(result.inserted_ids)
+
+    async def insert_many(self, documents, ordered=True):
+        self.round_trips += 1
+        await asyncio.sleep(ROUND_TRIP)
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            if document["_id"] in self.docs or (self.reject_text and document.get("text") == self.reject_text):
+                errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+                if ordered:
+                    break
+                continue
+            self.docs[document["_id"]] = document
+            inserted.append(document["_id"])
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertResult(inserted)
+
+
+def _make_db(reject_text=None) -> DatabaseManager:
+    db = DatabaseManager("mongodb://test", "test")
+    db.reminders = FakeCollection(reject_text)
+    db.calendar_outbox = FakeCollection()
+    return db
+
+
+def _series(days: int, start_in_days: int = 1):
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=start_in_days)
+    return [
+        {"original_input": "gym todos los días", "text": "gym", "date": start + timedelta(days=i)}
+        for i in range(days)
+    ]
+
+
+def _run(coro_factory):
+    outbox_module.calendar_outbox = None
+    try:
+        return asyncio.run(coro_factory())
+    finally:
+        outbox_module.calendar_outbox = None
+
+
+def test_series_is_one_round_trip():
+    """Una serie de 7 recordatorios se guarda y encola con un viaje a cada colección"""
+    print("🧪 Testing creación en lote...")
+
+    async def scenario():
+        db = _make_db()
+        outbox_module.calendar_outbox = CalendarOutbox(db)
+        results = await ReminderManager(db).create_reminders_bulk(1, _series(7))
+        return db, results
+
+    db, results = _run(scenario)
+    assert results == [True] * 7
+    assert db.reminders.round_trips == 1 and len(db.reminders.docs) == 7
+    assert db.calendar_outbox.round_trips == 1 and len(db.calendar_outbox.docs) == 7
+
+    stored = list(db.reminders.docs.values())
+    assert all(doc["next_fire_at"] for doc in stored)
+    assert all(doc["pre_reminders"] == sorted(doc["pre_reminders"]) for doc in stored)
+    print("✅ 7 recordatorios en un solo insert_many")
+
+
+def test_pre_reminders_match_single_path():
+    """El cálculo en lote da lo mismo que el cálculo por recordatorio"""
+    manager = ReminderManager(_make_db())
+    dates = [item["date"] for item in _series(10)]
+    assert manager._calculate_pre_reminders_bulk(dates) == [manager._calculate_pre_reminders(d) for d in dates]
+    print("✅ Pre-recordatorios en lote equivalentes")
+
+
+def test_partial_failures_are_reported_per_item():
+    """Fechas pasadas y errores de escritura se reportan en su posición; el resto se guarda"""
+    async def scenario():
+        db = _make_db(reject_text="dentista")
+        items = _series(3)
+        items.insert(1, {"original_input": "ayer", "text": "ayer", "date": datetime.utcnow() - timedelta(days=1)})
+        items.append({"original_input": "dentista", "text": "dentista", "date": items[0]["date"]})
+        results = await ReminderManager(db).create_reminders_bulk(1, items)
+        return db, results
+
+    db, results = _run(scenario)
+    assert results == [True, False, True, True, False], results
+    assert len(db.reminders.docs) == 3
+    print("✅ Fallos parciales reportados por recordatorio")
+
+
+def benchmark_bulk_vs_loop():
+    """Tiempo de guardar una serie: create_reminder en bucle vs create_reminders_bulk"""
+    print(f"\n📈 BENCHMARK: serie de recordatorios (latencia simulada {ROUND_TRIP * 1000:.0f} ms/viaje)")
+    print("=" * 60)
+
+    for size in (7, 30):
+        async def loop():
+            db = _make_db()
+            outbox_module.calendar_outbox = CalendarOutbox(db)
+            manager = ReminderManager(db)
+            started = time.perf_counter()
+            for item in _series(size):
+                await manager.create_reminder(1, item["original_input"], item["text"], item["date"])
+            return time.perf_counter() - started, db.reminders.round_trips + db.calendar_outbox.round_trips
+
+        async def bulk():
+            db = _make_db()
+            outbox_module.calendar_outbox = CalendarOutbox(db)
+            started = time.perf_counter()
+            await ReminderManager(db).create_reminders_bulk(1, _series(size))
+            return time.perf_counter() - started, db.reminders.round_trips + db.calendar_outbox.round_trips
+
+        loop_time, loop_trips = _run(loop)
+        bulk_time, bulk_trips = _run(bulk)
+        print(f"{size:>3} recordatorios: bucle {loop_trips:>3} viajes {loop_time * 1000:>6.0f} ms"
+              f" | lote {bulk_trips} viajes {bulk_time * 1000:>4.0f} ms")
+
+
+if __name__ == "__main__":
+    test_series_is_one_round_trip()
+    test_pre_reminders_match_single_path()
+    test_partial_failures_are_reported_per_item()
+    benchmark_bulk_vs_loop()
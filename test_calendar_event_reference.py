@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test de borrado/renombrado de eventos por UID/href (sin barrer el calendario)
+"""
+
+import asyncio
+import sys
+import os
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import caldav
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.calendar_integration import AppleCalendarIntegration, make_event_uid
+
+
+class RecordingCalDAVHandler(BaseHTTPRequestHandler):
+    """CalDAV mínimo en memoria que registra cada petición"""
+
+    events = {}
+    requests = []
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def _send(self, status: int, body: bytes = b"", headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        body = self._body()
+        self.requests.append(("PUT", self.path, self.headers.get("If-Match"), self.headers.get("If-None-Match")))
+        current = self.events.get(self.path)
+        if self.headers.get("If-None-Match") == "*" and current:
+            return self._send(412)
+        if self.headers.get("If-Match") and (not current or current[1] != self.headers["If-Match"]):
+            return self._send(412)
+        etag = f'"{len(self.requests)}"'
+        self.events[self.path] = (body, etag)
+        self._send(201, headers={"ETag": etag})
+
+    def do_GET(self):
+        self.requests.append(("GET", self.path))
+        if self.path not in self.events:
+            return self._send(404)
+        body, etag = self.events[self.path]
+        self._send(200, body, {"ETag": etag, "Content-Type": "text/calendar"})
+
+    def do_DELETE(self):
+        self.requests.append(("DELETE", self.path))
+        self._send(204 if self.events.pop(self.path, None) else 404)
+
+    def do_REPORT(self):
+        self._body()
+        self.requests.append(("REPORT", self.path))
+        self._send(207, b'<?xml version="1.0"?><d:multistatus xmlns:d="DAV:"></d:multistatus>')
+
+    def log_message(self, *args):
+        pass
+
+
+def _setup():
+    RecordingCalDAVHandler.events = {}
+    RecordingCalDAVHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingCalDAVHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    integration = AppleCalendarIntegration("test@icloud.com", "app-password", calendar_url=base_url)
+    integration.client = caldav.DAVClient(url=base_url, username="test", password="test")
+    integration.calendar = caldav.Calendar(client=integration.client, url=f"{base_url}/calendars/home/")
+    return server, integration
+
+
+def test_create_delete_by_reference():
+    """El evento se crea con el UID del recordatorio y se borra con un solo DELETE"""
+    print("🧪 Testing eventos por UID/href...")
+    server, integration = _setup()
+    uid = make_event_uid("6523f0c2a1b2c3d4e5f60718")
+
+    async def scenario():
+        reference = await integration.create_event("Examen Logística", datetime.utcnow() + timedelta(days=5), uid=uid)
+        deleted = await integration.delete_event_by_reference(reference["uid"], reference["href"])
+        return reference, deleted
+
+    try:
+        reference, deleted = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    methods = [request[0] for request in RecordingCalDAVHandler.requests]
+    print(f"   📡 {methods}")
+    assert reference["uid"] == uid
+    assert reference["href"].endswith(".ics") and reference["etag"]
+    assert deleted is True
+    assert methods == ["PUT", "DELETE"]
+    assert RecordingCalDAVHandler.events == {}
+    print("✅ Borrado directo, sin date_search")
+
+
+def test_rename_uses_if_match():
+    """Renombrar hace GET + PUT condicional con el ETag vigente"""
+    server, integration = _setup()
+    uid = make_event_uid("6523f0c2a1b2c3d4e5f60719")
+
+    async def scenario():
+        reference = await integration.create_event("reunion", datetime.utcnow() + timedelta(days=1), uid=uid)
+        updated = await integration.update_event_by_reference("reunión con Ana", uid, reference["href"])
+        return reference, updated
+
+    try:
+        reference, updated = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    put = [r for r in RecordingCalDAVHandler.requests if r[0] == "PUT"]
+    assert put[1][2] == reference["etag"]
+    assert updated["etag"] != reference["etag"]
+    body = next(iter(RecordingCalDAVHandler.events.values()))[0].decode()
+    assert "reunión con Ana" in body
+    print("✅ Renombrado con If-Match")
+
+
+def test_retry_and_missing_event_are_idempotent():
+    """Reintentar una creación no duplica; borrar un evento inexistente no es error"""
+    server, integration = _setup()
+    uid = make_event_uid("6523f0c2a1b2c3d4e5f60720")
+
+    async def scenario():
+        date = datetime.utcnow() + timedelta(days=2)
+        first = await integration.create_event("gym", date, uid=uid)
+        retry = await integration.create_event("gym", date, uid=uid)
+        await integration.delete_event_by_reference(uid, first["href"])
+        again = await integration.delete_event_by_reference(uid, first["href"])
+        return first, retry, again
+
+    try:
+        first, retry, again = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    assert first and retry and retry["href"] == first["href"]
+    assert again is True
+    print("✅ Creación y borrado idempotentes")
+
+
+if __name__ == "__main__":
+    test_create_delete_by_reference()
+    test_rename_uses_if_match()
+    test_retry_and_missing_event_are_idempotent()
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Test del espejo local de Apple Calendar contra un servidor CalDAV local
+Sincronización incremental (sync-token y ctag/etag) y búsquedas servidas desde el espejo
+"""
+
+import asyncio
+import re
+import sys
+import os
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from xml.sax.saxutils import escape
+
+import caldav
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.calendar_integration import AppleCalendarIntegration
+from bot.calendar_mirror import CalendarMirror
+
+CALENDAR_PATH = "/calendars/home/"
+
+
+class FakeCalendarStore:
+    """Calendario en memoria con historial de cambios para sync-collection"""
+
+    def __init__(self, supports_sync: bool = True):
+        self.supports_sync = supports_sync
+        self.events = {}      # path -> (etag, ical)
+        self.changes = []     # (version, path)
+        self.version = 0
+        self.requests = []    # (método, tipo de cuerpo)
+        self.lock = threading.Lock()
+
+    def put(self, path: str, summary: str, start: datetime):
+        uid = path.rsplit("/", 1)[-1][:-4]
+        return self.put_raw(path, (
+            "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nBEGIN:VEVENT\r\n"
+            f"UID:{uid}\r\nSUMMARY:{summary}\r\n"
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%SZ')}\r\n"
+            f"DTEND:{(start + timedelta(hours=1)).strftime('%Y%m%dT%H%M%SZ')}\r\n"
+            "END:VEVENT\r\nEND:VCALENDAR\r\n"
+        ))
+
+    def put_raw(self, path: str, ical: str):
+        with self.lock:
+            self.version += 1
+            self.events[path] = (f'"v{self.version}"', ical)
+            self.changes.append((self.version, path))
+            return self.events[path][0]
+
+    def delete(self, path: str) -> bool:
+        with self.lock:
+            if self.events.pop(path, None) is None:
+                return False
+            self.version += 1
+            self.changes.append((self.version, path))
+            return True
+
+    def count(self, method: str, kind: str = None) -> int:
+        return sum(1 for m, k in self.requests if m == method and (kind is None or k == kind))
+
+
+class CalDAVHandler(BaseHTTPRequestHandler):
+    """Servidor CalDAV mínimo: sync-collection, calendar-multiget, PROPFIND, PUT y DELETE"""
+
+    store: FakeCalendarStore = None
+
+    def _send(self, status: int, body: bytes = b"", headers: dict = None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        if body:
+            self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> str:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode()
+
+    @staticmethod
+    def _multistatus(responses: str, extra: str = "") -> bytes:
+        return (
+            '<?xml version="1.0"?><d:multistatus xmlns:d="DAV:" '
+            'xmlns:c="urn:ietf:params:xml:ns:caldav" xmlns:cs="http://calendarserver.org/ns/">'
+            f"{responses}{extra}</d:multistatus>"
+        ).encode()
+
+    @staticmethod
+    def _etag_response(path: str, etag: str) -> str:
+        return (
+            f"<d:response><d:href>{path}</d:href><d:propstat><d:prop>"
+            f"<d:getetag>{escape(etag)}</d:getetag></d:prop>"
+            "<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>"
+        )
+
+    def do_REPORT(self):
+        body = self._body()
+        store = self.store
+
+        if "sync-collection" in body:
+            store.requests.append(("REPORT", "sync"))
+            if not store.supports_sync:
+                return self._send(501)
+            token = re.search(r"<d:sync-token>(.*?)</d:sync-token>", body).group(1)
+            since = int(token.rsplit("/", 1)[-1]) if token else 0
+            if token and since > store.version:
+                return self._send(403)
+
+            with store.lock:
+                if since:
+                    paths = {path for version, path in store.changes if version > since}
+                else:
+                    paths = set(store.events)
+                responses = ""
+                for path in sorted(paths):
+                    if path in store.events:
+                        responses += self._etag_response(path, store.events[path][0])
+                    else:
+                        responses += (
+                            f"<d:response><d:href>{path}</d:href>"
+                            "<d:status>HTTP/1.1 404 Not Found</d:status></d:response>"
+                        )
+                new_token = f"<d:sync-token>http://example.com/sync/{store.version}</d:sync-token>"
+            return self._send(207, self._multistatus(responses, new_token))
+
+        if "calendar-multiget" in body:
+            store.requests.append(("REPORT", "multiget"))
+            responses = ""
+            for path in re.findall(r"<d:href>(.*?)</d:href>", body):
+                if path in store.events:
+                    etag, ical = store.events[path]
+                    responses += (
+                        f"<d:response><d:href>{path}</d:href><d:propstat><d:prop>"
+                        f"<d:getetag>{escape(etag)}</d:getetag>"
+                        f"<c:calendar-data>{escape(ical)}</c:calendar-data></d:prop>"
+                        "<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>"
+                    )
+            return self._send(207, self._multistatus(responses))
+
+        # calendar-query (date_search): lo que el espejo debe evitar
+        store.requests.append(("REPORT", "query"))
+        return self._send(207, self._multistatus(""))
+
+    def do_PROPFIND(self):
+        self._body()
+        store = self.store
+        if self.headers.get("Depth") == "0":
+            store.requests.append(("PROPFIND", "ctag"))
+            responses = (
+                f"<d:response><d:href>{CALENDAR_PATH}</d:href><d:propstat><d:prop>"
+                f"<cs:getctag>ctag-{store.version}</cs:getctag></d:prop>"
+                "<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>"
+            )
+            return self._send(207, self._multistatus(responses))
+
+        store.requests.append(("PROPFIND", "etags"))
+        with store.lock:
+            responses = self._etag_response(CALENDAR_PATH, '"collection"')
+            for path, (etag, _) in sorted(store.events.items()):
+                responses += self._etag_response(path, etag)
+        return self._send(207, self._multistatus(responses))
+
+    def do_GET(self):
+        self.store.requests.append(("GET", None))
+        if self.path not in self.store.events:
+            return self._send(404)
+        etag, ical = self.store.events[self.path]
+        body = ical.encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/calendar; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        ical = self._body()
+        self.store.requests.append(("PUT", None))
+        etag = self.store.put_raw(self.path, ical)
+        self._send(201, headers={"ETag": etag})
+
+    def do_DELETE(self):
+        self.store.requests.append(("DELETE", None))
+        self._send(204 if self.store.delete(self.path) else 404)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockDatabaseManager:
+    """BD simulada: colecciones del espejo en memoria"""
+
+    def __init__(self):
+        self.state = {}
+        self.events = {}
+
+    async def get_calendar_sync_state(self, calendar_url):
+        return self.state.get(calendar_url)
+
+    async def save_calendar_sync_state(self, calendar_url, state):
+        self.state.setdefault(calendar_url, {}).update({k: v for k, v in state.items() if v is not None})
+        return True
+
+    async def get_mirrored_etags(self, calendar_url):
+        return {href: event.get("etag") for (url, href), event in self.events.items() if url == calendar_url}
+
+    async def upsert_mirrored_events(self, calendar_url, events):
+        for event in events:
+            self.events.setdefault((calendar_url, event["href"]), {}).update(event)
+        return len(events)
+
+    async def delete_mirrored_events(self, calendar_url, hrefs):
+        return sum(1 for href in hrefs if self.events.pop((calendar_url, href), None))
+
+    async def delete_mirrored_events_by_uid(self, calendar_url, uid):
+        keys = [key for key, event in self.events.items() if key[0] == calendar_url and event.get("uid") == uid]
+        for key in keys:
+            del self.events[key]
+        return len(keys)
+
+    async def find_mirrored_events(self, calendar_url, start, end, title_pattern=None):
+        found = [
+            event for (url, _), event in self.events.items()
+            if url == calendar_url and event.get("dtstart")
+            and (start <= event["dtstart"] <= end or (event.get("rrule") and event["dtstart"] <= end))
+            and (not title_pattern or title_pattern.lower() in event.get("summary", "").lower())
+        ]
+        return sorted(found, key=lambda event: event["dtstart"])
+
+    async def count_mirrored_events(self, calendar_url):
+        return sum(1 for url, _ in self.events if url == calendar_url)
+
+
+def _start_server(store: FakeCalendarStore):
+    handler = type("Handler", (CalDAVHandler,), {"store": store})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_mirror(server, db: MockDatabaseManager):
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    integration = AppleCalendarIntegration("test@icloud.com", "app-password", calendar_url=base_url)
+    integration.client = caldav.DAVClient(url=base_url, username="test", password="test")
+    integration.calendar = caldav.Calendar(client=integration.client, url=f"{base_url}{CALENDAR_PATH}")
+    mirror = CalendarMirror(db, integration)
+    integration.mirror = mirror
+    return integration, mirror
+
+
+def _seed(store: FakeCalendarStore, count: int, start: datetime):
+    for i in range(count):
+        store.put(f"{CALENDAR_PATH}evento-{i}.ics", f"evento {i}", start + timedelta(hours=i))
+
+
+def test_incremental_sync_downloads_only_changes():
+    """Tras la sincronización inicial solo se descargan los recursos cambiados"""
+    print("🧪 Testing espejo de calendario con sync-token...")
+
+    store = FakeCalendarStore()
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    _seed(store, 30, start)
+    server = _start_server(store)
+    db = MockDatabaseManager()
+    integration, mirror = _make_mirror(server, db)
+
+    async def scenario():
+        assert await mirror.sync()
+        first = (mirror.last_downloaded, len(db.events))
+
+        store.put(f"{CALENDAR_PATH}evento-3.ics", "evento 3 movido", start)
+        store.delete(f"{CALENDAR_PATH}evento-7.ics")
+        assert await mirror.sync()
+        second = (mirror.last_downloaded, mirror.last_deleted, len(db.events))
+
+        assert await mirror.sync()
+        third = mirror.last_downloaded
+        return first, second, third
+
+    try:
+        first, second, third = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    print(f"   📥 inicial {first[0]}, incremental {second[0]} (+{second[1]} borrado), sin cambios {third}")
+    assert first == (30, 30)
+    assert second == (1, 1, 29)
+    assert third == 0
+    assert store.count("REPORT", "multiget") == 2
+    summaries = {event["summary"] for event in db.events.values()}
+    assert "evento 3 movido" in summaries and "evento 7" not in summaries
+    print("✅ Solo se descargan los eventos cambiados")
+
+
+def test_invalid_token_triggers_full_resync():
+    """Un sync-token rechazado (403) rehace la sincronización completa"""
+    store = FakeCalendarStore()
+    _seed(store, 5, datetime.utcnow() + timedelta(days=1))
+    server = _start_server(store)
+    db = MockDatabaseManager()
+    integration, mirror = _make_mirror(server, db)
+    db.state[mirror.calendar_url] = {"sync_token": "http://example.com/sync/999"}
+    db.events[(mirror.calendar_url, mirror._absolute(f"{CALENDAR_PATH}fantasma.ics"))] = {"etag": '"x"'}
+
+    try:
+        synced = asyncio.run(mirror.sync())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    assert synced
+    assert mirror.last_mode == "sync-token (completo)"
+    assert len(db.events) == 5
+    print("✅ Token inválido → resincronización completa")
+
+
+def test_ctag_fallback_skips_unchanged_calendar():
+    """Sin sync-collection, un ctag igual evita listar el calendario"""
+    store = FakeCalendarStore(supports_sync=False)
+    _seed(store, 10, datetime.utcnow() + timedelta(days=1))
+    server = _start_server(store)
+    db = MockDatabaseManager()
+    integration, mirror = _make_mirror(server, db)
+
+    async def scenario():
+        assert await mirror.sync()
+        downloaded = mirror.last_downloaded
+        listings = store.count("PROPFIND", "etags")
+
+        assert await mirror.sync()
+        return downloaded, listings, store.count("PROPFIND", "etags")
+
+    try:
+        downloaded, listings_first, listings_second = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    assert mirror.last_mode == "ctag/etag"
+    assert downloaded == 10
+    assert listings_first == listings_second == 1
+    print("✅ Respaldo ctag/etag sin descargas repetidas")
+
+
+def test_lookups_are_served_from_mirror():
+    """Borrar y renombrar por título no hace búsquedas en iCloud; las escrituras propias quedan reflejadas"""
+    store = FakeCalendarStore()
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=2)
+    _seed(store, 3, start)
+    server = _start_server(store)
+    db = MockDatabaseManager()
+    integration, mirror = _make_mirror(server, db)
+
+    async def scenario():
+        await mirror.sync()
+
+        deleted = await integration.delete_event_by_title_and_date("evento 1", start + timedelta(hours=1))
+        renamed = await integration.update_event_title("evento 2", "evento 2 renombrado", start + timedelta(hours=2))
+        created = await integration.create_event("nuevo", start, uid="nuevo@oskaros-bot")
+
+        multigets = store.count("REPORT", "multiget")
+        await mirror.sync()
+        return deleted, renamed, created, multigets, mirror.last_downloaded, await mirror.count_events()
+
+    try:
+        deleted, renamed, created, multigets, redownloaded, count = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    assert deleted and renamed and created
+    assert store.count("REPORT", "query") == 0
+    assert store.count("DELETE") == 1
+    assert multigets == 1
+    # Las escrituras propias ya están en el espejo con su etag: no se vuelven a descargar
+    assert redownloaded == 0
+    assert count == 3
+    summaries = {event["summary"] for event in db.events.values()}
+    assert summaries == {"evento 0", "evento 2 renombrado", "nuevo"}
+    print("✅ Búsquedas locales, a iCloud solo van las escrituras")
+
+
+def _put_series(store: FakeCalendarStore, name: str, start: datetime, rule: str, exdates=()):
+    """Serie creada desde otro dispositivo: un solo VEVENT con RRULE (y EXDATE)"""
+    stamp = lambda value: value.strftime('%Y%m%dT%H%M%SZ')
+    exdate = f"EXDATE:{','.join(stamp(value) for value in exdates)}\r\n" if exdates else ""
+    store.put_raw(f"{CALENDAR_PATH}{name}.ics", (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nBEGIN:VEVENT\r\n"
+        f"UID:{name}\r\nSUMMARY:{name}\r\n"
+        f"DTSTART:{stamp(start)}\r\nDTEND:{stamp(start + timedelta(hours=1))}\r\n"
+        f"RRULE:{rule}\r\n{exdate}"
+        "END:VEVENT\r\nEND:VCALENDAR\r\n"
+    ))
+
+
+def test_recurring_series_are_expanded():
+    """Una serie iniciada en el pasado se encuentra por sus ocurrencias futuras; EXDATE y UNTIL se respetan"""
+    store = FakeCalendarStore()
+    now = datetime.utcnow().replace(microsecond=0)
+    past = now - timedelta(days=3)
+    tomorrow = now + timedelta(days=1)
+    _put_series(store, "gym", past, "FREQ=DAILY")
+    _put_series(store, "terminada", past, f"FREQ=DAILY;UNTIL={(now - timedelta(days=2)).strftime('%Y%m%dT%H%M%SZ')}")
+    _put_series(store, "yoga", tomorrow, "FREQ=DAILY", exdates=[tomorrow])
+    server = _start_server(store)
+    db = MockDatabaseManager()
+    integration, mirror = _make_mirror(server, db)
+
+    async def scenario():
+        await mirror.sync()
+        window = await mirror.find_events(tomorrow - timedelta(hours=2), tomorrow + timedelta(hours=2))
+        deleted = await integration.delete_events_by_title_pattern("gym")
+        return window, deleted
+
+    try:
+        window, deleted = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    assert [event["summary"] for event in window] == ["gym"]
+    assert abs(window[0]["occurrence"] - tomorrow) <= timedelta(hours=1)  # hora local fija (cambio de horario)
+    assert deleted == 1 and f"{CALENDAR_PATH}gym.ics" not in store.events
+    assert store.count("REPORT", "query") == 0
+    print("✅ Series del espejo expandidas con RRULE/EXDATE")
+
+
+def test_bot_series_with_past_start_is_deleted():
+    """Serie creada por el bot (un evento con RRULE) cuyo inicio ya pasó: se borra desde el espejo"""
+    store = FakeCalendarStore()
+    now = datetime.utcnow().replace(microsecond=0)
+    server = _start_server(store)
+    db = MockDatabaseManager()
+    integration, mirror = _make_mirror(server, db)
+
+    async def scenario():
+        await mirror.sync()
+        reference = await integration.create_event(
+            "gym", now - timedelta(days=3), uid="gym@oskaros-bot", rrule="FREQ=DAILY"
+        )
+        await integration.update_event_recurrence_by_reference(
+            "FREQ=DAILY", [now + timedelta(days=1)], uid=reference["uid"], href=reference["href"]
+        )
+        await mirror.sync()
+        redownloaded = mirror.last_downloaded
+        skipped = await mirror.find_events(now + timedelta(days=1), now + timedelta(days=1))
+        deleted = await integration.delete_event_by_title_and_date("gym", now + timedelta(days=2))
+        return redownloaded, skipped, deleted
+
+    try:
+        redownloaded, skipped, deleted = asyncio.run(scenario())
+    finally:
+        integration.close()
+        server.shutdown()
+
+    assert redownloaded == 0  # la regla quedó en el espejo al escribirla
+    assert skipped == []      # la ocurrencia excluida no cuenta
+    assert deleted and store.events == {}
+    assert store.count("REPORT", "query") == 0
+    print("✅ Serie con inicio pasado eliminada desde el espejo")
+
+
+if __name__ == "__main__":
+    test_incremental_sync_downloads_only_changes()
+    test_invalid_token_triggers_full_resync()
+    test_ctag_fallback_skips_unchanged_calendar()
+    test_lookups_are_served_from_mirror()
+    test_recurring_series_are_expanded()
+    test_bot_series_with_past_start_is_deleted()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test de la capa CalDAV no bloqueante contra un servidor CalDAV local lento
+La latencia del event loop debe mantenerse plana mientras hay operaciones en curso
+"""
+
+import asyncio
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import caldav
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.calendar_integration import AppleCalendarIntegration
+
+
+SLOW_SECONDS = 0.4
+EMPTY_MULTISTATUS = b'<?xml version="1.0"?><d:multistatus xmlns:d="DAV:"></d:multistatus>'
+
+
+class SlowCalDAVHandler(BaseHTTPRequestHandler):
+    """Responde PUT/REPORT como iCloud, pero con una demora deliberada"""
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        time.sleep(SLOW_SECONDS)
+
+        body = EMPTY_MULTISTATUS if self.command in ("REPORT", "PROPFIND") else b""
+        self.send_response(207 if body else 201)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_PUT = do_REPORT = do_PROPFIND = do_DELETE = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowCalDAVHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_integration(server) -> AppleCalendarIntegration:
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    integration = AppleCalendarIntegration("test@icloud.com", "app-password", calendar_url=base_url)
+    integration.client = caldav.DAVClient(url=base_url, username="test", password="test")
+    integration.calendar = caldav.Calendar(client=integration.client, url=f"{base_url}/calendars/home/")
+    return integration
+
+
+async def _measure_loop_lag(operations, interval: float = 0.01):
+    """Ejecutar operaciones mientras un 'handler' mide cuánto se atrasa el loop"""
+    lags = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - expected)
+
+    probe = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    results = await asyncio.gather(*operations)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe
+    return results, elapsed, max(lags) if lags else 0.0
+
+
+def test_event_loop_stays_responsive():
+    """Crear y borrar eventos en un CalDAV lento no atrasa el event loop"""
+    print("🧪 Testing CalDAV no bloqueante (servidor lento)...")
+
+    server = _start_stub()
+    integration = _make_integration(server)
+    date = datetime.utcnow() + timedelta(days=3)
+
+    async def scenario():
+        operations = [integration.create_event(f"evento {i}", date) for i in range(4)]
+        operations.append(integration.delete_event_by_title_and_date("evento 0", date))
+        return await _measure_loop_lag(operations)
+
+    results, elapsed, max_lag = asyncio.run(scenario())
+    integration.close()
+    server.shutdown()
+
+    print(f"   ⏱️ 5 operaciones en {elapsed:.2f}s, atraso máximo del loop {max_lag * 1000:.1f} ms")
+    assert all(results[:4])
+    assert max_lag < 0.1
+    assert elapsed < SLOW_SECONDS * 5
+    print("✅ Event loop sin bloqueos durante operaciones de calendario")
+
+
+def test_timeout_releases_caller():
+    """Una llamada colgada corta por timeout y devuelve None sin bloquear"""
+    server = _start_stub()
+    integration = _make_integration(server)
+    integration.timeout = 0.1
+
+    started = time.perf_counter()
+    created = asyncio.run(integration.create_event("lento", datetime.utcnow()))
+    elapsed = time.perf_counter() - started
+    integration.close()
+    server.shutdown()
+
+    assert created is None
+    assert elapsed < SLOW_SECONDS
+    print(f"✅ Timeout a los {elapsed:.2f}s")
+
+
+def benchmark_blocking_vs_pool():
+    """Atraso del event loop: caldav directo (antes) vs pool de hilos (ahora)"""
+    print("\n📈 BENCHMARK: atraso del event loop con 4 eventos creados")
+    print("=" * 50)
+
+    server = _start_stub()
+    integration = _make_integration(server)
+    date = datetime.utcnow() + timedelta(days=3)
+
+    async def blocking_create(i):
+        # Comportamiento anterior: save_event directamente en el loop
+        integration.calendar.save_event(
+            f"BEGIN:VCALENDAR\nVERSION:2.0\nBEGIN:VEVENT\nUID:bench-{i}\nSUMMARY:evento {i}\nEND:VEVENT\nEND:VCALENDAR"
+        )
+        return True
+
+    async def before():
+        return await _measure_loop_lag([blocking_create(i) for i in range(4)])
+
+    async def after():
+        return await _measure_loop_lag([integration.create_event(f"evento {i}", date) for i in range(4)])
+
+    _, before_elapsed, before_lag = asyncio.run(before())
+    _, after_elapsed, after_lag = asyncio.run(after())
+    integration.close()
+    server.shutdown()
+
+    print(f"caldav en el loop: {before_elapsed:.2f}s, atraso máximo {before_lag * 1000:.0f} ms")
+    print(f"pool de hilos:     {after_elapsed:.2f}s, atraso máximo {after_lag * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    test_event_loop_stays_responsive()
+    test_timeout_releases_caller()
+    benchmark_blocking_vs_pool()
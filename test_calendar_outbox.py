@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Test de la cola write-behind de Apple Calendar
+"""
+
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bot.calendar_outbox as outbox_module
+from bot.calendar_outbox import CalendarOutbox
+from bot.reminder_manager import ReminderManager
+from database.models import Reminder
+
+
+class MockDatabaseManager:
+    """BD simulada: recordatorios y outbox en memoria"""
+
+    def __init__(self):
+        self.reminders = {}
+        self.outbox = []
+
+    # Recordatorios
+    async def add_reminder(self, reminder_data):
+        reminder = Reminder(**reminder_data)
+        self.reminders[str(reminder.id)] = reminder
+        return reminder
+
+    async def get_reminder_by_id(self, reminder_id, user_id):
+        reminder = self.reminders.get(str(reminder_id))
+        return reminder.dict(by_alias=True) if reminder else None
+
+    async def delete_reminder(self, reminder_id, user_id):
+        return self.reminders.pop(str(reminder_id), None) is not None
+
+    # Outbox
+    async def enqueue_calendar_operation(self, operation):
+        now = datetime.utcnow()
+        operation.update({"_id": ObjectId(), "status": "pending", "attempts": 0,
+                          "created_at": now, "next_attempt_at": now})
+        self.outbox.append(operation)
+        return True
+
+    async def cancel_pending_calendar_operations(self, reminder_id, operations):
+        before = len(self.outbox)
+        self.outbox = [
+            op for op in self.outbox
+            if not (op["reminder_id"] == reminder_id and op["status"] == "pending" and op["operation"] in operations)
+        ]
+        return before - len(self.outbox)
+
+    async def update_pending_calendar_operation(self, reminder_id, operation, changes):
+        for op in self.outbox:
+            if op["reminder_id"] == reminder_id and op["status"] == "pending" and op["operation"] == operation:
+                for path, value in changes.items():
+                    parent, field = path.split(".")
+                    op[parent][field] = value
+                return True
+        return False
+
+    async def claim_calendar_operations(self, limit):
+        now = datetime.utcnow()
+        ready = []
+        for position, op in enumerate(self.outbox):
+            if len(ready) >= limit or op["status"] != "pending" or op["next_attempt_at"] > now:
+                continue
+            # Detrás de una creación anterior del mismo recordatorio que aún no termina
+            if op["operation"] != "create" and any(
+                other["reminder_id"] == op["reminder_id"] and other["operation"] == "create"
+                and other["status"] in ("pending", "processing")
+                for other in self.outbox[:position]
+            ):
+                continue
+            op["status"] = "processing"
+            ready.append(op)
+        return [dict(op) for op in ready]
+
+    async def complete_calendar_operation(self, operation_id):
+        self.outbox = [op for op in self.outbox if op["_id"] != operation_id]
+        return True
+
+    async def retry_calendar_operation(self, operation_id, error, next_attempt_at):
+        for op in self.outbox:
+            if op["_id"] == operation_id:
+                op["attempts"] += 1
+                op["last_error"] = error
+                op["status"] = "pending" if next_attempt_at else "failed"
+                if next_attempt_at:
+                    op["next_attempt_at"] = next_attempt_at
+        return True
+
+    async def set_reminder_calendar_event(self, reminder_id, reference):
+        reminder = self.reminders.get(str(reminder_id))
+        if reminder:
+            reminder.calendar_href = reference.get("href")
+        return reminder is not None
+
+    async def release_stale_calendar_operations(self):
+        return 0
+
+    async def count_calendar_operations(self):
+        counts = {}
+        for op in self.outbox:
+            counts[op["status"]] = counts.get(op["status"], 0) + 1
+        return counts
+
+
+class SlowCalendar:
+    """iCloud simulado con latencia y fallos opcionales"""
+
+    def __init__(self, latency: float = 0.2, failures: int = 0, rename_failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.rename_failures = rename_failures
+        self.calls = []
+
+    async def create(self, reminder_data):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("create", reminder_data["text"]))
+        if self.failures:
+            self.failures -= 1
+            return None
+        uid = reminder_data.get("calendar_uid")
+        return {"uid": uid, "href": f"/calendars/home/{uid}.ics", "etag": '"1"'}
+
+    async def delete(self, title, date):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("delete", title))
+        return True
+
+    async def rename(self, old_title, new_title, date):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("rename", new_title))
+        return True
+
+    async def delete_by_reference(self, uid, href=None):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("delete_by_reference", uid))
+        return True
+
+    async def rename_by_reference(self, new_title, uid, href=None):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("rename_by_reference", new_title))
+        if self.rename_failures:
+            # Timeout o 412: la integración lo registra y devuelve None
+            self.rename_failures -= 1
+            return None
+        return {"uid": uid, "href": href, "etag": '"2"'}
+
+
+_ORIGINALS = {
+    name: getattr(outbox_module, name)
+    for name in (
+        "create_calendar_event", "delete_calendar_event", "update_calendar_event_title",
+        "delete_calendar_event_by_reference", "rename_calendar_event_by_reference", "calendar_outbox"
+    )
+}
+
+
+def _uninstall():
+    for name, value in _ORIGINALS.items():
+        setattr(outbox_module, name, value)
+
+
+def _install(calendar: SlowCalendar, db: MockDatabaseManager, **kwargs) -> CalendarOutbox:
+    outbox_module.create_calendar_event = calendar.create
+    outbox_module.delete_calendar_event = calendar.delete
+    outbox_module.update_calendar_event_title = calendar.rename
+    outbox_module.delete_calendar_event_by_reference = calendar.delete_by_reference
+    outbox_module.rename_calendar_event_by_reference = calendar.rename_by_reference
+    outbox_module.calendar_outbox = CalendarOutbox(db, **kwargs)
+    return outbox_module.calendar_outbox
+
+
+def test_reply_path_is_db_only():
+    """Crear 7 recordatorios no espera a iCloud; el worker los sincroniza después"""
+    print("🧪 Testing cola write-behind de calendario...")
+
+    async def scenario():
+        db = MockDatabaseManager()
+        calendar = SlowCalendar(latency=0.2)
+        outbox = _install(calendar, db, batch_size=20, poll_seconds=0.05)
+        manager = ReminderManager(db)
+
+        start = datetime.utcnow() + timedelta(days=1)
+        started = time.perf_counter()
+        for day in range(7):
+            assert await manager.create_reminder(1, "gym todos los días", "gym", start + timedelta(days=day))
+        reply_time = time.perf_counter() - started
+
+        await outbox.start()
+        started = time.perf_counter()
+        while db.outbox:
+            await asyncio.sleep(0.02)
+        sync_time = time.perf_counter() - started
+        await outbox.stop()
+        return reply_time, sync_time, calendar.calls
+
+    try:
+        reply_time, sync_time, calls = asyncio.run(scenario())
+    finally:
+        _uninstall()
+    print(f"   ⏱️ respuesta {reply_time * 1000:.1f} ms, sincronización {sync_time:.2f}s")
+    assert reply_time < 0.2
+    assert calls == [("create", "gym")] * 7
+    assert sync_time < 7 * 0.2
+    print("✅ Respuesta sin esperar a iCloud, lote sincronizado en paralelo")
+
+
+def test_create_then_delete_never_reaches_icloud():
+    """Una creación seguida de borrado se cancela sin tocar iCloud"""
+
+    async def scenario():
+        db = MockDatabaseManager()
+        calendar = SlowCalendar(latency=0)
+        outbox = _install(calendar, db)
+        manager = ReminderManager(db)
+
+        await manager.create_reminder(1, "dentista", "dentista", datetime.utcnow() + timedelta(days=2))
+        reminder_id = next(iter(db.reminders))
+        await manager.delete_reminder(1, reminder_id)
+
+        processed = await outbox.process_batch()
+        return processed, calendar.calls, outbox.coalesced
+
+    try:
+        processed, calls, coalesced = asyncio.run(scenario())
+    finally:
+        _uninstall()
+    assert processed == 0 and calls == [] and coalesced == 1
+    print("✅ Crear + borrar coalescidos")
+
+
+def test_rename_coalesces_into_pending_create():
+    """Renombrar antes de sincronizar crea el evento directamente con el título nuevo"""
+
+    async def scenario():
+        db = MockDatabaseManager()
+        calendar = SlowCalendar(latency=0)
+        outbox = _install(calendar, db)
+
+        await outbox.enqueue_create("r1", {"text": "reunion", "date": datetime.utcnow()})
+        await outbox.enqueue_rename("r1", "reunion", "reunión con Ana", datetime.utcnow())
+        await outbox.process_batch()
+        return calendar.calls
+
+    try:
+        calls = asyncio.run(scenario())
+    finally:
+        _uninstall()
+    assert calls == [("create", "reunión con Ana")]
+    print("✅ Renombrado coalescido en la creación")
+
+
+def test_failed_operation_is_retried_with_backoff():
+    """Un fallo de iCloud reprograma la operación y luego se completa"""
+
+    async def scenario():
+        db = MockDatabaseManager()
+        calendar = SlowCalendar(latency=0, failures=1)
+        outbox = _install(calendar, db, retry_seconds=0.05)
+
+        await outbox.enqueue_create("r1", {"text": "pagar arriendo", "date": datetime.utcnow()})
+        await outbox.process_batch()
+        attempts = db.outbox[0]["attempts"]
+
+        # Antes del backoff no se toma de nuevo
+        assert await outbox.process_batch() == 0
+        await asyncio.sleep(0.06)
+        await outbox.process_batch()
+        return attempts, db.outbox, calendar.calls
+
+    try:
+        attempts, remaining, calls = asyncio.run(scenario())
+    finally:
+        _uninstall()
+    assert attempts == 1
+    assert remaining == []
+    assert len(calls) == 2
+    print("✅ Reintento con backoff")
+
+
+def test_failed_rename_is_retried():
+    """Un renombrado por referencia que iCloud no aplicó vuelve a la cola en vez de perderse"""
+
+    async def scenario():
+        db = MockDatabaseManager()
+        calendar = SlowCalendar(latency=0, rename_failures=1)
+        outbox = _install(calendar, db, retry_seconds=0.05)
+
+        await outbox.enqueue_rename("r1", "reunion", "reunión con Ana", datetime.utcnow(), uid="r1@oskaros-bot")
+        await outbox.process_batch()
+        pending = [(op["operation"], op["attempts"]) for op in db.outbox]
+        await asyncio.sleep(0.06)
+        await outbox.process_batch()
+        return pending, db.outbox, calendar.calls
+
+    try:
+        pending, remaining, calls = asyncio.run(scenario())
+    finally:
+        _uninstall()
+    assert pending == [("rename", 1)]
+    assert remaining == []
+    assert calls == [("rename_by_reference", "reunión con Ana")] * 2
+    print("✅ Renombrado fallido reintentado")
+
+
+def test_delete_waits_for_retrying_create():
+    """Un borrado encolado mientras la creación estaba en curso espera su reintento (sin huérfanos)"""
+
+    async def scenario():
+        db = MockDatabaseManager()
+        calendar = SlowCalendar(latency=0, failures=1)
+        outbox = _install(calendar, db, retry_seconds=0.05)
+
+        await outbox.enqueue_create("r1", {"text": "gym", "date": datetime.utcnow(), "calendar_uid": "r1@oskaros-bot"})
+        [create] = await db.claim_calendar_operations(10)
+        # El usuario borra mientras la creación está en vuelo: no se puede cancelar
+        await outbox.enqueue_delete("r1", "gym", datetime.utcnow(), uid="r1@oskaros-bot")
+        await outbox._execute(create)
+
+        blocked = await outbox.process_batch()
+        await asyncio.sleep(0.06)
+        while await outbox.process_batch():
+            pass
+        return blocked, db.outbox, calendar.calls
+
+    try:
+        blocked, remaining, calls = asyncio.run(scenario())
+    finally:
+        _uninstall()
+    assert blocked == 0
+    assert remaining == []
+    assert calls == [("create", "gym"), ("create", "gym"), ("delete_by_reference", "r1@oskaros-bot")]
+    print("✅ Borrado detrás de la creación pendiente")
+
+
+if __name__ == "__main__":
+    test_reply_path_is_db_only()
+    test_create_then_delete_never_reaches_icloud()
+    test_rename_coalesces_into_pending_create()
+    test_failed_operation_is_retried_with_backoff()
+    test_failed_rename_is_retried()
+    test_delete_waits_for_retrying_create()
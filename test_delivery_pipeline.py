@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Test y benchmark del pipeline de entrega contra una API de Telegram falsa local
+"""
+
+import asyncio
+import sys
+import os
+import time
+from collections import defaultdict, deque
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.scheduler_service import SchedulerService
+from bot.delivery_pipeline import DeliveryPipeline
+
+
+class FakeTelegramAPI:
+    """Servidor local que imita sendMessage y aplica los límites de Telegram"""
+
+    def __init__(self, global_rate: int = 30, latency: float = 0.02, throttle_chat: int = None):
+        self.global_rate = global_rate
+        self.latency = latency
+        self.throttle_chat = throttle_chat
+        self.recent = deque()
+        self.last_by_chat = {}
+        self.delivered = defaultdict(list)
+        self.violations = 0
+        self.throttled = 0
+        self.runner = None
+        self.port = None
+
+    async def send_message(self, request):
+        payload = await request.json()
+        chat_id = payload["chat_id"]
+        now = time.monotonic()
+        await asyncio.sleep(self.latency)
+
+        # 429 forzado la primera vez para probar retry_after
+        if chat_id == self.throttle_chat and not self.throttled:
+            self.throttled += 1
+            return web.json_response(
+                {"ok": False, "error_code": 429, "parameters": {"retry_after": 0.3}},
+                status=429
+            )
+
+        # Ventanas algo más cortas que 1s para tolerar jitter de red
+        while self.recent and now - self.recent[0] > 0.95:
+            self.recent.popleft()
+        last = self.last_by_chat.get(chat_id)
+        if len(self.recent) >= self.global_rate or (last is not None and now - last < 0.9):
+            self.violations += 1
+            return web.json_response(
+                {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}},
+                status=429
+            )
+
+        self.recent.append(now)
+        self.last_by_chat[chat_id] = now
+        self.delivered[chat_id].append(now)
+        return web.json_response({"ok": True, "result": {}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self.send_message)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def _deliver_burst(messages, global_rate=30, throttle_chat=None):
+    api = FakeTelegramAPI(global_rate=global_rate, throttle_chat=throttle_chat)
+    await api.start()
+
+    service = SchedulerService(None, "TEST")
+    service.telegram_api_url = f"http://127.0.0.1:{api.port}/botTEST"
+    service.delivery.global_bucket.rate = global_rate
+    await service.delivery.start()
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(
+        service.delivery.submit(chat_id, text) for chat_id, text in messages
+    ))
+    elapsed = time.monotonic() - started
+
+    metrics = service.delivery.get_metrics()
+    await service.delivery.stop()
+    await service.http.close()
+    await api.stop()
+    return results, elapsed, metrics, api
+
+
+def test_burst_respects_limits():
+    """Ráfaga de recordatorios: todos entregados sin violar límites"""
+    print("🧪 Testing pipeline de entrega (ráfaga de 90 mensajes)...")
+
+    messages = [(1000 + i, f"🚨 ¡RECORDATORIO AHORA!: tarea {i}") for i in range(87)]
+    messages += [(42, "primero"), (42, "segundo"), (42, "tercero")]
+
+    results, elapsed, metrics, api = asyncio.run(_deliver_burst(messages, throttle_chat=1005))
+
+    print(f"   ⏱️ {elapsed:.2f}s (serie con pausa de 0.5s: ≥{len(messages) * 0.5:.0f}s)")
+    print(f"   📊 {metrics}")
+
+    assert all(results)
+    assert api.violations == 0
+    assert api.throttled == 1 and metrics["rate_limited"] == 1
+    chat_times = api.delivered[42]
+    assert len(chat_times) == 3
+    assert all(b - a >= 0.9 for a, b in zip(chat_times, chat_times[1:]))
+    assert elapsed < len(messages) * 0.5 / 4
+    print("✅ Ráfaga entregada respetando límites global y por chat")
+
+
+class ScriptedSend:
+    """send_func falso: respuestas predefinidas por chat y registro de envíos"""
+
+    def __init__(self, script=None):
+        self.script = {chat_id: list(results) for chat_id, results in (script or {}).items()}
+        self.calls = []
+
+    async def __call__(self, chat_id, text):
+        self.calls.append((chat_id, time.monotonic()))
+        pending = self.script.get(chat_id)
+        return pending.pop(0) if pending else {"ok": True}
+
+
+async def _run_pipeline(send, messages, **kwargs):
+    pipeline = DeliveryPipeline(send, **kwargs)
+    await pipeline.start()
+    started = time.monotonic()
+    results = await asyncio.gather(*(pipeline.submit(chat_id, text) for chat_id, text in messages))
+    metrics = pipeline.get_metrics()
+    await pipeline.stop()
+    return results, started, metrics
+
+
+def test_global_429_pauses_all_workers():
+    """Un retry_after mayor al espaciado por chat es el límite global: nadie envía durante la pausa"""
+    send = ScriptedSend({1: [{"ok": False, "retry_after": 0.3}]})
+    messages = [(1, "primero")] + [(100 + i, "otro") for i in range(20)]
+
+    results, _, metrics = asyncio.run(_run_pipeline(
+        send, messages, workers=8, global_rate=1000, per_chat_rate=10
+    ))
+
+    assert all(results) and metrics["rate_limited"] == 1
+    throttled_at = send.calls[0][1]
+    later = [at for chat_id, at in send.calls[1:] if at > throttled_at]
+    assert all(at - throttled_at >= 0.29 for at in later)
+    print("✅ 429 global pausa a todos los workers")
+
+
+def test_transient_errors_back_off_exponentially():
+    send = ScriptedSend({7: [{"ok": False, "retryable": True}, {"ok": False, "retryable": True}]})
+
+    results, _, metrics = asyncio.run(_run_pipeline(
+        send, [(7, "hola")], workers=2, global_rate=1000, per_chat_rate=1000, retry_base=0.05
+    ))
+
+    assert results == [True] and metrics["retried"] == 2
+    times = [at for _, at in send.calls]
+    assert times[1] - times[0] >= 0.05 and times[2] - times[1] >= 0.1
+    print("✅ Backoff exponencial ante errores transitorios")
+
+
+def test_paused_chat_does_not_park_workers():
+    """Con un solo worker, los mensajes de un chat pausado esperan fuera de la cola"""
+    send = ScriptedSend({1: [{"ok": False, "retry_after": 0.5}]})
+    messages = [(1, "a"), (1, "b"), (2, "c"), (3, "d")]
+
+    results, started, metrics = asyncio.run(_run_pipeline(
+        send, messages, workers=1, global_rate=1000, per_chat_rate=1
+    ))
+
+    assert all(results)
+    delivered = {chat_id: at for chat_id, at in reversed(send.calls)}
+    assert delivered[2] - started < 0.3 and delivered[3] - started < 0.3
+    assert max(at for chat_id, at in send.calls if chat_id == 1) - started >= 0.5
+    assert metrics["delayed"] == 0
+    print("✅ Chat pausado sin bloquear workers")
+
+
+def benchmark_serial_vs_pipeline(count: int = 500):
+    """Comparar el loop serial anterior con el pipeline (tiempo hasta el último mensaje)"""
+    print(f"\n📈 BENCHMARK: {count} recordatorios a las 08:00")
+    print("=" * 50)
+
+    async def serial(n):
+        api = FakeTelegramAPI(global_rate=10_000)
+        await api.start()
+        service = SchedulerService(None, "TEST")
+        service.telegram_api_url = f"http://127.0.0.1:{api.port}/botTEST"
+        started = time.monotonic()
+        for i in range(n):
+            await service._send_telegram_message(1000 + i, "recordatorio")
+            await asyncio.sleep(0.5)
+        elapsed = time.monotonic() - started
+        await service.http.close()
+        await api.stop()
+        return elapsed
+
+    sample = 10
+    serial_sample = asyncio.run(serial(sample))
+    serial_projection = serial_sample / sample * count
+    print(f"Serie (medido con {sample}, proyectado): {serial_projection:.1f}s")
+
+    messages = [(1000 + i, "recordatorio") for i in range(count)]
+    results, elapsed, metrics, api = asyncio.run(_deliver_burst(messages))
+    print(f"Pipeline: {elapsed:.1f}s | entregados {sum(results)}/{count} | violaciones {api.violations}")
+    print(f"Latencia p50 {metrics['latency_p50']}s, p95 {metrics['latency_p95']}s, máx {metrics['latency_max']}s")
+
+
+if __name__ == "__main__":
+    test_burst_respects_limits()
+    test_global_429_pauses_all_workers()
+    test_transient_errors_back_off_exponentially()
+    test_paused_chat_does_not_park_workers()
+    benchmark_serial_vs_pipeline()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Test de los histogramas de hábitos
+24 + 7 contadores por usuario, sumados con $inc al crear recordatorios y leídos por las sugerencias
+"""
+
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bot.calendar_outbox as outbox_module
+from database.connection import DatabaseManager
+from bot.habit_histogram import HabitHistogram
+from bot.memory_index import MemoryIndex
+from bot.reminder_manager import ReminderManager
+from utils.recurrence import to_utc
+
+
+class UpdateResult:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class FakeHistograms:
+    """Colección con índice único en user_id y $inc sobre posiciones de arrays"""
+
+    def __init__(self):
+        self.docs = {}
+        self.writes = 0
+
+    async def find_one(self, query, projection=None):
+        document = self.docs.get(query["user_id"])
+        return dict(document) if document else None
+
+    async def insert_one(self, document):
+        self.writes += 1
+        if document["user_id"] in self.docs:
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.docs[document["user_id"]] = {
+            **document, "hours": list(document["hours"]), "weekdays": list(document["weekdays"])
+        }
+
+    async def update_one(self, query, update):
+        self.writes += 1
+        document = self.docs.get(query["user_id"])
+        if not document:
+            return UpdateResult(0)
+        for path, count in update["$inc"].items():
+            field, position = path.split(".")
+            document[field][int(position)] += count
+        document.update(update.get("$set", {}))
+        return UpdateResult(1)
+
+
+class FakeReminders:
+    async def insert_many(self, documents, ordered=True):
+        for document in documents:
+            document.setdefault("_id", len(documents))
+        return None
+
+    async def insert_one(self, document):
+        await self.insert_many([document])
+        return type("InsertResult", (), {"inserted_id": document["_id"]})()
+
+
+def _db():
+    db = DatabaseManager("mongodb://test", "test")
+    db.habit_histograms = FakeHistograms()
+    db.reminders = FakeReminders()
+    return db
+
+
+def _local(days_ahead, hour, minute=0):
+    """Fecha UTC de un día futuro a la hora local indicada"""
+    day = datetime.utcnow().date() + timedelta(days=days_ahead)
+    return to_utc(datetime(day.year, day.month, day.day, hour, minute))
+
+
+def test_histogram_counts_local_time():
+    """Horas y días en hora de Chile; $inc solo de los contadores tocados"""
+    print("🧪 Testing histogramas de hábitos...")
+    monday_9 = to_utc(datetime(2026, 10, 19, 9, 0))
+    histogram = HabitHistogram.from_dates([monday_9, monday_9 + timedelta(days=7)])
+    assert histogram.hours[9] == 2 and histogram.weekdays[0] == 2
+    assert histogram.increments() == {"hours.9": 2, "weekdays.0": 2}
+    assert len(histogram.to_document()["hours"]) == 24 and len(histogram.to_document()["weekdays"]) == 7
+
+    assert histogram.describe() == []  # menos de 3 recordatorios
+    histogram.add(to_utc(datetime(2026, 10, 21, 18, 0)))
+    assert histogram.describe() == ["Prefiere recordatorios a las 09:00", "Frecuentemente programa para lunes"]
+    print("✅ Contadores en hora local")
+
+
+def test_increment_creates_then_updates_one_document():
+    db = _db()
+
+    async def scenario():
+        for hour in (9, 9, 20):
+            delta = HabitHistogram.from_dates([_local(1, hour)])
+            await db.increment_habit_histogram(7, delta.increments(), delta.to_document())
+        return await db.get_habit_histogram(7)
+
+    document = asyncio.run(scenario())
+    assert len(db.habit_histograms.docs) == 1
+    assert document["hours"][9] == 2 and document["hours"][20] == 1 and sum(document["weekdays"]) == 3
+    assert db.habit_histograms.writes == 4  # primer $inc sin documento + insert + 2 $inc
+    print("✅ Un documento por usuario, sin crecimiento")
+
+
+def test_reminder_creation_updates_histogram():
+    """Crear recordatorios (uno o en lote) suma al histograma con una sola escritura"""
+    outbox_module.calendar_outbox = None
+    db = _db()
+    manager = ReminderManager(db)
+
+    async def scenario():
+        await manager.create_reminder(5, "mañana a las 9 gym", "gym", _local(1, 9))
+        writes = db.habit_histograms.writes
+        await manager.create_reminders_bulk(5, [
+            {"original_input": "clases", "text": f"clase {i}", "date": _local(i + 2, 9)} for i in range(4)
+        ])
+        return writes
+
+    writes_before_bulk = asyncio.run(scenario())
+    assert db.habit_histograms.writes == writes_before_bulk + 1
+    histogram = HabitHistogram.from_document(db.habit_histograms.docs[5])
+    assert histogram.total == 5 and histogram.peak_hour() == (9, 5)
+    print("✅ Histograma actualizado al crear recordatorios")
+
+
+def test_suggestions_read_histogram_without_new_memories():
+    db = _db()
+    index = MemoryIndex(db)
+    inserted = []
+
+    async def add_ai_memory(memory_data):
+        inserted.append(memory_data)
+        return None
+
+    db.add_ai_memory = add_ai_memory
+
+    async def scenario():
+        generic = await index.suggest_improvements(3)
+        delta = HabitHistogram.from_dates([_local(7 * week + 1, 8) for week in range(3)])
+        await db.increment_habit_histogram(3, delta.increments(), delta.to_document())
+        return generic, await index.suggest_improvements(3), await index.analyze_reminder_patterns(3)
+
+    generic, suggestions, pattern = asyncio.run(scenario())
+    assert "📝 Prueba usar notas para capturar ideas rápidas" in generic
+    assert suggestions == [
+        "💡 Considera usar pre-recordatorios para tareas importantes",
+        "📅 Podrías beneficiarte de recordatorios semanales recurrentes"
+    ]
+    assert pattern.startswith("Prefiere recordatorios a las 08:00")
+    assert inserted == []  # analizar ya no agrega memorias HABIT duplicadas
+    print("✅ Sugerencias desde el histograma")
+
+
+def benchmark_pattern_detection():
+    """Costo por análisis: recorrer el historial (antes) vs leer 31 contadores (ahora)"""
+    print("\n📈 BENCHMARK: detección de patrones")
+    print("=" * 50)
+
+    for size in (100, 1000, 10000):
+        dates = [_local(i % 60 + 1, i % 24) for i in range(size)]
+        histogram = HabitHistogram.from_dates(dates)
+
+        started = time.perf_counter()
+        hour_counts = {}
+        for date in dates:
+            hour_counts[date.hour] = hour_counts.get(date.hour, 0) + 1
+        max(hour_counts.items(), key=lambda item: item[1])
+        rescan = time.perf_counter() - started
+
+        started = time.perf_counter()
+        histogram.describe()
+        incremental = time.perf_counter() - started
+
+        print(f"{size:>5} recordatorios: recorrer {rescan * 1e6:.0f} µs | histograma {incremental * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    test_histogram_counts_local_time()
+    test_increment_creates_then_updates_one_document()
+    test_reminder_creation_updates_histogram()
+    test_suggestions_read_histogram_without_new_memories()
+    benchmark_pattern_detection()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test y micro-benchmark del cliente HTTP compartido contra un servidor aiohttp local
+(sesión nueva por petición vs pool keep-alive)
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.http_client import HttpClient
+
+
+class StubServer:
+    """Servidor local que cuenta las conexiones TCP abiertas por los clientes"""
+
+    def __init__(self):
+        self.connections = set()
+        self.requests = 0
+        self.runner = None
+        self.port = None
+
+    async def handle(self, request):
+        self.requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        return web.json_response({"ok": True, "result": {}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/sendMessage", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/sendMessage"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def _per_request_sessions(count: int):
+    """Patrón anterior: una ClientSession por llamada"""
+    server = StubServer()
+    await server.start()
+
+    started = time.perf_counter()
+    for i in range(count):
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+            async with session.post(server.url, json={"chat_id": i}) as response:
+                await response.json()
+    elapsed = time.perf_counter() - started
+
+    await server.stop()
+    return elapsed, len(server.connections), server.requests
+
+
+async def _shared_client(count: int, concurrency: int = 1):
+    """Patrón nuevo: HttpClient compartido"""
+    server = StubServer()
+    await server.start()
+    client = HttpClient(limit_per_host=concurrency)
+    await client.start()
+
+    async def call(i):
+        async with client.session.post(server.url, json={"chat_id": i}) as response:
+            await response.json()
+
+    started = time.perf_counter()
+    for offset in range(0, count, concurrency):
+        await asyncio.gather(*(call(i) for i in range(offset, min(count, offset + concurrency))))
+    elapsed = time.perf_counter() - started
+
+    stats = client.get_stats()
+    await client.close()
+    await server.stop()
+    return elapsed, len(server.connections), server.requests, stats
+
+
+def test_shared_client_reuses_connections():
+    """Las peticiones reutilizan conexiones del pool en vez de abrir una por llamada"""
+    print("🧪 Testing cliente HTTP compartido...")
+
+    elapsed, connections, requests, stats = asyncio.run(_shared_client(50))
+
+    print(f"   🔌 {requests} peticiones, {connections} conexiones TCP, {stats}")
+    assert requests == 50
+    assert connections == 1
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 49
+    print("✅ Una sola conexión para 50 peticiones")
+
+
+def test_shared_client_respects_per_host_limit():
+    """El límite por host acota las conexiones simultáneas"""
+    elapsed, connections, requests, stats = asyncio.run(_shared_client(60, concurrency=4))
+
+    assert requests == 60
+    assert connections <= 4
+    print(f"✅ {connections} conexiones con límite por host de 4")
+
+
+def test_session_recreated_after_close():
+    """La sesión se recrea si se usa después de cerrar (sin fugas en tests)"""
+
+    async def scenario():
+        client = HttpClient()
+        first = client.session
+        await client.close()
+        second = client.session
+        reopened = second is not first and not second.closed
+        await client.close()
+        return reopened
+
+    assert asyncio.run(scenario())
+    print("✅ Sesión recreada tras cierre")
+
+
+def benchmark_per_request_vs_shared(count: int = 500):
+    """Latencia y conexiones abiertas: sesión por petición vs cliente compartido"""
+    print(f"\n📈 BENCHMARK: {count} peticiones secuenciales al servidor local")
+    print("=" * 50)
+
+    before, before_conns, _ = asyncio.run(_per_request_sessions(count))
+    after, after_conns, _, _ = asyncio.run(_shared_client(count))
+
+    print(f"Sesión por petición: {before * 1000 / count:.2f} ms/petición, {before_conns} handshakes TCP")
+    print(f"Cliente compartido:  {after * 1000 / count:.2f} ms/petición, {after_conns} handshakes TCP")
+    print(f"Mejora: {before / after:.1f}x (sin TLS; contra HTTPS real la diferencia es mayor)")
+
+
+if __name__ == "__main__":
+    test_shared_client_reuses_connections()
+    test_shared_client_respects_per_host_limit()
+    test_session_recreated_after_close()
+    benchmark_per_request_vs_shared()
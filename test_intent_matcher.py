@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test del detector precompilado de intención
+Mismos resultados que la detección lista por lista (any + re.search) y costo por mensaje
+"""
+
+import re
+import sys
+import os
+import time
+
+from loguru import logger
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.intent_matcher import (
+    IntentMatcher, intent_matcher, is_reminder_request, has_deletion_pattern,
+    REMINDER_KEYWORDS, DATE_PATTERNS, ACADEMIC_PATTERNS, TIME_RELATIVE_PATTERNS,
+    ACTIVITY_PATTERNS, ACTION_WORDS, IMPERATIVE_PHRASES, TIME_QUESTION_PHRASES,
+    RECURRING_PHRASES, NUMERIC_FREQUENCY_PATTERNS, DELETION_REQUEST_PHRASES,
+    DELETION_KEYWORDS, EXCEPTION_PHRASES
+)
+
+CORPUS = [
+    "recuérdame mañana a las 8 ir al gym",
+    "hola, ¿cómo estás?",
+    "tengo prueba de cálculo el 15/10/2025",
+    "entregar informe 25% RA1-2-3 el viernes",
+    "todos los días a las 8 tomar la pastilla",
+    "cada 8 horas tomar antibiótico",
+    "Elimina el recordatorio del dentista",
+    "todos excepto el viernes",
+    "gracias!",
+    "- comprar pan\n- pagar la luz\n- llamar a Juan",
+    "¿a qué hora es la reunión con el equipo?",
+    "nota: la clave del wifi es 1234",
+    "I need to call mom at 10:30",
+    "ok",
+    "1. estudiar 2. cocinar 3. dormir",
+    "ya no quiero el de los lunes",
+    "CONTROL 3 de física el 20-10-2025",
+    "Lunes a viernes 7:00 correr",
+    "me gusta el café",
+    "pero no el sábado",
+]
+
+
+def _legacy_features(text: str) -> dict:
+    """Detección original: una búsqueda por elemento de cada lista"""
+    text_lower = text.lower()
+    return {
+        "keywords": any(keyword in text_lower for keyword in REMINDER_KEYWORDS),
+        "date": any(re.search(pattern, text_lower) for pattern in DATE_PATTERNS),
+        "academic": any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in ACADEMIC_PATTERNS),
+        "relative": any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in TIME_RELATIVE_PATTERNS),
+        "activity": any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in ACTIVITY_PATTERNS),
+        "numeric_date": bool(re.search(r'\b\d{1,2}/\d{1,2}/\d{2,4}\b', text)),
+        "action": any(word in text_lower for word in ACTION_WORDS),
+        "imperative": any(phrase in text_lower for phrase in IMPERATIVE_PHRASES),
+        "question": any(phrase in text_lower for phrase in TIME_QUESTION_PHRASES),
+        "recurring": any(phrase in text_lower for phrase in RECURRING_PHRASES),
+        "frequency": any(re.search(pattern, text_lower) for pattern in NUMERIC_FREQUENCY_PATTERNS),
+        "deletion": any(phrase in text_lower for phrase in DELETION_REQUEST_PHRASES),
+        "deletion_command": any(keyword in text_lower for keyword in DELETION_KEYWORDS + EXCEPTION_PHRASES),
+    }
+
+
+def _legacy_is_reminder_request(text: str) -> bool:
+    f = _legacy_features(text)
+    has_context = len(text.split()) >= 2 and len(text) > 5
+    has_list_format = (
+        text.count('\n') > 1 or text.count('-') > 1 or text.count('•') > 0 or
+        text.count('*') > 1 or len(re.findall(r'\d+\.', text)) > 1
+    )
+    has_time_question = f["question"] and len(text.split()) > 2
+    return bool(
+        f["keywords"] or
+        (f["date"] and f["action"]) or
+        f["academic"] or
+        (f["relative"] and has_context) or
+        (f["numeric_date"] and len(text) > 15) or
+        (f["activity"] and (f["date"] or f["relative"])) or
+        (f["imperative"] and (f["date"] or f["relative"] or len(text) > 20)) or
+        (has_list_format and (f["date"] or f["academic"])) or
+        (has_time_question and f["activity"]) or
+        f["recurring"] or
+        (f["frequency"] and f["activity"]) or
+        f["deletion"]
+    )
+
+
+def test_features_match_legacy_detection():
+    """Cada rasgo coincide con la búsqueda lista por lista, incluso cuando varios se solapan"""
+    print("🧪 Testing detector de intención precompilado...")
+    for text in CORPUS:
+        assert intent_matcher.features(text) == _legacy_features(text), text
+    print(f"✅ {len(CORPUS)} mensajes con los mismos rasgos")
+
+
+def test_classification_matches_legacy():
+    """Misma decisión de recordatorio y de eliminación"""
+    for text in CORPUS:
+        assert is_reminder_request(text) == _legacy_is_reminder_request(text), text
+        assert has_deletion_pattern(text) == _legacy_features(text)["deletion_command"], text
+
+    assert is_reminder_request("recuérdame mañana a las 8 ir al gym")
+    assert not is_reminder_request("me gusta el café")
+    assert has_deletion_pattern("todos excepto el viernes")
+    assert not has_deletion_pattern("hola, ¿cómo estás?")
+    print("✅ Clasificación idéntica a la detección original")
+
+
+def test_literals_are_not_regex():
+    """Las frases se buscan literalmente (los metacaracteres no se interpretan)"""
+    matcher = IntentMatcher(literal_features={"dot": ["a.b"]}, pattern_features={})
+    assert matcher.features("xa.by") == {"dot": True}
+    assert matcher.features("axb") == {"dot": False}
+    print("✅ Frases escapadas")
+
+
+def benchmark_intent_matcher():
+    """Costo por mensaje de clasificar (recordatorio + eliminación)"""
+    print("\n📈 BENCHMARK: detección de intención por mensaje")
+    print("=" * 50)
+
+    rounds = 300
+
+    def per_message(classify_reminder, classify_deletion):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in CORPUS:
+                classify_reminder(text)
+                classify_deletion(text)
+        return (time.perf_counter() - started) / (rounds * len(CORPUS))
+
+    # Sin el log de depuración, que la versión de referencia no escribe
+    logger.disable("bot.intent_matcher")
+    try:
+        legacy = per_message(_legacy_is_reminder_request, lambda text: _legacy_features(text)["deletion_command"])
+        compiled = per_message(intent_matcher.is_reminder_request, intent_matcher.has_deletion_pattern)
+    finally:
+        logger.enable("bot.intent_matcher")
+
+    print(f"antes (búsqueda lista por lista): {legacy * 1e6:.1f} µs por mensaje")
+    print(f"después (regex precompilada):     {compiled * 1e6:.1f} µs por mensaje ({legacy / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    test_features_match_legacy_detection()
+    test_classification_matches_legacy()
+    test_literals_are_not_regex()
+    benchmark_intent_matcher()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Test del router de intención: una sola llamada al LLM por mensaje
+Compara llamadas y latencia contra la cascada de prompts especializados
+"""
+
+import asyncio
+import json
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.telegram_interface import TelegramBot
+from bot.llm_cache import LLMCache
+from bot.reminder_manager import ReminderManager
+from config.settings import settings
+
+LLM_LATENCY = 0.05
+BASE = datetime.utcnow().replace(microsecond=0) + timedelta(days=2)
+# Tokens aproximados por carácter de la respuesta (fechas ISO y español tokenizan denso)
+CHARS_PER_TOKEN = 3
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# Mensaje → respuesta esperada de cada prompt
+SCENARIOS = {
+    "simple": {
+        "message": "mañana a las 9 llamar al dentista",
+        "route": {"intent": "create", "recurring": False, "reminders": [
+            {"title": "Llamar dentista", "original": "llamar al dentista", "date": _iso(BASE)}
+        ]},
+        "recurring": {"is_recurring": False},
+        "multiple": [],
+        "time": _iso(BASE),
+        "created": 1
+    },
+    "recurrente": {
+        "message": "tomar la pastilla todos los días a las 8",
+        "route": {"intent": "create", "recurring": True, "pattern": "diario", "reminders": [
+            {"title": "Tomar pastilla", "original": "tomar la pastilla", "date": _iso(BASE + timedelta(days=i))}
+            for i in range(7)
+        ]},
+        "recurring": {"is_recurring": True, "pattern": "diario", "reminders": [
+            {"text": "tomar la pastilla", "date": _iso(BASE + timedelta(days=i))} for i in range(7)
+        ]},
+        "created": 7
+    },
+    "académico": {
+        "message": "40% RA1: Informe Logística FECHA: 5 OCTUBRE\n30% RA2: Examen Gestión FECHA: 26 OCTUBRE",
+        "route": {"intent": "create", "recurring": False, "reminders": [
+            {"title": "Informe Logística", "original": "Informe Logística", "date": _iso(BASE)},
+            {"title": "Examen Gestión", "original": "Examen Gestión", "date": _iso(BASE + timedelta(days=21))}
+        ]},
+        "recurring": {"is_recurring": False},
+        "multiple": [
+            {"text": "Informe Logística", "date": _iso(BASE)},
+            {"text": "Examen Gestión", "date": _iso(BASE + timedelta(days=21))}
+        ],
+        "created": 2
+    },
+    "eliminación": {
+        "message": "elimina el recordatorio del gym",
+        "route": {"intent": "delete", "reminders": [], "deletion": {
+            "deletion_type": "specific", "target_pattern": "gym", "exceptions": [], "action_description": "Eliminar gym"
+        }},
+        "deletion": {"is_deletion": True, "deletion_type": "specific", "target_pattern": "gym",
+                     "action_description": "Eliminar gym"},
+        "deleted": "r-gym"
+    }
+}
+
+
+class FakeLLM:
+    """OpenRouter simulado con latencia fija; responde según el prompt"""
+
+    def __init__(self, scenario: dict, router_ok: bool = True):
+        self.scenario = scenario
+        self.router_ok = router_ok
+        self.calls = []
+
+    async def __call__(self, messages, temperature=None, json_mode=False, max_tokens=None):
+        await asyncio.sleep(LLM_LATENCY)
+        system, user = messages[0]["content"], messages[1]["content"]
+
+        if "INTENCIONES" in system:
+            self.calls.append("route")
+            if not self.router_ok:
+                return "no es json"
+            # Como OpenRouter: la respuesta se corta al llegar a max_tokens
+            limit = (max_tokens or settings.AI_MAX_TOKENS) * CHARS_PER_TOKEN
+            return json.dumps(self.scenario["route"], ensure_ascii=False)[:limit]
+        if "Analizar eliminación" in user:
+            self.calls.append("deletion")
+            return json.dumps(self.scenario["deletion"])
+        if "Analizar recurrencia" in user:
+            self.calls.append("recurring")
+            return json.dumps(self.scenario["recurring"])
+        if "múltiples recordatorios" in user:
+            self.calls.append("multiple")
+            return json.dumps(self.scenario["multiple"])
+        if "Expresión temporal" in user:
+            self.calls.append("time")
+            return self.scenario["time"]
+        if "Mejorar recordatorios:" in user:
+            self.calls.append("enhance_batch")
+            texts = json.loads(user.split("\n", 1)[1])
+            return json.dumps([f"Título {text}" for text in texts])
+        if "Mejorar recordatorio" in user:
+            self.calls.append("enhance")
+            return "Título mejorado"
+        return None
+
+
+class MockReminderManager:
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+
+    async def create_reminder(self, user_id, original_input, reminder_text, target_date):
+        self.created.append((reminder_text, target_date))
+        return True
+
+    async def create_reminders_bulk(self, user_id, items):
+        return [await self.create_reminder(user_id, item["original_input"], item["text"], item["date"]) for item in items]
+
+    async def create_recurring_reminders(self, user_id, items):
+        return await self.create_reminders_bulk(user_id, items)
+
+    async def delete_reminder(self, user_id, reminder_id):
+        self.deleted.append(reminder_id)
+        return True
+
+
+class MockDatabaseManager:
+    """Recordatorios pendientes en memoria (lo que consulta una eliminación)"""
+
+    def __init__(self):
+        self.reminders = {
+            reminder_id: {"_id": reminder_id, "user_id": 1, "text": text, "date": BASE + timedelta(days=day)}
+            for reminder_id, text, day in (("r-gym", "gym", 0), ("r-clase-1", "clase inglés", 1), ("r-clase-2", "clase inglés", 8))
+        }
+
+    async def search_reminders_by_text(self, user_id, text_pattern, limit=None):
+        matches = [dict(r) for r in self.reminders.values() if text_pattern.lower() in r["text"].lower()]
+        return matches[:limit] if limit else matches
+
+    async def get_reminders_by_date_and_pattern(self, user_id, target_date, text_pattern):
+        return [r for r in await self.search_reminders_by_text(user_id, text_pattern)
+                if r["date"].date() == target_date.date()]
+
+    async def get_reminder_by_id(self, reminder_id, user_id):
+        reminder = self.reminders.get(reminder_id)
+        return dict(reminder) if reminder else None
+
+    async def delete_reminder(self, reminder_id, user_id):
+        return self.reminders.pop(reminder_id, None) is not None
+
+
+class MockMemoryIndex:
+    def __init__(self):
+        self.context_fetches = 0
+
+    async def get_user_context(self, user_id, limit=3, query=None):
+        self.context_fetches += 1
+        return ["Creó recordatorio: Gym"]
+
+    async def add_context(self, user_id, text, context_type):
+        return True
+
+
+class MockMessage:
+    class User:
+        id = 1
+
+    def __init__(self):
+        self.from_user = self.User()
+        self.replies = []
+
+    async def answer(self, text, **kwargs):
+        self.replies.append(text)
+        return self
+
+    async def edit_text(self, text, **kwargs):
+        self.replies.append(text)
+        return self
+
+
+def _make_bot(scenario: dict, router_ok: bool = True) -> TelegramBot:
+    bot = TelegramBot("123456:TEST-token", db_manager=None, openrouter_api_key="test-key")
+    bot.ai_interpreter.cache = LLMCache()
+    bot.ai_interpreter._make_api_call = FakeLLM(scenario, router_ok=router_ok)
+    bot.db = MockDatabaseManager()
+    bot.reminder_manager = MockReminderManager()
+    bot.memory_index = MockMemoryIndex()
+    return bot
+
+
+async def _run(bot: TelegramBot, text: str):
+    message = MockMessage()
+    started = time.perf_counter()
+    await bot._process_reminder_request(message, text)
+    return time.perf_counter() - started, message.replies[-1]
+
+
+def test_router_uses_one_call_per_message():
+    """Cada tipo de mensaje se resuelve con una sola llamada al LLM"""
+    print("🧪 Testing router de intención...")
+
+    for name, scenario in SCENARIOS.items():
+        bot = _make_bot(scenario)
+        _, reply = asyncio.run(_run(bot, scenario["message"]))
+
+        assert bot.ai_interpreter._make_api_call.calls == ["route"], (name, bot.ai_interpreter._make_api_call.calls)
+        if "created" in scenario:
+            assert len(bot.reminder_manager.created) == scenario["created"], name
+            assert "creado" in reply
+        else:
+            assert bot.reminder_manager.deleted == [scenario["deleted"]]
+            assert "eliminado" in reply
+        print(f"   ✅ {name}: 1 llamada")
+
+
+def test_router_titles_skip_enhance_calls():
+    """Los títulos del router se usan directamente (sin enhance_reminder_text por recordatorio)"""
+    bot = _make_bot(SCENARIOS["recurrente"])
+    asyncio.run(_run(bot, SCENARIOS["recurrente"]["message"]))
+    titles = {title for title, _ in bot.reminder_manager.created}
+    assert titles == {"Tomar pastilla"}
+    print("✅ Títulos del router sin llamadas de mejora")
+
+
+def test_invalid_router_answer_falls_back_to_cascade():
+    """Si el router no entrega JSON válido se usa la cascada de prompts especializados"""
+    scenario = SCENARIOS["académico"]
+    bot = _make_bot(scenario, router_ok=False)
+    _, reply = asyncio.run(_run(bot, scenario["message"]))
+
+    calls = bot.ai_interpreter._make_api_call.calls
+    assert calls[0] == "route" and "multiple" in calls
+    assert len(bot.reminder_manager.created) == 2
+    assert "recordatorios creados" in reply
+    print("✅ Respaldo con la cascada original")
+
+
+def test_cascade_enhances_batch_in_one_call():
+    """En la cascada, varios recordatorios se mejoran en una llamada y el contexto se lee una vez"""
+    scenario = SCENARIOS["académico"]
+    bot = _make_bot(scenario, router_ok=False)
+    asyncio.run(_run(bot, scenario["message"]))
+
+    calls = bot.ai_interpreter._make_api_call.calls
+    assert calls.count("enhance_batch") == 1 and "enhance" not in calls
+    assert [title for title, _ in bot.reminder_manager.created] == ["Título Informe Logística", "Título Examen Gestión"]
+    # Una lectura para el router y otra para la cascada, no una por recordatorio
+    assert bot.memory_index.context_fetches == 2
+    print("✅ Mejora de textos en lote")
+
+
+def test_recurring_series_costs_one_enhancement():
+    """Una serie recurrente (mismo texto) cuesta una sola mejora"""
+    scenario = SCENARIOS["recurrente"]
+    bot = _make_bot(scenario, router_ok=False)
+    asyncio.run(_run(bot, scenario["message"]))
+
+    calls = bot.ai_interpreter._make_api_call.calls
+    assert calls.count("enhance") + calls.count("enhance_batch") == 1
+    assert len(bot.reminder_manager.created) == 7
+    print("✅ Serie recurrente con una sola mejora")
+
+
+def test_long_syllabus_fits_router_answer():
+    """Un temario de 14 evaluaciones cabe en la respuesta del router (no se corta el JSON)"""
+    subjects = ["Logística", "Gestión", "Finanzas", "Marketing", "Estadística", "Contabilidad", "Economía"]
+    items = [
+        (f"{kind} {subject}", f"{20 if kind == 'Informe' else 30}% RA{i + 1}: {kind} Caso {subject} {5 + i} OCTUBRE 2025")
+        for i, (kind, subject) in enumerate((kind, subject) for kind in ("Informe", "Examen") for subject in subjects)
+    ]
+    scenario = {
+        "message": "\n".join(original for _, original in items),
+        "route": {"intent": "create", "recurring": False, "pattern": "", "reminders": [
+            {"title": title, "original": original, "date": _iso(BASE + timedelta(days=i))}
+            for i, (title, original) in enumerate(items)
+        ]},
+        "recurring": {"is_recurring": False},
+        "multiple": [{"text": title, "date": _iso(BASE + timedelta(days=i))} for i, (title, _) in enumerate(items)],
+        "created": len(items)
+    }
+    answer = json.dumps(scenario["route"], ensure_ascii=False)
+    assert len(answer) > settings.AI_MAX_TOKENS * CHARS_PER_TOKEN  # con el límite general se cortaría
+
+    bot = _make_bot(scenario)
+    asyncio.run(_run(bot, scenario["message"]))
+    assert bot.ai_interpreter._make_api_call.calls == ["route"]
+    assert len(bot.reminder_manager.created) == 14
+    print("✅ Temario largo en una sola llamada")
+
+
+def test_router_delete_goes_through_reminder_manager():
+    """Las eliminaciones del router resuelven el texto a un ID y usan las firmas reales del gestor"""
+    deletions = {
+        "specific": ({"deletion_type": "specific", "target_pattern": "gym"}, {"r-clase-1", "r-clase-2"}, "eliminado"),
+        "pattern": ({"deletion_type": "pattern", "target_pattern": "clase"}, {"r-gym"}, "Se eliminaron 2"),
+        "missing": ({"deletion_type": "specific", "target_pattern": "dentista"}, {"r-gym", "r-clase-1", "r-clase-2"},
+                    "No se encontró")
+    }
+
+    for name, (deletion, remaining, expected) in deletions.items():
+        scenario = {"message": f"elimina {deletion['target_pattern']}",
+                    "route": {"intent": "delete", "reminders": [], "deletion": deletion}}
+        bot = _make_bot(scenario)
+        bot.reminder_manager = ReminderManager(bot.db)
+        _, reply = asyncio.run(_run(bot, scenario["message"]))
+
+        assert set(bot.db.reminders) == remaining, name
+        assert expected in reply, (name, reply)
+
+    # Con fecha solo se borra el de ese día
+    bot = _make_bot(SCENARIOS["eliminación"])
+    bot.reminder_manager = ReminderManager(bot.db)
+    processing_msg = MockMessage()
+    asyncio.run(bot._apply_deletion(processing_msg, 1, {
+        "type": "specific", "target": "clase", "date": _iso(BASE + timedelta(days=8))
+    }))
+    assert set(bot.db.reminders) == {"r-gym", "r-clase-1"}
+    print("✅ Eliminación del router con ReminderManager real")
+
+
+def benchmark_router_vs_cascade():
+    """Llamadas al LLM y latencia por tipo de mensaje: cascada (antes) vs router (ahora)"""
+    print(f"\n📈 BENCHMARK: llamadas al LLM por mensaje (latencia simulada {LLM_LATENCY * 1000:.0f} ms/llamada)")
+    print("=" * 64)
+    print(f"{'tipo':<14}{'cascada':>20}{'router':>20}")
+
+    for name, scenario in SCENARIOS.items():
+        # La cascada es lo que hace el bot cuando el router no responde (más la llamada fallida)
+        cascade_bot = _make_bot(scenario, router_ok=False)
+        cascade_time, _ = asyncio.run(_run(cascade_bot, scenario["message"]))
+        cascade_calls = len(cascade_bot.ai_interpreter._make_api_call.calls) - 1
+        cascade_time -= LLM_LATENCY
+
+        router_bot = _make_bot(scenario)
+        router_time, _ = asyncio.run(_run(router_bot, scenario["message"]))
+        router_calls = len(router_bot.ai_interpreter._make_api_call.calls)
+
+        print(f"{name:<14}{cascade_calls:>6} llamadas {cascade_time * 1000:>5.0f} ms"
+              f"{router_calls:>6} llamadas {router_time * 1000:>5.0f} ms")
+
+
+if __name__ == "__main__":
+    test_router_uses_one_call_per_message()
+    test_long_syllabus_fits_router_answer()
+    test_router_titles_skip_enhance_calls()
+    test_invalid_router_answer_falls_back_to_cascade()
+    test_cascade_enhances_batch_in_one_call()
+    test_recurring_series_costs_one_enhancement()
+    test_router_delete_goes_through_reminder_manager()
+    benchmark_router_vs_cascade()
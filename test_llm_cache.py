@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Test de la caché de respuestas del LLM
+Respuestas repetidas no llaman a OpenRouter y las fechas relativas se re-anclan
+"""
+
+import asyncio
+import json
+import re
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bot.ai_interpreter as ai_module
+from bot.ai_interpreter import AIInterpreter
+from config.settings import settings
+from bot.llm_cache import LLMCache, ANCHOR_OFFSET, ANCHOR_DAILY, ANCHOR_WEEKLY, ANCHOR_DATE
+
+CHILE_TZ = pytz.timezone('America/Santiago')
+
+
+def _utc(local_naive: datetime) -> datetime:
+    """Hora local de Chile → UTC naive"""
+    return CHILE_TZ.localize(local_naive).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeLLM:
+    """OpenRouter simulado: responde según la fecha que trae el prompt"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, messages, temperature=None):
+        self.calls += 1
+        system, user = messages[0]["content"], messages[1]["content"]
+        now = datetime.strptime(
+            re.search(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", system).group(0), "%Y-%m-%d %H:%M:%S"
+        )
+
+        if "Analizar recurrencia" in user:
+            # "todos los días a las 8": próximos 7 días a las 08:00 hora de Chile
+            local = now.replace(tzinfo=pytz.UTC).astimezone(CHILE_TZ).replace(tzinfo=None)
+            first = local.replace(hour=8, minute=0, second=0)
+            if first <= local:
+                first += timedelta(days=1)
+            reminders = [{"text": "tomar la pastilla", "date": _iso(_utc(first + timedelta(days=i)))} for i in range(7)]
+            return json.dumps({"is_recurring": True, "pattern": "diario", "reminders": reminders})
+
+        if "Expresión temporal" in user:
+            return _iso(now + timedelta(minutes=90))
+
+        return None
+
+
+class MockDatabaseManager:
+    """Segundo nivel de la caché en memoria"""
+
+    def __init__(self):
+        self.entries = {}
+
+    async def get_llm_cache_entry(self, key):
+        entry = self.entries.get(key)
+        if entry and entry["expires_at"] > datetime.utcnow():
+            return dict(entry)
+        return None
+
+    async def save_llm_cache_entry(self, key, entry, expires_at):
+        self.entries[key] = {**entry, "expires_at": expires_at}
+        return True
+
+
+def _interpreter(cache: LLMCache = None):
+    ai = AIInterpreter("test-key", cache=cache or LLMCache())
+    ai._make_api_call = FakeLLM()
+    return ai
+
+
+def test_classify_anchors():
+    """Cada expresión se ancla según de qué depende su resultado"""
+    assert LLMCache.classify("dentro de 90 minutos llamar") == ANCHOR_OFFSET
+    assert LLMCache.classify("recuérdame tomar la pastilla todos los días a las 8") == ANCHOR_DAILY
+    assert LLMCache.classify("mañana ir al gym") == ANCHOR_DAILY
+    assert LLMCache.classify("todos los lunes standup") == ANCHOR_WEEKLY
+    assert LLMCache.classify("entrega informe 5 de octubre") == ANCHOR_DATE
+    assert LLMCache.classify("pagar arriendo cada mes") == ANCHOR_DATE
+    for offset in ("en 1 semana revisar notas", "dentro de 2 semanas renovar carnet",
+                   "al rato llamar a mamá", "en un rato sacar la ropa", "más tarde regar"):
+        assert LLMCache.classify(offset) == ANCHOR_OFFSET, offset
+    assert LLMCache.classify("en 2 semanas el viernes a las 9") == ANCHOR_WEEKLY
+    assert LLMCache.normalize("  Recuérdame   TOMAR la pastilla!! ") == "recuérdame tomar la pastilla"
+    print("✅ Clasificación de anclas temporales")
+
+
+def test_repeated_phrase_hits_cache():
+    """La misma frase (con otra puntuación/mayúsculas) no vuelve a llamar al LLM"""
+    print("🧪 Testing caché del LLM...")
+    ai = _interpreter()
+    now = _utc(datetime(2025, 10, 6, 10, 15))
+
+    async def scenario():
+        first = await ai.parse_recurring_reminder("recuérdame tomar la pastilla todos los días a las 8", now)
+        second = await ai.parse_recurring_reminder("Recuérdame tomar la pastilla  todos los días a las 8!", now + timedelta(minutes=20))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert ai._make_api_call.calls == 1
+    assert first == second and len(first) == 7
+    assert ai.cache.get_stats()["hits"] == 1
+    print("✅ Frase repetida servida desde caché")
+
+
+def test_daily_expression_is_reanchored_next_day():
+    """Un hit al día siguiente desplaza las fechas un día (en hora local)"""
+    ai = _interpreter()
+    fresh = _interpreter()
+    day_one = _utc(datetime(2025, 10, 6, 10, 15))
+    day_two = _utc(datetime(2025, 10, 7, 10, 40))
+    text = "recuérdame tomar la pastilla todos los días a las 8"
+
+    async def scenario():
+        await ai.parse_recurring_reminder(text, day_one)
+        cached = await ai.parse_recurring_reminder(text, day_two)
+        expected = await fresh.parse_recurring_reminder(text, day_two)
+        return cached, expected
+
+    cached, expected = asyncio.run(scenario())
+    assert ai._make_api_call.calls == 1
+    assert cached == expected
+    assert ai.cache.get_stats()["reanchored"] == 1
+    print("✅ Expresión diaria re-anclada al día siguiente")
+
+
+def test_offset_expression_is_reanchored_exactly():
+    """'dentro de 90 minutos' se recalcula desde la hora del hit (parser local desactivado)"""
+    ai = _interpreter()
+    start = _utc(datetime(2025, 10, 6, 10, 15))
+    later = start + timedelta(minutes=17, seconds=5)
+
+    async def scenario():
+        await ai.interpret_time_expression("dentro de 90 minutos llamar al banco", start)
+        return await ai.interpret_time_expression("dentro de 90 minutos llamar al banco", later)
+
+    original = settings.TIME_PARSER_MIN_CONFIDENCE
+    settings.TIME_PARSER_MIN_CONFIDENCE = 1.1
+    try:
+        result = asyncio.run(scenario())
+    finally:
+        settings.TIME_PARSER_MIN_CONFIDENCE = original
+    assert ai._make_api_call.calls == 1
+    assert result == later + timedelta(minutes=90)
+    print("✅ Desplazamiento relativo re-anclado")
+
+
+def test_week_offset_is_shifted_exactly():
+    """'en 1 semana' se desplaza por el delta exacto, no se ancla a la semana del hit"""
+    cache = LLMCache()
+    start = _utc(datetime(2025, 10, 6, 10, 15))
+    later = start + timedelta(hours=3, minutes=20)
+    phrase = "en 1 semana revisar notas"
+
+    async def scenario():
+        await cache.set("interpret_time_expression", 1, phrase, start, _iso(start + timedelta(weeks=1)))
+        return await cache.get("interpret_time_expression", 1, phrase, later)
+
+    assert asyncio.run(scenario()) == _iso(later + timedelta(weeks=1))
+    print("✅ Semanas relativas re-ancladas exactas")
+
+
+def test_past_result_is_not_served():
+    """Si re-anclar deja una fecha en el pasado, se consulta al LLM de nuevo"""
+    cache = LLMCache()
+    reference = _utc(datetime(2025, 10, 6, 10, 15))
+    answer = _iso(_utc(datetime(2025, 10, 6, 10, 30)))
+
+    async def scenario():
+        await cache.set("interpret_time_expression", 1, "a las 10:30 reunión", reference, answer)
+        return await cache.get("interpret_time_expression", 1, "a las 10:30 reunión", _utc(datetime(2025, 10, 7, 10, 45)))
+
+    assert asyncio.run(scenario()) is None
+    assert cache.get_stats()["stale"] == 1
+    print("✅ Resultados vencidos no se sirven")
+
+
+def test_mongo_tier_and_prompt_version():
+    """Otra instancia encuentra la respuesta en MongoDB; subir la versión del prompt la invalida"""
+    db = MockDatabaseManager()
+    now = _utc(datetime(2025, 10, 6, 10, 15))
+    text = "recuérdame tomar la pastilla todos los días a las 8"
+
+    async def scenario():
+        await _interpreter(LLMCache(db)).parse_recurring_reminder(text, now)
+
+        other = _interpreter(LLMCache(db))
+        await other.parse_recurring_reminder(text, now)
+        calls_from_db = other._make_api_call.calls
+
+        original = ai_module.PROMPT_VERSIONS["parse_recurring_reminder"]
+        ai_module.PROMPT_VERSIONS["parse_recurring_reminder"] = original + 1
+        try:
+            bumped = _interpreter(LLMCache(db))
+            await bumped.parse_recurring_reminder(text, now)
+        finally:
+            ai_module.PROMPT_VERSIONS["parse_recurring_reminder"] = original
+        return calls_from_db, other.cache.get_stats(), bumped._make_api_call.calls
+
+    calls_from_db, stats, calls_after_bump = asyncio.run(scenario())
+    assert calls_from_db == 0 and stats["db_hits"] == 1
+    assert calls_after_bump == 1
+    print("✅ Nivel MongoDB compartido y versión de prompt en la clave")
+
+
+def benchmark_repeated_phrasing():
+    """Llamadas al LLM para 50 mensajes con frases repetidas a lo largo de una semana"""
+    print("\n📈 BENCHMARK: llamadas al LLM con frases repetidas")
+    print("=" * 50)
+
+    phrases = [
+        "recuérdame tomar la pastilla todos los días a las 8",
+        "Recuérdame tomar la pastilla todos los días a las 8.",
+        "recuerdame tomar la pastilla todos los dias a las 8",
+    ]
+    ai = _interpreter()
+    start = _utc(datetime(2025, 10, 6, 10, 0))
+
+    async def scenario():
+        for i in range(50):
+            await ai.parse_recurring_reminder(phrases[i % len(phrases)], start + timedelta(hours=i * 3, minutes=i))
+
+    asyncio.run(scenario())
+    stats = ai.cache.get_stats()
+    print(f"sin caché: 50 llamadas")
+    print(f"con caché: {ai._make_api_call.calls} llamadas (hit rate {stats['hit_rate']:.0%}, re-anclados {stats['reanchored']})")
+
+
+if __name__ == "__main__":
+    test_classify_anchors()
+    test_repeated_phrase_hits_cache()
+    test_daily_expression_is_reanchored_next_day()
+    test_offset_expression_is_reanchored_exactly()
+    test_week_offset_is_shifted_exactly()
+    test_past_result_is_not_served()
+    test_mongo_tier_and_prompt_version()
+    benchmark_repeated_phrasing()
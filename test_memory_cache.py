@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test de la caché de contexto de IA
+Primera lectura desde MongoDB, siguientes desde memoria; lo guardado se ve sin releer
+"""
+
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.models import AIMemory, MemoryType
+from bot.memory_index import MemoryIndex, ContextCache
+
+
+class MockDatabaseManager:
+    """ai_memory en memoria con conteo de consultas"""
+
+    def __init__(self, memories=None):
+        self.memories = list(memories or [])
+        self.queries = []
+
+    async def add_ai_memory(self, memory_data):
+        memory = AIMemory(**memory_data)
+        self.memories.append(memory)
+        return memory
+
+    async def add_ai_memories_bulk(self, memories):
+        self.memories.extend(memories)
+        return len(memories)
+
+    async def increment_memory_access(self, access, accessed_at):
+        return len(access)
+
+    async def get_user_context(self, user_id, limit=5, memory_types=None):
+        self.queries.append((user_id, tuple(memory_types or ())))
+        found = [
+            m for m in self.memories
+            if m.user_id == user_id and (not memory_types or m.memory_type in memory_types)
+        ]
+        found.sort(key=lambda m: m.created_at, reverse=True)
+        return found[:limit]
+
+
+NOW = datetime.utcnow()
+
+
+def _memory(user_id, text, memory_type=MemoryType.CONTEXT, minutes_ago=0):
+    return AIMemory(
+        user_id=user_id, text=text, memory_type=memory_type, source="test",
+        created_at=NOW - timedelta(minutes=minutes_ago)
+    )
+
+
+def _history():
+    return [
+        _memory(1, "Prefiere mañanas", MemoryType.PREFERENCE, minutes_ago=300),
+        _memory(1, "Creó recordatorio: Gym", minutes_ago=30),
+        _memory(1, "Programa los lunes", MemoryType.HABIT, minutes_ago=10),
+        _memory(1, "Nota de ayer", minutes_ago=60 * 24),
+        _memory(2, "Otro usuario"),
+    ]
+
+
+def test_context_is_newest_first_and_cached():
+    """Orden por created_at entre tipos; la segunda lectura no consulta MongoDB"""
+    print("🧪 Testing caché de contexto...")
+    db = MockDatabaseManager(_history())
+    index = MemoryIndex(db)
+
+    first = asyncio.run(index.get_user_context(1, limit=3))
+    assert first == ["🔄 Programa los lunes", "💬 Creó recordatorio: Gym", "⚙️ Prefiere mañanas"]
+    queries = len(db.queries)
+    assert queries == len(MemoryType)
+
+    assert asyncio.run(index.get_user_context(1, limit=3)) == first
+    assert len(db.queries) == queries
+    stats = index.get_cache_stats()
+    assert stats["hits"] == len(MemoryType) and stats["misses"] == len(MemoryType)
+    print("✅ Contexto ordenado y servido desde memoria")
+
+
+def test_writes_update_cache_in_place():
+    """add_context / add_preference / add_habit_pattern aparecen sin releer"""
+    db = MockDatabaseManager(_history())
+    index = MemoryIndex(db)
+
+    async def scenario():
+        await index.get_user_context(1)
+        queries = len(db.queries)
+        await index.add_context(1, "Creó nota: ideas", "note_creation")
+        await index.add_preference(1, "Prefiere mensajes cortos")
+        await index.add_habit_pattern(1, "Usa recordatorios nocturnos")
+        return queries, await index.get_user_context(1, limit=3)
+
+    queries, context = asyncio.run(scenario())
+    assert len(db.queries) == queries
+    assert set(context) == {"💬 Creó nota: ideas", "⚙️ Prefiere mensajes cortos", "🔄 Usa recordatorios nocturnos"}
+    print("✅ Write-through sin invalidar")
+
+
+def test_type_filter_and_uncached_write():
+    """Filtro por tipo; escribir en un par no cargado no crea una entrada parcial"""
+    db = MockDatabaseManager(_history())
+    index = MemoryIndex(db)
+
+    asyncio.run(index.add_preference(1, "Prefiere tardes"))
+    assert index.get_cache_stats()["entries"] == 0
+
+    preferences = asyncio.run(index.get_preferences(1))
+    assert preferences == ["⚙️ Prefiere tardes", "⚙️ Prefiere mañanas"]
+    assert db.queries == [(1, (MemoryType.PREFERENCE,))]
+    print("✅ Filtro por tipo")
+
+
+def test_lru_eviction_across_users():
+    cache = ContextCache(max_entries=2, items_per_type=3)
+    cache.put(1, MemoryType.CONTEXT, [])
+    cache.put(2, MemoryType.CONTEXT, [])
+    cache.get(1, MemoryType.CONTEXT)
+    cache.put(3, MemoryType.CONTEXT, [])
+
+    assert cache.get(2, MemoryType.CONTEXT) is None
+    assert cache.get(1, MemoryType.CONTEXT) == []
+    assert cache.evictions == 1
+
+    cache.put(1, MemoryType.HABIT, [])
+    for i in range(5):
+        cache.add(_memory(1, f"hábito {i}", MemoryType.HABIT))
+    assert [m.text for m in cache.get(1, MemoryType.HABIT)] == ["hábito 4", "hábito 3", "hábito 2"]
+    print("✅ LRU acotado entre usuarios")
+
+
+def test_large_limit_bypasses_cache():
+    db = MockDatabaseManager(_history())
+    index = MemoryIndex(db, ContextCache(items_per_type=2))
+    assert len(asyncio.run(index.get_user_context(1, limit=10))) == 4
+    assert index.get_cache_stats()["entries"] == 0
+    print("✅ Límite mayor que la caché va a MongoDB")
+
+
+def benchmark_context_reads():
+    """Consultas a MongoDB para el contexto de una conversación"""
+    print("\n📈 BENCHMARK: lecturas de contexto")
+    print("=" * 50)
+
+    db = MockDatabaseManager([_memory(u, f"contexto {i}", minutes_ago=i) for u in range(50) for i in range(30)])
+    index = MemoryIndex(db)
+    messages = 2000
+
+    async def scenario():
+        started = time.perf_counter()
+        for i in range(messages):
+            user_id = i % 50
+            await index.get_user_context(user_id, limit=3)
+            if i % 4 == 0:
+                await index.add_context(user_id, f"mensaje {i}", "conversation")
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(scenario())
+    stats = index.get_cache_stats()
+    print(f"{messages} lecturas de 50 usuarios: {len(db.queries)} consultas (antes: {messages})")
+    print(f"tasa de aciertos: {stats['hit_rate']:.1%} ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    test_context_is_newest_first_and_cached()
+    test_writes_update_cache_in_place()
+    test_type_filter_and_uncached_write()
+    test_lru_eviction_across_users()
+    test_large_limit_bypasses_cache()
+    benchmark_context_reads()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test de la recuperación de memorias por relevancia
+Recencia, confianza, frecuencia de uso y términos en común; los accesos se escriben con un $inc en lote
+"""
+
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.models import AIMemory, MemoryType
+from bot.memory_index import MemoryIndex, score_memory
+from utils.text_search import tokenize
+
+
+class MockDatabaseManager:
+    """ai_memory en memoria que aplica los $inc de accesos"""
+
+    def __init__(self, memories=None):
+        self.memories = list(memories or [])
+        self.queries = 0
+        self.access_writes = []
+
+    async def add_ai_memories_bulk(self, memories):
+        self.memories.extend(memories)
+        return len(memories)
+
+    async def increment_memory_access(self, access, accessed_at):
+        self.access_writes.append(dict(access))
+        for memory in self.memories:
+            if memory.id in access:
+                memory.access_count += access[memory.id]
+                memory.last_accessed = accessed_at
+        return len(access)
+
+    async def get_user_context(self, user_id, limit=5, memory_types=None):
+        self.queries += 1
+        found = [
+            m.model_copy() for m in self.memories
+            if m.user_id == user_id and (not memory_types or m.memory_type in memory_types)
+        ]
+        found.sort(key=lambda m: m.created_at, reverse=True)
+        return found[:limit]
+
+
+NOW = datetime.utcnow()
+
+
+def _memory(text, memory_type=MemoryType.CONTEXT, confidence=0.6, hours_ago=0, access_count=0):
+    return AIMemory(
+        user_id=1, text=text, memory_type=memory_type, source="test", confidence=confidence,
+        created_at=NOW - timedelta(hours=hours_ago), access_count=access_count
+    )
+
+
+def _history():
+    return [
+        _memory("Mensaje general: hola", hours_ago=1),
+        _memory("Mensaje general: gracias", hours_ago=2),
+        _memory("Creó recordatorio: Pagar la luz", hours_ago=3),
+        _memory("Creó recordatorio: Dentista con la doctora Pérez", hours_ago=24 * 4),
+        _memory("Prefiere recordatorios a las 08:00", MemoryType.PREFERENCE, confidence=0.8, hours_ago=24 * 30),
+        _memory("Frecuentemente programa para lunes", MemoryType.HABIT, confidence=0.7, hours_ago=24 * 5),
+    ]
+
+
+def test_score_components():
+    """Cada componente suma: más reciente, más confiable, más usada o con términos en común"""
+    print("🧪 Testing puntaje de memorias...")
+    terms = set(tokenize("dentista mañana"))
+    base = _memory("Mensaje general: hola", hours_ago=24)
+
+    assert score_memory(_memory("Mensaje general: hola"), terms, NOW) > score_memory(base, terms, NOW)
+    assert score_memory(_memory("Mensaje general: hola", confidence=0.9, hours_ago=24), terms, NOW) > score_memory(base, terms, NOW)
+    assert score_memory(_memory("Mensaje general: hola", hours_ago=24, access_count=5), terms, NOW) > score_memory(base, terms, NOW)
+    assert score_memory(_memory("Cita con el dentista", hours_ago=24), terms, NOW) > score_memory(base, terms, NOW)
+    assert 0.0 <= score_memory(_memory("x", confidence=3.0, access_count=10 ** 6), terms, NOW) <= 1.0
+    print("✅ Componentes del puntaje")
+
+
+def test_query_ranks_relevant_memories_first():
+    """Con el mensaje actual, lo relacionado le gana a la charla reciente"""
+    db = MockDatabaseManager(_history())
+    index = MemoryIndex(db)
+
+    recent = asyncio.run(index.get_user_context(1, limit=3))
+    assert recent[0] == "💬 Mensaje general: hola"
+
+    ranked = asyncio.run(index.get_user_context(1, limit=3, query="recordar el dentista el lunes"))
+    assert ranked[0] == "💬 Creó recordatorio: Dentista con la doctora Pérez"
+    assert "🔄 Frecuentemente programa para lunes" in ranked
+    assert db.queries == len(MemoryType)  # ambas lecturas desde la misma ventana en caché
+    print("✅ Memorias relevantes primero")
+
+
+def test_access_counts_are_batched():
+    """Cada lectura suma en memoria; un solo bulk_write de $inc por flush"""
+    db = MockDatabaseManager(_history())
+    index = MemoryIndex(db)
+
+    async def scenario():
+        for _ in range(10):
+            await index.get_user_context(1, limit=3, query="dentista")
+        assert db.access_writes == []
+        await index.flush()
+        await index.flush()
+
+    asyncio.run(scenario())
+    assert len(db.access_writes) == 1
+    dentist = next(m for m in db.memories if "Dentista" in m.text)
+    assert db.access_writes[0][dentist.id] == 10
+    assert dentist.access_count == 10 and dentist.last_accessed is not None
+    print("✅ Accesos en un solo $inc por lote")
+
+
+def test_buffered_memory_access_is_not_double_counted():
+    """Una memoria aún en el búfer se inserta con su contador; no recibe $inc"""
+    db = MockDatabaseManager()
+    index = MemoryIndex(db)
+
+    async def scenario():
+        await index.add_context(1, "Creó recordatorio: Gym", "reminder_creation")
+        await index.get_user_context(1, limit=3, query="gym")
+        await index.flush()
+
+    asyncio.run(scenario())
+    assert db.access_writes == [] and db.memories[0].access_count == 1
+    print("✅ Memorias del búfer sin doble conteo")
+
+
+def benchmark_access_writes():
+    """Escrituras de contadores de acceso"""
+    print("\n📈 BENCHMARK: contadores de acceso")
+    print("=" * 50)
+
+    db = MockDatabaseManager(_history() * 5)
+    index = MemoryIndex(db)
+    reads = 1000
+
+    async def scenario():
+        started = time.perf_counter()
+        for _ in range(reads):
+            await index.get_user_context(1, limit=3, query="pagar la luz el lunes")
+        await index.flush()
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(scenario())
+    print(f"{reads} lecturas con ranking: {elapsed / reads * 1e6:.0f} µs por lectura")
+    print(f"escrituras: {len(db.access_writes)} bulk_write (una por lectura y memoria: {reads * 3})")
+
+
+if __name__ == "__main__":
+    test_score_components()
+    test_query_ranks_relevant_memories_first()
+    test_access_counts_are_batched()
+    test_buffered_memory_access_is_not_double_counted()
+    benchmark_access_writes()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Test de escrituras en lote, retención y compactación de ai_memory
+El contexto se escribe con insert_many, expira según su tipo y el antiguo se resume en una memoria por usuario
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+from database.models import AIMemory, MemoryType, CONTEXT_SUMMARY_SOURCE
+from bot.memory_index import MemoryIndex
+
+
+class MockDatabaseManager:
+    """ai_memory en memoria con las operaciones de lote y compactación"""
+
+    def __init__(self, memories=None, fail_writes=False):
+        self.memories = list(memories or [])
+        self.fail_writes = fail_writes
+        self.bulk_writes = []
+        self.single_writes = 0
+
+    async def add_ai_memory(self, memory_data):
+        self.single_writes += 1
+        memory = AIMemory(**memory_data)
+        self.memories.append(memory)
+        return memory
+
+    async def add_ai_memories_bulk(self, memories):
+        if self.fail_writes:
+            return 0
+        self.bulk_writes.append(len(memories))
+        self.memories.extend(memories)
+        return len(memories)
+
+    async def increment_memory_access(self, access, accessed_at):
+        return len(access)
+
+    async def get_user_context(self, user_id, limit=5, memory_types=None):
+        found = [
+            m for m in self.memories
+            if m.user_id == user_id and (not memory_types or m.memory_type in memory_types)
+        ]
+        found.sort(key=lambda m: m.created_at, reverse=True)
+        return found[:limit]
+
+    def _compactable(self, user_id=None):
+        return [
+            m for m in self.memories
+            if m.memory_type == MemoryType.CONTEXT and m.source != CONTEXT_SUMMARY_SOURCE
+            and (user_id is None or m.user_id == user_id)
+        ]
+
+    async def get_users_to_compact(self, before, keep_latest):
+        users = {m.user_id for m in self._compactable()}
+        return sorted(
+            u for u in users
+            if len(self._compactable(u)) > keep_latest or min(m.created_at for m in self._compactable(u)) < before
+        )
+
+    async def get_context_to_compact(self, user_id, before, keep_latest):
+        context = sorted(self._compactable(user_id), key=lambda m: m.created_at, reverse=True)
+        cutoff = before
+        if len(context) > keep_latest:
+            cutoff = max(cutoff, context[keep_latest].created_at + timedelta(microseconds=1))
+        folded = [m for m in context if m.created_at < cutoff]
+        if not folded:
+            return None
+        by_source = {}
+        for m in folded:
+            group = by_source.setdefault(m.source, {"count": 0, "last_text": m.text, "newest": m.created_at})
+            group["count"] += 1
+        return {"cutoff": cutoff, "total": len(folded), "newest": folded[0].created_at, "by_source": by_source}
+
+    async def get_context_summary(self, user_id):
+        for m in self.memories:
+            if m.user_id == user_id and m.source == CONTEXT_SUMMARY_SOURCE:
+                return {**m.dict(), "counts": self.counts[user_id]}
+        return None
+
+    async def fold_context(self, user_id, cutoff, summary):
+        self.counts = getattr(self, "counts", {})
+        self.counts[user_id] = summary["counts"]
+        self.memories = [
+            m for m in self.memories
+            if not (m.user_id == user_id and m.source == CONTEXT_SUMMARY_SOURCE)
+        ]
+        self.memories.append(AIMemory(user_id=user_id, **{k: v for k, v in summary.items() if k != "counts"}))
+        before = len(self.memories)
+        self.memories = [m for m in self.memories if not (m in self._compactable(user_id) and m.created_at < cutoff)]
+        return before - len(self.memories)
+
+
+NOW = datetime.utcnow()
+
+
+def _context(user_id, text, source="general_message", days_ago=0, minutes_ago=0):
+    return AIMemory(
+        user_id=user_id, text=text, memory_type=MemoryType.CONTEXT, source=source,
+        created_at=NOW - timedelta(days=days_ago, minutes=minutes_ago)
+    )
+
+
+def test_context_is_buffered_and_flushed_in_batches():
+    """add_context no escribe al instante; el lote sale con un insert_many y se lee antes de escribirse"""
+    print("🧪 Testing escrituras de contexto en lote...")
+    db = MockDatabaseManager()
+    index = MemoryIndex(db, flush_batch_size=50)
+
+    async def scenario():
+        for i in range(120):
+            await index.add_context(1, f"Mensaje general: {i}", "general_message")
+        visible = await index.get_user_context(1, limit=3)
+        await index.flush()
+        return visible
+
+    visible = asyncio.run(scenario())
+    assert visible[0] == "💬 Mensaje general: 119"
+    assert db.bulk_writes == [50, 50, 20] and db.single_writes == 0
+    assert index.get_cache_stats()["pending_writes"] == 0
+    print("✅ 120 memorias en 3 insert_many")
+
+
+def test_failed_flush_keeps_buffer():
+    db = MockDatabaseManager(fail_writes=True)
+    index = MemoryIndex(db, flush_batch_size=1000)
+
+    async def scenario():
+        await index.add_context(1, "Creó recordatorio: Gym", "reminder_creation")
+        await index.flush()
+        db.fail_writes = False
+        return await index.flush()
+
+    assert asyncio.run(scenario()) == 1
+    assert db.bulk_writes == [1]
+    print("✅ Un fallo de MongoDB no pierde el lote")
+
+
+def test_retention_by_memory_type():
+    """Contexto y patrones expiran (índice TTL); preferencias y hábitos se conservan"""
+    db = MockDatabaseManager()
+    index = MemoryIndex(db)
+
+    async def scenario():
+        await index.add_context(1, "Mensaje general: hola")
+        await index.add_preference(1, "Prefiere mañanas")
+        await index.add_habit_pattern(1, "Programa los lunes")
+        await index.flush()
+
+    asyncio.run(scenario())
+    by_type = {m.memory_type: m for m in db.memories}
+    context = by_type[MemoryType.CONTEXT]
+    assert context.expires_at - context.created_at == timedelta(days=settings.MEMORY_RETENTION_DAYS["context"])
+    assert by_type[MemoryType.PREFERENCE].expires_at is None
+    assert by_type[MemoryType.HABIT].expires_at is None
+    print("✅ Retención por tipo de memoria")
+
+
+def test_old_context_is_folded_into_one_summary():
+    """El contexto antiguo se resume por usuario; los contadores se acumulan entre compactaciones"""
+    old = [_context(1, f"Mensaje general: {i}", days_ago=10, minutes_ago=i) for i in range(30)]
+    old += [_context(1, "Creó recordatorio: Dentista", "reminder_creation", days_ago=9)]
+    recent = [_context(1, "Mensaje general: hoy", minutes_ago=5), _context(2, "Otro usuario", days_ago=1)]
+    preference = AIMemory(user_id=1, text="Prefiere mañanas", memory_type=MemoryType.PREFERENCE, source="user_input",
+                          created_at=NOW - timedelta(days=60))
+    db = MockDatabaseManager(old + recent + [preference])
+    index = MemoryIndex(db)
+
+    compacted = asyncio.run(index.compact_all_context())
+    assert compacted == 31
+
+    summaries = [m for m in db.memories if m.source == CONTEXT_SUMMARY_SOURCE]
+    assert len(summaries) == 1 and summaries[0].user_id == 1
+    assert "31 interacciones" in summaries[0].text and "30 mensajes" in summaries[0].text
+    assert summaries[0].text.endswith("Última: Creó recordatorio: Dentista")
+    assert summaries[0].expires_at is None
+    assert preference in db.memories
+    assert len([m for m in db.memories if m.user_id == 1]) == 3  # resumen + reciente + preferencia
+
+    db.memories.append(_context(1, "Guardó nota sobre: ideas", "note_creation", days_ago=8))
+    assert asyncio.run(index.cleanup_old_context(1, days_old=7)) == 1
+    summary = [m for m in db.memories if m.source == CONTEXT_SUMMARY_SOURCE][0]
+    assert "32 interacciones" in summary.text and "1 notas" in summary.text
+    print("✅ Contexto antiguo compactado en un resumen por usuario")
+
+
+def test_context_per_user_is_bounded():
+    """Aunque sea reciente, el contexto por encima del tope se compacta"""
+    limit = 20
+    db = MockDatabaseManager([_context(1, f"Mensaje general: {i}", minutes_ago=i) for i in range(50)])
+    index = MemoryIndex(db)
+
+    before = NOW - timedelta(days=settings.MEMORY_COMPACT_AFTER_DAYS)
+    assert asyncio.run(index.compact_user_context(1, before, keep_latest=limit)) == 30
+    remaining = [m for m in db.memories if m.source != CONTEXT_SUMMARY_SOURCE]
+    assert len(remaining) == limit
+    assert max(m.created_at for m in remaining) == NOW
+    print("✅ Contexto por usuario acotado")
+
+
+def benchmark_memory_writes():
+    """Viajes a MongoDB por ráfaga de mensajes"""
+    print("\n📈 BENCHMARK: escrituras de contexto")
+    print("=" * 50)
+
+    db = MockDatabaseManager()
+    index = MemoryIndex(db)
+    messages = 1000
+
+    async def scenario():
+        for i in range(messages):
+            await index.add_context(i % 40, f"Mensaje general: {i}")
+        await index.flush()
+
+    asyncio.run(scenario())
+    print(f"{messages} mensajes: {len(db.bulk_writes)} insert_many (antes: {messages} insert_one)")
+
+
+if __name__ == "__main__":
+    test_context_is_buffered_and_flushed_in_batches()
+    test_failed_flush_keeps_buffer()
+    test_retention_by_memory_type()
+    test_old_context_is_folded_into_one_summary()
+    test_context_per_user_is_bounded()
+    benchmark_memory_writes()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test del campo desnormalizado next_fire_at (próximo disparo de un recordatorio)
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.reminder_manager import ReminderManager
+from database.models import Reminder, ReminderStatus
+
+
+def _make_reminder() -> Reminder:
+    date = datetime(2030, 1, 20, 12, 0)
+    return Reminder(
+        user_id=123456,
+        text="examen",
+        original_input="examen",
+        date=date,
+        pre_reminders=[date - timedelta(days=d) for d in (1, 7, 2)]
+    )
+
+
+def test_next_fire_advances_through_pre_reminders():
+    """next_fire_at recorre los pre-recordatorios en orden y termina en el principal"""
+    print("🧪 Testing cálculo de next_fire_at...")
+
+    reminder = _make_reminder()
+    sequence = []
+
+    while True:
+        fire_at, kind = reminder.compute_next_fire()
+        if fire_at is None:
+            break
+        sequence.append(((reminder.date - fire_at).days, kind))
+        if kind == "pre_reminder":
+            reminder.pre_reminder_notified[fire_at.isoformat()] = True
+        else:
+            reminder.notified = True
+
+    assert sequence == [(7, "pre_reminder"), (2, "pre_reminder"), (1, "pre_reminder"), (0, "main")], sequence
+    print(f"✅ Secuencia: {sequence}")
+
+
+def test_next_fire_skips_missed_pre_reminders():
+    """Pre-recordatorios vencidos (bot caído) no bloquean los siguientes disparos"""
+    reminder = _make_reminder()
+    missed_until = reminder.date - timedelta(days=1, hours=12)
+
+    fire_at, kind = reminder.compute_next_fire(not_before=missed_until)
+    assert kind == "pre_reminder" and reminder.date - fire_at == timedelta(days=1)
+
+    reminder.status = ReminderStatus.CANCELLED
+    assert reminder.compute_next_fire() == (None, None)
+    print("✅ Pre-recordatorios perdidos omitidos, cancelados sin disparo")
+
+
+class MockDatabaseManager:
+    """BD simulada que aplica la consulta por next_fire_at"""
+
+    def __init__(self, reminders):
+        self.reminders = reminders
+
+    async def get_pending_reminders(self, current_time, tolerance_seconds=30):
+        tolerance = timedelta(seconds=tolerance_seconds)
+        return [
+            r for r in self.reminders
+            if r.next_fire_at and current_time - tolerance <= r.next_fire_at <= current_time + tolerance
+        ]
+
+
+def test_due_reminders_from_next_fire():
+    """get_due_reminders arma el disparo desde next_fire_at sin recorrer pre_reminders"""
+    now = datetime.utcnow()
+
+    pre = Reminder(user_id=1, text="viaje", original_input="viaje",
+                   date=now + timedelta(days=2), pre_reminders=[now])
+    pre.next_fire_at, pre.next_fire_kind = pre.compute_next_fire()
+
+    main = Reminder(user_id=1, text="gym", original_input="gym", date=now + timedelta(seconds=5))
+    main.next_fire_at, main.next_fire_kind = main.compute_next_fire()
+
+    later = Reminder(user_id=1, text="cena", original_input="cena", date=now + timedelta(hours=3))
+    later.next_fire_at, later.next_fire_kind = later.compute_next_fire()
+
+    manager = ReminderManager(MockDatabaseManager([pre, main, later]))
+    due = asyncio.run(manager.get_due_reminders(tolerance_seconds=30))
+
+    summary = sorted((info["reminder"].text, info["type"], info.get("days_before")) for info in due)
+    assert summary == [("gym", "main", None), ("viaje", "pre_reminder", 2)], summary
+    print("✅ Disparos vencidos obtenidos con una sola consulta")
+
+
+if __name__ == "__main__":
+    test_next_fire_advances_through_pre_reminders()
+    test_next_fire_skips_missed_pre_reminders()
+    test_due_reminders_from_next_fire()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Test del índice local de notas
+Ranking BM25 + trigramas sobre todas las notas (sin LLM salvo el reordenamiento opcional del top-k),
+consultas por etiqueta/prioridad/semana, borrado incremental y LRU por memoria
+"""
+
+import asyncio
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+from database.models import Note
+from bot.note_manager import NoteManager
+from bot.note_search import NoteSearchIndex, UserNoteIndex, embed
+
+
+class MockDatabaseManager:
+    """Notas en memoria con los métodos que usan NoteManager y el índice"""
+
+    def __init__(self):
+        self.notes = {}
+        self.index_loads = 0
+        self.direct_queries = 0
+        self.failing_loads = 0
+        self.load_gate = None
+
+    def seed(self, user_id, texts, tags=None, priorities=None, start=None):
+        start = start or datetime(2025, 1, 1)
+        for i, text in enumerate(texts):
+            note = Note(_id=ObjectId(), user_id=user_id, text=text, tags=(tags or {}).get(text, []),
+                        priority=(priorities or {}).get(text, "medium"), created_at=start + timedelta(minutes=i))
+            self.notes[str(note.id)] = note
+        return self
+
+    async def add_note(self, note_data):
+        note = Note(_id=ObjectId(), **note_data)
+        self.notes[str(note.id)] = note
+        return note
+
+    async def get_notes_for_index(self, user_id):
+        self.index_loads += 1
+        if self.failing_loads:
+            self.failing_loads -= 1
+            return None
+        notes = sorted((n for n in self.notes.values() if n.user_id == user_id), key=lambda n: n.created_at)
+        snapshot = [{"_id": n.id, "text": n.text, "tags": n.tags, "priority": n.priority,
+                     "note_type": n.note_type.value, "created_at": n.created_at} for n in notes]
+        if self.load_gate:
+            # Lectura lenta: lo creado después de leer no viene en el resultado
+            await self.load_gate.wait()
+        return snapshot
+
+    async def delete_note(self, note_id, user_id):
+        note = self.notes.get(note_id)
+        if note and note.user_id == user_id:
+            del self.notes[note_id]
+            return True
+        return False
+
+    async def get_notes_by_tag(self, user_id, tag, limit=10):
+        self.direct_queries += 1
+        notes = [n for n in self.notes.values() if n.user_id == user_id and tag.lower() in [t.lower() for t in n.tags]]
+        return sorted(notes, key=lambda n: n.created_at, reverse=True)[:limit]
+
+    async def get_notes_by_priority(self, user_id, priority, limit=10):
+        self.direct_queries += 1
+        notes = [n for n in self.notes.values() if n.user_id == user_id and (n.priority or "medium") == priority]
+        return sorted(notes, key=lambda n: n.created_at, reverse=True)[:limit]
+
+    async def get_notes_by_ids(self, user_id, note_ids):
+        return [self.notes[i] for i in note_ids if i in self.notes and self.notes[i].user_id == user_id]
+
+
+class FakeAI:
+    """Registra lo que llega al LLM; reordena al revés"""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def search_notes_semantically(self, query, notes):
+        self.prompts.append(notes)
+        return list(reversed(notes))
+
+    async def classify_note(self, text):
+        return {}
+
+
+NOTES = [
+    "Presupuesto del proyecto de la casa: 3 millones",
+    "Ideas para las vacaciones en el sur: Puerto Varas y Frutillar",
+    "La clave del wifi de la oficina es 1234",
+    "Reunión con el equipo de marketing sobre la campaña",
+    "Receta de pan amasado de la abuela",
+    "Libros pendientes: Cien años de soledad, Rayuela",
+    "Reuniones semanales: revisar presupuestos y métricas",
+]
+
+
+def _manager(db=None, ai=None):
+    db = db or MockDatabaseManager().seed(1, NOTES, tags={NOTES[4]: ["cocina"]})
+    return NoteManager(db, ai or FakeAI()), db
+
+
+def _texts(notes):
+    return [note.text for note in notes]
+
+
+def test_bm25_ranks_whole_corpus():
+    """Términos exactos, plurales y etiquetas se encuentran sin el LLM"""
+    print("🧪 Testing búsqueda local de notas...")
+    manager, _ = _manager()
+
+    async def scenario():
+        return (
+            await manager.search_notes(1, "clave wifi"),
+            await manager.search_notes(1, "reuniones"),
+            await manager.search_notes(1, "cocina"),
+            await manager.search_notes(1, "presupuesto", limit=1),
+        )
+
+    wifi, meetings, cooking, budget = asyncio.run(scenario())
+    assert _texts(wifi)[0] == NOTES[2]
+    assert set(_texts(meetings)[:2]) == {NOTES[3], NOTES[6]}
+    assert _texts(cooking) == [NOTES[4]]
+    assert len(budget) == 1 and budget[0].text in (NOTES[0], NOTES[6])
+    assert manager.ai.prompts == []
+    print("✅ BM25 sobre todas las notas, sin LLM")
+
+
+def test_trigram_vectors_catch_partial_words():
+    """Palabras incompletas o con otra terminación se acercan por trigramas"""
+    manager, _ = _manager()
+
+    async def scenario():
+        return await manager.search_notes(1, "presupuestario"), await manager.search_notes(1, "vacacion")
+
+    budget, holidays = asyncio.run(scenario())
+    assert NOTES[0] in _texts(budget)
+    assert _texts(holidays)[0] == NOTES[1]
+    assert asyncio.run(manager.search_notes(1, "xyzzy")) == []
+    print("✅ Similitud de trigramas")
+
+
+def test_index_built_once_and_updated_on_create():
+    """El índice se carga una vez por usuario y las notas nuevas entran sin recargar"""
+    manager, db = _manager()
+
+    async def scenario():
+        await manager.search_notes(1, "wifi")
+        await manager.create_note(1, "Comprar regalo para el cumpleaños de Ana", auto_classify=False)
+        found = await manager.search_notes(1, "regalo cumpleaños")
+        other_user = await manager.search_notes(2, "wifi")
+        return found, other_user
+
+    found, other_user = asyncio.run(scenario())
+    assert _texts(found) == ["Comprar regalo para el cumpleaños de Ana"]
+    assert other_user == []
+    assert db.index_loads == 2  # usuario 1 y usuario 2, una vez cada uno
+    print("✅ Índice incremental por usuario")
+
+
+def test_optional_llm_rerank_sees_only_top_k():
+    """Con el reordenamiento activo, el prompt lleva solo los candidatos locales"""
+    ai = FakeAI()
+    manager, _ = _manager(ai=ai)
+    original = settings.NOTE_SEARCH_LLM_RERANK
+    settings.NOTE_SEARCH_LLM_RERANK = True
+    try:
+        results = asyncio.run(manager.search_notes(1, "reuniones presupuesto", limit=2))
+    finally:
+        settings.NOTE_SEARCH_LLM_RERANK = original
+
+    assert len(ai.prompts) == 1 and len(ai.prompts[0]) <= settings.NOTE_SEARCH_RERANK_TOP_K
+    assert all(set(candidate) == {"id", "text"} for candidate in ai.prompts[0])
+    assert len(results) == 2
+    print("✅ LLM solo para reordenar el top-k")
+
+
+def test_embedding_is_normalized():
+    vector = embed(["reunion", "equipo"], 512)
+    assert abs(sum(value * value for value in vector.values()) - 1.0) < 1e-9
+    assert embed([], 512) == {}
+    index = UserNoteIndex(512)
+    index.add("a", "hola mundo")
+    assert len(index) == 1 and index.bm25(["mundo"])
+    print("✅ Vectores con norma 1")
+
+
+def test_tag_priority_and_tags_are_lookups():
+    """Etiqueta y prioridad salen del índice; las notas nuevas aparecen sin recargar"""
+    db = MockDatabaseManager().seed(
+        1, NOTES,
+        tags={NOTES[4]: ["Cocina"], NOTES[0]: ["casa", "finanzas"], NOTES[6]: ["finanzas"]},
+        priorities={NOTES[0]: "high", NOTES[2]: "high"}
+    )
+    manager = NoteManager(db, FakeAI())
+
+    async def scenario():
+        # Sin índice cargado: consulta indexada en MongoDB, sin construir el índice
+        direct = await manager.get_notes_by_tag(1, "FINANZAS")
+        loads_before = db.index_loads
+        tags = await manager.get_all_user_tags(1)
+        finance = await manager.get_notes_by_tag(1, "FINANZAS")
+        high = await manager.get_notes_by_priority(1, "high")
+        await manager.create_note(1, "Pagar contribuciones", auto_classify=False)
+        return direct, loads_before, finance, high, tags
+
+    direct, loads_before, finance, high, tags = asyncio.run(scenario())
+    assert loads_before == 0 and db.direct_queries == 1
+    assert _texts(direct) == _texts(finance) == [NOTES[6], NOTES[0]]
+    assert _texts(high) == [NOTES[2], NOTES[0]]
+    assert "Cocina" in tags and "finanzas" in tags
+    assert db.index_loads == 1 and db.direct_queries == 1
+    print("✅ Etiquetas y prioridades por diccionario (o consulta indexada si no hay índice)")
+
+
+def test_created_since_uses_day_buckets():
+    """Las notas de la última semana salen de los buckets por día, con sus metadatos"""
+    db = MockDatabaseManager()
+    db.seed(1, ["nota vieja"], tags={"nota vieja": ["viejo"]}, start=datetime.utcnow() - timedelta(days=30))
+    db.seed(1, ["idea nueva", "otra idea"], tags={"idea nueva": ["Idea"], "otra idea": ["idea"]},
+            priorities={"idea nueva": "high"}, start=datetime.utcnow() - timedelta(days=2))
+    index = NoteSearchIndex(db)
+
+    note_ids, metadata = asyncio.run(index.created_since(1, datetime.utcnow() - timedelta(days=7)))
+    assert [db.notes[note_id].text for note_id in note_ids] == ["otra idea", "idea nueva"]
+    assert [meta["priority"] for meta in metadata] == ["medium", "high"]
+    assert all(meta["tags"] == ["idea"] for meta in metadata)
+    print("✅ Notas por rango de creación desde los buckets por día")
+
+
+def test_delete_updates_every_structure():
+    """Borrar una nota la saca de la búsqueda, etiquetas, prioridades y días"""
+    db = MockDatabaseManager().seed(1, NOTES, tags={NOTES[4]: ["cocina"]}, priorities={NOTES[4]: "low"})
+    manager = NoteManager(db, FakeAI())
+    bread_id = next(i for i, note in db.notes.items() if note.text == NOTES[4])
+
+    async def scenario():
+        assert await manager.search_notes(1, "pan amasado")
+        deleted = await manager.delete_note(1, bread_id)
+        missing = await manager.delete_note(1, bread_id)
+        return deleted, missing, await manager.search_notes(1, "pan amasado"), await manager.get_all_user_tags(1)
+
+    deleted, missing, found, tags = asyncio.run(scenario())
+    index = manager.search_index._users[1]
+    assert deleted and not missing
+    assert found == [] and tags == []
+    assert "low" not in index.by_priority and len(index) == len(NOTES) - 1
+    assert sum(len(p) for p in index.postings.values()) == sum(len(m["terms"]) for m in index.meta if m)
+    print("✅ Borrado incremental")
+
+
+def test_lru_respects_memory_budget():
+    """Sobre el presupuesto se descarta el índice menos usado y se reconstruye al volver"""
+    db = MockDatabaseManager()
+    for user_id in (1, 2, 3):
+        db.seed(user_id, NOTES)
+    single = NoteSearchIndex(db)
+    asyncio.run(single.search(1, "wifi"))
+    budget = int(single.memory_bytes * 2.5)
+
+    index = NoteSearchIndex(db, memory_budget_bytes=budget)
+
+    async def scenario():
+        await index.search(1, "wifi")
+        await index.search(2, "wifi")
+        await index.search(1, "wifi")  # el usuario 1 pasa a ser el más reciente
+        await index.search(3, "wifi")
+        return list(index._users)
+
+    loaded = asyncio.run(scenario())
+    assert loaded == [1, 3]
+    assert index.memory_bytes <= budget and index.get_stats()["evictions"] == 1
+    assert asyncio.run(index.search(2, "wifi"))  # se reconstruye
+    print("✅ LRU bajo presupuesto de memoria")
+
+
+def test_failed_load_is_not_cached():
+    """Un error transitorio de MongoDB no deja un índice vacío para siempre"""
+    manager, db = _manager()
+    db.failing_loads = 1
+
+    async def scenario():
+        return await manager.search_notes(1, "wifi"), await manager.search_notes(1, "wifi")
+
+    failed, retried = asyncio.run(scenario())
+    assert failed == []
+    assert _texts(retried) == ["La clave del wifi de la oficina es 1234"]
+    assert db.index_loads == 2
+    print("✅ Carga fallida no se guarda en caché")
+
+
+def test_concurrent_first_searches_build_once():
+    """Búsquedas simultáneas comparten la carga; una nota creada durante la carga no se pierde"""
+    manager, db = _manager()
+
+    async def scenario():
+        db.load_gate = asyncio.Event()
+        searches = asyncio.gather(manager.search_notes(1, "wifi"), manager.search_notes(1, "receta pan"))
+        await asyncio.sleep(0)
+        await manager.create_note(1, "Comprar regalo para el cumpleaños de Ana", auto_classify=False)
+        db.load_gate.set()
+        first = await searches
+        return first, await manager.search_notes(1, "regalo cumpleaños")
+
+    (wifi, bread), gift = asyncio.run(scenario())
+    assert _texts(wifi) == ["La clave del wifi de la oficina es 1234"]
+    assert _texts(bread)[0] == "Receta de pan amasado de la abuela"
+    assert _texts(gift) == ["Comprar regalo para el cumpleaños de Ana"]
+    assert db.index_loads == 1
+    print("✅ Una sola carga por usuario bajo concurrencia")
+
+
+def benchmark_note_search():
+    """Latencia del ranking local con 2000 notas vs el prompt de 100 notas al LLM"""
+    print("\n📈 BENCHMARK: búsqueda de notas")
+    print("=" * 50)
+
+    random.seed(7)
+    vocabulary = ("reunión equipo presupuesto proyecto casa vacaciones viaje receta pan libro clave wifi "
+                  "médico control banco pago arriendo idea campaña cliente informe entrega curso").split()
+    corpus = [" ".join(random.choice(vocabulary) for _ in range(random.randint(6, 20))) for _ in range(2000)]
+    db = MockDatabaseManager().seed(1, corpus)
+    index = NoteSearchIndex(db)
+
+    queries = ["presupuesto proyecto", "clave wifi", "control médico", "vacaciones", "informe cliente"]
+
+    async def scenario():
+        await index.search(1, "warmup")
+        started = time.perf_counter()
+        for _ in range(20):
+            for query in queries:
+                await index.search(1, query)
+        return (time.perf_counter() - started) / (20 * len(queries))
+
+    per_search = asyncio.run(scenario())
+    old_prompt_chars = sum(len(f"{i}: {text}\n") for i, text in enumerate(corpus[:100]))
+
+    print(f"antes: prompt de ~{old_prompt_chars // 4} tokens con 100 de {len(corpus)} notas + latencia del LLM")
+    print(f"ahora: {per_search * 1000:.2f} ms por búsqueda sobre las {len(corpus)} notas, 0 tokens")
+
+    async def lookups():
+        started = time.perf_counter()
+        for _ in range(200):
+            await index.notes_by_priority(1, "medium", limit=10)
+            await index.all_tags(1)
+        return (time.perf_counter() - started) / 400
+
+    print(f"etiqueta/prioridad: {asyncio.run(lookups()) * 1e6:.0f} µs por consulta (antes: leer 100-200 notas de MongoDB)")
+    print(f"memoria estimada del índice: {index.get_stats()['memory_mb']} MB")
+
+
+if __name__ == "__main__":
+    test_bm25_ranks_whole_corpus()
+    test_trigram_vectors_catch_partial_words()
+    test_index_built_once_and_updated_on_create()
+    test_optional_llm_rerank_sees_only_top_k()
+    test_embedding_is_normalized()
+    test_tag_priority_and_tags_are_lookups()
+    test_created_since_uses_day_buckets()
+    test_delete_updates_every_structure()
+    test_lru_respects_memory_budget()
+    test_failed_load_is_not_cached()
+    test_concurrent_first_searches_build_once()
+    benchmark_note_search()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Test de filtros en MongoDB e índices compuestos
+Las consultas llevan sus predicados (fecha futura, prioridad, etiqueta) y, contra un MongoDB real
+(MONGODB_TEST_URI), explain() confirma que ninguna hace COLLSCAN
+"""
+
+import asyncio
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.connection import DatabaseManager
+from bot.reminder_manager import ReminderManager
+
+NOW = datetime.utcnow()
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=1):
+        self.docs = sorted(self.docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeReminders:
+    """Aplica igualdades y rangos de fecha; registra cada consulta"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query):
+        self.queries.append(query)
+
+        def matches(doc):
+            for key, condition in query.items():
+                if isinstance(condition, dict):
+                    if "$gt" in condition and not doc[key] > condition["$gt"]:
+                        return False
+                    if "$lte" in condition and not doc[key] <= condition["$lte"]:
+                        return False
+                elif doc.get(key) != condition:
+                    return False
+            return True
+
+        return FakeCursor([d for d in self.docs if matches(d)])
+
+
+def _reminders(overdue=30, upcoming=5):
+    docs = [
+        {"user_id": 1, "text": f"vencido {i}", "original_input": "recuérdame", "status": "pending",
+         "date": NOW - timedelta(days=1, minutes=i)}
+        for i in range(overdue)
+    ]
+    docs += [
+        {"user_id": 1, "text": f"futuro {i}", "original_input": "recuérdame", "status": "pending",
+         "date": NOW + timedelta(hours=i + 1)}
+        for i in range(upcoming)
+    ]
+    return docs
+
+
+def test_future_only_filter_is_in_the_query():
+    """Con muchos vencidos, la lista de próximos no queda vacía"""
+    print("🧪 Testing filtros en la consulta...")
+    db = DatabaseManager("mongodb://test", "test")
+    db.reminders = FakeReminders(_reminders())
+
+    upcoming = asyncio.run(ReminderManager(db).get_pending_reminders_for_user(1, limit=3))
+    assert [r.text for r in upcoming] == ["futuro 0", "futuro 1", "futuro 2"]
+    query = db.reminders.queries[-1]
+    assert query["status"] == "pending" and "$gt" in query["date"]
+    print("✅ 'Solo futuros' resuelto por MongoDB")
+
+
+def test_overdue_filter_is_in_the_query():
+    """La limpieza solo trae pendientes vencidos"""
+    db = DatabaseManager("mongodb://test", "test")
+    db.reminders = FakeReminders(_reminders(overdue=3, upcoming=40))
+
+    overdue = asyncio.run(db.get_user_reminders(1, status="pending", limit=100, until=NOW))
+    assert len(overdue) == 3 and all(r.date <= NOW for r in overdue)
+    print("✅ Vencidos filtrados en la consulta")
+
+
+class RecordingCollection:
+    """Colección real que guarda los cursores y pipelines para explicarlos después"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.cursors = []
+        self.pipelines = []
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def find(self, *args, **kwargs):
+        cursor = self._collection.find(*args, **kwargs)
+        self.cursors.append((args[0] if args else kwargs.get("filter"), cursor))
+        return cursor
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        self.pipelines.append(pipeline)
+        return self._collection.aggregate(pipeline, *args, **kwargs)
+
+
+def _winning_stages(node, inside_plan=False):
+    """Etapas de los planes ganadores de un explain (incluye $facet/$cursor anidados)"""
+    stages = []
+    if isinstance(node, dict):
+        if inside_plan and "stage" in node:
+            stages.append(node["stage"])
+        for key, value in node.items():
+            stages += _winning_stages(value, inside_plan or key in ("winningPlan", "queryPlan"))
+    elif isinstance(node, list):
+        for item in node:
+            stages += _winning_stages(item, inside_plan)
+    return stages
+
+
+def test_no_collscan_with_real_mongodb():
+    """explain() de cada consulta de listados/resúmenes usa los índices (requiere MONGODB_TEST_URI)"""
+    uri = os.getenv("MONGODB_TEST_URI")
+    if not uri:
+        print("⏭️ MONGODB_TEST_URI no configurado: se omite la verificación con explain()")
+        return
+
+    async def scenario():
+        db = DatabaseManager(uri, f"oskar_explain_{uuid.uuid4().hex[:8]}")
+        assert await db.connect()
+        try:
+            await db.reminders.insert_many(_reminders())
+            await db.notes.insert_many([
+                {"user_id": 1, "text": f"nota {i}", "tags": ["trabajo"] if i % 2 else [],
+                 "priority": "high" if i % 3 == 0 else None, "created_at": NOW - timedelta(hours=i)}
+                for i in range(50)
+            ])
+
+            db.reminders = RecordingCollection(db.reminders)
+            db.notes = RecordingCollection(db.notes)
+            manager = ReminderManager(db)
+
+            await manager.get_pending_reminders_for_user(1)
+            await db.get_user_reminders(1, status="pending", limit=100, until=NOW)
+            await db.search_reminders_by_text(1, "vencid")
+            await db.get_weekly_reminder_stats(1, NOW - timedelta(days=7))
+            await db.get_notes_by_priority(1, "high")
+            await db.get_notes_by_priority(1, "medium")
+            await db.get_notes_by_tag(1, "trabajo")
+            await db.get_notes_for_index(1)
+            await db.get_weekly_note_stats(1, NOW - timedelta(days=7))
+
+            plans = []
+            for collection in (db.reminders, db.notes):
+                for query, cursor in collection.cursors:
+                    plans.append((query, await cursor.clone().explain()))
+                for pipeline in collection.pipelines:
+                    explained = await db.db.command(
+                        "aggregate", collection.name, pipeline=pipeline, explain=True
+                    )
+                    plans.append((pipeline[0], explained))
+            return plans
+        finally:
+            await db.client.drop_database(db.database_name)
+            await db.close()
+
+    plans = asyncio.run(scenario())
+    assert len(plans) == 9
+    for query, explained in plans:
+        stages = _winning_stages(explained)
+        assert stages, query
+        assert "COLLSCAN" not in stages, (query, stages)
+    print(f"✅ {len(plans)} consultas sin COLLSCAN")
+
+
+def benchmark_overdue_backlog():
+    """Próximos recordatorios visibles según la cantidad de vencidos"""
+    print("\n📈 BENCHMARK: recordatorios vencidos acumulados")
+    print("=" * 50)
+
+    for overdue in (5, 50, 500):
+        db = DatabaseManager("mongodb://test", "test")
+        db.reminders = FakeReminders(_reminders(overdue=overdue))
+        upcoming = asyncio.run(ReminderManager(db).get_pending_reminders_for_user(1, limit=5))
+        print(f"{overdue:>3} vencidos: {len(upcoming)} próximos (antes, con limit*2: {max(0, 5 - max(0, overdue - 5))})")
+
+
+if __name__ == "__main__":
+    test_future_only_filter_is_in_the_query()
+    test_overdue_filter_is_in_the_query()
+    test_no_collscan_with_real_mongodb()
+    benchmark_overdue_backlog()
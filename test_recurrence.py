@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Test de recordatorios recurrentes guardados como regla (RRULE + EXDATE)
+Una serie es un solo documento; las ocurrencias se generan a demanda
+"""
+
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+import pytz
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bot.calendar_outbox as outbox_module
+from bot.calendar_outbox import CalendarOutbox
+from bot.reminder_manager import ReminderManager
+from database.connection import DatabaseManager
+from database.models import Reminder
+from utils.recurrence import infer_rrule, iter_occurrences, next_occurrence, previous_occurrence, to_local
+
+CHILE_TZ = pytz.timezone('America/Santiago')
+
+
+def _utc(local_naive: datetime) -> datetime:
+    """Hora local de Chile → UTC naive"""
+    return CHILE_TZ.localize(local_naive).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+class Result:
+    def __init__(self, ids=(), matched=0):
+        self.inserted_ids = list(ids)
+        self.inserted_id = self.inserted_ids[0] if self.inserted_ids else None
+        self.matched_count = self.modified_count = self.deleted_count = matched
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):  # orden por textScore: se conserva el de inserción
+            return self
+        self.docs = sorted(self.docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """Lo justo de Motor para recordatorios y outbox (los filtros $or/$regex se ignoran)"""
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _matches(document, query):
+        for key, value in query.items():
+            if key.startswith("$"):
+                continue
+            if isinstance(value, dict):
+                if "$in" in value and document.get(key) not in value["$in"]:
+                    return False
+            elif document.get(key) != value:
+                return False
+        return True
+
+    def _first(self, query):
+        return next((d for d in self.docs.values() if self._matches(d, query)), None)
+
+    async def insert_many(self, documents, ordered=True):
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+            self.docs[document["_id"]] = document
+        return Result([d["_id"] for d in documents])
+
+    async def insert_one(self, document):
+        return await self.insert_many([document])
+
+    def find(self, query, projection=None):
+        return FakeCursor([d for d in self.docs.values() if self._matches(d, query)])
+
+    @staticmethod
+    def _apply(document, update):
+        for key, value in update.get("$set", {}).items():
+            target = document
+            *path, last = key.split(".")
+            for part in path:
+                target = target.setdefault(part, {})
+            target[last] = value
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        document = self._first(query)
+        if document:
+            self._apply(document, update)
+        return document
+
+    async def update_one(self, query, update):
+        document = self._first(query)
+        if document:
+            self._apply(document, update)
+        return Result(matched=1 if document else 0)
+
+    async def find_one(self, query):
+        return self._first(query)
+
+    async def delete_one(self, query):
+        document = self._first(query)
+        if document:
+            del self.docs[document["_id"]]
+        return Result(matched=1 if document else 0)
+
+    async def delete_many(self, query):
+        matching = [d["_id"] for d in self.docs.values() if self._matches(d, query)]
+        for key in matching:
+            del self.docs[key]
+        return Result(matched=len(matching))
+
+
+def _make_db() -> DatabaseManager:
+    db = DatabaseManager("mongodb://test", "test")
+    db.reminders = FakeCollection()
+    db.calendar_outbox = FakeCollection()
+    return db
+
+
+def _daily_dates(days: int, hour: int = 8):
+    """Lo que lista el LLM para "todos los días a las 8": próximos `days` días en hora de Chile"""
+    today = to_local(datetime.utcnow()).date()
+    return [_utc(datetime.combine(today + timedelta(days=i + 1), datetime.min.time()).replace(hour=hour))
+            for i in range(days)]
+
+
+def _run(coro_factory):
+    outbox_module.calendar_outbox = None
+    try:
+        return asyncio.run(coro_factory())
+    finally:
+        outbox_module.calendar_outbox = None
+
+
+async def _create_daily_series(db):
+    manager = ReminderManager(db)
+    items = [{"original_input": "gym todos los días", "text": "gym", "date": d} for d in _daily_dates(7)]
+    results = await manager.create_recurring_reminders(1, items)
+    return manager, results
+
+
+def test_infer_rrule_from_listed_dates():
+    """Las fechas que lista el LLM se convierten en la regla que las genera"""
+    print("🧪 Testing inferencia de reglas...")
+    start = _utc(datetime(2025, 10, 7, 8, 0))
+    weekdays = [_utc(datetime(2025, 10, d, 7, 30)) for d in (9, 10, 13, 14, 15)]
+
+    assert infer_rrule([start + timedelta(days=i) for i in range(7)]) == "FREQ=DAILY;INTERVAL=1"
+    assert infer_rrule([start + timedelta(days=2 * i) for i in range(7)]) == "FREQ=DAILY;INTERVAL=2"
+    assert infer_rrule([start + timedelta(weeks=i) for i in range(4)]) == "FREQ=WEEKLY;INTERVAL=1"
+    assert infer_rrule([_utc(datetime(2025, m, 15, 9)) for m in (10, 11, 12)]) == "FREQ=MONTHLY;INTERVAL=1"
+    assert infer_rrule([start + timedelta(hours=8 * i) for i in range(7)]) == "FREQ=HOURLY;INTERVAL=8;COUNT=7"
+    assert infer_rrule(weekdays) == "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"
+    # Lunes a viernes empezando un lunes: consecutivos, pero no es una serie diaria
+    monday_start = [_utc(datetime(2026, 10, d, 7, 30)) for d in range(19, 24)]
+    assert infer_rrule(monday_start) == "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"
+    assert to_local(next_occurrence(infer_rrule(monday_start), monday_start[0], monday_start[-1])).day == 26
+    # Menos de una semana listada: la serie termina en la última fecha
+    assert infer_rrule([start + timedelta(days=i) for i in range(3)]) == "FREQ=DAILY;INTERVAL=1;COUNT=3"
+    # Fechas irregulares o demasiado pocas no se convierten en una serie infinita
+    assert infer_rrule([start, start + timedelta(days=1), start + timedelta(days=5)]) is None
+    assert infer_rrule([start, start + timedelta(days=1)]) is None
+    print("✅ Reglas diarias, semanales, mensuales, por horas y por días hábiles")
+
+
+def test_occurrences_keep_local_time_across_dst():
+    """Expandir en hora de Chile: el cambio de horario no corre la hora del recordatorio"""
+    start = _utc(datetime(2025, 9, 4, 8, 0))
+    occurrences = list(islice(iter_occurrences("FREQ=DAILY;INTERVAL=1", start, after=start, inclusive=True), 7))
+    assert {to_local(o).hour for o in occurrences} == {8}
+    assert occurrences[3] - occurrences[2] == timedelta(hours=23)  # 6 → 7 de septiembre
+    print("✅ Ocurrencias estables en hora local")
+
+
+def test_series_is_one_document():
+    """Siete fechas diarias se guardan como un recordatorio con regla y un evento recurrente"""
+    async def scenario():
+        db = _make_db()
+        outbox_module.calendar_outbox = CalendarOutbox(db)
+        _, results = await _create_daily_series(db)
+        return db, results
+
+    db, results = _run(scenario)
+    assert results == [True] * 7
+    assert len(db.reminders.docs) == 1 and len(db.calendar_outbox.docs) == 1
+
+    stored = next(iter(db.reminders.docs.values()))
+    assert stored["rrule"] == "FREQ=DAILY;INTERVAL=1" and stored["recurring"]
+    assert stored["date"] == stored["series_start"] == _daily_dates(1)[0]
+    # Una serie diaria no avisa "mañana" cada día
+    assert stored["pre_reminders"] == []
+    payload = next(iter(db.calendar_outbox.docs.values()))["payload"]
+    assert payload["rrule"] == "FREQ=DAILY;INTERVAL=1"
+    print("✅ Serie guardada como un solo documento")
+
+
+def test_main_notification_advances_series():
+    """El aviso principal materializa la siguiente ocurrencia; la serie no termina a los 7 días"""
+    async def scenario():
+        db = _make_db()
+        await _create_daily_series(db)
+        reminder_id = next(iter(db.reminders.docs))
+        dates = []
+        for _ in range(10):
+            dates.append(db.reminders.docs[reminder_id]["date"])
+            reminder = await db.mark_as_notified(str(reminder_id))
+        return dates, reminder
+
+    dates, reminder = _run(scenario)
+    assert all(b - a == timedelta(days=1) for a, b in zip(dates, dates[1:]))
+    assert not reminder.notified and reminder.next_fire_kind == "main"
+    assert reminder.next_fire_at == reminder.date == dates[-1] + timedelta(days=1)
+    print("✅ Serie avanza más allá del horizonte listado")
+
+
+def test_counted_series_ends():
+    """Una serie con COUNT (tratamiento cada 8 horas) se cierra tras su última toma"""
+    async def scenario():
+        db = _make_db()
+        start = datetime.utcnow().replace(microsecond=0) + timedelta(hours=1)
+        items = [{"original_input": "antibiótico", "text": "antibiótico", "date": start + timedelta(hours=8 * i)}
+                 for i in range(3)]
+        await ReminderManager(db).create_recurring_reminders(1, items)
+        reminder_id = next(iter(db.reminders.docs))
+        for _ in range(3):
+            reminder = await db.mark_as_notified(str(reminder_id))
+        return reminder
+
+    reminder = _run(scenario)
+    assert reminder.notified and reminder.next_fire_at is None
+    print("✅ Serie con COUNT termina")
+
+
+def test_weekday_exception_edits_rule():
+    """'gym todos los días excepto viernes' filtra la regla (BYDAY) y una fecha puntual va a EXDATE"""
+    async def scenario():
+        db = _make_db()
+        outbox_module.calendar_outbox = CalendarOutbox(db)
+        manager, _ = await _create_daily_series(db)
+        by_weekday = await manager.delete_reminder_exceptions("gym", 1, exception_weekdays=["viernes"])
+        skipped = _daily_dates(3)[2]
+        by_date = await manager.delete_reminder_exceptions(
+            "gym", 1, exception_dates=[to_local(skipped).date().isoformat()]
+        )
+        return db, by_weekday, by_date, skipped
+
+    db, by_weekday, by_date, skipped = _run(scenario)
+    assert by_weekday and by_date
+    assert len(db.reminders.docs) == 1
+
+    reminder = Reminder(**next(iter(db.reminders.docs.values())))
+    assert reminder.rrule == "FREQ=DAILY;INTERVAL=1;BYDAY=MO,TU,WE,TH,SA,SU"
+    assert skipped in reminder.exdates
+    upcoming = list(islice(iter_occurrences(reminder.rrule, reminder.series_start, reminder.exdates,
+                                            after=reminder.series_start, inclusive=True), 20))
+    assert all(to_local(o).weekday() != 4 for o in upcoming) and skipped not in upcoming
+    assert reminder.date == upcoming[0]
+    # El evento (aún sin enviar a iCloud) se creará con la regla nueva
+    payload = next(iter(db.calendar_outbox.docs.values()))["payload"]
+    assert payload["rrule"] == reminder.rrule and payload["exdates"] == reminder.exdates
+    print("✅ Excepciones como BYDAY/EXDATE, sin borrar documentos")
+
+
+def test_upcoming_occurrences_merge_series():
+    """/listar expande la serie y la intercala con recordatorios sueltos"""
+    async def scenario():
+        db = _make_db()
+        manager, _ = await _create_daily_series(db)
+        dentist = _daily_dates(3, hour=10)[2]
+        await manager.create_reminders_bulk(1, [{"original_input": "dentista", "text": "dentista", "date": dentist}])
+        return await manager.get_upcoming_occurrences(1, limit=5), dentist
+
+    occurrences, dentist = _run(scenario)
+    dates = [entry["date"] for entry in occurrences]
+    assert len(occurrences) == 5 and dates == sorted(dates)
+    assert dentist in dates
+    assert sum(1 for entry in occurrences if entry["reminder"].rrule) == 4
+    print("✅ Próximas ocurrencias combinadas")
+
+
+def benchmark_series_storage_and_iteration():
+    """Documentos por serie y costo de calcular la próxima ocurrencia"""
+    print("\n📈 BENCHMARK: series como regla")
+    print("=" * 45)
+
+    async def scenario():
+        db = _make_db()
+        await _create_daily_series(db)
+        return len(db.reminders.docs)
+
+    documents = _run(scenario)
+    print(f"'todos los días': antes 7 documentos (y fin a los 7 días), ahora {documents} sin fin")
+
+    start = _utc(datetime(2025, 10, 7, 8, 0))
+    rules = ["FREQ=DAILY;INTERVAL=1", "FREQ=WEEKLY;BYDAY=MO,WE,FR", "FREQ=MONTHLY;INTERVAL=1"]
+    series = []
+    for i in range(30):
+        rule = rules[i % len(rules)]
+        after = start + timedelta(days=400 + i)
+        reminder = Reminder(user_id=1, text="x", original_input="x", rrule=rule, series_start=start,
+                            date=previous_occurrence(rule, start, after))
+        series.append((rule, after, reminder))
+
+    rounds = 50
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for rule, after, _ in series:
+            next_occurrence(rule, start, after)
+    from_start = (time.perf_counter() - started) / (rounds * len(series))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for _, after, reminder in series:
+            reminder.next_occurrence(after)
+    from_materialized = (time.perf_counter() - started) / (rounds * len(series))
+
+    print(f"próxima ocurrencia a ~400 días del inicio: desde DTSTART {from_start * 1e6:.0f} µs"
+          f" | desde la ocurrencia materializada {from_materialized * 1e6:.0f} µs")
+
+if __name__ == "__main__":
+    test_infer_rrule_from_listed_dates()
+    test_occurrences_keep_local_time_across_dst()
+    test_series_is_one_document()
+    test_main_notification_advances_series()
+    test_counted_series_ends()
+    test_weekday_exception_edits_rule()
+    test_upcoming_occurrences_merge_series()
+    benchmark_series_storage_and_iteration()
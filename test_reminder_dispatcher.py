@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test del despachador de recordatorios por eventos (heap en memoria)
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.reminder_dispatcher import ReminderDispatcher
+from database.models import Reminder
+
+
+class MockDatabaseManager:
+    """BD simulada que cuenta las lecturas de la ventana"""
+
+    def __init__(self, reminders):
+        self.reminders = reminders
+        self.window_reads = 0
+
+    async def get_reminders_in_window(self, start, end):
+        self.window_reads += 1
+        return [
+            r for r in self.reminders
+            if (not r.notified and start <= r.date <= end)
+            or any(start <= p <= end for p in r.pre_reminders)
+        ]
+
+
+def _make_reminder(text: str, seconds_ahead: float, pre_seconds=()) -> Reminder:
+    now = datetime.utcnow()
+    return Reminder(
+        user_id=123456,
+        text=text,
+        original_input=text,
+        date=now + timedelta(seconds=seconds_ahead),
+        pre_reminders=[now + timedelta(seconds=s) for s in pre_seconds]
+    )
+
+
+async def _run_dispatch_scenario():
+    fired = []
+
+    async def on_due(info):
+        fired.append((info["reminder"].text, info["type"], datetime.utcnow() - info["notification_time"]))
+
+    loaded = _make_reminder("tomar pastilla", 0.4, pre_seconds=[0.2])
+    db = MockDatabaseManager([loaded])
+    dispatcher = ReminderDispatcher(db, on_due, horizon_hours=1, grace_seconds=30)
+    await dispatcher.start()
+
+    # Recordatorio creado después del arranque (sin recargar la BD)
+    created = _make_reminder("llamar al médico", 0.3)
+    assert dispatcher.schedule_reminder(created) == 1
+
+    # Recordatorio creado y luego eliminado: nunca debe dispararse
+    deleted = _make_reminder("gym", 0.25)
+    dispatcher.schedule_reminder(deleted)
+    assert dispatcher.unschedule_reminder(str(deleted.id)) == 1
+
+    await asyncio.sleep(0.8)
+    status = dispatcher.get_status()
+    await dispatcher.stop()
+    return fired, db.window_reads, status
+
+
+def test_dispatcher_fires_on_time():
+    """Los disparos ocurren en su hora exacta y sin sondear la BD"""
+    print("🧪 Testing despachador por eventos...")
+
+    fired, window_reads, status = asyncio.run(_run_dispatch_scenario())
+
+    for text, kind, delay in fired:
+        print(f"   ⏰ {kind:<12} {text:<18} retraso {delay.total_seconds() * 1000:.1f} ms")
+
+    kinds = sorted((text, kind) for text, kind, _ in fired)
+    assert kinds == [
+        ("llamar al médico", "main"),
+        ("tomar pastilla", "main"),
+        ("tomar pastilla", "pre_reminder"),
+    ], kinds
+    assert all(delay < timedelta(seconds=0.2) for _, _, delay in fired)
+    assert window_reads == 1
+    assert status["scheduled"] == 0
+    print(f"✅ {len(fired)} disparos a tiempo con {window_reads} lectura de BD")
+
+
+def test_dispatcher_does_not_refire():
+    """Una recarga de la ventana no vuelve a programar disparos ya enviados"""
+
+    async def scenario():
+        fired = []
+
+        async def on_due(info):
+            fired.append(info["type"])
+
+        db = MockDatabaseManager([_make_reminder("pagar cuenta", 0.1)])
+        dispatcher = ReminderDispatcher(db, on_due, horizon_hours=1, grace_seconds=30)
+        await dispatcher.start()
+        await asyncio.sleep(0.3)
+
+        # La BD aún no refleja "notified": la recarga no debe duplicar
+        await dispatcher.refresh()
+        await asyncio.sleep(0.2)
+        await dispatcher.stop()
+        return fired
+
+    fired = asyncio.run(scenario())
+    assert fired == ["main"], fired
+    print("✅ Recarga sin duplicados")
+
+
+if __name__ == "__main__":
+    test_dispatcher_fires_on_time()
+    test_dispatcher_does_not_refire()
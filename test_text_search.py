@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test de la búsqueda de recordatorios por texto
+Índice de texto con todos los términos, respaldo literal escapado y entrada del usuario sin regex
+"""
+
+import asyncio
+import re
+import sys
+import os
+import time
+from datetime import datetime
+
+from pymongo.errors import OperationFailure
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.connection import DatabaseManager
+from utils.text_search import normalize_text, search_terms, matches_all_terms
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return dict(next(self._iter))
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeReminders:
+    """Colección simulada: $text como OR de palabras (ordenado por coincidencias) y $regex"""
+
+    def __init__(self, docs, text_index=True):
+        self.docs = docs
+        self.text_index = text_index
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        docs = [d for d in self.docs if d["user_id"] == query["user_id"] and d["status"] == query["status"]]
+
+        if "$text" in query:
+            if not self.text_index:
+                raise OperationFailure("text index required for $text query")
+            words = query["$text"]["$search"].split()
+
+            def score(doc):
+                content = normalize_text(f"{doc['text']} {doc['original_input']}").split()
+                return sum(1 for word in words if word in content)
+
+            ranked = sorted((d for d in docs if score(d)), key=score, reverse=True)
+            return FakeCursor([{**d, "score": score(d)} for d in ranked])
+
+        pattern = query["$or"][0]["text"]["$regex"]
+        return FakeCursor([
+            d for d in docs
+            if re.search(pattern, d["text"], re.I) or re.search(pattern, d["original_input"], re.I)
+        ])
+
+
+def _reminder(text, original_input=None, user_id=1):
+    return {
+        "_id": text, "user_id": user_id, "status": "pending", "text": text,
+        "original_input": original_input or f"recuérdame {text}", "date": datetime(2025, 10, 7, 12, 0)
+    }
+
+
+def _db(docs, text_index=True):
+    db = DatabaseManager("mongodb://test", "test")
+    db.reminders = FakeReminders(docs, text_index)
+    return db
+
+
+DOCS = [
+    _reminder("Tomar pastillas para la presión"),
+    _reminder("Tomar agua"),
+    _reminder("Reunión con el dentista"),
+    _reminder("Pagar la luz", "luz"),
+    _reminder("Tomar pastillas", user_id=2),
+]
+
+
+def test_search_terms_are_normalized():
+    """Minúsculas, sin tildes, sin palabras vacías"""
+    print("🧪 Testing búsqueda de texto...")
+    assert search_terms("Eliminar la Reunión del DENTISTA") == ["eliminar", "reunion", "dentista"]
+    assert search_terms("de la") == []
+    assert matches_all_terms("Tomar pastillas para la presión", ["pastilla", "presion"])
+    assert not matches_all_terms("Tomar agua", ["tomar", "pastilla"])
+    print("✅ Términos normalizados")
+
+
+def test_text_index_requires_all_terms():
+    """$text trae cualquiera de los términos; solo quedan los que los tienen todos, del usuario"""
+    db = _db(DOCS)
+    results = asyncio.run(db.search_reminders_by_text(1, "tomar pastilla"))
+    assert [r["_id"] for r in results] == ["Tomar pastillas para la presión"]
+    assert "score" not in results[0]
+    assert db.reminders.queries[0]["$text"]["$search"] == "tomar pastilla"
+    assert db.reminders.queries[0]["$text"]["$language"] == "spanish"
+    print("✅ Índice de texto con todos los términos")
+
+
+def test_partial_word_falls_back_to_escaped_literal():
+    """Una palabra incompleta no está en el índice: búsqueda literal escapada"""
+    db = _db(DOCS)
+    results = asyncio.run(db.search_reminders_by_text(1, "dentis"))
+    assert [r["_id"] for r in results] == ["Reunión con el dentista"]
+    assert db.reminders.queries[-1]["$or"][0]["text"]["$regex"] == "dentis"
+    print("✅ Respaldo literal para palabras incompletas")
+
+
+def test_regex_metacharacters_are_literal():
+    """La entrada del usuario nunca se evalúa como regex"""
+    db = _db(DOCS + [_reminder("Llamar a (Juan)+")])
+    results = asyncio.run(db.search_reminders_by_text(1, "(Juan)+"))
+    assert [r["_id"] for r in results] == ["Llamar a (Juan)+"]
+    assert asyncio.run(db.search_reminders_by_text(1, "(a+)+$")) == []
+    assert asyncio.run(db.search_reminders_by_text(1, "   ")) == []
+    print("✅ Metacaracteres tratados como texto")
+
+
+def test_missing_text_index_still_searches():
+    """Sin índice de texto (aún creándose) se usa la búsqueda literal"""
+    db = _db(DOCS, text_index=False)
+    results = asyncio.run(db.search_reminders_by_text(1, "agua"))
+    assert [r["_id"] for r in results] == ["Tomar agua"]
+    print("✅ Respaldo sin índice de texto")
+
+
+def test_limit_and_date_filter():
+    """El límite corta por relevancia y la búsqueda por fecha conserva el rango del día"""
+    db = _db(DOCS)
+    assert len(asyncio.run(db.search_reminders_by_text(1, "tomar", limit=1))) == 1
+
+    asyncio.run(db.get_reminders_by_date_and_pattern(1, datetime(2025, 10, 7, 15, 0), "luz"))
+    query = db.reminders.queries[-1]
+    assert query["date"] == {"$gte": datetime(2025, 10, 7), "$lte": datetime(2025, 10, 7, 23, 59, 59, 999999)}
+    print("✅ Límite y filtro por fecha")
+
+
+def benchmark_regex_input():
+    """Texto del usuario con metacaracteres: como regex (antes) vs escapado (ahora)"""
+    print("\n📈 BENCHMARK: entrada del usuario con metacaracteres")
+    print("=" * 50)
+
+    user_input = "(a+)+$"
+    stored_text = "a" * 22 + "!"
+
+    started = time.perf_counter()
+    re.search(user_input, stored_text, re.I)
+    as_regex = time.perf_counter() - started
+
+    started = time.perf_counter()
+    re.search(re.escape(user_input), stored_text, re.I)
+    escaped = time.perf_counter() - started
+
+    print(f"como regex: {as_regex * 1000:.1f} ms por documento (retroceso exponencial)")
+    print(f"escapado:   {escaped * 1000:.3f} ms por documento")
+
+
+if __name__ == "__main__":
+    test_search_terms_are_normalized()
+    test_text_index_requires_all_terms()
+    test_partial_word_falls_back_to_escaped_literal()
+    test_regex_metacharacters_are_literal()
+    test_missing_text_index_still_searches()
+    test_limit_and_date_filter()
+    benchmark_regex_input()
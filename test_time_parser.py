@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test del parser local de expresiones temporales
+Corpus con los casos del prompt de interpret_time_expression: tasa de aciertos y latencia
+"""
+
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+from bot.ai_interpreter import AIInterpreter
+from utils.time_parser import parse_time_expression
+
+CHILE_TZ = pytz.timezone('America/Santiago')
+
+# Lunes 6 de octubre de 2025, 10:15 en Chile
+NOW_LOCAL = datetime(2025, 10, 6, 10, 15)
+
+
+def _utc(local_naive: datetime) -> datetime:
+    """Hora local de Chile → UTC naive"""
+    return CHILE_TZ.localize(local_naive).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+NOW = _utc(NOW_LOCAL)
+
+# Expresión → hora local esperada (resuelta localmente con confianza alta)
+LOCAL_CORPUS = {
+    "recuérdame en 5 segundos ir a dormir": NOW_LOCAL + timedelta(seconds=5),
+    "en 30 minutos llamar a Juan": NOW_LOCAL + timedelta(minutes=30),
+    "en 2 horas y media estudiar": NOW_LOCAL + timedelta(hours=2, minutes=30),
+    "dentro de 3 días pagar la luz": NOW_LOCAL + timedelta(days=3),
+    "en 2 semanas control médico": NOW_LOCAL + timedelta(weeks=2),
+    "al tiro comprar pan": NOW_LOCAL + timedelta(seconds=30),
+    "altiro sacar la basura": NOW_LOCAL + timedelta(seconds=30),
+    "lueguito llamar al jefe": NOW_LOCAL + timedelta(minutes=45),
+    "en un ratito revisar correo": NOW_LOCAL + timedelta(minutes=20),
+    "tempranito ejercitar": datetime(2025, 10, 7, 7, 0),
+    "en la once tomar té": datetime(2025, 10, 6, 17, 0),
+    "mañana a las 8 ir al gym": datetime(2025, 10, 7, 8, 0),
+    "pasado mañana a las 10 hacer compras": datetime(2025, 10, 8, 10, 0),
+    "hoy a las 18:00 reunión": datetime(2025, 10, 6, 18, 0),
+    "7:30 am desayuno": datetime(2025, 10, 7, 7, 30),
+    "3:15 pm llamada": datetime(2025, 10, 6, 15, 15),
+    "14h30 dentista": datetime(2025, 10, 6, 14, 30),
+    "15:45hs clase": datetime(2025, 10, 6, 15, 45),
+    "2 pm almuerzo con Ana": datetime(2025, 10, 6, 14, 0),
+    "8:30AM standup": datetime(2025, 10, 7, 8, 30),
+    "22:00hrs apagar luces": datetime(2025, 10, 6, 22, 0),
+    "a las 9 y media de la noche ver serie": datetime(2025, 10, 6, 21, 30),
+    "a las 5 de la tarde pasear al perro": datetime(2025, 10, 6, 17, 0),
+    "quarter past 3 meeting": datetime(2025, 10, 6, 15, 15),
+    "half past 5 call": datetime(2025, 10, 6, 17, 30),
+    "10 to 8 dinner": datetime(2025, 10, 6, 19, 50),
+    "a la una menos cuarto almuerzo": datetime(2025, 10, 6, 12, 45),
+    "a las 1 menos 10 reunión": datetime(2025, 10, 6, 12, 50),
+    "at 10 to 1 lunch": datetime(2025, 10, 6, 12, 50),
+    "a la una menos cuarto de la madrugada tomar remedio": datetime(2025, 10, 7, 0, 45),
+    "el viernes a las 10 llamar a mamá": datetime(2025, 10, 10, 10, 0),
+    "el próximo lunes a las 9 standup": datetime(2025, 10, 13, 9, 0),
+    "esta tarde revisar email": datetime(2025, 10, 6, 15, 0),
+    "mañana en la mañana ir al banco": datetime(2025, 10, 7, 9, 0),
+    "el 25 de diciembre a las 20:00 cena": datetime(2025, 12, 25, 20, 0),
+    "15/10/2025 a las 23:59 entregar informe": datetime(2025, 10, 15, 23, 59),
+    "Oct 15th at 9:00 deadline": datetime(2025, 10, 15, 9, 0),
+    "2025-10-25 a las 11 presentación": datetime(2025, 10, 25, 11, 0),
+    "al mediodía almorzar": datetime(2025, 10, 6, 12, 0),
+    "a medianoche tomar remedio": datetime(2025, 10, 7, 0, 0),
+    "a las 12 de la noche sacar la basura": datetime(2025, 10, 7, 0, 0),
+    "12 de la madrugada tomar remedio": datetime(2025, 10, 7, 0, 0),
+    "el viernes a las 12 de la noche cerrar caja": datetime(2025, 10, 11, 0, 0),
+    "6 de la tarde regar plantas": datetime(2025, 10, 6, 18, 0),
+}
+
+# Expresiones que deben quedar bajo el umbral (recurrencias, vaguedades, solo fecha, pasado)
+LLM_CORPUS = [
+    "todos los lunes standup",
+    "cada 8 horas tomar antibiótico",
+    "fin de semana limpiar casa",
+    "pronto llamar a Pedro",
+    "mañana ir al gym",
+    "el 5 de octubre entregar informe",
+    "entre las 2 y 3 pm llamar",
+    "Q1 review meeting",
+    "cuando pueda arreglar esto",
+    "end of month report",
+    "hoy a las 8 correr",
+    "después de comer tomar pastillas",
+]
+
+
+def _confident(text: str):
+    result = parse_time_expression(text, NOW)
+    if result and result.confidence >= settings.TIME_PARSER_MIN_CONFIDENCE:
+        return result
+    return None
+
+
+def test_local_corpus():
+    """Los casos listados en el prompt se resuelven localmente y con la hora correcta"""
+    print("🧪 Testing parser local de expresiones temporales...")
+    for text, expected in LOCAL_CORPUS.items():
+        result = _confident(text)
+        assert result is not None, (text, parse_time_expression(text, NOW))
+        assert result.date == _utc(expected), (text, result, _utc(expected))
+    print(f"✅ {len(LOCAL_CORPUS)} expresiones resueltas localmente")
+
+
+def test_low_confidence_goes_to_llm():
+    """Recurrencias, vaguedades y fechas sin hora quedan para el LLM"""
+    for text in LLM_CORPUS:
+        assert _confident(text) is None, (text, parse_time_expression(text, NOW))
+    print(f"✅ {len(LLM_CORPUS)} expresiones derivadas al LLM")
+
+
+def test_interpreter_skips_llm_for_confident_parses():
+    """interpret_time_expression no llama al LLM si el parser local está seguro; si el LLM falla usa la lectura local"""
+    calls = []
+
+    async def failing_llm(messages, temperature=None, json_mode=False):
+        calls.append(messages[1]["content"])
+        return None
+
+    ai = AIInterpreter("test-key")
+    ai._make_api_call = failing_llm
+
+    async def scenario():
+        confident = await ai.interpret_time_expression("mañana a las 8 ir al gym", NOW)
+        fallback = await ai.interpret_time_expression("mañana ir al gym", NOW)
+        return confident, fallback
+
+    confident, fallback = asyncio.run(scenario())
+    assert confident == _utc(datetime(2025, 10, 7, 8, 0))
+    assert len(calls) == 1 and "mañana ir al gym" in calls[0]
+    assert fallback == _utc(datetime(2025, 10, 7, 9, 0))
+    print("✅ LLM solo para baja confianza, con respaldo local")
+
+
+def benchmark_time_parser():
+    """Tasa de aciertos locales sobre todo el corpus y latencia por expresión"""
+    print("\n📈 BENCHMARK: parser local de expresiones temporales")
+    print("=" * 55)
+
+    corpus = list(LOCAL_CORPUS) + LLM_CORPUS
+    local_hits = sum(1 for text in corpus if _confident(text))
+
+    rounds = 200
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            parse_time_expression(text, NOW)
+    per_parse = (time.perf_counter() - started) / (rounds * len(corpus))
+
+    print(f"corpus: {len(corpus)} expresiones")
+    print(f"resueltas localmente: {local_hits} ({local_hits / len(corpus):.0%}), al LLM: {len(corpus) - local_hits}")
+    print(f"latencia media: {per_parse * 1e6:.1f} µs por expresión (vs ~10 s de timeout del LLM)")
+
+
+if __name__ == "__main__":
+    test_local_corpus()
+    test_low_confidence_goes_to_llm()
+    test_interpreter_skips_llm_for_confident_parses()
+    benchmark_time_parser()
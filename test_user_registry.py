@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test del registro de usuarios en caché
+Un mensaje de un usuario conocido no escribe en MongoDB; last_activity se guarda en lote
+"""
+
+import asyncio
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database.models import User
+from bot.user_registry import UserRegistry, UserMiddleware
+
+
+class MockDatabaseManager:
+    """Usuarios en memoria con conteo de lecturas y escrituras"""
+
+    def __init__(self):
+        self.users = {}
+        self.reads = 0
+        self.writes = 0
+        self.bulk_writes = []
+
+    async def get_user(self, user_id):
+        self.reads += 1
+        data = self.users.get(user_id)
+        return User(**data) if data else None
+
+    async def add_user(self, user_data):
+        self.writes += 1
+        user = User(**user_data)
+        existing = self.users.get(user.user_id)
+        document = user.dict(exclude={"id", "created_at"})
+        document["created_at"] = existing["created_at"] if existing else user.created_at
+        self.users[user.user_id] = document
+        return True
+
+    async def update_users_activity(self, activity):
+        self.bulk_writes.append(dict(activity))
+        for user_id, last_activity in activity.items():
+            if user_id in self.users:
+                self.users[user_id]["last_activity"] = last_activity
+        return len(activity)
+
+
+def _tg_user(user_id=123456, username="oskar", first_name="Oskar", language_code="es"):
+    return SimpleNamespace(
+        id=user_id, username=username, first_name=first_name, last_name=None,
+        language_code=language_code, is_bot=False
+    )
+
+
+def test_known_user_does_no_writes():
+    """Primer mensaje registra; los siguientes salen de la caché y solo anotan actividad"""
+    print("🧪 Testing registro de usuarios en caché...")
+    db = MockDatabaseManager()
+    registry = UserRegistry(db, flush_seconds=3600)
+
+    async def scenario():
+        first = await registry.get_user(_tg_user())
+        created_at = first.created_at
+        for _ in range(20):
+            user = await registry.get_user(_tg_user())
+        return first, user, created_at
+
+    first, user, created_at = asyncio.run(scenario())
+    assert first.user_id == user.user_id == 123456
+    assert db.writes == 1 and db.reads == 2  # lectura inicial + lectura tras registrar
+    assert user.created_at == created_at
+    assert registry.get_stats()["pending_activity"] == 1
+    print("✅ 20 mensajes de un usuario conocido: 0 escrituras")
+
+
+def test_activity_is_flushed_in_one_bulk_write():
+    db = MockDatabaseManager()
+    registry = UserRegistry(db, flush_seconds=3600)
+
+    async def scenario():
+        for user_id in (111111, 222222, 333333):
+            await registry.get_user(_tg_user(user_id))
+            await registry.get_user(_tg_user(user_id))
+        return await registry.flush(), await registry.flush()
+
+    updated, second = asyncio.run(scenario())
+    assert updated == 3 and second == 0
+    assert len(db.bulk_writes) == 1 and set(db.bulk_writes[0]) == {111111, 222222, 333333}
+    print("✅ last_activity de varios usuarios en un solo bulk_write")
+
+
+def test_profile_change_and_ttl_refresh():
+    """Un cambio de username se escribe; created_at se conserva; el TTL fuerza releer"""
+    db = MockDatabaseManager()
+    registry = UserRegistry(db, ttl_seconds=0.05, flush_seconds=3600)
+
+    async def scenario():
+        original = await registry.get_user(_tg_user())
+        renamed = await registry.get_user(_tg_user(username="oskar_new"))
+        await asyncio.sleep(0.06)
+        await registry.get_user(_tg_user(username="oskar_new"))
+        return original, renamed
+
+    original, renamed = asyncio.run(scenario())
+    assert renamed.username == "oskar_new"
+    assert renamed.created_at == original.created_at
+    assert db.writes == 2 and registry.misses == 3
+    print("✅ Cambios de perfil y expiración de la caché")
+
+
+def test_invalid_user_is_not_registered():
+    db = MockDatabaseManager()
+    registry = UserRegistry(db)
+    assert asyncio.run(registry.get_user(_tg_user(user_id=-5))) is None
+    assert db.writes == 0
+    print("✅ ID inválido rechazado")
+
+
+def test_middleware_shares_user_with_handlers():
+    db = MockDatabaseManager()
+    middleware = UserMiddleware(UserRegistry(db, flush_seconds=3600))
+    seen = {}
+
+    async def handler(event, data):
+        seen.update(data)
+        return "ok"
+
+    result = asyncio.run(middleware(handler, object(), {"event_from_user": _tg_user()}))
+    assert result == "ok" and seen["db_user"].user_id == 123456
+
+    seen.clear()
+    asyncio.run(middleware(handler, object(), {}))
+    assert "db_user" not in seen
+    print("✅ Middleware expone db_user")
+
+
+def benchmark_user_writes():
+    """Escrituras a MongoDB por ráfaga de mensajes"""
+    print("\n📈 BENCHMARK: escrituras de usuarios por mensajes")
+    print("=" * 50)
+
+    db = MockDatabaseManager()
+    registry = UserRegistry(db, flush_seconds=3600)
+    users, messages = 50, 2000
+
+    async def scenario():
+        started = time.perf_counter()
+        for i in range(messages):
+            await registry.get_user(_tg_user(100000 + i % users))
+        await registry.flush()
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(scenario())
+    print(f"{messages} mensajes de {users} usuarios:")
+    print(f"antes: {messages} update_one con upsert")
+    print(f"ahora: {db.writes} registros + {len(db.bulk_writes)} bulk_write ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    test_known_user_does_no_writes()
+    test_activity_is_flushed_in_one_bulk_write()
+    test_profile_change_and_ttl_refresh()
+    test_invalid_user_is_not_registered()
+    test_middleware_shares_user_with_handlers()
+    benchmark_user_writes()
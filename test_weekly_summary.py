@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test del resumen semanal con agregaciones de MongoDB
+Conteos y top de etiquetas en el servidor; solo viajan los últimos documentos que usa /resumen
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+from database.connection import DatabaseManager
+from bot.reminder_manager import ReminderManager
+from bot.note_manager import NoteManager
+
+
+def _value(document, expression):
+    """"$campo" o {"$ifNull": ["$campo", valor]}"""
+    if isinstance(expression, dict) and "$ifNull" in expression:
+        field, default = expression["$ifNull"]
+        value = _value(document, field)
+        return default if value is None else value
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document.get(expression[1:])
+    return expression
+
+
+def _run_stages(documents, stages):
+    """Intérprete mínimo de las etapas que usan los resúmenes"""
+    for stage in stages:
+        (name, spec), = stage.items()
+        if name == "$match":
+            def matches(d):
+                for key, condition in spec.items():
+                    if isinstance(condition, dict):
+                        if "$gte" in condition and not d.get(key) >= condition["$gte"]:
+                            return False
+                    elif d.get(key) != condition:
+                        return False
+                return True
+            documents = [d for d in documents if matches(d)]
+        elif name == "$facet":
+            documents = [{key: _run_stages(documents, sub) for key, sub in spec.items()}]
+        elif name == "$group":
+            groups = {}
+            for d in documents:
+                key = _value(d, spec["_id"])
+                groups[key] = groups.get(key, 0) + 1
+            documents = [{"_id": key, "count": count} for key, count in groups.items()]
+        elif name == "$sort":
+            for key, direction in reversed(list(spec.items())):
+                documents = sorted(documents, key=lambda d: d[key], reverse=direction < 0)
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$project":
+            documents = [{key: d.get(key) for key, keep in spec.items() if keep} for d in documents]
+        elif name == "$unwind":
+            documents = [{**d, spec[1:]: item} for d in documents for item in d.get(spec[1:]) or []]
+        elif name == "$count":
+            documents = [{spec: len(documents)}] if documents else []
+    return documents
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.pipelines = []
+        self.returned = 0
+
+    async def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        for row in _run_stages(self.documents, pipeline):
+            self.returned += sum(len(v) for v in row.values() if isinstance(v, list))
+            yield row
+
+
+NOW = datetime.utcnow()
+
+
+def _history(weekly_reminders=30, old_reminders=500, weekly_notes=12, old_notes=300):
+    statuses = ["pending", "completed", "missed"]
+    reminders = [
+        {"user_id": 1, "text": f"recordatorio {i}", "status": statuses[i % 3], "date": NOW + timedelta(days=1),
+         "created_at": NOW - timedelta(days=30, hours=i)}
+        for i in range(old_reminders)
+    ] + [
+        {"user_id": 1, "text": f"semana {i}", "status": statuses[i % 3], "date": NOW + timedelta(days=1),
+         "created_at": NOW - timedelta(hours=i * 5)}
+        for i in range(weekly_reminders)
+    ] + [{"user_id": 2, "text": "otro usuario", "status": "pending", "created_at": NOW}]
+
+    notes = [
+        {"user_id": 1, "text": f"nota vieja {i}", "tags": ["viejo"], "created_at": NOW - timedelta(days=20, hours=i)}
+        for i in range(old_notes)
+    ] + [
+        {"user_id": 1, "text": f"nota {i}", "tags": ["trabajo"] + (["idea"] if i % 2 else []),
+         "note_type": "idea" if i % 3 == 0 else "general", "priority": "high" if i < 4 else None,
+         "created_at": NOW - timedelta(hours=i * 7)}
+        for i in range(weekly_notes)
+    ]
+    return reminders, notes
+
+
+def _db(reminders, notes):
+    db = DatabaseManager("mongodb://test", "test")
+    db.reminders = FakeCollection(reminders)
+    db.notes = FakeCollection(notes)
+    return db
+
+
+def test_reminder_summary_counts_on_server():
+    """Conteos por estado de la semana (no de los 50 primeros por fecha) y últimos N creados"""
+    print("🧪 Testing resumen semanal con agregaciones...")
+    reminders, notes = _history()
+    db = _db(reminders, notes)
+    summary = asyncio.run(ReminderManager(db).get_weekly_reminder_summary(1))
+
+    assert summary["total"] == 30
+    assert (summary["pending"], summary["completed"], summary["missed"]) == (10, 10, 10)
+    assert len(summary["reminders"]) == settings.SUMMARY_RECENT_ITEMS
+    # Del más antiguo al más nuevo: los últimos 10 del prompt son los más recientes
+    assert summary["reminders"][-1]["text"] == "semana 0"
+    assert len(db.reminders.pipelines) == 1 and "$facet" in db.reminders.pipelines[0][1]
+    print("✅ Recordatorios: una agregación con conteos exactos")
+
+
+def test_note_summary_counts_on_server():
+    """Tipos, prioridades (con valor por defecto) y top de etiquetas calculados en la agregación"""
+    reminders, notes = _history()
+    db = _db(reminders, notes)
+    summary = asyncio.run(NoteManager(db, ai_interpreter=None).get_weekly_notes_summary(1))
+
+    assert summary["total"] == 12
+    assert summary["types"] == {"idea": 4, "general": 8}
+    assert summary["priorities"] == {"high": 4, "medium": 8}
+    assert summary["top_tags"] == [("trabajo", 12), ("idea", 6)]
+    assert [note["text"] for note in summary["notes"]][-1] == "nota 0"
+    assert all(set(note) == {"text", "tags", "created_at"} for note in summary["notes"])
+    print("✅ Notas: conteos y etiquetas top en el servidor")
+
+
+def test_empty_week():
+    db = _db([], [])
+    reminders = asyncio.run(ReminderManager(db).get_weekly_reminder_summary(1))
+    notes = asyncio.run(NoteManager(db, ai_interpreter=None).get_weekly_notes_summary(1))
+    assert reminders["total"] == 0 and reminders["reminders"] == []
+    assert notes == {"total": 0, "types": {}, "priorities": {}, "top_tags": [], "notes": []}
+    print("✅ Semana vacía")
+
+
+def benchmark_weekly_summary():
+    """Documentos enviados a la aplicación según el tamaño del historial"""
+    print("\n📈 BENCHMARK: documentos que viajan para /resumen")
+    print("=" * 50)
+
+    for old in (100, 1000, 10000):
+        reminders, notes = _history(old_reminders=old, old_notes=old)
+        db = _db(reminders, notes)
+        asyncio.run(ReminderManager(db).get_weekly_reminder_summary(1))
+        asyncio.run(NoteManager(db, ai_interpreter=None).get_weekly_notes_summary(1))
+        moved = db.reminders.returned + db.notes.returned
+        print(f"historial {old:>5}: {moved} filas devueltas (antes: 50 recordatorios + 50 notas completos)")
+
+
+if __name__ == "__main__":
+    test_reminder_summary_counts_on_server()
+    test_note_summary_counts_on_server()
+    test_empty_week()
+    benchmark_weekly_summary()
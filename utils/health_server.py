@@ -3,6 +3,7 @@ Health check server para DigitalOcean App Platform
 """
 
 import asyncio
+from typing import Callable, Dict, Any
 from aiohttp import web, Application
 from loguru import logger
 
@@ -15,6 +16,11 @@ class HealthServer:
         self.app = None
         self.runner = None
         self.site = None
+        self.stats_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+    
+    def register_stats(self, name: str, provider: Callable[[], Dict[str, Any]]):
+        """Publicar estadísticas de un componente en /stats"""
+        self.stats_providers[name] = provider
     
     async def health_handler(self, request):
         """Endpoint de health check"""
@@ -24,12 +30,23 @@ class HealthServer:
             "timestamp": asyncio.get_event_loop().time()
         })
     
+    async def stats_handler(self, request):
+        """Endpoint de estadísticas (cachés, colas)"""
+        stats = {}
+        for name, provider in self.stats_providers.items():
+            try:
+                stats[name] = provider()
+            except Exception as e:
+                stats[name] = {"error": str(e)}
+        return web.json_response(stats)
+    
     async def start(self):
         """Iniciar servidor de health check"""
         try:
             self.app = Application()
             self.app.router.add_get('/health', self.health_handler)
             self.app.router.add_get('/', self.health_handler)  # Root también
+            self.app.router.add_get('/stats', self.stats_handler)
             
             self.runner = web.AppRunner(self.app)
             await self.runner.setup()
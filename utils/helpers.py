@@ -8,6 +8,8 @@ from typing import Optional, List, Dict, Any
 import pytz
 from loguru import logger
 
+from utils.time_parser import parse_time_expression
+
 
 def format_datetime_for_user(dt: datetime, timezone: str = "America/Santiago") -> str:
     """Formatear fecha y hora para mostrar al usuario"""
@@ -26,51 +28,14 @@ def format_datetime_for_user(dt: datetime, timezone: str = "America/Santiago") -
 def parse_simple_time_expressions(text: str, current_time: Optional[datetime] = None) -> Optional[datetime]:
     """
     Parser básico para expresiones temporales simples
-    Fallback si la IA no responde
+    Fallback si la IA no responde (usa la gramática local de utils.time_parser)
     """
     if current_time is None:
-        # Usar hora de Chile
-        chile_tz = pytz.timezone('America/Santiago')
-        current_time = datetime.now(chile_tz).astimezone(pytz.UTC).replace(tzinfo=None)
-    
-    text = text.lower().strip()
-    
-    # Meses en español
-    meses = {
-        'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6,
-        'julio': 7, 'agosto': 8, 'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
-    }
-    
-    # Patrones básicos
-    patterns = [
-        # "en X segundos"
-        (r'en\s+(\d+)\s+segundos?', lambda m: current_time + timedelta(seconds=int(m.group(1)))),
-        # "en X minutos"
-        (r'en\s+(\d+)\s+minutos?', lambda m: current_time + timedelta(minutes=int(m.group(1)))),
-        # "en X horas"
-        (r'en\s+(\d+)\s+horas?', lambda m: current_time + timedelta(hours=int(m.group(1)))),
-        # "en X días"
-        (r'en\s+(\d+)\s+d[ií]as?', lambda m: current_time + timedelta(days=int(m.group(1)))),
-        # "mañana"
-        (r'mañana', lambda m: current_time + timedelta(days=1)),
-        # "ahora"
-        (r'ahora', lambda m: current_time),
-        # "DD/MM/YYYY"
-        (r'(\d{1,2})/(\d{1,2})/(\d{4})', lambda m: datetime(int(m.group(3)), int(m.group(2)), int(m.group(1)), 9, 0)),
-        # "DD de MES de YYYY" o "DD MES YYYY"
-        (r'(\d{1,2})\s+(?:de\s+)?(' + '|'.join(meses.keys()) + r')\s+(?:de\s+)?(\d{4})', 
-         lambda m: datetime(int(m.group(3)), meses[m.group(2)], int(m.group(1)), 9, 0)),
-    ]
-    
-    for pattern, func in patterns:
-        match = re.search(pattern, text)
-        if match:
-            try:
-                return func(match)
-            except Exception as e:
-                logger.error(f"Error parseando expresión '{text}': {e}")
-                continue
+        current_time = datetime.utcnow()
     
+    result = parse_time_expression(text, current_time)
+    if result and result.date > current_time:
+        return result.date
     return None
 
 
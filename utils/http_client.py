@@ -0,0 +1,101 @@
+"""
+Cliente HTTP compartido para todas las llamadas salientes
+Una sola ClientSession con pool de conexiones keep-alive, límite por host
+y caché de DNS (Telegram, OpenRouter, etc.)
+"""
+
+from typing import Optional, Dict, Any
+import aiohttp
+from loguru import logger
+
+from config.settings import settings
+
+
+class HttpClient:
+    """Capa HTTP de la aplicación (una sesión, conexiones reutilizadas)"""
+
+    def __init__(
+        self,
+        limit: int = None,
+        limit_per_host: int = None,
+        dns_cache_seconds: int = None,
+        keepalive_seconds: float = None
+    ):
+        """
+        Args:
+            limit: Conexiones simultáneas totales
+            limit_per_host: Conexiones simultáneas por host
+            dns_cache_seconds: TTL de la caché de DNS
+            keepalive_seconds: Tiempo que una conexión ociosa se mantiene abierta
+        """
+        self.limit = limit or settings.HTTP_POOL_LIMIT
+        self.limit_per_host = limit_per_host or settings.HTTP_POOL_LIMIT_PER_HOST
+        self.dns_cache_seconds = dns_cache_seconds or settings.HTTP_DNS_CACHE_SECONDS
+        self.keepalive_seconds = keepalive_seconds or settings.HTTP_KEEPALIVE_SECONDS
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # Métricas
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Contar peticiones y conexiones nuevas vs reutilizadas"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_seconds,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_seconds
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[self._build_trace_config()]
+        )
+
+    async def start(self):
+        """Crear la sesión compartida (debe llamarse dentro del event loop)"""
+        if self._session and not self._session.closed:
+            return
+
+        self._session = self._create_session()
+        logger.info(f"🌐 Cliente HTTP compartido iniciado (pool {self.limit}, {self.limit_per_host}/host)")
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Sesión compartida (se crea al primer uso si no se llamó a start)"""
+        if not self._session or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    async def close(self):
+        """Cerrar la sesión y todas las conexiones del pool"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logger.info("🌐 Cliente HTTP compartido cerrado")
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de uso del pool"""
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused
+        }
@@ -0,0 +1,315 @@
+"""
+Reglas de recurrencia (RRULE, RFC 5545) para recordatorios
+Una serie se guarda como regla + EXDATEs y sus ocurrencias se generan a demanda;
+la expansión se hace en hora de Chile para que "todos los días a las 8" no se corra con el cambio de horario
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pytz
+from dateutil.rrule import rrule, rrulestr
+
+CHILE_TZ = pytz.timezone('America/Santiago')
+
+# Menos fechas que esto no alcanzan para afirmar una regla
+MIN_SERIES_LENGTH = 3
+
+WEEKDAY_CODES = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+WEEKDAY_NAMES = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+# Frecuencias cuyas ocurrencias se pueden filtrar por día de la semana sin cambiar su sentido
+BYDAY_FILTERABLE = ("HOURLY", "DAILY", "WEEKLY")
+
+
+def to_local(utc_naive: datetime) -> datetime:
+    """UTC naive → hora local de Chile naive"""
+    return pytz.UTC.localize(utc_naive).astimezone(CHILE_TZ).replace(tzinfo=None)
+
+
+def to_utc(local_naive: datetime) -> datetime:
+    """Hora local de Chile naive → UTC naive (horas inexistentes por DST se resuelven con horario estándar)"""
+    return CHILE_TZ.localize(local_naive, is_dst=False).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def parse_rule(rule: str) -> Dict[str, str]:
+    """'FREQ=DAILY;INTERVAL=2' → {'FREQ': 'DAILY', 'INTERVAL': '2'}"""
+    parts = {}
+    for part in rule.upper().replace("RRULE:", "").split(";"):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            parts[key.strip()] = value.strip()
+    return parts
+
+
+def format_rule(parts: Dict[str, str]) -> str:
+    """Inverso de parse_rule (FREQ siempre primero)"""
+    ordered = ["FREQ"] + [key for key in parts if key != "FREQ"]
+    return ";".join(f"{key}={parts[key]}" for key in ordered if key in parts)
+
+
+@lru_cache(maxsize=1024)
+def _compile(rule: str, dtstart_local: datetime) -> rrule:
+    """Regla parseada (las series activas se repiten mucho entre refrescos)"""
+    return rrulestr(rule, dtstart=dtstart_local)
+
+
+def iteration_start(rule: str, dtstart: datetime, known_occurrence: Optional[datetime]) -> datetime:
+    """
+    Desde dónde expandir: una ocurrencia conocida sirve de DTSTART equivalente
+
+    Así el costo no crece con la antigüedad de la serie. Con COUNT no se puede
+    (la cuenta parte del inicio real).
+    """
+    if known_occurrence and known_occurrence > dtstart and "COUNT" not in parse_rule(rule):
+        return known_occurrence
+    return dtstart
+
+
+def iter_occurrences(
+    rule: str,
+    dtstart: datetime,
+    exdates: Iterable[datetime] = (),
+    after: Optional[datetime] = None,
+    inclusive: bool = False
+) -> Iterator[datetime]:
+    """
+    Recorrer las ocurrencias de una serie
+
+    Args:
+        rule: Valor RRULE (ej: "FREQ=WEEKLY;BYDAY=MO,WE")
+        dtstart: Primera ocurrencia (UTC)
+        exdates: Ocurrencias excluidas (UTC)
+        after: Empezar después de esta hora (UTC); None desde el inicio
+        inclusive: Incluir `after` si es una ocurrencia
+
+    Yields:
+        Ocurrencias en UTC, en orden
+    """
+    compiled = _compile(rule, to_local(dtstart))
+    excluded = set(exdates)
+    local_occurrences = compiled.xafter(to_local(after), inc=inclusive) if after else iter(compiled)
+
+    for local in local_occurrences:
+        occurrence = to_utc(local)
+        if occurrence not in excluded:
+            yield occurrence
+
+
+def next_occurrence(
+    rule: str,
+    dtstart: datetime,
+    after: datetime,
+    exdates: Iterable[datetime] = ()
+) -> Optional[datetime]:
+    """Primera ocurrencia posterior a `after` (None si la serie terminó)"""
+    return next(iter_occurrences(rule, dtstart, exdates, after=after), None)
+
+
+def previous_occurrence(
+    rule: str,
+    dtstart: datetime,
+    before: datetime,
+    exdates: Iterable[datetime] = ()
+) -> Optional[datetime]:
+    """Última ocurrencia anterior a `before` (None si no hay)"""
+    compiled = _compile(rule, to_local(dtstart))
+    excluded = set(exdates)
+    local = compiled.before(to_local(before))
+
+    while local is not None:
+        occurrence = to_utc(local)
+        if occurrence not in excluded:
+            return occurrence
+        local = compiled.before(local)
+    return None
+
+
+def occurrences_between(
+    rule: str,
+    dtstart: datetime,
+    start: datetime,
+    end: datetime,
+    exdates: Iterable[datetime] = (),
+    limit: Optional[int] = None
+) -> List[datetime]:
+    """Ocurrencias en [start, end] (UTC), como máximo `limit`"""
+    occurrences = []
+    for occurrence in iter_occurrences(rule, dtstart, exdates, after=start, inclusive=True):
+        if occurrence > end or (limit is not None and len(occurrences) >= limit):
+            break
+        occurrences.append(occurrence)
+    return occurrences
+
+
+def series_pre_reminders(
+    rule: str,
+    dtstart: datetime,
+    occurrence: datetime,
+    days_before: Iterable[int],
+    exdates: Iterable[datetime] = (),
+    now: Optional[datetime] = None
+) -> List[datetime]:
+    """
+    Pre-recordatorios de una ocurrencia
+
+    Solo se conservan los que caen después de la ocurrencia anterior: una serie diaria
+    no avisa "mañana" todos los días, una semanal sí avisa 2 y 1 día antes.
+    Para la primera ocurrencia se usa el intervalo hasta la siguiente.
+    """
+    now = now or datetime.utcnow()
+    previous = previous_occurrence(rule, dtstart, occurrence, exdates)
+    if previous is None:
+        following = next_occurrence(rule, dtstart, occurrence, exdates)
+        previous = occurrence - (following - occurrence) if following else None
+
+    not_before = max(now, previous) if previous else now
+    pre_reminders = [occurrence - timedelta(days=days) for days in sorted(days_before, reverse=True)]
+    return [pre_time for pre_time in pre_reminders if pre_time > not_before]
+
+
+def _candidate_rules(local_dates: List[datetime]) -> List[str]:
+    """Reglas que podrían generar las fechas (se verifican después)"""
+    candidates = []
+    gaps = {b - a for a, b in zip(local_dates, local_dates[1:])}
+    same_time = len({d.time() for d in local_dates}) == 1
+    weekdays = sorted({d.weekday() for d in local_dates})
+
+    # Con menos de una semana hábil de fechas, cualquier conjunto de días "encaja".
+    # Si no hay sábados ni domingos, los días hábiles van antes que la regla diaria:
+    # lunes a viernes consecutivos también se verifican como FREQ=DAILY
+    by_day = None
+    if same_time and len(local_dates) >= 5:
+        by_day = "FREQ=WEEKLY;BYDAY=" + ",".join(WEEKDAY_CODES[w] for w in weekdays)
+        if len(weekdays) > 1 and weekdays[-1] < 5:
+            candidates.append(by_day)
+
+    if len(gaps) == 1:
+        gap = gaps.pop()
+        if gap.seconds == 0 and gap.days % 7 == 0:
+            candidates.append(f"FREQ=WEEKLY;INTERVAL={gap.days // 7}")
+        elif gap.seconds == 0:
+            candidates.append(f"FREQ=DAILY;INTERVAL={gap.days}")
+        elif gap.days == 0 and gap.seconds % 3600 == 0:
+            # Tratamientos "cada 8 horas": la serie termina donde la listó el usuario
+            candidates.append(f"FREQ=HOURLY;INTERVAL={gap.seconds // 3600};COUNT={len(local_dates)}")
+
+    if same_time and len({d.day for d in local_dates}) == 1:
+        first = local_dates[0]
+        months = [(d.year - first.year) * 12 + d.month - first.month for d in local_dates]
+        steps = {b - a for a, b in zip(months, months[1:])}
+        if len(steps) == 1:
+            candidates.append(f"FREQ=MONTHLY;INTERVAL={steps.pop()}")
+
+    if by_day and by_day not in candidates:
+        candidates.append(by_day)
+
+    minutes = {d.minute for d in local_dates}
+    hours = sorted({d.hour for d in local_dates})
+    if len(minutes) == 1 and len(hours) > 1:
+        candidates.append(f"FREQ=DAILY;BYHOUR={','.join(map(str, hours))};BYMINUTE={minutes.pop()}")
+
+    return candidates
+
+
+def infer_rrule(dates: List[datetime]) -> Optional[str]:
+    """
+    Deducir la regla de una serie listada por fechas (lo que entrega el LLM)
+
+    Una regla solo se acepta si reproduce exactamente las fechas listadas. Una regla
+    diaria o semanal queda sin fin solo si lo listado cubre al menos una semana completa;
+    si no (p.ej. tres días seguidos), se cierra con COUNT en la última fecha listada.
+
+    Args:
+        dates: Fechas de la serie (UTC)
+
+    Returns:
+        Valor RRULE o None si las fechas no forman una serie regular
+    """
+    dates = sorted(set(dates))
+    if len(dates) < MIN_SERIES_LENGTH:
+        return None
+
+    local_dates = [to_local(d) for d in dates]
+    for candidate in _candidate_rules(local_dates):
+        generated = []
+        for occurrence in iter_occurrences(candidate, dates[0], after=dates[0], inclusive=True):
+            generated.append(occurrence)
+            if len(generated) > len(dates):
+                break
+        if generated[:len(dates)] != dates:
+            continue
+
+        # Horizonte listado: hasta la ocurrencia que seguiría a la última fecha
+        following = generated[len(dates)] if len(generated) > len(dates) else None
+        unbounded = "COUNT=" not in candidate and candidate.startswith(("FREQ=DAILY", "FREQ=WEEKLY"))
+        if unbounded and following and (to_local(following).date() - local_dates[0].date()).days < 7:
+            candidate += f";COUNT={len(dates)}"
+        return candidate
+    return None
+
+
+def exclude_weekdays(rule: str, dtstart: datetime, weekdays: Iterable[int]) -> Optional[str]:
+    """
+    Quitar días de la semana de una serie con un filtro BYDAY
+
+    Args:
+        rule: Valor RRULE actual
+        dtstart: Primera ocurrencia (UTC), define el día de una serie semanal simple
+        weekdays: Días a excluir (0=lunes, hora local)
+
+    Returns:
+        Regla nueva, o None si no queda ningún día
+
+    Raises:
+        ValueError: Si la frecuencia no admite el filtro (mensual/anual: usar EXDATE)
+    """
+    parts = parse_rule(rule)
+    if parts.get("FREQ") not in BYDAY_FILTERABLE:
+        raise ValueError(f"BYDAY no aplicable a FREQ={parts.get('FREQ')}")
+
+    if "BYDAY" in parts:
+        current = [WEEKDAY_CODES.index(code[-2:]) for code in parts["BYDAY"].split(",")]
+    elif parts["FREQ"] == "WEEKLY":
+        current = [to_local(dtstart).weekday()]
+    else:
+        current = list(range(7))
+
+    excluded = set(weekdays)
+    remaining = [day for day in current if day not in excluded]
+    if not remaining:
+        return None
+    if remaining == current:
+        return rule
+
+    parts["BYDAY"] = ",".join(WEEKDAY_CODES[day] for day in remaining)
+    return format_rule(parts)
+
+
+def describe_rrule(rule: str) -> str:
+    """Descripción corta en español ("cada 2 días", "lunes y miércoles")"""
+    parts = parse_rule(rule)
+    freq = parts.get("FREQ")
+    interval = int(parts.get("INTERVAL", 1))
+
+    if "BYDAY" in parts:
+        names = [WEEKDAY_NAMES[WEEKDAY_CODES.index(code[-2:])] for code in parts["BYDAY"].split(",")]
+        if len(names) == 7:
+            return "todos los días"
+        if len(names) >= 5:
+            skipped = [name for name in WEEKDAY_NAMES if name not in names]
+            return "todos los días excepto " + " y ".join(skipped)
+        days = names[0] if len(names) == 1 else ", ".join(names[:-1]) + f" y {names[-1]}"
+        return f"los {days}" + (f" (cada {interval} semanas)" if interval > 1 and freq == "WEEKLY" else "")
+    if "BYHOUR" in parts:
+        hours = parts["BYHOUR"].split(",")
+        return f"{len(hours)} veces al día"
+
+    units = {"HOURLY": ("hora", "horas"), "DAILY": ("día", "días"),
+             "WEEKLY": ("semana", "semanas"), "MONTHLY": ("mes", "meses"), "YEARLY": ("año", "años")}
+    singular, plural = units.get(freq, ("vez", "veces"))
+    text = f"cada {singular}" if interval == 1 else f"cada {interval} {plural}"
+    if "COUNT" in parts:
+        text += f" ({parts['COUNT']} veces)"
+    return text
@@ -0,0 +1,78 @@
+"""
+Búsqueda de texto en español
+Normaliza consultas del usuario para el índice de texto de MongoDB ($text),
+verifica que un resultado contenga todos los términos buscados y tokeniza
+textos para los índices en memoria
+"""
+
+import re
+import unicodedata
+from typing import List
+
+# Idioma del índice de texto (stemming y palabras vacías de MongoDB)
+TEXT_SEARCH_LANGUAGE = "spanish"
+
+# Palabras vacías frecuentes en las consultas (no aportan al filtro de términos)
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "me", "mi", "mis", "para", "por", "que", "se", "su", "sus", "tu", "tus",
+    "un", "una", "unos", "unas", "y", "o", "recordatorio", "recordatorios",
+}
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes ("Reunión" → "reunion"), igual que el índice de texto"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(term: str) -> str:
+    """Quitar el plural (pastillas → pastilla, reuniones → reunion)"""
+    if len(term) > 5 and term.endswith("es"):
+        return term[:-2]
+    if len(term) > 3 and term.endswith("s"):
+        return term[:-1]
+    return term
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Términos significativos de una consulta
+
+    Args:
+        query: Texto libre del usuario
+
+    Returns:
+        Términos normalizados, sin palabras vacías ni repetidos
+    """
+    terms = []
+    for word in _WORD.findall(normalize_text(query)):
+        if word not in STOPWORDS and word not in terms:
+            terms.append(word)
+    return terms
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokens para un índice invertido (con repeticiones, en orden)
+
+    Args:
+        text: Texto libre
+
+    Returns:
+        Raíces normalizadas sin palabras vacías ("Reuniones del equipo" → ["reunion", "equipo"])
+    """
+    return [stem(word) for word in _WORD.findall(normalize_text(text)) if word not in STOPWORDS]
+
+
+def matches_all_terms(text: str, terms: List[str]) -> bool:
+    """
+    Verificar que el texto contenga todos los términos (singular o plural)
+
+    $text devuelve documentos con cualquiera de los términos; para borrar o
+    modificar se exige que estén todos, como lo hacía la búsqueda por frase.
+    """
+    normalized = normalize_text(text)
+    return all(stem(term) in normalized for term in terms)
@@ -0,0 +1,422 @@
+"""
+Parser local de expresiones temporales en español (chileno) e inglés básico
+Tokenizador compilado + gramática de reglas; cada resultado trae una confianza
+para decidir si hace falta consultar al LLM
+"""
+
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Optional, NamedTuple, List, Tuple
+import pytz
+
+
+CHILE_TZ = pytz.timezone('America/Santiago')
+
+
+class TimeParseResult(NamedTuple):
+    """Resultado del parser local"""
+    date: datetime          # UTC naive
+    confidence: float       # 0..1
+    matched: str            # Fragmentos reconocidos
+
+
+# --- VOCABULARIO ---
+
+NUMBER_WORDS = {
+    "un": 1, "una": 1, "uno": 1, "a": 1, "an": 1, "one": 1,
+    "dos": 2, "two": 2, "tres": 3, "three": 3, "cuatro": 4, "four": 4, "cinco": 5, "five": 5,
+    "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "ten": 10, "once": 11, "doce": 12,
+    "quince": 15, "veinte": 20, "treinta": 30, "cuarenta": 40, "media": 0.5, "medio": 0.5
+}
+
+UNITS = {
+    "segundo": "seconds", "seg": "seconds", "second": "seconds",
+    "minuto": "minutes", "min": "minutes", "minute": "minutes",
+    "hora": "hours", "hr": "hours", "hour": "hours", "h": "hours",
+    "dia": "days", "day": "days",
+    "semana": "weeks", "week": "weeks"
+}
+
+# Expresiones relativas sin número: minutos desde ahora y confianza
+RELATIVE_WORDS = {
+    "al tiro": (0.5, 0.95), "altiro": (0.5, 0.95), "al toque": (0.5, 0.95), "altoque": (0.5, 0.95),
+    "ahora mismo": (0.5, 0.95), "ahora ya": (0.5, 0.95), "ahora": (0.5, 0.95), "yapo": (0.5, 0.95),
+    "right now": (0.5, 0.95), "asap": (0.5, 0.9),
+    "en un cachito": (10, 0.85), "cachito": (10, 0.85), "en un ratito": (20, 0.85), "ratito": (20, 0.85),
+    "lueguito": (45, 0.85), "al rato": (90, 0.85),
+    "pronto": (60, 0.6), "soon": (60, 0.6), "luego": (45, 0.6), "mas tarde": (150, 0.6),
+    "later": (120, 0.6), "despues": (90, 0.6)
+}
+
+# Partes del día: hora por defecto y si fuerzan AM/PM sobre una hora ambigua
+DAY_PARTS = {
+    "mananita": (6, 0, "am"), "manana": (9, 0, "am"), "madrugada": (3, 0, "am"), "morning": (9, 0, "am"),
+    "tarde": (15, 0, "pm"), "afternoon": (15, 0, "pm"),
+    "noche": (20, 0, "pm"), "evening": (20, 0, "pm"), "night": (20, 0, "pm")
+}
+
+# Partes del día en que "las 12" es la medianoche: al final de ese día (noche) o al inicio (madrugada)
+MIDNIGHT_PARTS = {"noche": 1, "night": 1, "madrugada": 0}
+
+DAY_WORDS = {"hoy": 0, "today": 0, "manana": 1, "tomorrow": 1, "pasado manana": 2}
+
+WEEKDAYS = {
+    "lunes": 0, "martes": 1, "miercoles": 2, "jueves": 3, "viernes": 4, "sabado": 5, "domingo": 6,
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6
+}
+
+MONTHS = {
+    "enero": 1, "ene": 1, "january": 1, "jan": 1,
+    "febrero": 2, "feb": 2, "february": 2,
+    "marzo": 3, "mar": 3, "march": 3,
+    "abril": 4, "abr": 4, "april": 4, "apr": 4,
+    "mayo": 5, "may": 5,
+    "junio": 6, "jun": 6, "june": 6,
+    "julio": 7, "jul": 7, "july": 7,
+    "agosto": 8, "ago": 8, "august": 8, "aug": 8,
+    "septiembre": 9, "setiembre": 9, "september": 9, "sept": 9, "sep": 9,
+    "octubre": 10, "october": 10, "oct": 10,
+    "noviembre": 11, "november": 11, "nov": 11,
+    "diciembre": 12, "december": 12, "dic": 12, "dec": 12
+}
+
+
+def _alternation(words) -> str:
+    """Alternativa regex con las palabras más largas primero"""
+    return "|".join(re.escape(w).replace(r"\ ", r"\s+") for w in sorted(words, key=len, reverse=True))
+
+
+NUM = r"\d+|" + _alternation(NUMBER_WORDS)
+UNIT = r"segundos?|segs?|seconds?|minutos?|mins?|minutes?|horas?|hrs?|hours?|h|dias?|days?|semanas?|weeks?"
+MONTH = _alternation(MONTHS)
+HOUR_WORDS = "una|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce"
+MERIDIEM = r"a\.?\s?m\.?|p\.?\s?m\.?|hrs?|hs"
+
+# Tokenizador: una sola regex compilada; el orden de las alternativas resuelve empates
+TOKEN_PATTERNS: List[Tuple[str, str]] = [
+    ("offset", rf"\b(?:en|dentro\s+de|in)\s+(?P<off_n>{NUM})\s+(?P<off_unit>{UNIT})\b(?:\s+y\s+(?P<off_frac>media|cuarto))?"),
+    ("relative", rf"\b(?P<rel>{_alternation(RELATIVE_WORDS)})\b(?!\s+de\b)"),
+    ("teatime", r"\b(?:(?:en|a|para)\s+)?la\s+once\b"),
+    ("early", r"\btempranito\b"),
+    ("part", rf"\b(?P<part_this>esta|this)\s+(?P<part_a>{_alternation(DAY_PARTS)})\b"
+             rf"|\b(?:(?:en|por|de|a|in\s+the)\s+la|in\s+the)\s+(?P<part_b>{_alternation(DAY_PARTS)})\b"),
+    ("noon", r"\b(?:al\s+|a\s+)?(?:mediodia|noon)\b"),
+    ("midnight", r"\b(?:a\s+(?:la\s+)?)?(?:medianoche|midnight)\b"),
+    ("day", rf"\b(?P<day_word>{_alternation(DAY_WORDS)})\b"),
+    ("weekday", rf"\b(?:(?:el|este|on|this)\s+)?(?:(?P<wd_next>proximo|next)\s+)?(?P<wd>{_alternation(WEEKDAYS)})\b"),
+    ("date_iso", r"\b(?P<iso_y>\d{4})[-/](?P<iso_m>\d{1,2})[-/](?P<iso_d>\d{1,2})\b"),
+    ("date_num", r"\b(?P<num_d>\d{1,2})[/-](?P<num_m>\d{1,2})(?:[/-](?P<num_y>\d{4}|\d{2}))?\b"
+                 r"|\b(?P<dot_d>\d{1,2})\.(?P<dot_m>\d{1,2})\.(?P<dot_y>\d{4})\b"),
+    ("date_text", rf"\b(?P<dt_d>\d{{1,2}})(?:st|nd|rd|th|ro)?\s+(?:de\s+|of\s+)?(?P<dt_m>{MONTH})\b\.?"
+                  rf"(?:\s+(?:de\s+|del\s+)?(?P<dt_y>\d{{4}})\b)?"
+                  rf"|\b(?P<dt2_m>{MONTH})\b\.?\s+(?P<dt2_d>\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(?P<dt2_y>\d{{4}})\b)?"),
+    ("clock_hm", rf"(?:\b(?:a\s+las?|a\s+eso\s+de\s+las?|at)\s+)?\b(?P<hm_h>\d{{1,2}})(?::|h|\.)(?P<hm_m>[0-5]\d)"
+                 rf"(?:\s*(?P<hm_mer>{MERIDIEM}|h))?(?!\w)"),
+    ("clock_mer", rf"(?:\b(?:a\s+las?|at)\s+)?\b(?P<mer_h>\d{{1,2}})\s*(?P<mer>{MERIDIEM})(?!\w)"),
+    ("clock_en", r"\b(?:(?P<en_q>quarter|half)|(?P<en_n>\d{1,2}))\s+(?P<en_rel>past|to)\s+(?P<en_h>\d{1,2})\b(?:\s+o'?clock)?"
+                 r"|\b(?P<oc_h>\d{1,2})\s+o'?clock\b"),
+    ("clock_word", rf"(?:\ba\s+las?\s+|\b(?:las?\s+)?(?=(?:\d{{1,2}}|{HOUR_WORDS})\s+(?:de|en|por)\s+la\s+(?:{_alternation(DAY_PARTS)})\b))"
+                   rf"(?P<w_h>\d{{1,2}}|{HOUR_WORDS})\b(?:\s+(?P<w_op>y|menos)\s+(?P<w_m>media|cuarto|\d{{1,2}})\b)?"
+                   r"(?:\s+(?:en\s+punto|hrs?|horas)\b)?"),
+]
+
+TOKENIZER = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_PATTERNS))
+
+# Vocabulario temporal que la gramática no resuelve: si queda fuera de los tokens, decide el LLM
+UNHANDLED = re.compile(
+    r"\b(?:cada|todos|todas|every|daily|weekly|monthly|diario|diariamente|semanal\w*|mensual\w*|anual\w*"
+    r"|entre|between|desde|hasta|antes|before|after|despues|fin\s+de|end\s+of|eom|eoy|q[1-4]|h[12]"
+    r"|semanas?|mes|meses|anos?|weeks?|months?|years?|ayer|anteayer|yesterday|otro|otra|cuando|algun"
+    r"|eventually|menos|veces|feriado|navidad|semestre|trimestre|tarde|noche|madrugada|am|pm)\b"
+)
+
+DATE_KINDS = ("day", "weekday", "date_iso", "date_num", "date_text")
+CLOCK_KINDS = ("clock_hm", "clock_mer", "clock_en", "clock_word")
+FIXED_TIMES = {"teatime": (17, 0), "early": (7, 0), "noon": (12, 0), "midnight": (0, 0)}
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes (ñ → n) para que la gramática no duplique variantes"""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _to_utc(local: datetime) -> datetime:
+    return CHILE_TZ.localize(local).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def _number(value: str) -> float:
+    return float(value) if value.isdigit() else NUMBER_WORDS[re.sub(r"\s+", " ", value)]
+
+
+def _unit(value: str) -> str:
+    if value.endswith("s") and value[:-1] in UNITS:
+        value = value[:-1]
+    return UNITS[value]
+
+
+class TimeExpressionParser:
+    """Gramática de reglas sobre los tokens temporales de un mensaje"""
+
+    def tokenize(self, text: str) -> List[re.Match]:
+        return list(TOKENIZER.finditer(text))
+
+    def parse(self, text: str, current_time: Optional[datetime] = None) -> Optional[TimeParseResult]:
+        """
+        Interpretar una expresión temporal
+
+        Args:
+            text: Texto del usuario
+            current_time: Hora actual (UTC naive)
+
+        Returns:
+            TimeParseResult con la fecha en UTC, o None si no hay nada temporal reconocible
+        """
+        if current_time is None:
+            current_time = datetime.utcnow()
+
+        normalized = normalize_text(text)
+        tokens = self.tokenize(normalized)
+        if not tokens:
+            return None
+
+        remainder = normalized
+        for token in reversed(tokens):
+            remainder = remainder[:token.start()] + " " + remainder[token.end():]
+
+        by_kind = {}
+        for token in tokens:
+            by_kind.setdefault(token.lastgroup, []).append(token)
+
+        matched = " | ".join(token.group(0).strip() for token in tokens)
+        result = self._resolve(by_kind, current_time)
+        if result is None:
+            return None
+
+        date, confidence = result
+        if UNHANDLED.search(remainder):
+            confidence = min(confidence, 0.5)
+        if date <= current_time:
+            confidence = min(confidence, 0.3)
+        return TimeParseResult(date, round(confidence, 3), matched)
+
+    # --- REGLAS ---
+
+    def _resolve(self, by_kind: dict, current_time: datetime) -> Optional[Tuple[datetime, float]]:
+        relative = by_kind.get("offset", []) + by_kind.get("relative", [])
+        dates = [token for kind in DATE_KINDS for token in by_kind.get(kind, [])]
+        clocks = [token for kind in CLOCK_KINDS for token in by_kind.get(kind, [])]
+        fixed = [token for kind in FIXED_TIMES for token in by_kind.get(kind, [])]
+        parts = by_kind.get("part", [])
+
+        if relative:
+            delta, confidence = self._relative_delta(relative[0])
+            if len(relative) > 1 or dates or clocks or fixed or parts:
+                confidence = min(confidence, 0.5)
+            return current_time + delta, confidence
+
+        local_now = current_time.replace(tzinfo=pytz.UTC).astimezone(CHILE_TZ).replace(tzinfo=None)
+        confidence = 0.95
+
+        # Fecha
+        base_date = None
+        if dates:
+            resolved = self._resolve_date(dates[0], local_now)
+            if resolved is None:
+                return None
+            base_date, factor = resolved
+            confidence *= factor
+            if len(dates) > 1 and self._resolve_date(dates[1], local_now) != resolved:
+                confidence = min(confidence, 0.5)
+
+        part = None
+        if parts:
+            part = parts[0].group("part_a") or parts[0].group("part_b")
+            if parts[0].group("part_this"):
+                if base_date and base_date != local_now.date():
+                    confidence = min(confidence, 0.5)
+                base_date = local_now.date()
+
+        # Hora
+        if len(clocks) + len(fixed) > 1:
+            confidence = min(confidence, 0.5)
+
+        day_shift = 0
+        if clocks:
+            hour, minute, meridiem, ambiguous, before = self._clock(clocks[0])
+            if hour == 12 and not meridiem and part in MIDNIGHT_PARTS:
+                # "a las 12 de la noche": 00:00 del día siguiente, no mediodía
+                hour, day_shift = 0, MIDNIGHT_PARTS[part]
+            else:
+                hour, factor = self._apply_meridiem(hour, meridiem or (DAY_PARTS[part][2] if part else None), ambiguous)
+                confidence *= factor
+            if ambiguous and not meridiem and not part and base_date is None and 7 <= hour <= 11:
+                # "a las 9" a las 10:15: ya pasó en la mañana, lo natural es la noche de hoy
+                if local_now.replace(hour=hour, minute=minute, second=0, microsecond=0) <= local_now < \
+                        local_now.replace(hour=hour + 12, minute=minute, second=0, microsecond=0):
+                    hour += 12
+                    confidence *= 0.95
+            if before:
+                # "la una menos cuarto": el meridiano se resolvió sobre la hora dicha (13:00)
+                day_shift, minutes = divmod(day_shift * 1440 + hour * 60 - before, 1440)
+                hour, minute = divmod(minutes, 60)
+        elif fixed:
+            kind = fixed[0].lastgroup
+            hour, minute = FIXED_TIMES[kind]
+            confidence *= 0.9
+            if kind == "midnight":
+                day_shift = 1
+        elif part:
+            hour, minute, _ = DAY_PARTS[part]
+            confidence *= 0.9
+        elif base_date is not None:
+            # Solo fecha: la hora por defecto depende del tipo de tarea (lo decide el LLM)
+            hour, minute = 9, 0
+            confidence = min(confidence, 0.7)
+        else:
+            return None
+
+        if hour > 23 or minute > 59:
+            return None
+
+        if base_date is None:
+            local = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(days=day_shift)
+            if local <= local_now:
+                local += timedelta(days=1)
+        else:
+            local = datetime(base_date.year, base_date.month, base_date.day, hour, minute) + timedelta(days=day_shift)
+
+        return _to_utc(local), confidence
+
+    @staticmethod
+    def _relative_delta(token: re.Match) -> Tuple[timedelta, float]:
+        if token.lastgroup == "relative":
+            minutes, confidence = RELATIVE_WORDS[re.sub(r"\s+", " ", token.group("rel"))]
+            return timedelta(minutes=minutes), confidence
+
+        amount = _number(token.group("off_n"))
+        unit = _unit(token.group("off_unit"))
+        delta = timedelta(**{unit: amount})
+        fraction = token.group("off_frac")
+        if fraction:
+            delta += timedelta(**{unit: 0.5 if fraction == "media" else 0.25})
+        return delta, 0.95
+
+    @staticmethod
+    def _resolve_date(token: re.Match, local_now: datetime) -> Optional[Tuple[datetime, float]]:
+        kind = token.lastgroup
+        today = local_now.date()
+
+        if kind == "day":
+            return today + timedelta(days=DAY_WORDS[re.sub(r"\s+", " ", token.group("day_word"))]), 1.0
+
+        if kind == "weekday":
+            ahead = (WEEKDAYS[token.group("wd")] - today.weekday()) % 7
+            # "el lunes" dicho un lunes: la próxima semana, pero es ambiguo ("el próximo lunes" no)
+            return (today + timedelta(days=ahead or 7)), (1.0 if ahead or token.group("wd_next") else 0.85)
+
+        factor = 1.0
+        if kind == "date_iso":
+            year, month, day = token.group("iso_y"), token.group("iso_m"), token.group("iso_d")
+        elif kind == "date_num":
+            day = token.group("num_d") or token.group("dot_d")
+            month = token.group("num_m") or token.group("dot_m")
+            year = token.group("num_y") or token.group("dot_y")
+            if int(month) > 12 >= int(day):
+                # Formato MM/DD
+                day, month = month, day
+                factor = 0.9
+        else:
+            day = token.group("dt_d") or token.group("dt2_d")
+            month = MONTHS[token.group("dt_m") or token.group("dt2_m")]
+            year = token.group("dt_y") or token.group("dt2_y")
+
+        try:
+            if year:
+                year = int(year)
+                year = year + 2000 if year < 100 else year
+                return datetime(year, int(month), int(day)).date(), factor
+            candidate = datetime(today.year, int(month), int(day)).date()
+            if candidate < today:
+                candidate = datetime(today.year + 1, int(month), int(day)).date()
+            return candidate, factor
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _clock(token: re.Match) -> Tuple[int, int, Optional[str], bool, int]:
+        """
+        Hora, minuto, meridiano explícito ("am"/"pm"/"24h"), si la hora es ambigua
+        y minutos a restar ("menos cuarto", "10 to 8"; la hora devuelta es la dicha)
+        """
+        kind = token.lastgroup
+
+        def meridiem(value: Optional[str]) -> Optional[str]:
+            if not value:
+                return None
+            value = value.replace(".", "").replace(" ", "")
+            return value if value in ("am", "pm") else "24h"
+
+        if kind == "clock_hm":
+            hour, minute = int(token.group("hm_h")), int(token.group("hm_m"))
+            explicit = meridiem(token.group("hm_mer"))
+            return hour, minute, explicit, explicit is None and 1 <= hour <= 12, 0
+
+        if kind == "clock_mer":
+            explicit = meridiem(token.group("mer"))
+            hour = int(token.group("mer_h"))
+            return hour, 0, explicit, False, 0
+
+        if kind == "clock_en":
+            if token.group("oc_h"):
+                return int(token.group("oc_h")), 0, None, True, 0
+            hour = int(token.group("en_h"))
+            minutes = {"quarter": 15, "half": 30}.get(token.group("en_q")) or int(token.group("en_n") or 0)
+            minute, before = (0, minutes) if token.group("en_rel") == "to" else (minutes, 0)
+            # "quarter past 3", "10 to 8": horas de oficina → tarde
+            if 1 <= hour <= 8:
+                return hour + 12, minute, "24h", False, before
+            return hour, minute, None, 1 <= hour <= 12, before
+
+        # clock_word: "a las 9 y media", "a la una menos cuarto"
+        raw_hour = token.group("w_h")
+        hour = int(raw_hour) if raw_hour.isdigit() else int(NUMBER_WORDS[raw_hour])
+        minute = before = 0
+        if token.group("w_m"):
+            value = token.group("w_m")
+            minute = {"media": 30, "cuarto": 15}.get(value) or int(value)
+            if token.group("w_op") == "menos":
+                minute, before = 0, minute
+        return hour, minute, None, 1 <= hour <= 12, before
+
+    @staticmethod
+    def _apply_meridiem(hour: int, meridiem: Optional[str], ambiguous: bool) -> Tuple[int, float]:
+        if meridiem == "am":
+            return (0 if hour == 12 else hour), 1.0
+        if meridiem == "pm":
+            return (hour + 12 if hour < 12 else hour), 1.0
+        if meridiem == "24h" or not ambiguous or hour == 12:
+            return hour, 1.0
+        # Sin AM/PM: de 1 a 6 casi siempre es de tarde
+        if hour <= 6:
+            return hour + 12, 0.85
+        return hour, 0.9
+
+
+# Instancia global del parser
+time_parser = TimeExpressionParser()
+
+
+def parse_time_expression(text: str, current_time: Optional[datetime] = None) -> Optional[TimeParseResult]:
+    """
+    Interpretar una expresión temporal localmente (función de conveniencia)
+
+    Args:
+        text: Texto del usuario
+        current_time: Hora actual (UTC naive)
+
+    Returns:
+        TimeParseResult o None
+    """
+    return time_parser.parse(text, current_time)